@@ -0,0 +1,514 @@
+# app/batch.py
+"""
+This module provides streaming batch evaluation of calculations. An input CSV file of
+`operation,num1,num2` rows is read in bounded-size chunks, each row is evaluated with the
+loaded plugin commands, and results are written incrementally to an output CSV file, so
+memory use stays constant regardless of the input size.
+
+For large files, run_sharded_batch splits the input into byte ranges aligned to line
+boundaries. Worker processes read, evaluate and write their shards independently, so the
+parent never touches the rows; it only concatenates the shard outputs in input order,
+which gives the same output file as evaluating in one process. Rows must not contain
+quoted line breaks, which `operation,num1,num2` rows never do.
+
+plan_batch asks the execution planner whether a file is best evaluated inline, on the
+thread pool or on the worker pool, from a sample of its rows.
+
+Both runners take an optional deadline for the whole job. Rows that are not evaluated
+when it passes are written with a timeout error, and the worker pool is recycled so that
+the calculations it is still running stop.
+"""
+
+import csv
+import logging
+import os
+import shutil
+import tempfile
+import time
+from collections import deque
+from decimal import InvalidOperation
+from itertools import islice
+from app.calculation import Calculation
+from app.calculations import Calculations
+from app.execution_planner import ExecutionPlanner, PlanDecision, calculation_size
+from app.numeric import NumericBackend, create_backend, get_backend
+from app.shm_transport import SharedColumn
+from app.worker_pool import CalculationTimeout, WorkerPool, worker_commands
+
+DEFAULT_CHUNK_SIZE = 10000
+DEFAULT_SHARDS_PER_WORKER = 4
+PLAN_SAMPLE_ROWS = 256
+OUTPUT_HEADER = ["operation", "num1", "num2", "result", "error"]
+
+class BatchSummary:
+    """
+    Totals collected while running a batch job.
+    """
+    def __init__(self):
+        self.rows = 0
+        self.errors = 0
+        self.chunks = 0
+        self.timed_out = 0
+        self.elapsed = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """
+        Rows evaluated per second.
+
+        Returns:
+            float: The throughput of the batch job.
+        """
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self) -> str:
+        errors = f"{self.errors} errors, {self.timed_out} timed out" if self.timed_out else f"{self.errors} errors"
+        return (f"Processed {self.rows} rows ({errors}) in {self.chunks} chunks "
+                f"in {self.elapsed:.3f}s ({self.throughput:.0f} rows/sec)")
+
+def read_chunks(reader, chunk_size: int, skip_header: bool = True):
+    """
+    Yield lists of at most chunk_size rows from a CSV reader, skipping an optional header.
+
+    Args:
+        reader: A csv.reader over the input file.
+        chunk_size (int): The maximum number of rows per chunk.
+        skip_header (bool): Whether a first row starting with "operation" is a header.
+    """
+    first_chunk = skip_header
+    while True:
+        chunk = list(islice(reader, chunk_size))
+        if not chunk:
+            return
+        if first_chunk and chunk[0] and chunk[0][0].strip().lower() == "operation":
+            chunk = chunk[1:]
+        first_chunk = False
+        if chunk:
+            yield chunk
+
+def evaluate_row(row: list, commands: dict, backend: NumericBackend) -> tuple:
+    """
+    Evaluate a single `operation,num1,num2` row.
+
+    Args:
+        row (list): The CSV fields of the row.
+        commands (dict): The loaded plugin commands, keyed by operation name.
+        backend (NumericBackend): The numeric backend used to parse the operands.
+
+    Returns:
+        tuple: The operation name, operands, result and error message (None on success).
+    """
+    if len(row) != 3:
+        return None, None, None, None, f"Expected 3 fields, got {len(row)}"
+    operation_type, num1, num2 = (field.strip() for field in row)
+    command = commands.get(operation_type)
+    if command is None:
+        return None, None, None, None, f"Unknown operation: {operation_type}"
+    try:
+        value1, value2 = backend.parse(num1), backend.parse(num2)
+    except InvalidOperation:
+        return operation_type, None, None, None, f"Invalid number input: {num1} or {num2}"
+    try:
+        result = command.execute(value1, value2)
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        return operation_type, value1, value2, None, f"{type(e).__name__}: {e}"
+    return operation_type, value1, value2, result, None
+
+def evaluate_chunk(chunk: list, mode: str, commands: dict = None) -> list:
+    """
+    Evaluate a chunk of rows. Without commands, the worker process's preloaded plugins are used.
+
+    Args:
+        chunk (list): The CSV rows to evaluate.
+        mode (str): The name of the numeric backend to evaluate with.
+        commands (dict): The plugin commands, keyed by operation name.
+
+    Returns:
+        list: One evaluate_row tuple per input row.
+    """
+    commands = commands if commands is not None else worker_commands()
+    backend = create_backend(mode)
+    return [evaluate_row(row, commands, backend) for row in chunk]
+
+def evaluate_chunk_shared(chunk: list, mode: str, names: tuple) -> tuple:
+    """
+    Evaluate a chunk of rows in a worker process and write the operands and results into
+    shared columns, so only the errors and side channels are pickled back.
+
+    Args:
+        chunk (list): The CSV rows to evaluate.
+        mode (str): The name of the numeric backend to evaluate with.
+        names (tuple): The block names of the num1, num2 and result columns.
+
+    Returns:
+        tuple: The error messages and the side channels of the three columns, by row.
+    """
+    columns = [SharedColumn(len(chunk), name) for name in names]
+    try:
+        errors, side_channels = {}, ({}, {}, {})
+        for position, (_, num1, num2, result, error) in enumerate(evaluate_chunk(chunk, mode)):
+            if error is not None:
+                errors[position] = error
+                continue
+            for column, side_channel, value in zip(columns, side_channels, (num1, num2, result)):
+                needs_side_channel, entry = column.write(position, value)
+                if needs_side_channel:
+                    side_channel[position] = entry
+        return errors, side_channels
+    finally:
+        for column in columns:
+            column.close()
+
+def read_shared_chunk(chunk: list, columns: list, errors: dict, side_channels: tuple) -> list:
+    """
+    Rebuild the evaluate_row tuples of a chunk evaluated by evaluate_chunk_shared.
+
+    Args:
+        chunk (list): The CSV rows of the chunk.
+        columns (list): The num1, num2 and result SharedColumns.
+        errors (dict): The error messages by row.
+        side_channels (tuple): The side channels of the columns.
+
+    Returns:
+        list: One evaluate_row tuple per row.
+    """
+    rows = [position for position in range(len(chunk)) if position not in errors]
+    values = [column.column(side_channel).take(rows) for column, side_channel in zip(columns, side_channels)]
+    evaluated = [(None, None, None, None, errors.get(position)) for position in range(len(chunk))]
+    for position, num1, num2, result in zip(rows, *values):
+        evaluated[position] = (chunk[position][0].strip(), num1, num2, result, None)
+    return evaluated
+
+def _release(columns: list):
+    for column in columns:
+        column.close()
+        column.memory.unlink()
+
+def format_rows(chunk: list, evaluated: list) -> tuple:
+    """
+    Build the output rows of an evaluated chunk.
+
+    Args:
+        chunk (list): The CSV rows of the chunk.
+        evaluated (list): One evaluate_row tuple per row.
+
+    Returns:
+        tuple: The `operation,num1,num2,result,error` rows and the number of errors.
+    """
+    output_rows, errors = [], 0
+    for row, (operation_type, num1, num2, result, error) in zip(chunk, evaluated):
+        if error is None:
+            output_rows.append([operation_type, num1, num2, result, ""])
+        else:
+            errors += 1
+            output_rows.append(row[:3] + [""] * (3 - len(row[:3])) + ["", error])
+    return output_rows, errors
+
+def _record_calculation(commands: dict, operation_type: str, num1, num2, result):
+    calculation = Calculation(num1, num2, commands[operation_type])
+    calculation.result = result
+    Calculations.add_calculation(calculation)
+
+def _write_chunk(writer, chunk: list, evaluated: list, commands: dict, record_history: bool, summary: BatchSummary):
+    if record_history:
+        for operation_type, num1, num2, result, error in evaluated:
+            if error is None:
+                _record_calculation(commands, operation_type, num1, num2, result)
+    output_rows, errors = format_rows(chunk, evaluated)
+    writer.writerows(output_rows)
+    summary.errors += errors
+    summary.rows += len(chunk)
+    summary.chunks += 1
+    logging.debug("Batch chunk %d written (%d rows so far).", summary.chunks, summary.rows)
+
+def _write_timed_out(writer, chunk: list, deadline: float, summary: BatchSummary):
+    message = f"CalculationTimeout: the batch deadline of {deadline:g}s was exceeded"
+    output_rows, errors = format_rows(chunk, [(None, None, None, None, message)] * len(chunk))
+    writer.writerows(output_rows)
+    summary.errors += errors
+    summary.rows += len(chunk)
+    summary.timed_out += len(chunk)
+
+def _remaining(start: float, deadline: float) -> float:
+    """
+    Return the seconds left before the deadline of a job started at start (None if it has none).
+    """
+    return None if deadline is None else max(0.0, start + deadline - time.perf_counter())
+
+def _collect(pool: WorkerPool, future, timeout: float, summary: BatchSummary):
+    """
+    Return the result of a task, or None if the job's deadline passed before it finished.
+    Missing the deadline recycles the pool, which stops every task still running.
+    """
+    if not summary.timed_out:
+        try:
+            return pool.wait(future, timeout)
+        except CalculationTimeout:
+            return None
+    # Tasks that finished before the pool was recycled still have their results
+    if future.done() and not future.cancelled() and future.exception() is None:
+        return future.result()
+    return None
+
+def run_batch(input_path: str, output_path: str, commands: dict, chunk_size: int = DEFAULT_CHUNK_SIZE,
+              record_history: bool = False, pool: WorkerPool = None, deadline: float = None) -> BatchSummary:
+    """
+    Stream calculations from input_path through the plugin commands into output_path.
+
+    Operands are parsed with the active numeric backend. Rows that fail are written
+    with an error message instead of aborting the job. When a
+    worker pool is given, chunks are evaluated in the pool's processes (at most two chunks
+    per worker in flight) and written back in input order; the operands and results come
+    back in shared memory columns rather than pickled.
+
+    Args:
+        input_path (str): CSV file of `operation,num1,num2` rows (header optional).
+        output_path (str): CSV file to write `operation,num1,num2,result,error` rows to.
+        commands (dict): The loaded plugin commands, keyed by operation name.
+        chunk_size (int): The number of rows held in memory at a time.
+        record_history (bool): Whether successful calculations are added to Calculations.
+        pool (WorkerPool): Optional worker pool to evaluate chunks in.
+        deadline (float): Optional seconds the job may take. Without a pool, the job can
+            only stop between chunks.
+
+    Returns:
+        BatchSummary: Row, error and timing totals for the job.
+    """
+    summary = BatchSummary()
+    mode = get_backend().name
+    start = time.perf_counter()
+    with open(input_path, newline="", encoding="utf-8") as infile, \
+         open(output_path, "w", newline="", encoding="utf-8") as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(OUTPUT_HEADER)
+
+        def write_pending(chunk: list, columns: list, future):
+            try:
+                shared = _collect(pool, future, _remaining(start, deadline), summary)
+                if shared is None:
+                    _write_timed_out(writer, chunk, deadline, summary)
+                    summary.chunks += 1
+                else:
+                    evaluated = read_shared_chunk(chunk, columns, *shared)
+                    _write_chunk(writer, chunk, evaluated, commands, record_history, summary)
+            finally:
+                _release(columns)
+
+        if pool is None:
+            for chunk in read_chunks(csv.reader(infile), chunk_size):
+                if _remaining(start, deadline) == 0:
+                    _write_timed_out(writer, chunk, deadline, summary)
+                    summary.chunks += 1
+                    continue
+                _write_chunk(writer, chunk, evaluate_chunk(chunk, mode, commands), commands, record_history, summary)
+                outfile.flush()
+        else:
+            pending = deque()
+            try:
+                for chunk in read_chunks(csv.reader(infile), chunk_size):
+                    if summary.timed_out:
+                        _write_timed_out(writer, chunk, deadline, summary)
+                        summary.chunks += 1
+                        continue
+                    # Operands and results come back through shared memory instead of pickles
+                    columns = []
+                    try:
+                        for _ in range(3):
+                            columns.append(SharedColumn(len(chunk)))
+                        names = tuple(column.name for column in columns)
+                        pending.append((chunk, columns, pool.submit(evaluate_chunk_shared, chunk, mode, names)))
+                    except BaseException:
+                        _release(columns)
+                        raise
+                    if len(pending) >= 2 * pool.max_workers:
+                        write_pending(*pending.popleft())
+                while pending:
+                    write_pending(*pending.popleft())
+            finally:
+                for _, columns, _ in pending:
+                    _release(columns)
+            outfile.flush()
+    summary.elapsed = time.perf_counter() - start
+    logging.info(str(summary))
+    return summary
+
+def plan_batch(input_path: str, planner: ExecutionPlanner, chunk_size: int = DEFAULT_CHUNK_SIZE,
+               strategy: str = None, deadline: float = None) -> PlanDecision:
+    """
+    Pick inline, thread or process evaluation for a batch job. The row count is estimated
+    from the file size, and the cost per row from a sample of the first rows.
+
+    Args:
+        input_path (str): CSV file of `operation,num1,num2` rows (header optional).
+        planner (ExecutionPlanner): The planner to decide with.
+        chunk_size (int): The number of rows per chunk, each submitted as one task.
+        strategy (str): A strategy to use instead of the cheapest one.
+        deadline (float): Seconds the job must finish in, if any.
+
+    Returns:
+        PlanDecision: The decision.
+    """
+    backend = get_backend()
+    with open(input_path, newline="", encoding="utf-8") as infile:
+        lines = list(islice(infile, PLAN_SAMPLE_ROWS))
+    sample = next(read_chunks(csv.reader(lines), PLAN_SAMPLE_ROWS), [])
+    sampled_bytes = sum(len(line.encode("utf-8")) for line in lines)
+    rows = max(len(sample), round(os.path.getsize(input_path) * len(sample) / sampled_bytes)) if sample else 0
+    works, sizes = [], []
+    for row in sample:
+        if len(row) != 3 or row[0].strip() not in planner.commands:
+            continue
+        operation_type = row[0].strip()
+        try:
+            size = calculation_size(operation_type, backend.parse(row[1].strip()), backend.parse(row[2].strip()))
+        except InvalidOperation:
+            continue
+        works.append(planner.work_seconds(operation_type, size))
+        sizes.append(size)
+    work = sum(works) / len(works) if works else 0.0
+    size = round(sum(sizes) / len(sizes)) if sizes else 1
+    tasks = max(1, -(-rows // chunk_size))
+    return planner.decide(os.path.basename(input_path), work, size, rows, tasks, strategy, deadline)
+
+def shard_ranges(input_path: str, shards: int) -> list:
+    """
+    Split a file into at most `shards` byte ranges of similar size that each start at the
+    beginning of a line.
+
+    Args:
+        input_path (str): The file to split.
+        shards (int): The number of ranges wanted.
+
+    Returns:
+        list: (start, end) byte offsets covering the whole file, in order.
+    """
+    size = os.path.getsize(input_path)
+    boundaries = [0]
+    with open(input_path, "rb") as infile:
+        for shard in range(1, shards):
+            offset = size * shard // shards
+            if offset <= boundaries[-1]:
+                continue
+            # Reading from the byte before the nominal offset keeps a shard that already
+            # starts on a line, and otherwise moves it to the start of the next line
+            infile.seek(offset - 1)
+            infile.readline()
+            position = infile.tell()
+            if boundaries[-1] < position < size:
+                boundaries.append(position)
+    boundaries.append(size)
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if end > start]
+
+def _read_lines(infile, length: int):
+    """
+    Yield the decoded lines in the next `length` bytes of a binary file.
+    """
+    while length > 0:
+        line = infile.readline()
+        if not line:
+            return
+        length -= len(line)
+        yield line.decode("utf-8")
+
+def evaluate_shard(input_path: str, start: int, end: int, output_path: str, mode: str,
+                   chunk_size: int = DEFAULT_CHUNK_SIZE) -> tuple:
+    """
+    Evaluate the rows in a byte range of the input and write their output rows to a
+    file of their own. Runs in a worker process, with its preloaded plugins.
+
+    Args:
+        input_path (str): The input CSV file.
+        start (int): The offset of the first line of the shard.
+        end (int): The offset the shard ends before.
+        output_path (str): The file to write the shard's output rows to, without header.
+        mode (str): The name of the numeric backend to evaluate with.
+        chunk_size (int): The number of rows held in memory at a time.
+
+    Returns:
+        tuple: The numbers of rows and errors in the shard.
+    """
+    commands = worker_commands()
+    backend = create_backend(mode)
+    rows = errors = 0
+    with open(input_path, "rb") as infile, open(output_path, "w", newline="", encoding="utf-8") as outfile:
+        infile.seek(start)
+        writer = csv.writer(outfile)
+        for chunk in read_chunks(csv.reader(_read_lines(infile, end - start)), chunk_size, skip_header=start == 0):
+            output_rows, chunk_errors = format_rows(chunk, [evaluate_row(row, commands, backend) for row in chunk])
+            writer.writerows(output_rows)
+            rows += len(chunk)
+            errors += chunk_errors
+    return rows, errors
+
+def _record_shard_history(shard_path: str, commands: dict, backend: NumericBackend):
+    with open(shard_path, newline="", encoding="utf-8") as shard:
+        for operation_type, num1, num2, result, error in csv.reader(shard):
+            if not error:
+                _record_calculation(commands, operation_type, backend.parse(num1), backend.parse(num2),
+                                    backend.parse(result))
+
+def _write_timed_out_shard(writer, input_path: str, start: int, end: int, deadline: float, summary: BatchSummary):
+    with open(input_path, "rb") as infile:
+        infile.seek(start)
+        for chunk in read_chunks(csv.reader(_read_lines(infile, end - start)), DEFAULT_CHUNK_SIZE,
+                                 skip_header=start == 0):
+            _write_timed_out(writer, chunk, deadline, summary)
+
+def run_sharded_batch(input_path: str, output_path: str, commands: dict, pool: WorkerPool, shards: int = None,
+                      chunk_size: int = DEFAULT_CHUNK_SIZE, record_history: bool = False,
+                      deadline: float = None) -> BatchSummary:
+    """
+    Evaluate a batch file in the worker processes of a pool, one line-aligned byte range
+    (shard) per task, and merge the shard outputs into output_path in input order. The
+    output is the same as run_batch's.
+
+    Args:
+        input_path (str): CSV file of `operation,num1,num2` rows (header optional).
+        output_path (str): CSV file to write `operation,num1,num2,result,error` rows to.
+        commands (dict): The loaded plugin commands, keyed by operation name.
+        pool (WorkerPool): The worker pool to evaluate the shards in.
+        shards (int): The number of shards; defaults to BATCH_SHARDS, or four per worker.
+        chunk_size (int): The number of rows a worker holds in memory at a time.
+        record_history (bool): Whether successful calculations are added to Calculations.
+        deadline (float): Optional seconds the job may take.
+
+    Returns:
+        BatchSummary: Row, error and timing totals for the job; chunks counts the shards.
+    """
+    summary = BatchSummary()
+    backend = get_backend()
+    start = time.perf_counter()
+    shards = shards or int(os.getenv("BATCH_SHARDS", "0")) or DEFAULT_SHARDS_PER_WORKER * pool.max_workers
+    ranges = shard_ranges(input_path, shards)
+    directory = tempfile.mkdtemp(prefix=".shards-", dir=os.path.dirname(os.path.abspath(output_path)))
+    futures = []
+    try:
+        shard_paths = [os.path.join(directory, f"{index}.csv") for index in range(len(ranges))]
+        futures = [pool.submit(evaluate_shard, input_path, begin, end, shard_path, backend.name, chunk_size)
+                   for (begin, end), shard_path in zip(ranges, shard_paths)]
+        with open(output_path, "w", newline="", encoding="utf-8") as outfile:
+            writer = csv.writer(outfile)
+            writer.writerow(OUTPUT_HEADER)
+            for future, shard_path, (begin, end) in zip(futures, shard_paths, ranges):
+                result = _collect(pool, future, _remaining(start, deadline), summary)
+                if result is None:
+                    _write_timed_out_shard(writer, input_path, begin, end, deadline, summary)
+                    summary.chunks += 1
+                    continue
+                rows, errors = result
+                if record_history:
+                    _record_shard_history(shard_path, commands, backend)
+                with open(shard_path, newline="", encoding="utf-8") as shard:
+                    shutil.copyfileobj(shard, outfile)
+                summary.rows += rows
+                summary.errors += errors
+                summary.chunks += 1
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    summary.elapsed = time.perf_counter() - start
+    logging.info(str(summary))
+    return summary
@@ -3,18 +3,29 @@
 This module provides a Calculations class that manages arithmetic operation history 
 using the PandasFacade for DataFrame operations. It supports adding, clearing, 
 retrieving, filtering, saving, loading, and deleting calculation records.
+
+When a journal is open, every change is also appended to the journal next to the
+history file, so saving does not have to rewrite the whole history.
+
+The history itself lives in a HistorySession; Calculations is the default session
+used by the REPL and the batch commands, and callers that need their own history
+create another HistorySession.
 """
 
-import pandas as pd
+from typing import TYPE_CHECKING
 from app.calculation import Calculation
-from app.pandas_facade import PandasFacade
+from app.history_query import HistoryQuery
+from app.history_session import HistorySession
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 class Calculations:
     """
     A class to manage calculations using the PandasFacade for DataFrame operations.
     """
 
-    facade = PandasFacade()
+    session = HistorySession()
 
     @classmethod
     def add_calculation(cls, calculation: Calculation):
@@ -24,33 +35,60 @@ class Calculations:
         Args:
             calculation (Calculation): The calculation instance to add.
         """
-        new_record = {
-            "operation": calculation.operation.operation_name,
-            "num1": calculation.a,
-            "num2": calculation.b,
-            "result": calculation.result
-        }
-        cls.facade.add_record(new_record)
+        cls.session.add_calculation(calculation)
 
     @classmethod
     def clear_history(cls):
         """
         Clear the entire history of calculations.
         """
-        cls.facade.clear()
+        cls.session.clear_history()
 
     @classmethod
-    def get_all_calculations(cls) -> pd.DataFrame:
+    def get_all_calculations(cls) -> "pd.DataFrame":
         """
         Retrieve all Calculation instances in the history.
 
         Returns:
             pd.DataFrame: A DataFrame containing all calculation records.
         """
-        return cls.facade.dataframe
+        return cls.session.get_all_calculations()
+
+    @classmethod
+    def get_latest(cls) -> dict:
+        """
+        Retrieve the most recent calculation in the history.
+
+        Returns:
+            dict: The latest calculation record, or None if the history is empty.
+        """
+        return cls.session.get_latest()
+
+    @classmethod
+    def preview_history(cls, count: int = 5) -> "pd.DataFrame":
+        """
+        Retrieve only the first and last calculations, without materializing the whole history.
+
+        Args:
+            count (int): The number of calculations to take from each end.
+
+        Returns:
+            pd.DataFrame: A DataFrame of the selected calculation records.
+        """
+        return cls.session.preview_history(count)
 
     @classmethod
-    def filter_with_operation(cls, operation: str) -> pd.DataFrame:
+    def count(cls) -> int:
+        """
+        Count the calculations in the history.
+
+        Returns:
+            int: The number of calculations.
+        """
+        return cls.session.count()
+
+    @classmethod
+    def filter_with_operation(cls, operation: str) -> "pd.DataFrame":
         """
         Filter Calculation instances based on the specified operation.
 
@@ -60,27 +98,80 @@ class Calculations:
         Returns:
             pd.DataFrame: A DataFrame containing filtered calculation records.
         """
-        return cls.facade.filter_by_operation(operation)
+        return cls.session.filter_with_operation(operation)
+
+    @classmethod
+    def count_by_operation(cls) -> dict:
+        """
+        Count the Calculation instances of every operation in the history.
+
+        Returns:
+            dict: Calculation counts keyed by operation name.
+        """
+        return cls.session.count_by_operation()
+
+    @classmethod
+    def summary(cls, operation: str = None) -> dict:
+        """
+        Return running aggregates of the results by operation.
+
+        Args:
+            operation (str): Only summarize this operation.
+
+        Returns:
+            dict: count, sum, mean, variance, stdev, min and max keyed by operation name.
+        """
+        return cls.session.summary(operation)
+
+    @classmethod
+    def query(cls, query: HistoryQuery) -> "pd.DataFrame":
+        """
+        Run a range/predicate query over the history.
+
+        Args:
+            query (HistoryQuery): The query.
+
+        Returns:
+            pd.DataFrame: The matching calculation records.
+        """
+        return cls.session.query(query)
+
+    @classmethod
+    def explain_query(cls, query: HistoryQuery) -> str:
+        """
+        Run a query and describe how it was answered.
+
+        Args:
+            query (HistoryQuery): The query.
+
+        Returns:
+            str: The plan chosen and the rows it examined.
+        """
+        return cls.session.explain_query(query)
 
     @classmethod
     def save_history(cls, filepath: str):
         """
-        Save the calculation history to a CSV file.
+        Save the calculation history to a file. The format is chosen by extension:
+        .npz, .arrow and .feather are binary columnar formats, anything else is CSV.
+
+        Saving to the file of the open journal compacts it.
 
         Args:
             filepath (str): The path where the history should be saved.
         """
-        cls.facade.save_to_file(filepath)
+        cls.session.save_history(filepath)
 
     @classmethod
     def load_history(cls, filepath: str):
         """
-        Load calculation history from a CSV file.
+        Load calculation history from a file, then replay its journal if there is one.
+        Binary columnar files are memory-mapped instead of read into memory.
 
         Args:
             filepath (str): The path from where the history should be loaded.
         """
-        cls.facade.load_from_file(filepath)
+        cls.session.load_history(filepath)
 
     @classmethod
     def delete_history(cls, index: int):
@@ -90,4 +181,61 @@ class Calculations:
         Args:
             index (int): The index of the calculation to delete.
         """
-        cls.facade.delete_record(index)
+        cls.session.delete_history(index)
+
+    @classmethod
+    def delete_records(cls, indices) -> int:
+        """
+        Delete many calculations in one pass. Indices refer to the history before the
+        delete; out-of-range indices are ignored.
+
+        Args:
+            indices: The indices of the calculations to delete, e.g. a list or a range.
+
+        Returns:
+            int: The number of calculations deleted.
+        """
+        return cls.session.delete_records(indices)
+
+    @classmethod
+    def delete_operation(cls, operation: str) -> int:
+        """
+        Delete every calculation of an operation.
+
+        Args:
+            operation (str): The operation name.
+
+        Returns:
+            int: The number of calculations deleted.
+        """
+        return cls.session.delete_operation(operation)
+
+    @classmethod
+    def open_journal(cls, filepath: str, fsync_every: int = None, compact_every: int = None):
+        """
+        Load the history stored at filepath and journal every later change next to it.
+
+        Defaults come from the HISTORY_JOURNAL_FSYNC (records per fsync, 0 = leave it to
+        the OS) and HISTORY_JOURNAL_COMPACT_EVERY (journal records before an automatic
+        compaction, 0 = never) environment variables.
+
+        Args:
+            filepath (str): The snapshot file of the history.
+            fsync_every (int): fsync after this many journal records.
+            compact_every (int): Compact after this many journal records.
+        """
+        cls.session.open_journal(filepath, fsync_every, compact_every)
+
+    @classmethod
+    def compact_history(cls):
+        """
+        Write a fresh snapshot of the history and start an empty journal.
+        """
+        cls.session.compact_history()
+
+    @classmethod
+    def close_journal(cls):
+        """
+        Stop journaling changes.
+        """
+        cls.session.close_journal()
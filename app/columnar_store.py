@@ -0,0 +1,218 @@
+# app/columnar_store.py
+"""
+This module reads and writes calculation history in binary columnar formats.
+
+- `.npz`: an uncompressed NumPy archive, always available.
+- `.arrow` / `.feather`: Arrow IPC files, available when pyarrow is installed.
+
+Every value column is stored as a type code per row plus the exact text of the value,
+so Decimal, float, int and fixed-point values round-trip without loss. The operation
+column is stored as integer codes into a list of operation names.
+
+Files are opened lazily through memory mapping: only the pages a reader touches are
+loaded, so looking at the latest rows or filtering by operation works on histories
+much larger than RAM.
+"""
+
+import os
+import struct
+import zipfile
+from decimal import Decimal
+import numpy as np
+from app.journal import decode_value, encode_value
+
+NPZ_EXTENSIONS = (".npz",)
+ARROW_EXTENSIONS = (".arrow", ".feather")
+VALUE_KINDS = [None, "decimal", "float", "int", "fixed", "str"]
+
+def is_columnar_path(filepath: str) -> bool:
+    """
+    Whether a file extension selects a binary columnar format.
+
+    Args:
+        filepath (str): The history file path.
+
+    Returns:
+        bool: True for .npz, .arrow and .feather files.
+    """
+    return filepath.lower().endswith(NPZ_EXTENSIONS + ARROW_EXTENSIONS)
+
+def _encode_column(values: list) -> tuple:
+    kinds = np.zeros(len(values), dtype=np.int8)
+    texts = []
+    for index, value in enumerate(values):
+        encoded = encode_value(value)
+        if encoded is None:
+            texts.append(b"")
+        elif isinstance(encoded, str):
+            kinds[index] = VALUE_KINDS.index("str")
+            texts.append(encoded.encode("utf-8"))
+        else:
+            kinds[index] = VALUE_KINDS.index(encoded[0])
+            texts.append(encoded[1].encode("ascii"))
+    return kinds, _bytes_array(texts)
+
+def _bytes_array(items: list) -> np.ndarray:
+    return np.array(items, dtype=bytes) if items else np.zeros(0, dtype="S1")
+
+def _decode_cell(kind: int, text: bytes):
+    if kind == 0:
+        return None
+    if VALUE_KINDS[kind] == "str":
+        return text.decode("utf-8")
+    return decode_value([VALUE_KINDS[kind], text.decode("ascii")])
+
+def write_columnar(filepath: str, codes: list, categories: list, columns: dict):
+    """
+    Write history columns to a binary columnar file chosen by extension.
+
+    Args:
+        filepath (str): The .npz, .arrow or .feather file to write.
+        codes (list): The operation code of every row (-1 for no operation).
+        categories (list): The operation names the codes refer to.
+        columns (dict): The num1, num2 and result values keyed by column name.
+    """
+    arrays = {
+        "operation_codes": np.asarray(codes, dtype=np.int32),
+        "operation_categories": _bytes_array([name.encode("utf-8") for name in categories]),
+    }
+    for name, values in columns.items():
+        arrays[f"{name}_kinds"], arrays[f"{name}_text"] = _encode_column(values)
+    # Write to a temporary file first: the target may be memory-mapped by a reader
+    root, extension = os.path.splitext(filepath)
+    temporary_path = f"{root}.tmp{extension}"
+    if filepath.lower().endswith(ARROW_EXTENSIONS):
+        _write_arrow(temporary_path, arrays)
+    else:
+        with open(temporary_path, "wb") as f:
+            np.savez(f, **arrays)
+    os.replace(temporary_path, filepath)
+
+def _write_arrow(filepath: str, arrays: dict):
+    import pyarrow as pa  # pylint: disable=import-outside-toplevel
+    table = pa.table({
+        "operation": pa.DictionaryArray.from_arrays(
+            pa.array(arrays["operation_codes"], mask=arrays["operation_codes"] < 0),
+            pa.array([name.decode("utf-8") for name in arrays["operation_categories"]], type=pa.string()),
+        ),
+        **{name: pa.array(array) if name.endswith("_kinds") else pa.array(array.tolist(), type=pa.binary())
+           for name, array in arrays.items() if name.endswith(("_kinds", "_text"))},
+    })
+    with pa.OSFile(filepath, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+def _memmap_npz(filepath: str) -> dict:
+    """
+    Memory-map every array stored in an uncompressed .npz archive.
+    """
+    arrays = {}
+    with zipfile.ZipFile(filepath) as archive, open(filepath, "rb") as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"Cannot memory-map compressed member {info.filename} of {filepath}")
+            f.seek(info.header_offset)
+            name_length, extra_length = struct.unpack("<HH", f.read(30)[26:30])
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            name = info.filename[:-4]
+            if 0 in shape:
+                arrays[name] = np.zeros(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(filepath, dtype=dtype, mode="r", offset=f.tell(), shape=shape,
+                                         order="F" if fortran_order else "C")
+    return arrays
+
+def _memmap_arrow(filepath: str) -> dict:
+    import pyarrow as pa  # pylint: disable=import-outside-toplevel
+    table = pa.ipc.open_file(pa.memory_map(filepath, "r")).read_all()
+    operation = table.column("operation").combine_chunks()
+    arrays = {
+        "operation_codes": operation.indices.fill_null(-1).to_numpy(zero_copy_only=False).astype(np.int32),
+        "operation_categories": _bytes_array([name.encode("utf-8") for name in operation.dictionary.to_pylist()]),
+    }
+    for name in table.column_names:
+        if name.endswith("_kinds"):
+            arrays[name] = table.column(name).to_numpy()
+        elif name.endswith("_text"):
+            arrays[name] = _ArrowTextColumn(table.column(name))
+    return arrays
+
+class _ArrowTextColumn:
+    """
+    Random access to a binary Arrow column without converting all of it to Python.
+    """
+    def __init__(self, column):
+        self._column = column.combine_chunks()
+
+    def __len__(self) -> int:
+        return len(self._column)
+
+    def __getitem__(self, index: int) -> bytes:
+        return self._column[index].as_py()
+
+class ColumnarHistory:
+    """
+    A read-only, memory-mapped view of a history file written by write_columnar.
+    """
+    def __init__(self, filepath: str):
+        """
+        Open a columnar history file without reading its rows.
+
+        Args:
+            filepath (str): The .npz, .arrow or .feather file to open.
+        """
+        self.filepath = filepath
+        arrays = _memmap_arrow(filepath) if filepath.lower().endswith(ARROW_EXTENSIONS) else _memmap_npz(filepath)
+        self.codes = arrays["operation_codes"]
+        self.categories = [name.decode("utf-8") for name in arrays["operation_categories"]]
+        self._kinds = {name[:-6]: array for name, array in arrays.items() if name.endswith("_kinds")}
+        self._texts = {name[:-5]: array for name, array in arrays.items() if name.endswith("_text")}
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def column_names(self) -> list:
+        """
+        The names of the value columns in the file.
+        """
+        return list(self._kinds)
+
+    def value(self, name: str, index: int):
+        """
+        Decode a single cell.
+
+        Args:
+            name (str): The column name.
+            index (int): The row position.
+
+        Returns:
+            The exact stored value.
+        """
+        return _decode_cell(int(self._kinds[name][index]), bytes(self._texts[name][index]))
+
+    def values(self, name: str, positions=None) -> list:
+        """
+        Decode a column, or only the given row positions of it.
+
+        Args:
+            name (str): The column name.
+            positions: Optional row positions to decode.
+
+        Returns:
+            list: The exact stored values.
+        """
+        if isinstance(self._texts[name], _ArrowTextColumn):
+            positions = range(len(self)) if positions is None else positions
+            return [self.value(name, position) for position in positions]
+        kinds, texts = np.asarray(self._kinds[name]), np.asarray(self._texts[name])
+        if positions is not None:
+            positions = np.asarray(positions, dtype=np.int64)
+            kinds, texts = kinds[positions], texts[positions]
+        decimal_kind = VALUE_KINDS.index("decimal")
+        return [Decimal(text.decode("ascii")) if kind == decimal_kind else _decode_cell(kind, text)
+                for kind, text in zip(kinds.tolist(), texts.tolist())]
@@ -5,13 +5,24 @@ This module defines the abstract base class `Command` for executing arithmetic o
 
 from decimal import Decimal
 from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
 
 class Command(ABC):
     """
     Abstract base class for arithmetic operations. 
     Provides a common interface for executing operations.
+
+    Plugins describe themselves to the result cache with class attributes:
+    `pure` (the result depends only on the operands), `commutative` (the operands
+    can be swapped) and `arity` (1 if the second operand is ignored).
     """
     operation_name: str
+    pure: bool = False
+    commutative: bool = False
+    arity: int = 2
 
     @abstractmethod
     def execute(self, num1: Decimal, num2: Decimal) -> Decimal:
@@ -38,3 +49,30 @@ class Command(ABC):
             result_queue (multiprocessing.Queue): Queue to store the result.
         """
         # No implementation needed for abstract methods
+
+    def execute_batch(self, a, b) -> "np.ndarray":
+        """
+        Execute the operation element-wise over two columns of numbers.
+
+        This default implementation loops over `execute`; plugins override it with
+        vectorized NumPy code. Rows that raise an ArithmeticError (such as division by
+        zero) come back as None for object arrays and NaN for numeric arrays.
+
+        Args:
+            a (array-like): The first operands (float64, int64 or object array of Decimal).
+            b (array-like): The second operands, the same length as a.
+
+        Returns:
+            np.ndarray: The results, object dtype if either input is object, else float64.
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel,redefined-outer-name
+        a, b = np.asarray(a), np.asarray(b)
+        results = np.empty(len(a), dtype=object)
+        for index, (num1, num2) in enumerate(zip(a, b)):
+            try:
+                results[index] = self.execute(num1, num2)
+            except ArithmeticError:
+                results[index] = None
+        if a.dtype != object and b.dtype != object:
+            return results.astype(np.float64)
+        return results
@@ -0,0 +1,515 @@
+# app/execution_planner.py
+"""
+This module decides where calculations run: inline in the calling thread, on the thread
+pool, or on the worker process pool.
+
+The inline cost of a calculation is looked up on a per-operation cost curve of measured
+(size, seconds) points, interpolated on a log-log scale, where size is the number of
+digits of the larger operand (for a Decimal division, the precision, which sets how many
+digits of the quotient are computed). The first time an operation is planned,
+a short microbenchmark measures the curve on growing operands until a single call would
+take more than a couple of milliseconds; larger sizes are extrapolated and, once such a
+calculation has run inline, its measured time is added to the curve. Dispatch costs are
+measured once as well: the round trip of a task to a thread, how much two threads
+actually speed the work up (about 1x, as Decimal arithmetic holds the GIL) and the
+pickling cost per digit.
+
+Each strategy is estimated as its dispatch overhead plus the work divided by the
+parallelism it can get, plus pickling for processes, and the cheapest one wins. A single
+calculation therefore always runs inline unless another strategy is requested: a thread
+or process can only add dispatch costs to it. Batches move to threads or processes once
+their work outweighs those costs.
+
+Inline and thread runs cannot be stopped, so under a deadline only work estimated well
+within it (1%) may run there; anything else goes to the worker pool, whose processes
+can be killed when they miss the deadline.
+
+Every decision is kept with its estimates and, once run, its measured time; measured
+single calculations on threads and processes refine the dispatch overheads. The process costs are only known
+once the worker pool runs, so they start from PLANNER_PROCESS_OVERHEAD_US (default 300)
+and PLANNER_PROCESS_STARTUP_MS (default 100). PLANNER_CALIBRATE=0 skips the
+microbenchmarks and uses fixed defaults.
+"""
+
+import logging
+import math
+import os
+import pickle
+import time
+from bisect import insort
+from collections import deque
+from decimal import Decimal, getcontext, localcontext
+from app.numeric import FixedPoint
+from app.worker_pool import ThreadPool, WorkerPool, get_pool, get_thread_pool
+
+STRATEGIES = ("inline", "thread", "process")
+DEFAULT_PROCESS_OVERHEAD_US = 300
+DEFAULT_PROCESS_STARTUP_MS = 100
+DEFAULT_HISTORY = 100
+# With a deadline, work estimated above this fraction of it goes where it can be stopped
+DEADLINE_INLINE_FRACTION = 0.01
+# Operand sizes the microbenchmark measures, while a call is projected to stay under the limit
+CALIBRATION_SIZES = (8, 32, 128, 512, 2048, 8192, 32768)
+CALIBRATION_CALL_LIMIT = 2e-3
+# Time spent on each timing loop of the microbenchmark
+CALIBRATION_LOOP_SECONDS = 2e-4
+# Weight of a new measurement when refining an overhead
+_SMOOTHING = 0.2
+_FLOAT_DIGITS = 17
+
+def operand_digits(value) -> int:
+    """
+    Return the number of significant digits of an operand, the size its cost grows with.
+
+    Args:
+        value: A Decimal, float, int or FixedPoint.
+
+    Returns:
+        int: The number of digits.
+    """
+    if isinstance(value, Decimal):
+        # Coefficient digits; exponent notation keeps huge exponents out of the count
+        mantissa = str(value).split("E", 1)[0]
+        return max(1, len(mantissa.lstrip("-").replace(".", "").lstrip("0")))
+    if isinstance(value, FixedPoint):
+        value = value.raw
+    if isinstance(value, int):
+        return max(1, math.ceil(abs(value).bit_length() * math.log10(2)))
+    return _FLOAT_DIGITS
+
+def calculation_size(operation: str, num1, num2) -> int:
+    """
+    Return the size in digits a calculation's cost is estimated from.
+
+    Args:
+        operation (str): The operation name.
+        num1: The first number.
+        num2: The second number.
+
+    Returns:
+        int: The size.
+    """
+    if operation == "divide" and isinstance(num1, Decimal):
+        return getcontext().prec
+    return max(operand_digits(num1), operand_digits(num2))
+
+def _format_seconds(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:.2f}s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f}ms"
+    return f"{seconds * 1e6:.1f}us"
+
+def _best_time(function, loops: int, repeats: int = 2) -> float:
+    """
+    Return the fastest mean seconds per call of function over a few repeats.
+    """
+    best = math.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        best = min(best, (time.perf_counter() - start) / loops)
+    return best
+
+class OperationCost:
+    """
+    The cost curve of one operation: measured (size, seconds) points, interpolated on a
+    log-log scale.
+    """
+    def __init__(self, points: list):
+        """
+        Initialize an OperationCost.
+
+        Args:
+            points (list): (size, seconds) pairs, at least two.
+        """
+        self.points = sorted(points)
+        # Sizes above the microbenchmark's are only known from measured calculations
+        self.calibrated_size = self.points[-1][0]
+
+    def seconds(self, size: int) -> float:
+        """
+        Return the estimated seconds of one calculation on operands of size digits.
+        """
+        points = self.points
+        if size <= points[0][0]:
+            return points[0][1]
+        for (size1, seconds1), (size2, seconds2) in zip(points, points[1:]):
+            if size <= size2:
+                break
+        slope = math.log(max(seconds2, 1e-12) / max(seconds1, 1e-12)) / math.log(size2 / size1)
+        if size > size2:
+            # Beyond the curve no operation grows slower than linearly or faster than quadratically
+            slope = min(2.0, max(1.0, slope))
+        return seconds1 * (size / size1) ** slope
+
+    def observe(self, size: int, seconds: float):
+        """
+        Add a measured calculation beyond the calibrated sizes to the curve.
+
+        Args:
+            size (int): The calculation size in digits.
+            seconds (float): The measured seconds.
+        """
+        if size <= self.calibrated_size:
+            return
+        for index, (point_size, point_seconds) in enumerate(self.points):
+            if point_size > self.calibrated_size and point_size / 1.5 <= size <= point_size * 1.5:
+                # Carry the measurement over to the point's size along the current curve
+                scaled = seconds * point_seconds / self.seconds(size)
+                self.points[index] = (point_size, (1 - _SMOOTHING) * point_seconds + _SMOOTHING * scaled)
+                return
+        insort(self.points, (size, seconds))
+
+    def __str__(self) -> str:
+        return ", ".join(f"{size}: {_format_seconds(seconds)}" for size, seconds in self.points)
+
+# Used for operations that are not calibrated: roughly a schoolbook multiplication
+DEFAULT_COST_POINTS = ((8, 2e-7), (2048, 1e-4))
+
+def calibrate_operation(operation: str, command) -> OperationCost:
+    """
+    Measure the cost curve of a command on growing operands.
+
+    Args:
+        operation (str): The operation name.
+        command: The command.
+
+    Returns:
+        OperationCost: The measured curve.
+    """
+    points = []
+    for size in CALIBRATION_SIZES:
+        if points:
+            last_size, last_seconds = points[-1]
+            slope = 2.0
+            if len(points) > 1:
+                slope = max(1.0, math.log(last_seconds / points[-2][1]) / math.log(last_size / points[-2][0]))
+            if last_seconds * (size / last_size) ** slope > CALIBRATION_CALL_LIMIT:
+                break
+        num1, num2 = Decimal("7" * size), Decimal("3" * size)
+        with localcontext() as context:
+            if operation == "divide":
+                context.prec = size
+            single = _best_time(lambda: command.execute(num1, num2), 1, 1)
+            loops = max(1, int(CALIBRATION_LOOP_SECONDS / max(single, 1e-7)))
+            points.append((size, max(_best_time(lambda: command.execute(num1, num2), loops), 1e-9)))
+    return OperationCost(points)
+
+class PlanDecision:
+    """
+    A strategy picked by the planner, with the estimates it was picked on.
+    """
+    def __init__(self, label: str, size: int, rows: int, tasks: int, estimates: dict, strategy: str,
+                 forced: bool = False):
+        """
+        Initialize a PlanDecision.
+
+        Args:
+            label (str): What is being run (the operation, or the batch file).
+            size (int): The operand size in digits (the mean size for a batch).
+            rows (int): The number of calculations.
+            tasks (int): The number of tasks the calculations are submitted as.
+            estimates (dict): Estimated seconds by strategy.
+            strategy (str): The strategy to run with.
+            forced (bool): Whether the strategy was requested rather than picked.
+        """
+        self.label = label
+        self.size = size
+        self.rows = rows
+        self.tasks = tasks
+        self.estimates = estimates
+        self.strategy = strategy
+        self.forced = forced
+        self.measured = None
+        self.deadline = None
+        # Whether the process estimate includes starting the worker pool
+        self.cold_start = False
+
+    def __str__(self) -> str:
+        estimates = ", ".join(f"{strategy} {_format_seconds(seconds)}" for strategy, seconds in self.estimates.items())
+        chosen = f"{self.strategy} (requested)" if self.forced else self.strategy
+        if self.deadline:
+            chosen += f" within {self.deadline:g}s"
+        measured = "not run" if self.measured is None else f"measured {_format_seconds(self.measured)}"
+        return f"{self.label} {self.size} digits x {self.rows}: {chosen}; estimated {estimates}; {measured}"
+
+class ExecutionPlanner:
+    """
+    Picks inline, thread or process execution from a calibrated cost model.
+    """
+    def __init__(self, commands=None, history: int = DEFAULT_HISTORY, calibrate: bool = True,
+                 pool: WorkerPool = None, thread_pool: ThreadPool = None):
+        """
+        Initialize an ExecutionPlanner. Nothing is measured until something is planned.
+
+        Args:
+            commands: The plugin commands to calibrate, keyed by operation name.
+            history (int): The number of decisions kept.
+            calibrate (bool): Whether to run the microbenchmarks; otherwise defaults are used.
+            pool (WorkerPool): The process pool planned for; defaults to the shared one.
+            thread_pool (ThreadPool): The thread pool planned for; defaults to the shared one.
+        """
+        self.commands = commands if commands is not None else {}
+        self._pool = pool
+        self._thread_pool = thread_pool
+        self.calibrate_enabled = calibrate
+        self.costs = {}
+        self.thread_overhead = 50e-6
+        self.thread_parallelism = 1.0
+        self.process_overhead = int(os.getenv("PLANNER_PROCESS_OVERHEAD_US", str(DEFAULT_PROCESS_OVERHEAD_US))) / 1e6
+        self.process_startup = int(os.getenv("PLANNER_PROCESS_STARTUP_MS", str(DEFAULT_PROCESS_STARTUP_MS))) / 1e3
+        self.transfer_per_digit = 5e-9
+        self.calibration_seconds = 0.0
+        self.decisions = deque(maxlen=history)
+        self._dispatch_calibrated = False
+
+    @property
+    def pool(self) -> WorkerPool:
+        """
+        The process pool planned for.
+        """
+        return self._pool or get_pool()
+
+    @property
+    def thread_pool(self) -> ThreadPool:
+        """
+        The thread pool planned for.
+        """
+        return self._thread_pool or get_thread_pool()
+
+    def calibrate(self):
+        """
+        Measure every command's cost curve and the dispatch costs again.
+        """
+        self.costs.clear()
+        self._dispatch_calibrated = False
+        for operation in self.commands:
+            self.cost(operation)
+        self._calibrate_dispatch()
+
+    def cost(self, operation: str) -> OperationCost:
+        """
+        Return the cost curve of an operation, measuring it on first use.
+
+        Args:
+            operation (str): The operation name.
+
+        Returns:
+            OperationCost: The curve.
+        """
+        if operation not in self.costs:
+            cost = None
+            if self.calibrate_enabled and operation in self.commands:
+                start = time.perf_counter()
+                try:
+                    cost = calibrate_operation(operation, self.commands[operation])
+                except Exception as e:  # pylint: disable=broad-exception-caught
+                    logging.warning("Could not calibrate %s: %s", operation, e)
+                self.calibration_seconds += time.perf_counter() - start
+            self.costs[operation] = cost or OperationCost(list(DEFAULT_COST_POINTS))
+        return self.costs[operation]
+
+    def _calibrate_dispatch(self):
+        if self._dispatch_calibrated or not self.calibrate_enabled:
+            return
+        self._dispatch_calibrated = True
+        start = time.perf_counter()
+        pool = self.thread_pool
+        self.thread_overhead = _best_time(lambda: pool.submit(int).result(), 20)
+        size = CALIBRATION_SIZES[4]
+        num1, num2 = Decimal("7" * size), Decimal("3" * size)
+        self.transfer_per_digit = _best_time(lambda: pickle.loads(pickle.dumps(num1)), 20) / size
+        if pool.max_workers > 1:
+            def work():
+                for _ in range(10):
+                    _ = num1 * num2
+            serial = _best_time(lambda: (work(), work()), 1)
+            parallel = _best_time(lambda: [future.result() for future in (pool.submit(work), pool.submit(work))], 1)
+            self.thread_parallelism = min(2.0, max(1.0, serial / parallel))
+        self.calibration_seconds += time.perf_counter() - start
+        logging.info("Execution planner measured dispatch costs in %.1f ms.", (time.perf_counter() - start) * 1e3)
+
+    def work_seconds(self, operation: str, size: int) -> float:
+        """
+        Return the estimated inline seconds of one calculation.
+
+        Args:
+            operation (str): The operation name.
+            size (int): The calculation size in digits.
+
+        Returns:
+            float: The estimate.
+        """
+        return self.cost(operation).seconds(size)
+
+    def estimate(self, work: float, size: int, rows: int = 1, tasks: int = 1) -> dict:
+        """
+        Estimate each strategy for rows calculations split into tasks.
+
+        Args:
+            work (float): The inline seconds of one calculation.
+            size (int): The operand size in digits, for pickling costs.
+            rows (int): The number of calculations.
+            tasks (int): The number of tasks the calculations are submitted as.
+
+        Returns:
+            dict: Estimated seconds by strategy.
+        """
+        self._calibrate_dispatch()
+        total = work * rows
+        thread_parallelism = min(self.thread_parallelism, self.thread_pool.max_workers, tasks)
+        # Processes run truly in parallel, but no more of them than there are cores
+        process_parallelism = min(self.pool.max_workers, os.cpu_count() or 1, tasks)
+        process = (self.process_overhead * tasks + self.transfer_per_digit * 3 * size * rows
+                   + total / process_parallelism)
+        if not self.pool.started:
+            process += self.process_startup
+        return {
+            "inline": total,
+            "thread": self.thread_overhead * tasks + total / thread_parallelism,
+            "process": process,
+        }
+
+    def decide(self, label: str, work: float, size: int, rows: int = 1, tasks: int = 1,
+               strategy: str = None, deadline: float = None) -> PlanDecision:
+        """
+        Pick and record the cheapest strategy.
+
+        Args:
+            label (str): What is being run.
+            work (float): The inline seconds of one calculation (the mean, for a batch).
+            size (int): The operand size in digits (the mean, for a batch).
+            rows (int): The number of calculations.
+            tasks (int): The number of tasks the calculations are submitted as.
+            strategy (str): A strategy to use instead of the cheapest one.
+            deadline (float): Seconds the work must finish in, if any.
+
+        Returns:
+            PlanDecision: The decision.
+        """
+        if strategy is not None and strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy: {strategy}. Use one of: {', '.join(STRATEGIES)}")
+        estimates = self.estimate(work, size, rows, tasks)
+        chosen = strategy or min(estimates, key=estimates.get)
+        if strategy is None and deadline and estimates[chosen] > deadline * DEADLINE_INLINE_FRACTION:
+            chosen = "process"
+        decision = PlanDecision(label, size, rows, tasks, estimates, chosen, forced=strategy is not None)
+        decision.deadline = deadline
+        decision.cold_start = not self.pool.started
+        self.decisions.append(decision)
+        return decision
+
+    def plan_calculation(self, operation: str, num1, num2, strategy: str = None,
+                         deadline: float = None) -> PlanDecision:
+        """
+        Pick where a single calculation runs.
+
+        Args:
+            operation (str): The operation name.
+            num1: The first number.
+            num2: The second number.
+            strategy (str): A strategy to use instead of the cheapest one.
+            deadline (float): Seconds the calculation must finish in, if any.
+
+        Returns:
+            PlanDecision: The decision.
+        """
+        size = calculation_size(operation, num1, num2)
+        return self.decide(operation, self.work_seconds(operation, size), size, strategy=strategy, deadline=deadline)
+
+    def record(self, decision: PlanDecision, seconds: float):
+        """
+        Store the measured time of a decision and refine the cost model with it.
+
+        Args:
+            decision (PlanDecision): The decision that was run.
+            seconds (float): The measured seconds.
+        """
+        decision.measured = seconds
+        if decision.rows != 1:
+            # Batch times include reading and writing rows, which the estimates leave out
+            return
+        error = seconds - decision.estimates[decision.strategy]
+        if decision.strategy == "inline":
+            if decision.label in self.costs:
+                self.costs[decision.label].observe(decision.size, seconds)
+        elif decision.strategy == "thread":
+            self.thread_overhead = self._refine(self.thread_overhead, error)
+        elif decision.cold_start:
+            # This run started the pool; that is a one-off cost, not a per-task overhead
+            self.process_startup = max(0.0, self.process_startup + error)
+        else:
+            self.process_overhead = self._refine(self.process_overhead, error)
+
+    @staticmethod
+    def _refine(overhead: float, error: float) -> float:
+        # The whole estimation error is put down to the overhead
+        return (1 - _SMOOTHING) * overhead + _SMOOTHING * max(0.0, overhead + error)
+
+    def measure(self, decision: PlanDecision, function):
+        """
+        Call function, the work of a decision, and record how long it took. Failed runs
+        (such as missed deadlines) keep their time but do not refine the model.
+
+        Args:
+            decision (PlanDecision): The decision being run.
+            function: The callable doing the work.
+
+        Returns:
+            The function's return value.
+        """
+        start = time.perf_counter()
+        try:
+            result = function()
+        except BaseException:
+            decision.measured = time.perf_counter() - start
+            raise
+        self.record(decision, time.perf_counter() - start)
+        return result
+
+    def report(self) -> str:
+        """
+        Describe the cost model and the recent decisions.
+
+        Returns:
+            str: The report.
+        """
+        lines = [f"Cost model (measured in {_format_seconds(self.calibration_seconds)}), seconds by digits:"]
+        for operation, cost in sorted(self.costs.items()):
+            lines.append(f"  {operation}: {cost}")
+        lines.append(f"  thread: {_format_seconds(self.thread_overhead)} per task, "
+                     f"{self.thread_parallelism:.2f}x parallelism")
+        lines.append(f"  process: {_format_seconds(self.process_overhead)} per task, "
+                     f"{_format_seconds(self.process_startup)} startup, "
+                     f"{self.transfer_per_digit * 1e9:.2f}ns per digit pickled")
+        if self.decisions:
+            lines.append("Recent decisions:")
+            lines.extend(f"  {decision}" for decision in self.decisions)
+        return "\n".join(lines)
+
+_default_planner = None
+
+def get_planner(commands=None) -> ExecutionPlanner:
+    """
+    Return the shared planner, creating it from the environment on first use.
+
+    Args:
+        commands: The plugin commands the planner calibrates, used on first call.
+
+    Returns:
+        ExecutionPlanner: The shared planner.
+    """
+    global _default_planner  # pylint: disable=global-statement
+    if _default_planner is None:
+        _default_planner = ExecutionPlanner(commands, int(os.getenv("PLANNER_HISTORY", str(DEFAULT_HISTORY))),
+                                            os.getenv("PLANNER_CALIBRATE", "1") != "0")
+    return _default_planner
+
+def reset_planner():
+    """
+    Forget the shared planner, so the next get_planner creates a new one.
+    """
+    global _default_planner  # pylint: disable=global-statement
+    _default_planner = None
@@ -0,0 +1,332 @@
+# app/expression.py
+"""
+This module evaluates arithmetic expressions such as `(2 + 3) * 4 / 7` or `square(5) - ans`
+with the loaded plugin commands: `+`, `-`, `*` and `/` run the add, subtract, multiply and
+divide plugins, `name(x)` or `name(x, y)` runs any plugin by name, and `ans` is the
+result of the latest calculation in the history.
+
+An expression is compiled into a template keyed by its shape, the text with every number
+literal replaced by a slot (`(#+#)*#/#`), so expressions that only differ in their
+numbers share one compiled template and skip parsing. A template is a list of plugin
+calls over registers holding the literals, `ans` and earlier results. Calls that only
+depend on literals are constant: they are folded once per set of literals and the
+folded registers are cached, so evaluating the same expression again only runs the calls
+that depend on `ans`. Both caches hold EXPRESSION_CACHE_SIZE entries (default 256).
+
+How each plugin call runs is up to the caller: evaluate takes an execute function, which
+the REPL uses to send calls through the result cache and, under a deadline, the worker pool.
+"""
+
+import os
+import re
+from collections import OrderedDict
+from app.numeric import get_backend
+
+DEFAULT_CACHE_SIZE = 256
+OPERATORS = {"+": "add", "-": "subtract", "*": "multiply", "/": "divide"}
+SLOT = "#"
+ANSWER = "ans"
+EXPRESSION_USAGE = ("Usage: eval <expression>, e.g. eval (2 + 3) * 4 / 7 or eval square(5) - ans "
+                    "(+ - * / and any command as name(x) or name(x, y))")
+
+# A number that is not part of a name or of a longer malformed number
+_LITERAL = re.compile(r"(?<![\w.])((?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)(?![\w.])")
+# Whitespace next to a symbol does not change the shape
+_SPACE = re.compile(r"\s+(?=\W)|(?<=\W)\s+")
+_TOKEN = re.compile(r"\s*(?:([A-Za-z_]\w*)|(\S))")
+
+def _describe(token: str) -> str:
+    return "the end" if token is None else "a number" if token == SLOT else f"'{token}'"
+
+def _execute(command, num1, num2):
+    return command.execute(num1, num2)
+
+def expression_shape(text: str) -> tuple:
+    """
+    Split an expression into its shape and its number literals.
+
+    Args:
+        text (str): The expression.
+
+    Returns:
+        tuple: The shape (the text with a slot for every literal) and the literals, in order.
+    """
+    # One pass: split alternates the text between literals with the literals themselves
+    parts = _LITERAL.split(text.strip())
+    return _SPACE.sub("", SLOT.join(parts[::2])), tuple(parts[1::2])
+
+class ExpressionTemplate:
+    """
+    A compiled expression shape: plugin calls over registers holding the slot values,
+    zero (the unused operand of unary calls), `ans` and the results of earlier calls.
+    """
+    def __init__(self, shape: str, commands):
+        """
+        Compile a shape.
+
+        Args:
+            shape (str): The shape, from expression_shape.
+            commands: The plugin commands, keyed by operation name.
+
+        Raises:
+            ValueError: If the shape is not a valid expression or uses an unknown command.
+        """
+        self.shape = shape
+        self.commands = commands
+        self.slots = shape.count(SLOT)
+        self.zero, self.answer = self.slots, self.slots + 1
+        self.steps = []
+        self.constant = [True] * self.slots + [True, False]
+        self.uses_answer = False
+        self._tokens = [(name or symbol) for name, symbol in _TOKEN.findall(shape)]
+        self._position = 0
+        self._next_slot = 0
+        self.result = self._sum()
+        if self._position < len(self._tokens):
+            raise ValueError(f"Invalid expression: did not expect {_describe(self._tokens[self._position])}.")
+        del self._tokens
+
+    def _peek(self) -> str:
+        return self._tokens[self._position] if self._position < len(self._tokens) else None
+
+    def _take(self, expected: str = None) -> str:
+        token = self._peek()
+        if token is None or (expected is not None and token != expected):
+            raise ValueError(f"Invalid expression: expected {_describe(expected) if expected else 'a value'}, "
+                             f"found {_describe(token)}.")
+        self._position += 1
+        return token
+
+    def _call(self, name: str, left: int, right: int) -> int:
+        if name not in self.commands:
+            raise ValueError(f"Unknown command in expression: {name}")
+        command = self.commands[name]
+        self.steps.append((command, left, right))
+        # Impure commands are never folded, whatever their operands
+        self.constant.append(self.constant[left] and self.constant[right] and getattr(command, "pure", False))
+        return len(self.constant) - 1
+
+    def _sum(self) -> int:
+        register = self._product()
+        while self._peek() in ("+", "-"):
+            operator = self._take()
+            register = self._call(OPERATORS[operator], register, self._product())
+        return register
+
+    def _product(self) -> int:
+        register = self._unary()
+        while self._peek() in ("*", "/"):
+            operator = self._take()
+            register = self._call(OPERATORS[operator], register, self._unary())
+        return register
+
+    def _unary(self) -> int:
+        if self._peek() == "-":
+            self._take()
+            return self._call(OPERATORS["-"], self.zero, self._unary())
+        if self._peek() == "+":
+            self._take()
+            return self._unary()
+        return self._primary()
+
+    def _primary(self) -> int:
+        token = self._take()
+        if token == SLOT:
+            self._next_slot += 1
+            return self._next_slot - 1
+        if token == "(":
+            register = self._sum()
+            self._take(")")
+            return register
+        if token == ANSWER:
+            self.uses_answer = True
+            return self.answer
+        if token[0].isalpha() or token[0] == "_":
+            self._take("(")
+            arguments = [self._sum()]
+            while self._peek() == ",":
+                self._take()
+                arguments.append(self._sum())
+            self._take(")")
+            arity = getattr(self.commands.get(token), "arity", 2)
+            if token in self.commands and len(arguments) != arity:
+                raise ValueError(f"Invalid expression: {token} takes {arity} argument{'s' if arity > 1 else ''}, "
+                                 f"got {len(arguments)}.")
+            return self._call(token, arguments[0], arguments[1] if len(arguments) > 1 else self.zero)
+        raise ValueError(f"Invalid expression: did not expect {_describe(token)}.")
+
+    def fold(self, values: list, execute=_execute) -> list:
+        """
+        Fill the registers with the slot values and the results of the constant calls.
+
+        Args:
+            values (list): The slot values, then zero.
+            execute: Runs one call as execute(command, num1, num2); defaults to command.execute.
+
+        Returns:
+            list: The registers, with None for `ans` and the calls that depend on it.
+        """
+        registers = list(values) + [None] * (len(self.constant) - len(values))
+        for index, (command, left, right) in enumerate(self.steps, self.answer + 1):
+            if self.constant[index]:
+                registers[index] = execute(command, registers[left], registers[right])
+        return registers
+
+    def run(self, folded: list, answer=None, execute=_execute) -> list:
+        """
+        Run the calls that were not folded.
+
+        Args:
+            folded (list): The registers, from fold.
+            answer: The value of `ans`.
+            execute: Runs one call as execute(command, num1, num2); defaults to command.execute.
+
+        Returns:
+            list: Every register filled in; the one numbered `result` holds the value.
+        """
+        registers = list(folded)
+        registers[self.answer] = answer
+        for index, (command, left, right) in enumerate(self.steps, self.answer + 1):
+            if not self.constant[index]:
+                registers[index] = execute(command, registers[left], registers[right])
+        return registers
+
+    def last_call(self, registers: list) -> tuple:
+        """
+        Return the outermost call of the expression with its operands.
+
+        Args:
+            registers (list): The registers, from run.
+
+        Returns:
+            tuple: (command, num1, num2), or None if the expression is a single value.
+        """
+        if self.result <= self.answer:
+            return None
+        command, left, right = self.steps[self.result - self.answer - 1]
+        return command, registers[left], registers[right]
+
+class ExpressionEvaluator:
+    """
+    Evaluates expressions with cached templates and folded constants.
+    """
+    def __init__(self, commands, cache_size: int = DEFAULT_CACHE_SIZE):
+        """
+        Initialize an ExpressionEvaluator.
+
+        Args:
+            commands: The plugin commands, keyed by operation name.
+            cache_size (int): The number of templates, and of folded literal sets, kept.
+        """
+        self.commands = commands
+        self.cache_size = cache_size
+        self._templates = OrderedDict()
+        self._folded = OrderedDict()
+        self.template_hits = 0
+        self.template_misses = 0
+        self.fold_hits = 0
+
+    @staticmethod
+    def _remember(cache: OrderedDict, key, value, size: int):
+        cache[key] = value
+        if len(cache) > size:
+            cache.popitem(last=False)
+
+    def compile(self, shape: str) -> ExpressionTemplate:
+        """
+        Return the template of a shape, compiling it on a cache miss.
+
+        Args:
+            shape (str): The shape, from expression_shape.
+
+        Returns:
+            ExpressionTemplate: The template.
+
+        Raises:
+            ValueError: If the shape is not a valid expression.
+        """
+        template = self._templates.get(shape)
+        if template is not None:
+            self._templates.move_to_end(shape)
+            self.template_hits += 1
+            return template
+        self.template_misses += 1
+        template = ExpressionTemplate(shape, self.commands)
+        self._remember(self._templates, shape, template, self.cache_size)
+        return template
+
+    def evaluate(self, text: str, answer=None, execute=_execute) -> tuple:
+        """
+        Evaluate an expression with the active numeric backend.
+
+        Args:
+            text (str): The expression.
+            answer: The value of `ans`.
+            execute: Runs one plugin call as execute(command, num1, num2), e.g. through the
+                result cache or the worker pool; defaults to command.execute.
+
+        Returns:
+            tuple: The value and the outermost call (command, num1, num2), or None for the
+            call if the expression is a single value.
+
+        Raises:
+            ValueError: If the expression is invalid, or uses `ans` without an answer.
+            ArithmeticError: If a command fails, e.g. on a division by zero.
+        """
+        shape, literals = expression_shape(text)
+        template = self.compile(shape)
+        if answer is None and template.uses_answer:
+            raise ValueError("No previous result for ans.")
+        backend = get_backend()
+        key = (shape, literals, backend.context_key())
+        folded = self._folded.get(key)
+        if folded is None:
+            folded = template.fold([backend.parse(literal) for literal in literals] + [backend.parse("0")], execute)
+            if self.cache_size > 0:
+                self._remember(self._folded, key, folded, self.cache_size)
+        else:
+            self._folded.move_to_end(key)
+            self.fold_hits += 1
+        registers = template.run(folded, answer, execute)
+        return registers[template.result], template.last_call(registers)
+
+    def stats(self) -> dict:
+        """
+        Return the cache counters.
+
+        Returns:
+            dict: Cached template and folded-literal counts, and hit and miss counters.
+        """
+        return {
+            "templates": len(self._templates),
+            "folded": len(self._folded),
+            "template_hits": self.template_hits,
+            "template_misses": self.template_misses,
+            "fold_hits": self.fold_hits,
+        }
+
+_default_evaluator = None
+
+def get_evaluator(commands=None) -> ExpressionEvaluator:
+    """
+    Return the shared evaluator, creating it from the environment on first use. Templates
+    hold the commands they were compiled with, so other commands get a new evaluator.
+
+    Args:
+        commands: The plugin commands expressions dispatch to.
+
+    Returns:
+        ExpressionEvaluator: The shared evaluator.
+    """
+    global _default_evaluator  # pylint: disable=global-statement
+    if _default_evaluator is None or (commands is not None and commands is not _default_evaluator.commands):
+        _default_evaluator = ExpressionEvaluator(commands, int(os.getenv("EXPRESSION_CACHE_SIZE",
+                                                                         str(DEFAULT_CACHE_SIZE))))
+    return _default_evaluator
+
+def reset_evaluator():
+    """
+    Forget the shared evaluator, so the next get_evaluator creates a new one.
+    """
+    global _default_evaluator  # pylint: disable=global-statement
+    _default_evaluator = None
@@ -0,0 +1,521 @@
+# app/history_query.py
+"""
+This module provides range and predicate queries over calculation history.
+
+A query combines comparisons on num1, num2 and result (`result > 10`, `num1 between 1 5`,
+`num2 != 0`), an optional operation and an optional top/bottom-k ordering. The planner
+picks the cheapest way to find candidate rows:
+
+- the per-operation position index, when the operation is the most selective part;
+- a sorted index of a column, built lazily on first use and answering a range in
+  O(log n + k);
+- a vectorized NumPy scan of the column keys, when no index narrows the rows enough
+  (or the history is too small for an index to pay off);
+- for top/bottom-k without a selective filter, a walk of the sorted index from one end
+  that stops after k matches.
+
+Indexes sort float keys of the values. Rounding a Decimal to a float never changes the
+order of two values, so a float range always contains every exact match; each candidate
+is then checked against the exact values, so results match comparing the Decimals.
+Indexes follow appends (new rows are scanned until there are enough of them to re-sort)
+and are rebuilt after the history is cleared, loaded or compacted.
+
+QUERY_INDEX_MIN_ROWS (default 4096) sets the history size below which only scans are
+used, and QUERY_SCAN_FRACTION (default 0.1) the fraction of rows above which an index
+is not worth using.
+"""
+
+import heapq
+import math
+import os
+import re
+from decimal import Decimal, InvalidOperation
+from typing import TYPE_CHECKING
+from app.numeric import FixedPoint
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+    from app.pandas_facade import PandasFacade
+
+QUERY_COLUMNS = ("num1", "num2", "result")
+COMPARISONS = ("<", "<=", ">", ">=", "==", "!=")
+DEFAULT_INDEX_MIN_ROWS = 4096
+DEFAULT_SCAN_FRACTION = 0.1
+# Re-sort an index once this fraction of its rows was appended after the last sort
+RESORT_FRACTION = 0.125
+QUERY_USAGE = ("Usage: query [explain] [operation <name>] [<column> <op> <value> | <column> between <low> <high>] ... "
+               "[top|bottom <k> <column>]")
+
+_TOKEN = re.compile(r"<=|>=|==|!=|<|>|[^\s<>=!]+")
+
+def exact(value):
+    """
+    Return a history value in a form that compares exactly with a Decimal.
+
+    Args:
+        value: A history value.
+
+    Returns:
+        The value, or None if it is not a number.
+    """
+    if isinstance(value, FixedPoint):
+        return value.to_decimal()
+    if isinstance(value, Decimal):
+        return None if value.is_nan() else value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return None
+
+def _parse_number(text: str) -> Decimal:
+    try:
+        value = Decimal(text)
+    except InvalidOperation:
+        value = None
+    if value is None or value.is_nan():
+        raise ValueError(f"Invalid number in query: {text}")
+    return value
+
+class Condition:
+    """
+    A comparison of one column with a number.
+    """
+    def __init__(self, column: str, operator: str, value: Decimal):
+        """
+        Initialize a Condition.
+
+        Args:
+            column (str): num1, num2 or result.
+            operator (str): One of <, <=, >, >=, == and !=.
+            value (Decimal): The number to compare with.
+        """
+        self.column = column
+        self.operator = operator
+        self.value = value
+
+    def matches(self, value) -> bool:
+        """
+        Whether a history value satisfies the condition, compared exactly.
+        """
+        value = exact(value)
+        if value is None:
+            return False
+        if self.operator == "<":
+            return value < self.value
+        if self.operator == "<=":
+            return value <= self.value
+        if self.operator == ">":
+            return value > self.value
+        if self.operator == ">=":
+            return value >= self.value
+        if self.operator == "==":
+            return value == self.value
+        return value != self.value
+
+    def key_masks(self, keys: "np.ndarray") -> tuple:
+        """
+        Split rows by their float keys into those that certainly satisfy the condition
+        and those only an exact comparison can decide.
+
+        Rounding to a float never reverses an order, so a key strictly beyond the rounded
+        bound proves the exact value is beyond the bound too; only keys equal to it are
+        undecided.
+
+        Args:
+            keys (np.ndarray): The float keys of the rows; NaN for non-numbers.
+
+        Returns:
+            tuple: (sure, maybe) boolean masks.
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        bound = float(self.value)
+        maybe = keys == bound
+        if ">" in self.operator:
+            sure = keys > bound
+        elif "<" in self.operator:
+            sure = keys < bound
+        elif self.operator == "==":
+            sure = np.zeros(len(keys), dtype=bool)
+        else:
+            sure = (keys != bound) & ~np.isnan(keys)
+        return sure, maybe
+
+    def __str__(self) -> str:
+        return f"{self.column} {self.operator} {self.value}"
+
+class HistoryQuery:
+    """
+    A conjunction of conditions, an optional operation and an optional top/bottom-k.
+    """
+    def __init__(self, conditions: list = None, operation: str = None, top: tuple = None):
+        """
+        Initialize a HistoryQuery.
+
+        Args:
+            conditions (list): Condition instances that must all hold.
+            operation (str): Only match records of this operation.
+            top (tuple): (k, column, descending) to keep only the k largest (or smallest)
+                values of a column, ordered by it.
+        """
+        self.conditions = conditions or []
+        self.operation = operation
+        self.top = top
+
+    @classmethod
+    def parse(cls, text: str) -> "HistoryQuery":
+        """
+        Parse a query such as `operation add result >= 10 num2 between 1 5 top 3 result`.
+        Terms may be joined with `and`.
+
+        Args:
+            text (str): The query text.
+
+        Returns:
+            HistoryQuery: The parsed query.
+
+        Raises:
+            ValueError: If the text is not a valid query.
+        """
+        tokens = _TOKEN.findall(text)
+        query = cls()
+        position = 0
+        try:
+            while position < len(tokens):
+                term = tokens[position].lower()
+                if term == "and":
+                    position += 1
+                elif term == "operation":
+                    query.operation = tokens[position + 1]
+                    position += 2
+                elif term in ("top", "bottom"):
+                    count = int(tokens[position + 1])
+                    column = tokens[position + 2].lower()
+                    if column not in QUERY_COLUMNS or count < 0:
+                        raise ValueError(f"Invalid {term} term: {term} {count} {column}")
+                    query.top = (count, column, term == "top")
+                    position += 3
+                elif term in QUERY_COLUMNS:
+                    operator = tokens[position + 1].lower()
+                    if operator == "between":
+                        query.conditions.append(Condition(term, ">=", _parse_number(tokens[position + 2])))
+                        query.conditions.append(Condition(term, "<=", _parse_number(tokens[position + 3])))
+                        position += 4
+                    elif operator in COMPARISONS:
+                        query.conditions.append(Condition(term, operator, _parse_number(tokens[position + 2])))
+                        position += 3
+                    else:
+                        raise ValueError(f"Unknown comparison: {tokens[position + 1]}")
+                else:
+                    raise ValueError(f"Unknown query term: {tokens[position]}")
+        except IndexError as e:
+            raise ValueError(f"Incomplete query: {text.strip()}") from e
+        return query
+
+    def bounds(self) -> dict:
+        """
+        Return, for each column with a range condition, the float interval that contains
+        every value satisfying its conditions.
+
+        Returns:
+            dict: (low, high) float pairs keyed by column.
+        """
+        bounds = {}
+        for condition in self.conditions:
+            if condition.operator == "!=":
+                continue
+            low, high = bounds.get(condition.column, (-math.inf, math.inf))
+            value = float(condition.value)
+            if condition.operator in (">", ">=", "=="):
+                low = max(low, value)
+            if condition.operator in ("<", "<=", "=="):
+                high = min(high, value)
+            bounds[condition.column] = (low, high)
+        return bounds
+
+    def matches(self, record: dict) -> bool:
+        """
+        Whether a record satisfies the query, compared exactly.
+        """
+        if self.operation is not None and record["operation"] != self.operation:
+            return False
+        return all(condition.matches(record[condition.column]) for condition in self.conditions)
+
+    def __str__(self) -> str:
+        terms = [f"operation {self.operation}"] if self.operation is not None else []
+        terms += [str(condition) for condition in self.conditions]
+        if self.top:
+            terms.append(f"{'top' if self.top[2] else 'bottom'} {self.top[0]} {self.top[1]}")
+        return " and ".join(terms) or "all"
+
+class ColumnIndex:
+    """
+    Float keys of one column for every row position, with a lazily sorted order.
+    """
+    def __init__(self, facade: "PandasFacade", column: str):
+        """
+        Initialize a ColumnIndex.
+
+        Args:
+            facade (PandasFacade): The history.
+            column (str): The column to index.
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        self.facade = facade
+        self.column = column
+        self.keys = np.empty(0, dtype=np.float64)
+        self.order = None
+        self.sorted_keys = None
+        self.sorted_rows = 0
+
+    def refresh(self):
+        """
+        Add the keys of rows appended since the last refresh.
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        slots = self.facade.row_slots
+        if slots > len(self.keys):
+            self.keys = np.concatenate([self.keys, self.facade.column_floats(self.column, len(self.keys))])
+
+    def sort(self):
+        """
+        Sort the keys if they never were, or if many rows were appended since.
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        if self.order is None or len(self.keys) - self.sorted_rows > RESORT_FRACTION * self.sorted_rows:
+            self.order = np.argsort(self.keys, kind="stable")
+            self.sorted_keys = self.keys[self.order]
+            self.sorted_rows = len(self.keys)
+
+    def _sorted_range(self, low: float, high: float) -> tuple:
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        return (int(np.searchsorted(self.sorted_keys, low, "left")),
+                int(np.searchsorted(self.sorted_keys, high, "right")))
+
+    def estimate(self, low: float, high: float) -> int:
+        """
+        Return an upper bound of the rows with a key in [low, high], in O(log n).
+        """
+        start, stop = self._sorted_range(low, high)
+        return stop - start + len(self.keys) - self.sorted_rows
+
+    def range(self, low: float, high: float) -> "np.ndarray":
+        """
+        Return the row positions with a key in [low, high], in ascending order.
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        start, stop = self._sorted_range(low, high)
+        tail = self.keys[self.sorted_rows:]
+        appended = np.flatnonzero((tail >= low) & (tail <= high)) + self.sorted_rows
+        return np.sort(np.concatenate([self.order[start:stop], appended]))
+
+    def mask(self, low: float, high: float) -> "np.ndarray":
+        """
+        Return a boolean mask of the rows with a key in [low, high], by scanning the keys.
+        """
+        return (self.keys >= low) & (self.keys <= high)
+
+    def walk(self, descending: bool):
+        """
+        Yield (key, row position) for every row with a numeric key, in key order.
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        numeric = int(np.searchsorted(self.sorted_keys, math.inf, "right"))
+        tail = np.flatnonzero(~np.isnan(self.keys[self.sorted_rows:])) + self.sorted_rows
+        tail = tail[np.argsort(self.keys[tail], kind="stable")]
+        streams = [zip(self.sorted_keys[:numeric].tolist(), self.order[:numeric].tolist()),
+                   zip(self.keys[tail].tolist(), tail.tolist())]
+        if descending:
+            streams = [zip(self.sorted_keys[:numeric][::-1].tolist(), self.order[:numeric][::-1].tolist()),
+                       zip(self.keys[tail][::-1].tolist(), tail[::-1].tolist())]
+        return heapq.merge(*streams, key=lambda item: item[0], reverse=descending)
+
+class QueryPlan:
+    """
+    How a query finds its candidate rows, and what executing it cost.
+    """
+    def __init__(self, strategy: str, column: str = None, estimate: int = None):
+        """
+        Initialize a QueryPlan.
+
+        Args:
+            strategy (str): "operation", "index", "scan" or "walk".
+            column (str): The indexed column, for "index" and "walk".
+            estimate (int): The expected number of candidate rows.
+        """
+        self.strategy = strategy
+        self.column = column
+        self.estimate = estimate
+        self.examined = None
+        self.matched = None
+
+    def describe(self) -> str:
+        """
+        Describe the plan in one line.
+        """
+        source = {"operation": "operation position index", "scan": "vectorized scan of the column keys",
+                  "index": f"sorted index on {self.column}",
+                  "walk": f"walk of the sorted index on {self.column}"}[self.strategy]
+        text = source + (f", ~{self.estimate} candidate rows" if self.estimate is not None else "")
+        if self.examined is not None:
+            text += f"; examined {self.examined} rows, matched {self.matched}"
+        return text
+
+class QueryEngine:
+    """
+    Plans and runs HistoryQuery instances over one history, keeping its column indexes.
+    """
+    def __init__(self, facade: "PandasFacade"):
+        """
+        Initialize a QueryEngine.
+
+        Args:
+            facade (PandasFacade): The history to query.
+        """
+        self.facade = facade
+        self.index_min_rows = int(os.getenv("QUERY_INDEX_MIN_ROWS", str(DEFAULT_INDEX_MIN_ROWS)))
+        self.scan_fraction = float(os.getenv("QUERY_SCAN_FRACTION", str(DEFAULT_SCAN_FRACTION)))
+        self.last_plan = None
+        self._indexes = {}
+        self._version = None
+
+    def index(self, column: str) -> ColumnIndex:
+        """
+        Return the up-to-date index of a column, creating it on first use.
+
+        Args:
+            column (str): num1, num2 or result.
+
+        Returns:
+            ColumnIndex: The index.
+        """
+        if self._version != self.facade.version:
+            self._indexes = {}
+            self._version = self.facade.version
+        index = self._indexes.get(column)
+        if index is None:
+            index = self._indexes[column] = ColumnIndex(self.facade, column)
+        index.refresh()
+        return index
+
+    def plan(self, query: HistoryQuery) -> QueryPlan:
+        """
+        Choose how to find the candidate rows of a query.
+
+        Args:
+            query (HistoryQuery): The query.
+
+        Returns:
+            QueryPlan: The chosen plan.
+        """
+        slots = self.facade.row_slots
+        options = []
+        if query.operation is not None:
+            options.append((self.facade.count_by_operation().get(query.operation, 0), "operation", None))
+        if slots >= self.index_min_rows:
+            for column, (low, high) in query.bounds().items():
+                index = self.index(column)
+                index.sort()
+                options.append((index.estimate(low, high), "index", column))
+        best = min(options, default=None)
+        if best is not None and best[0] <= self.scan_fraction * slots:
+            return QueryPlan(best[1], best[2], best[0])
+        if query.top and slots >= self.index_min_rows:
+            return QueryPlan("walk", query.top[1], query.top[0])
+        if query.operation is not None and not query.bounds():
+            # Nothing to scan for, and the operation's rows are never more than all rows
+            return QueryPlan("operation", estimate=options[0][0])
+        return QueryPlan("scan", estimate=slots)
+
+    def _operation_mask(self, operation: str) -> "np.ndarray":
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        mask = np.zeros(self.facade.row_slots, dtype=bool)
+        mask[self.facade.operation_rows(operation)] = True
+        return mask
+
+    def _candidates(self, query: HistoryQuery, plan: QueryPlan) -> "np.ndarray":
+        """
+        Return the ascending live row positions the plan reads, restricted to the
+        query's operation.
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        if plan.strategy == "operation":
+            return np.asarray(self.facade.operation_rows(query.operation), dtype=np.int64)
+        if plan.strategy == "index":
+            low, high = query.bounds()[plan.column]
+            positions = self.index(plan.column).range(low, high)
+            if query.operation is not None:
+                positions = positions[self._operation_mask(query.operation)[positions]]
+        else:
+            mask = np.ones(self.facade.row_slots, dtype=bool)
+            for column, (low, high) in query.bounds().items():
+                mask &= self.index(column).mask(low, high)
+            if query.operation is not None:
+                mask &= self._operation_mask(query.operation)
+            positions = np.flatnonzero(mask)
+        return np.asarray(self.facade.live_rows(positions.tolist()), dtype=np.int64)
+
+    def _filter(self, query: HistoryQuery, candidates: "np.ndarray") -> list:
+        """
+        Return the candidates that satisfy the conditions. Keys decide every row except
+        those whose key equals a bound, which are compared exactly.
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        keep = np.ones(len(candidates), dtype=bool)
+        undecided = np.zeros(len(candidates), dtype=bool)
+        for condition in query.conditions:
+            sure, maybe = condition.key_masks(self.index(condition.column).keys[candidates])
+            keep &= sure | maybe
+            undecided |= maybe
+        undecided = set(candidates[keep & undecided].tolist())
+        if not undecided:
+            return candidates[keep].tolist()
+        return [position for position in candidates[keep].tolist()
+                if position not in undecided or query.matches(self.facade.row(position))]
+
+    def _walk(self, query: HistoryQuery, plan: QueryPlan) -> list:
+        count, column, descending = query.top
+        index = self.index(column)
+        index.sort()
+        found, last_key, examined = [], None, 0
+        for key, position in index.walk(descending):
+            # Keep going past k while keys tie, so the exact ordering can break the tie
+            if len(found) >= count and key != last_key:
+                break
+            examined += 1
+            if self.facade.live_rows([position]) and query.matches(self.facade.row(position)):
+                found.append(position)
+                last_key = key
+        plan.examined = examined
+        return sorted(found)
+
+    def run(self, query: HistoryQuery) -> "pd.DataFrame":
+        """
+        Run a query.
+
+        Args:
+            query (HistoryQuery): The query.
+
+        Returns:
+            pd.DataFrame: The matching records, indexed by their history indices, in
+            history order or, for top/bottom-k, ordered by the column.
+        """
+        plan = self.last_plan = self.plan(query)
+        if plan.strategy == "walk":
+            positions = self._walk(query, plan)
+        else:
+            candidates = self._candidates(query, plan)
+            plan.examined = len(candidates)
+            positions = self._filter(query, candidates)
+        if query.top:
+            count, column, descending = query.top
+            keyed = [(exact(self.facade.row(position)[column]), position) for position in positions]
+            keyed = [item for item in keyed if item[0] is not None]
+            select = heapq.nlargest if descending else heapq.nsmallest
+            ordered = [position for _, position in select(count, keyed, key=lambda item: item[0])]
+            positions = sorted(ordered)
+        plan.matched = len(positions)
+        frame = self.facade.rows_frame(positions)
+        if query.top:
+            ranks = {position: rank for rank, position in enumerate(positions)}
+            frame = frame.iloc[[ranks[position] for position in ordered]]
+        return frame
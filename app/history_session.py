@@ -0,0 +1,431 @@
+# app/history_session.py
+"""
+This module provides HistorySession, a thread-safe calculation history. Each session
+owns its own records and journal, so separate callers (REPL, server connections,
+batch jobs) can keep separate histories; `Calculations` is a shim over a default one.
+
+Appends are lock-striped: a thread adds its record to one of several small buffers
+chosen by thread id, tagged with a global sequence number, so concurrent appenders
+rarely contend. Any read or other change first drains the buffers into the history in
+sequence order under the session lock, so readers always see every completed append,
+in the order the appends happened. While a journal is open, appends take the session
+lock instead, since every change must reach the journal in order.
+
+Deletes only tombstone rows; once the facade reports that enough rows are tombstoned,
+a background thread compacts it under the session lock, so the delete that crosses
+HISTORY_COMPACT_RATIO returns without rewriting the history.
+"""
+
+import heapq
+import itertools
+import logging
+import os
+import threading
+from contextlib import ExitStack, contextmanager
+from operator import itemgetter
+from typing import TYPE_CHECKING
+from app.calculation import Calculation
+from app.history_query import HistoryQuery, QueryEngine
+from app.journal import HistoryJournal
+from app.pandas_facade import PandasFacade
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+DEFAULT_APPEND_STRIPES = 8
+
+class HistorySession:
+    """
+    A calculation history that can be shared by many threads.
+    """
+    def __init__(self, stripes: int = None):
+        """
+        Initialize a HistorySession.
+
+        Args:
+            stripes (int): The number of append buffers; defaults to HISTORY_APPEND_STRIPES
+                (default 8).
+        """
+        self.facade = PandasFacade()
+        self.journal = None
+        self._query_engine = None
+        self._lock = threading.RLock()
+        # next() on itertools.count is atomic, so appenders on different stripes never
+        # share a sequence number
+        self._sequence = itertools.count()
+        stripes = stripes or int(os.getenv("HISTORY_APPEND_STRIPES", str(DEFAULT_APPEND_STRIPES)))
+        self._stripes = [(threading.Lock(), []) for _ in range(max(1, stripes))]
+        self._compactor = None
+        self._compaction_pending = False
+
+    @contextmanager
+    def _all_stripes(self):
+        with ExitStack() as stack:
+            for lock, _ in self._stripes:
+                stack.enter_context(lock)
+            yield
+
+    def _drain(self):
+        """
+        Move buffered appends into the history, in the order they happened. The caller
+        holds the session lock.
+        """
+        with self._all_stripes():
+            buffers = [buffer[:] for _, buffer in self._stripes if buffer]
+            for _, buffer in self._stripes:
+                buffer.clear()
+        if buffers:
+            for _, record in heapq.merge(*buffers, key=itemgetter(0)):
+                self.facade.add_record(record)
+
+    def _schedule_compaction(self):
+        """
+        Start compacting tombstoned rows in the background if enough rows are deleted. The
+        caller holds the session lock.
+        """
+        if self.facade.compaction_due and not self._compaction_pending:
+            self._compaction_pending = True
+            self._compactor = threading.Thread(target=self._compact_tombstones, name="history-compaction",
+                                               daemon=True)
+            self._compactor.start()
+
+    def _compact_tombstones(self):
+        with self._lock:
+            self._compaction_pending = False
+            if self.facade.compaction_due:
+                self.facade.compact()
+
+    def add_calculation(self, calculation: Calculation):
+        """
+        Add a new Calculation instance to the history.
+
+        Args:
+            calculation (Calculation): The calculation instance to add.
+        """
+        record = {
+            "operation": calculation.operation.operation_name,
+            "num1": calculation.a,
+            "num2": calculation.b,
+            "result": calculation.result
+        }
+        lock, buffer = self._stripes[threading.get_ident() % len(self._stripes)]
+        with lock:
+            if self.journal is None:
+                buffer.append((next(self._sequence), record))
+                return
+        with self._lock:
+            # The journal may have been closed since it was checked above
+            self._drain()
+            self.facade.add_record(record)
+            if self.journal is not None:
+                self.journal.append_add(record)
+                self._compact_if_due()
+
+    def clear_history(self):
+        """
+        Clear the entire history of calculations.
+        """
+        with self._lock:
+            self._drain()
+            self.facade.clear()
+            if self.journal is not None:
+                self.journal.append_clear()
+                self._compact_if_due()
+
+    def get_all_calculations(self) -> "pd.DataFrame":
+        """
+        Retrieve all Calculation instances in the history.
+
+        Returns:
+            pd.DataFrame: A DataFrame containing all calculation records.
+        """
+        with self._lock:
+            self._drain()
+            return self.facade.dataframe
+
+    def get_latest(self) -> dict:
+        """
+        Retrieve the most recent calculation in the history.
+
+        Returns:
+            dict: The latest calculation record, or None if the history is empty.
+        """
+        with self._lock:
+            self._drain()
+            return self.facade.get_record(-1)
+
+    def get_latest_records(self, count: int) -> list:
+        """
+        Retrieve the most recent calculations, oldest first.
+
+        Args:
+            count (int): The maximum number of calculations to return.
+
+        Returns:
+            list: The calculation records.
+        """
+        with self._lock:
+            self._drain()
+            length = len(self.facade)
+            return [self.facade.get_record(index) for index in range(max(0, length - count), length)]
+
+    def preview_history(self, count: int = 5) -> "pd.DataFrame":
+        """
+        Retrieve only the first and last calculations, without materializing the whole history.
+
+        Args:
+            count (int): The number of calculations to take from each end.
+
+        Returns:
+            pd.DataFrame: A DataFrame of the selected calculation records.
+        """
+        with self._lock:
+            self._drain()
+            return self.facade.head_and_tail(count)
+
+    def count(self) -> int:
+        """
+        Count the calculations in the history.
+
+        Returns:
+            int: The number of calculations.
+        """
+        with self._lock:
+            self._drain()
+            return len(self.facade)
+
+    def filter_with_operation(self, operation: str) -> "pd.DataFrame":
+        """
+        Filter Calculation instances based on the specified operation.
+
+        Args:
+            operation (str): The name of the operation to filter by.
+
+        Returns:
+            pd.DataFrame: A DataFrame containing filtered calculation records.
+        """
+        with self._lock:
+            self._drain()
+            return self.facade.filter_by_operation(operation)
+
+    def count_by_operation(self) -> dict:
+        """
+        Count the Calculation instances of every operation in the history.
+
+        Returns:
+            dict: Calculation counts keyed by operation name.
+        """
+        with self._lock:
+            self._drain()
+            return self.facade.count_by_operation()
+
+    def summary(self, operation: str = None) -> dict:
+        """
+        Return running aggregates of the results by operation.
+
+        Args:
+            operation (str): Only summarize this operation.
+
+        Returns:
+            dict: count, sum, mean, variance, stdev, min and max keyed by operation name.
+        """
+        with self._lock:
+            self._drain()
+            return self.facade.summary(operation)
+
+    def query(self, query: HistoryQuery) -> "pd.DataFrame":
+        """
+        Run a range/predicate query over the history.
+
+        Args:
+            query (HistoryQuery): The query.
+
+        Returns:
+            pd.DataFrame: The matching calculation records.
+        """
+        with self._lock:
+            self._drain()
+            if self._query_engine is None:
+                self._query_engine = QueryEngine(self.facade)
+            return self._query_engine.run(query)
+
+    def explain_query(self, query: HistoryQuery) -> str:
+        """
+        Run a query and describe how it was answered.
+
+        Args:
+            query (HistoryQuery): The query.
+
+        Returns:
+            str: The plan chosen and the rows it examined.
+        """
+        with self._lock:
+            self.query(query)
+            return self._query_engine.last_plan.describe()
+
+    def save_history(self, filepath: str):
+        """
+        Save the calculation history to a file. The format is chosen by extension:
+        .npz, .arrow and .feather are binary columnar formats, anything else is CSV.
+
+        Saving to the file of the open journal compacts it.
+
+        Args:
+            filepath (str): The path where the history should be saved.
+        """
+        with self._lock:
+            self._drain()
+            if self.journal is not None and self.journal.snapshot_path == filepath:
+                self.compact_history()
+            else:
+                self.facade.save_to_file(filepath)
+
+    def load_history(self, filepath: str):
+        """
+        Load calculation history from a file, then replay its journal if there is one.
+        Binary columnar files are memory-mapped instead of read into memory.
+
+        An open journal only describes its own snapshot: loading that file again keeps
+        journaling to it, while loading any other file stops journaling.
+
+        Args:
+            filepath (str): The path from where the history should be loaded.
+        """
+        with self._lock:
+            self._drain()
+            if self.journal is not None:
+                if self.journal.snapshot_path == filepath:
+                    self.open_journal(filepath, self.journal.fsync_every, self.journal.compact_every)
+                    return
+                logging.info("Stopped journaling to %s after loading %s.", self.journal.path, filepath)
+                self.close_journal()
+            if os.path.exists(filepath):
+                self.facade.load_from_file(filepath)
+            else:
+                self.facade.clear()
+            HistoryJournal(filepath).replay(self.facade)
+
+    def delete_history(self, index: int):
+        """
+        Delete a specific calculation from the history by its index.
+
+        Args:
+            index (int): The index of the calculation to delete.
+        """
+        with self._lock:
+            self._drain()
+            in_range = 0 <= index < len(self.facade)
+            self.facade.delete_record(index)
+            if in_range and self.journal is not None:
+                self.journal.append_delete(index)
+                self._compact_if_due()
+            self._schedule_compaction()
+
+    def delete_records(self, indices) -> int:
+        """
+        Delete many calculations in one pass. Indices refer to the history before the
+        delete; out-of-range indices are ignored.
+
+        Args:
+            indices: The indices of the calculations to delete, e.g. a list or a range.
+
+        Returns:
+            int: The number of calculations deleted.
+        """
+        with self._lock:
+            self._drain()
+            length = len(self.facade)
+            indices = sorted({index for index in indices if 0 <= index < length})
+            removed = self.facade.remove_records(indices)
+            if removed and self.journal is not None:
+                self.journal.append_delete_many(indices)
+                self._compact_if_due()
+            self._schedule_compaction()
+            return removed
+
+    def delete_operation(self, operation: str) -> int:
+        """
+        Delete every calculation of an operation.
+
+        Args:
+            operation (str): The operation name.
+
+        Returns:
+            int: The number of calculations deleted.
+        """
+        with self._lock:
+            self._drain()
+            removed = self.facade.remove_operation(operation)
+            if removed and self.journal is not None:
+                self.journal.append_delete_operation(operation)
+                self._compact_if_due()
+            self._schedule_compaction()
+            return removed
+
+    def open_journal(self, filepath: str, fsync_every: int = None, compact_every: int = None):
+        """
+        Load the history stored at filepath and journal every later change next to it. If
+        the file does not exist yet, the current history is saved there first.
+
+        Defaults come from the HISTORY_JOURNAL_FSYNC (records per fsync, 0 = leave it to
+        the OS) and HISTORY_JOURNAL_COMPACT_EVERY (journal records before an automatic
+        compaction, 0 = never) environment variables.
+
+        Args:
+            filepath (str): The snapshot file of the history.
+            fsync_every (int): fsync after this many journal records.
+            compact_every (int): Compact after this many journal records.
+        """
+        with self._lock:
+            self.close_journal()
+            if fsync_every is None:
+                fsync_every = int(os.getenv("HISTORY_JOURNAL_FSYNC", "0"))
+            if compact_every is None:
+                compact_every = int(os.getenv("HISTORY_JOURNAL_COMPACT_EVERY", "100000"))
+            journal = HistoryJournal(filepath, fsync_every, compact_every)
+            if not os.path.exists(filepath):
+                # Nothing to load: the current history becomes the file's first snapshot
+                self._drain()
+                root, extension = os.path.splitext(filepath)
+                self.facade.save_to_file(f"{root}.tmp{extension}")
+                os.replace(f"{root}.tmp{extension}", filepath)
+                with self._all_stripes():
+                    journal.open(fresh=True)
+                    self.journal = journal
+                return
+            with self._all_stripes():
+                for _, buffer in self._stripes:
+                    buffer.clear()
+                self.facade.load_from_file(filepath)
+                replayed = journal.replay(self.facade)
+                journal.open(fresh=replayed < 0)
+                self.journal = journal
+
+    def compact_history(self):
+        """
+        Write a fresh snapshot of the history and start an empty journal.
+        """
+        with self._lock:
+            if self.journal is None:
+                raise RuntimeError("No history journal is open.")
+            snapshot_path = self.journal.snapshot_path
+            root, extension = os.path.splitext(snapshot_path)
+            self.journal.close()
+            self.facade.save_to_file(f"{root}.tmp{extension}")
+            os.replace(f"{root}.tmp{extension}", snapshot_path)
+            self.journal.open(fresh=True)
+            logging.info("Compacted history journal into %s.", snapshot_path)
+
+    def _compact_if_due(self):
+        if self.journal.needs_compaction:
+            self.compact_history()
+
+    def close_journal(self):
+        """
+        Stop journaling changes.
+        """
+        with self._lock:
+            if self.journal is not None:
+                with self._all_stripes():
+                    self.journal.close()
+                    self.journal = None
@@ -0,0 +1,140 @@
+# app/history_stats.py
+"""
+This module provides RunningStats, the running count, sum, mean, variance, minimum and
+maximum of a stream of results, kept up to date as values are added and removed.
+
+The mean and variance use Welford's algorithm, so each update is O(1) and numerically
+stable without keeping the values; removing a value runs the update in reverse. Removing
+the current minimum or maximum cannot be undone without the remaining values, so it only
+marks the extremes stale for the owner to recompute. Values are aggregated as floats.
+"""
+
+import math
+
+def to_float(value) -> float:
+    """
+    Convert a history value to a float.
+
+    Args:
+        value: A Decimal, float, int, FixedPoint or anything else.
+
+    Returns:
+        float: The value, or None if it is missing, not numeric or NaN.
+    """
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(number) else number
+
+class RunningStats:
+    """
+    Incrementally maintained aggregates of a set of values.
+    """
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = None
+        self.maximum = None
+        self.extremes_stale = False
+
+    def add(self, value):
+        """
+        Add one value.
+
+        Args:
+            value: The value; non-numeric values are ignored.
+        """
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            return
+        if number != number:  # NaN
+            return
+        count = self.count = self.count + 1
+        self.total += number
+        mean = self.mean
+        delta = number - mean
+        mean = self.mean = mean + delta / count
+        self.m2 += delta * (number - mean)
+        if self.extremes_stale:
+            return
+        if self.minimum is None or number < self.minimum:
+            self.minimum = number
+        if self.maximum is None or number > self.maximum:
+            self.maximum = number
+
+    def remove(self, value):
+        """
+        Remove one value that was added before.
+
+        Args:
+            value: The value; non-numeric values are ignored.
+        """
+        number = to_float(value)
+        if number is None:
+            return
+        if self.count <= 1:
+            self.__init__()
+            return
+        mean = (self.count * self.mean - number) / (self.count - 1)
+        self.m2 = max(0.0, self.m2 - (number - self.mean) * (number - mean))
+        self.mean = mean
+        self.count -= 1
+        self.total -= number
+        if number in (self.minimum, self.maximum):
+            self.extremes_stale = True
+
+    def set_extremes(self, values):
+        """
+        Recompute the minimum and maximum from the values currently aggregated.
+
+        Args:
+            values: The values.
+        """
+        numbers = [number for number in map(to_float, values) if number is not None]
+        self.minimum = min(numbers, default=None)
+        self.maximum = max(numbers, default=None)
+        self.extremes_stale = False
+
+    @property
+    def variance(self) -> float:
+        """
+        The sample variance, or 0.0 for fewer than two values.
+        """
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def as_dict(self) -> dict:
+        """
+        Return the aggregates as plain data.
+
+        Returns:
+            dict: count, sum, mean, variance, stdev, min and max.
+        """
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.mean if self.count else None,
+            "variance": self.variance,
+            "stdev": math.sqrt(self.variance),
+            "min": self.minimum,
+            "max": self.maximum,
+        }
+
+def format_summary(summary: dict) -> str:
+    """
+    Format aggregates keyed by operation as a table.
+
+    Args:
+        summary (dict): The aggregates, as returned by PandasFacade.summary.
+
+    Returns:
+        str: One line per operation.
+    """
+    lines = [f"{'operation':<12} {'count':>8} {'sum':>12} {'mean':>12} {'stdev':>12} {'min':>12} {'max':>12}"]
+    for operation, stats in summary.items():
+        values = [stats[name] for name in ("sum", "mean", "stdev", "min", "max")]
+        lines.append(f"{operation:<12} {stats['count']:>8} " + " ".join(f"{value:>12.6g}" for value in values))
+    return "\n".join(lines)
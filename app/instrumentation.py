@@ -0,0 +1,272 @@
+# app/instrumentation.py
+"""
+This module records per-operation call counts, error counts and per-phase latency
+histograms for calculations.
+
+Latencies are kept in HDR-style log-linear histograms: every power of two is split into
+16 sub-buckets, so percentiles are within about 6% of the true value while a histogram
+stays a small sparse dict regardless of how many calls it has seen.
+
+Instrumentation is off unless METRICS_ENABLED=1 (or the REPL `stats on` command) turns
+it on; while it is off, timing a phase costs a single attribute check. When
+METRICS_EXPORT_FILE is set, the metrics are written there on exit, as JSON or, for a
+.prom or .txt file, in the Prometheus text exposition format, together with the
+counters of the log sampler.
+"""
+
+import atexit
+import json
+import logging
+import os
+import time
+from collections import Counter
+from app.log_sampling import get_sampler
+
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+PERCENTILES = (("p50", 0.50), ("p95", 0.95), ("p99", 0.99))
+PHASES = ("parse", "dispatch", "execute", "display", "history")
+
+def bucket_index(value: int) -> int:
+    """
+    Return the histogram bucket of a non-negative integer value.
+    """
+    if value < SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return (shift + 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+
+def bucket_upper_bound(index: int) -> int:
+    """
+    Return the largest value that falls in a histogram bucket.
+    """
+    if index < SUB_BUCKETS:
+        return index
+    shift = index // SUB_BUCKETS - 1
+    return ((index % SUB_BUCKETS + SUB_BUCKETS + 1) << shift) - 1
+
+class LatencyHistogram:
+    """
+    A log-linear histogram of latencies in nanoseconds.
+    """
+    def __init__(self):
+        self.buckets = Counter()
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, nanoseconds: int):
+        """
+        Add one latency.
+
+        Args:
+            nanoseconds (int): The latency in nanoseconds.
+        """
+        self.buckets[bucket_index(nanoseconds)] += 1
+        self.count += 1
+        self.total += nanoseconds
+        self.max = max(self.max, nanoseconds)
+
+    def percentile(self, fraction: float) -> int:
+        """
+        Return the latency at a fraction (0-1) of the recorded values.
+
+        Args:
+            fraction (float): The percentile as a fraction.
+
+        Returns:
+            int: The upper bound of the bucket holding that percentile, in nanoseconds.
+        """
+        if not self.count:
+            return 0
+        target = max(1, fraction * self.count)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= target:
+                return min(bucket_upper_bound(index), self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        """
+        Return the count, mean, max and percentiles, in microseconds.
+
+        Returns:
+            dict: The histogram summary.
+        """
+        result = {"count": self.count, "mean_us": self.total / self.count / 1e3 if self.count else 0.0,
+                  "max_us": self.max / 1e3}
+        for label, fraction in PERCENTILES:
+            result[f"{label}_us"] = self.percentile(fraction) / 1e3
+        return result
+
+class Instrumentation:
+    """
+    Collects call counts, error counts and phase latencies keyed by operation.
+    """
+    def __init__(self, enabled: bool = False):
+        """
+        Initialize an Instrumentation.
+
+        Args:
+            enabled (bool): Whether anything is recorded.
+        """
+        self.enabled = enabled
+        self.calls = Counter()
+        self.errors = Counter()
+        self.phases = {}
+
+    def clock(self) -> int:
+        """
+        Return the current time in nanoseconds, or 0 when disabled.
+        """
+        return time.perf_counter_ns() if self.enabled else 0
+
+    def record(self, operation: str, phase: str, start: int) -> int:
+        """
+        Record the time since start as one occurrence of a phase.
+
+        Args:
+            operation (str): The operation name.
+            phase (str): The phase name.
+            start (int): A value returned by clock().
+
+        Returns:
+            int: The current clock, to be used as the start of the next phase.
+        """
+        if not self.enabled:
+            return 0
+        now = time.perf_counter_ns()
+        histogram = self.phases.get((operation, phase))
+        if histogram is None:
+            histogram = self.phases[(operation, phase)] = LatencyHistogram()
+        histogram.record(now - start)
+        return now
+
+    def count_call(self, operation: str):
+        """
+        Count a calculation of an operation.
+        """
+        if self.enabled:
+            self.calls[operation] += 1
+
+    def count_error(self, operation: str):
+        """
+        Count a failed calculation of an operation.
+        """
+        if self.enabled:
+            self.errors[operation] += 1
+
+    def reset(self):
+        """
+        Drop everything recorded so far.
+        """
+        self.calls.clear()
+        self.errors.clear()
+        self.phases.clear()
+
+    def snapshot(self) -> dict:
+        """
+        Return the recorded metrics as plain data.
+
+        Returns:
+            dict: Calls, errors and phase summaries keyed by operation.
+        """
+        operations = {}
+        for operation in sorted(set(self.calls) | set(self.errors) | {key[0] for key in self.phases}):
+            operations[operation] = {
+                "calls": self.calls[operation],
+                "errors": self.errors[operation],
+                "phases": {phase: self.phases[(operation, phase)].summary()
+                           for phase in PHASES if (operation, phase) in self.phases},
+            }
+        return operations
+
+    def report(self) -> str:
+        """
+        Format the recorded metrics as a table.
+
+        Returns:
+            str: One line per operation and phase.
+        """
+        lines = [f"{'operation':<12} {'phase':<9} {'calls':>8} {'errors':>7} "
+                 f"{'p50 us':>9} {'p95 us':>9} {'p99 us':>9} {'max us':>9}"]
+        for operation, metrics in self.snapshot().items():
+            first = True
+            for phase, summary in metrics["phases"].items():
+                calls, errors = (metrics["calls"], metrics["errors"]) if first else ("", "")
+                lines.append(f"{operation if first else '':<12} {phase:<9} {calls:>8} {errors:>7} "
+                             f"{summary['p50_us']:>9.1f} {summary['p95_us']:>9.1f} "
+                             f"{summary['p99_us']:>9.1f} {summary['max_us']:>9.1f}")
+                first = False
+            if first:
+                lines.append(f"{operation:<12} {'-':<9} {metrics['calls']:>8} {metrics['errors']:>7}")
+        return "\n".join(lines)
+
+    def to_prometheus(self) -> str:
+        """
+        Format the recorded metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: Counters for calls and errors and a histogram per operation and phase.
+        """
+        lines = ["# TYPE calculator_calls_total counter"]
+        lines += [f'calculator_calls_total{{operation="{operation}"}} {count}'
+                  for operation, count in sorted(self.calls.items())]
+        lines.append("# TYPE calculator_errors_total counter")
+        lines += [f'calculator_errors_total{{operation="{operation}"}} {count}'
+                  for operation, count in sorted(self.errors.items())]
+        lines.append("# TYPE calculator_phase_seconds histogram")
+        for (operation, phase), histogram in sorted(self.phases.items()):
+            labels = f'operation="{operation}",phase="{phase}"'
+            cumulative = 0
+            for index in sorted(histogram.buckets):
+                cumulative += histogram.buckets[index]
+                lines.append(f'calculator_phase_seconds_bucket{{{labels},le="{bucket_upper_bound(index) / 1e9:.9g}"}} '
+                             f"{cumulative}")
+            lines.append(f'calculator_phase_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f"calculator_phase_seconds_sum{{{labels}}} {histogram.total / 1e9:.9g}")
+            lines.append(f"calculator_phase_seconds_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, filepath: str):
+        """
+        Write the recorded metrics and the log sampler's counters to a file: Prometheus
+        text for .prom and .txt files, JSON otherwise (the log counters under "log_sampling").
+
+        Args:
+            filepath (str): The file to write.
+        """
+        sampler = get_sampler()
+        with open(filepath, "w", encoding="utf-8") as f:
+            if filepath.lower().endswith((".prom", ".txt")):
+                f.write(self.to_prometheus() + sampler.to_prometheus())
+            else:
+                json.dump({**self.snapshot(), "log_sampling": sampler.stats()}, f, indent=2)
+        logging.info("Metrics exported to %s.", filepath)
+
+_default_metrics = None
+
+def get_metrics() -> Instrumentation:
+    """
+    Return the shared instrumentation, creating it from the environment on first use.
+
+    Returns:
+        Instrumentation: The shared instrumentation.
+    """
+    global _default_metrics  # pylint: disable=global-statement
+    if _default_metrics is None:
+        _default_metrics = Instrumentation(os.getenv("METRICS_ENABLED", "0") == "1")
+        export_path = os.getenv("METRICS_EXPORT_FILE")
+        if export_path:
+            atexit.register(_default_metrics.export, export_path)
+    return _default_metrics
+
+def reset_metrics():
+    """
+    Forget the shared instrumentation.
+    """
+    global _default_metrics  # pylint: disable=global-statement
+    if _default_metrics is not None and os.getenv("METRICS_EXPORT_FILE"):
+        atexit.unregister(_default_metrics.export)
+    _default_metrics = None
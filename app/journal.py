@@ -0,0 +1,241 @@
+# app/journal.py
+"""
+This module provides an append-only journal for calculation history.
+
+Instead of rewriting the whole history file after every change, each add, delete and
+clear is appended to `<snapshot>.journal` as one JSON line. Loading replays the snapshot
+followed by the journal, and compaction writes a fresh snapshot and starts a new journal,
+so persistence cost is proportional to the change rather than the history size.
+
+The first line of a journal names the snapshot it applies to (its size and a CRC32), so a
+journal left behind by an interrupted compaction is never replayed twice.
+"""
+
+import json
+import logging
+import os
+import zlib
+from decimal import Decimal
+from app.numeric import FixedPoint
+
+FINGERPRINT_BLOCK = 1 << 20
+
+def encode_value(value):
+    """
+    Encode a history value as a JSON-compatible [type, text] pair that round-trips exactly.
+
+    Args:
+        value: A Decimal, float, int, FixedPoint, str or None.
+
+    Returns:
+        The encoded value.
+    """
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, FixedPoint):
+        return ["fixed", str(value)]
+    if isinstance(value, Decimal):
+        return ["decimal", str(value)]
+    if isinstance(value, float):
+        return ["float", repr(value)]
+    if isinstance(value, int):
+        return ["int", str(value)]
+    return ["decimal", str(value)]
+
+def decode_value(encoded):
+    """
+    Decode a value produced by encode_value.
+
+    Args:
+        encoded: The encoded value.
+
+    Returns:
+        The original value.
+    """
+    if not isinstance(encoded, list):
+        return encoded
+    kind, text = encoded
+    if kind == "fixed":
+        value = Decimal(text)
+        return FixedPoint.from_decimal(value, max(0, -value.as_tuple().exponent))
+    if kind == "float":
+        return float(text)
+    if kind == "int":
+        return int(text)
+    return Decimal(text)
+
+def snapshot_fingerprint(path: str) -> dict:
+    """
+    Identify the contents of a snapshot file by its size and the CRC32 of its first and
+    last mebibyte, which is cheap even for snapshots too large to read.
+
+    Args:
+        path (str): The snapshot file.
+
+    Returns:
+        dict: The size and crc of the file, or None if it does not exist.
+    """
+    if not os.path.exists(path):
+        return None
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        crc = zlib.crc32(f.read(FINGERPRINT_BLOCK))
+        if size > FINGERPRINT_BLOCK:
+            f.seek(max(FINGERPRINT_BLOCK, size - FINGERPRINT_BLOCK))
+            crc = zlib.crc32(f.read(), crc)
+    return {"size": size, "crc": crc}
+
+class HistoryJournal:
+    """
+    An append-only log of history changes on top of a snapshot file.
+    """
+    def __init__(self, snapshot_path: str, fsync_every: int = 0, compact_every: int = 0):
+        """
+        Initialize a HistoryJournal.
+
+        Args:
+            snapshot_path (str): The snapshot file; the journal lives next to it.
+            fsync_every (int): fsync after this many records (1 = every record, 0 = never).
+            compact_every (int): Records after which compaction is due (0 = never).
+        """
+        self.snapshot_path = snapshot_path
+        self.path = snapshot_path + ".journal"
+        self.fsync_every = fsync_every
+        self.compact_every = compact_every
+        self.records = 0
+        self._unsynced = 0
+        self._file = None
+
+    def _read_entries(self):
+        with open(self.path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    logging.warning("Ignoring unreadable journal line %d in %s.", line_number, self.path)
+                    return
+
+    def replay(self, facade) -> int:
+        """
+        Apply the journal to a facade that has just loaded the snapshot.
+
+        A journal whose header does not match the current snapshot is stale and skipped.
+
+        Args:
+            facade (PandasFacade): The facade holding the snapshot records.
+
+        Returns:
+            int: The number of records replayed, or -1 if there is no valid journal.
+        """
+        if not os.path.exists(self.path):
+            return -1
+        entries = self._read_entries()
+        header = next(entries, None)
+        if not header or header.get("op") != "base" or header.get("snapshot") != snapshot_fingerprint(self.snapshot_path):
+            logging.warning("Journal %s does not match its snapshot; skipping it.", self.path)
+            return -1
+        replayed = 0
+        for entry in entries:
+            if entry["op"] == "add":
+                facade.add_record({name: decode_value(value) for name, value in entry["record"].items()})
+            elif entry["op"] == "delete":
+                if "indices" in entry:
+                    facade.remove_records(entry["indices"])
+                else:
+                    facade.remove_record(entry["index"])
+            elif entry["op"] == "delete_operation":
+                facade.remove_operation(entry["operation"])
+            elif entry["op"] == "clear":
+                facade.clear()
+            replayed += 1
+        self.records = replayed
+        logging.info("Replayed %d journal records from %s.", replayed, self.path)
+        return replayed
+
+    def open(self, fresh: bool = False):
+        """
+        Open the journal for appending, starting a new one for the current snapshot if
+        fresh is set or no journal exists yet.
+
+        Args:
+            fresh (bool): Whether to discard any existing journal.
+        """
+        self.close()
+        if fresh or not os.path.exists(self.path):
+            with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(json.dumps({"op": "base", "snapshot": snapshot_fingerprint(self.snapshot_path)}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(self.path + ".tmp", self.path)
+            self.records = 0
+        self._file = open(self.path, "a", encoding="utf-8")  # pylint: disable=consider-using-with
+
+    def _write(self, entry: dict):
+        if self._file is None:
+            self.open()
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        self.records += 1
+        self._unsynced += 1
+        if self.fsync_every and self._unsynced >= self.fsync_every:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def append_add(self, record: dict):
+        """
+        Record an added calculation.
+
+        Args:
+            record (dict): The history record that was added.
+        """
+        self._write({"op": "add", "record": {name: encode_value(value) for name, value in record.items()}})
+
+    def append_delete(self, index: int):
+        """
+        Record a deleted calculation.
+
+        Args:
+            index (int): The index that was deleted.
+        """
+        self._write({"op": "delete", "index": index})
+
+    def append_delete_many(self, indices: list):
+        """
+        Record calculations deleted together.
+
+        Args:
+            indices (list): The indices that were deleted, as they were before the delete.
+        """
+        self._write({"op": "delete", "indices": indices})
+
+    def append_delete_operation(self, operation: str):
+        """
+        Record that every calculation of an operation was deleted.
+
+        Args:
+            operation (str): The operation name.
+        """
+        self._write({"op": "delete_operation", "operation": operation})
+
+    def append_clear(self):
+        """
+        Record that the history was cleared.
+        """
+        self._write({"op": "clear"})
+
+    @property
+    def needs_compaction(self) -> bool:
+        """
+        Whether the journal has grown past its compaction threshold.
+        """
+        return bool(self.compact_every) and self.records >= self.compact_every
+
+    def close(self):
+        """
+        Flush and close the journal file.
+        """
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
@@ -0,0 +1,113 @@
+# app/log_sampling.py
+"""
+This module provides sampled, lazily formatted logging for hot paths.
+
+Per-calculation records are only rendered when their level is enabled, and successful
+calculations can be sampled so that only 1 in N of them is logged. Each sampled record
+carries the number of events it stands for, so counts can still be recovered from the
+log. Errors are never sampled. The default sampler reads LOG_SAMPLE_EVERY (default 1,
+log every event). The counters are shown by the REPL `stats` command and written with
+the metrics export (METRICS_EXPORT_FILE).
+"""
+
+import logging
+import os
+from collections import Counter
+
+class LogSampler:
+    """
+    Counts hot-path events by key and decides which of them get logged.
+    """
+    def __init__(self, every: int = 1):
+        """
+        Initialize a LogSampler.
+
+        Args:
+            every (int): Log the first of every `every` events per key (1 logs all of them).
+        """
+        self.every = max(1, every)
+        self.seen = Counter()
+        self.logged = Counter()
+
+    def log(self, key: str, level: int, msg: str, *args):
+        """
+        Count an event and log it if it is sampled and its level is enabled. The message
+        is %-formatted by the logging handlers, and only for records that are emitted.
+
+        Args:
+            key (str): The event name used for counting and sampling.
+            level (int): The logging level.
+            msg (str): The %-style message.
+            *args: The message arguments.
+        """
+        self.seen[key] += 1
+        if (self.seen[key] - 1) % self.every:
+            return
+        if not logging.getLogger().isEnabledFor(level):
+            return
+        self.logged[key] += 1
+        if self.every > 1:
+            msg += " [sampled 1/%d, %d seen]"
+            args += (self.every, self.seen[key])
+        logging.log(level, msg, *args)
+
+    def stats(self) -> dict:
+        """
+        Return the per-key counters.
+
+        Returns:
+            dict: Seen and logged counts keyed by event name.
+        """
+        return {key: {"seen": seen, "logged": self.logged[key]} for key, seen in self.seen.items()}
+
+    def reset(self):
+        """
+        Drop the counters.
+        """
+        self.seen.clear()
+        self.logged.clear()
+
+    def report(self) -> str:
+        """
+        Format the counters as a table.
+
+        Returns:
+            str: One line per event name.
+        """
+        lines = [f"{'log event':<14} {'seen':>8} {'logged':>8}  (sampling 1 in {self.every})"]
+        lines += [f"{key:<14} {counts['seen']:>8} {counts['logged']:>8}" for key, counts in sorted(self.stats().items())]
+        return "\n".join(lines)
+
+    def to_prometheus(self) -> str:
+        """
+        Format the counters in the Prometheus text exposition format.
+
+        Returns:
+            str: Counters of seen and logged events per event name.
+        """
+        lines = ["# TYPE calculator_log_events_total counter"]
+        lines += [f'calculator_log_events_total{{event="{key}"}} {seen}' for key, seen in sorted(self.seen.items())]
+        lines.append("# TYPE calculator_log_records_total counter")
+        lines += [f'calculator_log_records_total{{event="{key}"}} {self.logged[key]}' for key in sorted(self.seen)]
+        return "\n".join(lines) + "\n"
+
+_default_sampler = None
+
+def get_sampler() -> LogSampler:
+    """
+    Return the shared sampler, creating it from LOG_SAMPLE_EVERY on first use.
+
+    Returns:
+        LogSampler: The shared sampler.
+    """
+    global _default_sampler  # pylint: disable=global-statement
+    if _default_sampler is None:
+        _default_sampler = LogSampler(int(os.getenv("LOG_SAMPLE_EVERY", "1")))
+    return _default_sampler
+
+def reset_sampler():
+    """
+    Forget the shared sampler and its counters.
+    """
+    global _default_sampler  # pylint: disable=global-statement
+    _default_sampler = None
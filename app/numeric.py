@@ -0,0 +1,338 @@
+# app/numeric.py
+"""
+This module provides the numeric backends that calculations run on.
+
+- `decimal`: exact arbitrary-precision Decimal arithmetic (the default).
+- `float`: hardware float64 arithmetic, for workloads that only need double precision.
+- `fixed`: scaled-integer fixed-point arithmetic with a fixed number of decimal digits.
+
+The active backend is chosen with the NUMERIC_MODE environment variable, the `--mode`
+command-line flag or the REPL `mode` command. Plugins only use arithmetic operators,
+so they work unchanged with the values of every backend.
+"""
+
+import os
+from abc import ABC, abstractmethod
+from decimal import MAX_EMAX, MAX_PREC, MIN_EMIN, Context, Decimal, InvalidOperation, ROUND_HALF_EVEN, getcontext
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+DEFAULT_FIXED_POINT_DIGITS = 6
+# Rescaling by a power of ten only moves the exponent; with unbounded precision it never rounds
+_EXACT = Context(prec=MAX_PREC, Emax=MAX_EMAX, Emin=MIN_EMIN)
+
+def _divide_half_even(numerator: int, denominator: int) -> int:
+    """
+    Integer division rounded half to even, matching Decimal's default rounding.
+    """
+    quotient, remainder = divmod(numerator, denominator)
+    twice = 2 * remainder
+    if denominator < 0:
+        twice, denominator = -twice, -denominator
+    if twice > denominator or (twice == denominator and quotient % 2 == 1):
+        quotient += 1
+    return quotient
+
+class FixedPoint:
+    """
+    A decimal number stored as an integer scaled by 10 ** digits.
+    """
+    __slots__ = ("raw", "digits")
+
+    def __init__(self, raw: int, digits: int = DEFAULT_FIXED_POINT_DIGITS):
+        self.raw = raw
+        self.digits = digits
+
+    @classmethod
+    def from_decimal(cls, value: Decimal, digits: int = DEFAULT_FIXED_POINT_DIGITS) -> "FixedPoint":
+        """
+        Round a Decimal to the given number of digits.
+
+        Args:
+            value (Decimal): The value to convert.
+            digits (int): The number of decimal digits to keep.
+
+        Returns:
+            FixedPoint: The rounded fixed-point value.
+        """
+        return cls(int(value.scaleb(digits, _EXACT).to_integral_value(ROUND_HALF_EVEN)), digits)
+
+    def _coerce(self, other) -> int:
+        if isinstance(other, FixedPoint):
+            if other.digits == self.digits:
+                return other.raw
+            return FixedPoint.from_decimal(other.to_decimal(), self.digits).raw
+        if isinstance(other, int):
+            return other * 10 ** self.digits
+        if isinstance(other, Decimal):
+            return FixedPoint.from_decimal(other, self.digits).raw
+        return NotImplemented
+
+    def to_decimal(self) -> Decimal:
+        """
+        Return the exact value as a Decimal.
+
+        Returns:
+            Decimal: The value with exactly `digits` decimal places.
+        """
+        return Decimal(self.raw).scaleb(-self.digits, _EXACT)
+
+    def __add__(self, other):
+        other_raw = self._coerce(other)
+        if other_raw is NotImplemented:
+            return NotImplemented
+        return FixedPoint(self.raw + other_raw, self.digits)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        other_raw = self._coerce(other)
+        if other_raw is NotImplemented:
+            return NotImplemented
+        return FixedPoint(self.raw - other_raw, self.digits)
+
+    def __rsub__(self, other):
+        other_raw = self._coerce(other)
+        if other_raw is NotImplemented:
+            return NotImplemented
+        return FixedPoint(other_raw - self.raw, self.digits)
+
+    def __mul__(self, other):
+        other_raw = self._coerce(other)
+        if other_raw is NotImplemented:
+            return NotImplemented
+        return FixedPoint(_divide_half_even(self.raw * other_raw, 10 ** self.digits), self.digits)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        other_raw = self._coerce(other)
+        if other_raw is NotImplemented:
+            return NotImplemented
+        if other_raw == 0:
+            raise ZeroDivisionError("Division by zero is not allowed.")
+        return FixedPoint(_divide_half_even(self.raw * 10 ** self.digits, other_raw), self.digits)
+
+    def __rtruediv__(self, other):
+        other_raw = self._coerce(other)
+        if other_raw is NotImplemented:
+            return NotImplemented
+        return FixedPoint(other_raw, self.digits) / self
+
+    def __neg__(self):
+        return FixedPoint(-self.raw, self.digits)
+
+    def __abs__(self):
+        return FixedPoint(abs(self.raw), self.digits)
+
+    def __eq__(self, other):
+        other_raw = self._coerce(other)
+        if other_raw is NotImplemented:
+            return NotImplemented
+        return self.raw == other_raw
+
+    def __lt__(self, other):
+        other_raw = self._coerce(other)
+        if other_raw is NotImplemented:
+            return NotImplemented
+        return self.raw < other_raw
+
+    def __le__(self, other):
+        other_raw = self._coerce(other)
+        if other_raw is NotImplemented:
+            return NotImplemented
+        return self.raw <= other_raw
+
+    def __gt__(self, other):
+        other_raw = self._coerce(other)
+        if other_raw is NotImplemented:
+            return NotImplemented
+        return self.raw > other_raw
+
+    def __ge__(self, other):
+        other_raw = self._coerce(other)
+        if other_raw is NotImplemented:
+            return NotImplemented
+        return self.raw >= other_raw
+
+    def __hash__(self):
+        return hash(self.to_decimal())
+
+    def __float__(self):
+        return self.raw / 10 ** self.digits
+
+    def __str__(self):
+        return str(self.to_decimal())
+
+    def __repr__(self):
+        return f"FixedPoint('{self}')"
+
+class NumericBackend(ABC):
+    """
+    Abstract base class for the number types calculations run on.
+    """
+    name: str
+
+    @abstractmethod
+    def parse(self, text: str):
+        """
+        Convert user input into a number of this backend.
+
+        Args:
+            text (str): The number as typed by the user.
+
+        Returns:
+            The parsed number.
+
+        Raises:
+            InvalidOperation: If the text is not a valid number.
+        """
+
+    @abstractmethod
+    def to_decimal(self, value) -> Decimal:
+        """
+        Convert a number of this backend to a Decimal.
+
+        Args:
+            value: A number produced by this backend.
+
+        Returns:
+            Decimal: The equivalent Decimal.
+        """
+
+    def context_key(self) -> tuple:
+        """
+        Describe everything besides the operands that can change a result.
+
+        Returns:
+            tuple: A hashable description of the numeric context.
+        """
+        return (self.name,)
+
+    def column(self, values) -> "np.ndarray":
+        """
+        Pack parsed numbers into an array suitable for `Command.execute_batch`.
+
+        Args:
+            values (list): Numbers produced by `parse`.
+
+        Returns:
+            np.ndarray: The operand column.
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel,redefined-outer-name
+        column = np.empty(len(values), dtype=object)
+        column[:] = values
+        return column
+
+class DecimalBackend(NumericBackend):
+    """
+    Exact arbitrary-precision arithmetic with Decimal.
+    """
+    name = "decimal"
+
+    def parse(self, text: str) -> Decimal:
+        return Decimal(text)
+
+    def to_decimal(self, value) -> Decimal:
+        return value if isinstance(value, Decimal) else Decimal(str(value))
+
+    def context_key(self) -> tuple:
+        context = getcontext()
+        return (self.name, context.prec, context.rounding)
+
+class FloatBackend(NumericBackend):
+    """
+    Fast double precision arithmetic with float64.
+    """
+    name = "float"
+
+    def parse(self, text: str) -> float:
+        try:
+            return float(text)
+        except (TypeError, ValueError) as e:
+            raise InvalidOperation(f"Invalid number: {text}") from e
+
+    def to_decimal(self, value) -> Decimal:
+        return Decimal(repr(float(value)))
+
+    def column(self, values) -> "np.ndarray":
+        import numpy as np  # pylint: disable=import-outside-toplevel,redefined-outer-name
+        return np.asarray(values, dtype=np.float64)
+
+class FixedPointBackend(NumericBackend):
+    """
+    Scaled-integer fixed-point arithmetic with a fixed number of decimal digits.
+    """
+    name = "fixed"
+
+    def __init__(self, digits: int = DEFAULT_FIXED_POINT_DIGITS):
+        self.digits = digits
+
+    def parse(self, text: str) -> FixedPoint:
+        value = Decimal(text)
+        if not value.is_finite():
+            raise InvalidOperation(f"Invalid number: {text}")
+        return FixedPoint.from_decimal(value, self.digits)
+
+    def to_decimal(self, value) -> Decimal:
+        return value.to_decimal() if isinstance(value, FixedPoint) else Decimal(str(value))
+
+    def context_key(self) -> tuple:
+        return (self.name, self.digits)
+
+BACKENDS = {
+    "decimal": DecimalBackend,
+    "float": FloatBackend,
+    "fixed": FixedPointBackend,
+}
+
+def create_backend(name: str) -> NumericBackend:
+    """
+    Create the backend with the given name. The fixed-point precision is read from the
+    FIXED_POINT_DIGITS environment variable.
+
+    Args:
+        name (str): One of `decimal`, `float` or `fixed`.
+
+    Returns:
+        NumericBackend: The new backend.
+
+    Raises:
+        ValueError: If the name is not a known backend.
+    """
+    name = name.lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown numeric mode: {name}. Choose from {', '.join(BACKENDS)}.")
+    if name == "fixed":
+        return FixedPointBackend(int(os.getenv("FIXED_POINT_DIGITS", str(DEFAULT_FIXED_POINT_DIGITS))))
+    return BACKENDS[name]()
+
+_backend = None
+
+def get_backend() -> NumericBackend:
+    """
+    Return the active backend, creating it from NUMERIC_MODE on first use.
+
+    Returns:
+        NumericBackend: The active backend.
+    """
+    global _backend  # pylint: disable=global-statement
+    if _backend is None:
+        _backend = create_backend(os.getenv("NUMERIC_MODE", "decimal"))
+    return _backend
+
+def set_backend(name: str) -> NumericBackend:
+    """
+    Make the named backend the active one.
+
+    Args:
+        name (str): One of `decimal`, `float` or `fixed`.
+
+    Returns:
+        NumericBackend: The new active backend.
+    """
+    global _backend  # pylint: disable=global-statement
+    _backend = create_backend(name)
+    return _backend
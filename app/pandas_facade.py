@@ -1,11 +1,162 @@
 # app/pandas_facade.py
 """
-This module provides a PandasFacade class that simplifies common DataFrame operations, 
-including adding records, clearing data, filtering, saving to a file, loading from a file, 
+This module provides a PandasFacade class that simplifies common DataFrame operations,
+including adding records, clearing data, filtering, saving to a file, loading from a file,
 and deleting records.
+
+Records are kept in an append-optimized columnar buffer and are only materialized into
+a DataFrame when the data is actually read, so adding a record is an amortized O(1)
+operation regardless of the history size. The num1, num2 and result columns are
+ScaledColumns: Decimals are stored as int64 coefficients with their scale instead of
+Python objects, so a row takes a few dozen bytes, and they come back as the exact same
+Decimals.
+
+The operation column is stored as integer codes into a list of operation names (and
+materialized as a categorical column), with a per-operation index of row positions
+kept up to date on every change, so filtering and counting by operation cost time
+proportional to the matching rows rather than the whole history.
+
+Deleting a record only marks its row as deleted (a tombstone in a bitmap, with a Fenwick
+tree of its prefix counts), so a delete, and finding the row of a record index, cost
+O(log n) instead of shifting every later row. Indices seen by callers skip tombstoned
+rows, and the rows are dropped for good when the history is compacted: on save, or once
+tombstones make up HISTORY_COMPACT_RATIO (default 0.25) of the rows, by whoever owns the
+facade (HistorySession compacts in a background thread), never inside the delete itself.
+
+Per-operation aggregates of the result column (count, sum, mean, variance, min, max) are
+kept up to date on every add and delete, so `summary` does not rescan the history; after
+a load they are rebuilt once, on first use.
+
+Histories loaded from a binary columnar file (.npz, .arrow, .feather) stay memory-mapped
+as a read-only base segment that new records are appended after; rows of the base are
+only decoded when they are read.
+
+pandas, NumPy and the columnar store are imported on first use, so recording a
+calculation does not pay for importing them.
 """
 
-import pandas as pd
+import bisect
+import os
+from array import array
+from itertools import compress
+from typing import TYPE_CHECKING
+from app.history_stats import RunningStats
+from app.scaled_column import ScaledColumn, float_keys
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+    from app.columnar_store import ColumnarHistory
+
+# The extensions app.columnar_store handles, checked here without importing it
+COLUMNAR_EXTENSIONS = (".npz", ".arrow", ".feather")
+
+COLUMNS = ["operation", "num1", "num2", "result"]
+VALUE_COLUMNS = COLUMNS[1:]
+# Maps a tombstone bitmap (1 = deleted) to a selector of the rows to keep
+_KEEP_TABLE = bytes([1, 0]) + bytes(254)
+# Above this many positions, converting them scans the bitmap with NumPy instead
+_TREE_LOOKUPS = 64
+
+class TombstoneIndex:
+    """
+    The deleted rows of a history: a bitmap (1 = deleted) and a Fenwick tree over it, so
+    marking a row and converting between record indices and row positions take O(log n).
+    """
+    def __init__(self, length: int):
+        """
+        Initialize a TombstoneIndex with no deleted rows.
+
+        Args:
+            length (int): The number of rows.
+        """
+        self.mask = bytearray(length)
+        self.count = 0
+        self._capacity = 0
+        self._tree = [0]
+
+    def __len__(self) -> int:
+        return self.count
+
+    def append(self):
+        """
+        Add a live row at the end.
+        """
+        self.mask.append(0)
+
+    def _fit(self):
+        # Rows past the capacity are live, so the tree only needs rebuilding (in O(n), with
+        # the capacity doubled) before one of them is marked
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        capacity = 1 << max(len(self.mask) - 1, 1).bit_length()
+        counts = np.zeros(capacity + 1, dtype=np.int64)
+        np.cumsum(np.frombuffer(self.mask, dtype=np.uint8), out=counts[1:len(self.mask) + 1])
+        counts[len(self.mask) + 1:] = self.count
+        nodes = np.arange(1, capacity + 1)
+        self._tree = [0] + (counts[nodes] - counts[nodes - (nodes & -nodes)]).tolist()
+        self._capacity = capacity
+
+    def mark(self, position: int):
+        """
+        Mark a live row as deleted.
+
+        Args:
+            position (int): The row position.
+        """
+        self.mask[position] = 1
+        self.count += 1
+        if position >= self._capacity:
+            self._fit()
+            return
+        tree, node = self._tree, position + 1
+        while node <= self._capacity:
+            tree[node] += 1
+            node += node & -node
+
+    def before(self, position: int) -> int:
+        """
+        Return the number of deleted rows before a row position.
+        """
+        tree, node, dead = self._tree, min(position, self._capacity), 0
+        while node:
+            dead += tree[node]
+            node &= node - 1
+        return dead
+
+    def select(self, index: int) -> int:
+        """
+        Return the row position of the live row with a record index.
+        """
+        # Descend to the longest prefix with at most index live rows; the row after it is
+        # the one, and rows past the capacity are all live
+        tree, node, dead, step = self._tree, 0, 0, self._capacity
+        while step:
+            if node + step <= self._capacity and node + step - dead - tree[node + step] <= index:
+                node += step
+                dead += tree[node]
+            step >>= 1
+        return index + dead
+
+    def select_many(self, indices: list) -> list:
+        """
+        Return the row positions of ascending record indices.
+        """
+        if len(indices) <= _TREE_LOOKUPS:
+            return [self.select(index) for index in indices]
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        live = np.flatnonzero(np.frombuffer(self.mask, dtype=np.uint8) == 0)
+        return live[np.asarray(indices, dtype=np.int64)].tolist()
+
+    def logical_many(self, positions: list) -> list:
+        """
+        Return the record indices of ascending live row positions.
+        """
+        if len(positions) <= _TREE_LOOKUPS:
+            return [position - self.before(position) for position in positions]
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        positions = np.asarray(positions, dtype=np.int64)
+        dead = np.cumsum(np.frombuffer(self.mask, dtype=np.uint8), dtype=np.int64)
+        return (positions - dead[positions]).tolist()
 
 class PandasFacade:
     """
@@ -13,24 +164,242 @@ class PandasFacade:
     """
 
     def __init__(self):
-        self.dataframe = pd.DataFrame(columns=["operation", "num1", "num2", "result"])
+        self.compact_ratio = float(os.getenv("HISTORY_COMPACT_RATIO", "0.25"))
+        self._epoch = 0
+        self._reset()
+
+    def _reset(self, base: "ColumnarHistory" = None):
+        self._epoch += 1
+        self._base = base
+        self._base_length = len(base) if base is not None else 0
+        self._base_positions = {}
+        self._base_counts = None
+        self._codes = []
+        self._columns = {name: ScaledColumn() for name in VALUE_COLUMNS}
+        self._categories = list(base.categories) if base is not None else []
+        self._category_codes = {name: code for code, name in enumerate(self._categories)}
+        self._positions = {name: array("q") for name in self._categories}
+        self._frame = None
+        # Aggregates by operation code; None until rebuilt after a load
+        self._stats = {} if base is None else None
+        self._reset_tombstones()
+
+    def _reset_tombstones(self):
+        self._dead = None
+        self._dead_counts = {}
+
+    def __len__(self) -> int:
+        return self._base_length + len(self._codes) - self.tombstones
+
+    @property
+    def tombstones(self) -> int:
+        """
+        The number of deleted rows not yet dropped by compaction.
+        """
+        return self._dead.count if self._dead is not None else 0
+
+    @property
+    def compaction_due(self) -> bool:
+        """
+        Whether tombstones make up compact_ratio of the rows, so compact() should be run.
+        """
+        return bool(self.compact_ratio) and self.tombstones >= self.compact_ratio * self._physical_length() > 0
+
+    def _physical_length(self) -> int:
+        return self._base_length + len(self._codes)
+
+    def _physical(self, index: int) -> int:
+        """
+        Return the row position of a record index, skipping tombstoned rows.
+        """
+        return self._dead.select(index) if self.tombstones else index
+
+    def _physical_many(self, indices: list) -> list:
+        """
+        Return the row positions of ascending record indices.
+        """
+        return self._dead.select_many(indices) if self.tombstones else list(indices)
+
+    def _logical(self, positions: list) -> list:
+        """
+        Return the record indices of ascending live row positions.
+        """
+        return self._dead.logical_many(positions) if self.tombstones else positions
+
+    def _live(self, positions) -> list:
+        """
+        Drop tombstoned rows from ascending row positions.
+        """
+        if not self.tombstones:
+            return list(positions)
+        mask = self._dead.mask
+        return [position for position in positions if not mask[position]]
+
+    def _live_positions(self) -> list:
+        if not self.tombstones:
+            return list(range(self._physical_length()))
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        return np.flatnonzero(np.frombuffer(self._dead.mask, dtype=np.uint8) == 0).tolist()
+
+    def _code_at(self, position: int) -> int:
+        if position < self._base_length:
+            return int(self._base.codes[position])
+        return self._codes[position - self._base_length]
+
+    def _value_at(self, name: str, position: int):
+        if position < self._base_length:
+            return self._base.value(name, position) if name in self._base.column_names else None
+        return self._columns[name][position - self._base_length]
+
+    def _base_values(self, name: str, positions: list) -> list:
+        if name not in self._base.column_names:
+            return [None] * len(positions)
+        return self._base.values(name, positions)
+
+    def _operation_positions(self, operation: str) -> list:
+        """
+        Return the row positions of an operation, in order.
+        """
+        if operation not in self._category_codes:
+            return []
+        positions = []
+        if self._base is not None:
+            if operation not in self._base_positions:
+                import numpy as np  # pylint: disable=import-outside-toplevel
+                code = self._category_codes[operation]
+                self._base_positions[operation] = np.flatnonzero(np.asarray(self._base.codes) == code).tolist()
+            positions.extend(self._base_positions[operation])
+        positions.extend(self._positions[operation])
+        return self._live(positions)
+
+    def _materialize_base(self):
+        """
+        Decode the memory-mapped base segment into the in-memory column buffer.
+        """
+        if self._base is None:
+            return
+        base, codes, columns, categories = self._base, self._codes, self._columns, self._categories
+        tombstones, stats = (self._dead, self._dead_counts), self._stats
+        self._reset()
+        (self._dead, self._dead_counts), self._stats = tombstones, stats
+        self._categories = categories
+        self._category_codes = {name: code for code, name in enumerate(categories)}
+        self._positions = {name: array("q") for name in categories}
+        self._codes = [int(code) for code in base.codes] + codes
+        for position, code in enumerate(self._codes):
+            if code >= 0:
+                self._positions[self._categories[code]].append(position)
+        self._columns = {}
+        for name in VALUE_COLUMNS:
+            self._columns[name] = ScaledColumn(base.values(name) if name in base.column_names else [None] * len(base))
+            self._columns[name].extend(columns[name])
+
+    def _code_for(self, operation) -> int:
+        """
+        Return the code of an operation name, registering new names. None maps to -1.
+        """
+        if operation is None:
+            return -1
+        code = self._category_codes.get(operation)
+        if code is None:
+            code = len(self._categories)
+            self._categories.append(operation)
+            self._category_codes[operation] = code
+            self._positions[operation] = array("q")
+        return code
+
+    def _build_frame(self, positions=None) -> "pd.DataFrame":
+        """
+        Build a DataFrame from the buffer, optionally restricted to some ascending row positions.
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        import pandas as pd  # pylint: disable=import-outside-toplevel,redefined-outer-name
+        if positions is None and self._base is None and not self.tombstones:
+            codes, index = self._codes, None
+            columns = {name: values.tolist() for name, values in self._columns.items()}
+        else:
+            index = None if positions is None else self._logical(positions)
+            positions = self._live_positions() if positions is None else positions
+            split = bisect.bisect_left(positions, self._base_length)
+            base_positions = positions[:split]
+            tail_positions = [position - self._base_length for position in positions[split:]]
+            codes = np.asarray(self._base.codes)[base_positions].tolist() if base_positions else []
+            codes += [self._codes[position] for position in tail_positions]
+            columns = {}
+            for name in VALUE_COLUMNS:
+                values = self._base_values(name, base_positions) if base_positions else []
+                columns[name] = values + self._columns[name].take(tail_positions)
+        data = {"operation": pd.Categorical.from_codes(codes, categories=list(self._categories))}
+        for name, values in columns.items():
+            data[name] = pd.Series(values, dtype=object, index=index)
+        return pd.DataFrame(data, columns=COLUMNS, index=index)
+
+    @property
+    def dataframe(self) -> "pd.DataFrame":
+        """
+        The history as a DataFrame, materialized from the column buffer on first access
+        after a change and cached until the next change.
+
+        Returns:
+            pd.DataFrame: A DataFrame containing all records.
+        """
+        if self._frame is None:
+            self._frame = self._build_frame()
+        return self._frame
+
+    @dataframe.setter
+    def dataframe(self, frame: "pd.DataFrame"):
+        """
+        Replace the buffered records with the rows of an existing DataFrame.
+
+        Args:
+            frame (pd.DataFrame): The DataFrame to load into the buffer.
+        """
+        self._reset()
+        operations = frame["operation"].tolist() if "operation" in frame.columns else [None] * len(frame)
+        for position, operation in enumerate(operations):
+            if isinstance(operation, float) and operation != operation:
+                operation = None
+            code = self._code_for(operation)
+            self._codes.append(code)
+            if code >= 0:
+                self._positions[operation].append(position)
+        self._columns = {
+            name: ScaledColumn(frame[name].tolist() if name in frame.columns else [None] * len(frame))
+            for name in VALUE_COLUMNS
+        }
+        self._stats = None
 
     def add_record(self, record: dict):
         """
-        Add a new record to the DataFrame.
+        Add a new record to the column buffer.
 
         Args:
             record (dict): A dictionary containing operation details.
         """
-        self.dataframe = pd.concat([self.dataframe, pd.DataFrame([record])], ignore_index=True)
+        operation = record.get("operation")
+        code = self._code_for(operation)
+        if code >= 0:
+            self._positions[operation].append(self._physical_length())
+        self._codes.append(code)
+        for name, values in self._columns.items():
+            values.append(record.get(name))
+        if self._dead is not None:
+            self._dead.append()
+        if self._stats is not None and code >= 0:
+            stats = self._stats.get(code)
+            if stats is None:
+                stats = self._stats[code] = RunningStats()
+            stats.add(record.get("result"))
+        self._frame = None
 
     def clear(self):
         """
         Clear the DataFrame.
         """
-        self.dataframe = pd.DataFrame(columns=self.dataframe.columns)
+        self._reset()
 
-    def filter_by_operation(self, operation: str) -> pd.DataFrame:
+    def filter_by_operation(self, operation: str) -> "pd.DataFrame":
         """
         Filter the DataFrame by operation.
 
@@ -40,25 +409,306 @@ class PandasFacade:
         Returns:
             pd.DataFrame: A DataFrame filtered by the specified operation.
         """
-        return self.dataframe[self.dataframe["operation"] == operation]
+        return self._build_frame(self._operation_positions(operation))
+
+    def count_by_operation(self) -> dict:
+        """
+        Count the records of every operation present in the history.
+
+        Returns:
+            dict: Record counts keyed by operation name.
+        """
+        counts = {operation: len(positions) for operation, positions in self._positions.items()}
+        if self._base is not None:
+            if self._base_counts is None:
+                import numpy as np  # pylint: disable=import-outside-toplevel
+                codes = np.asarray(self._base.codes)
+                self._base_counts = np.bincount(codes[codes >= 0], minlength=len(self._base.categories))
+            for code, count in enumerate(self._base_counts):
+                counts[self._categories[code]] += int(count)
+        for code, count in self._dead_counts.items():
+            if code >= 0:
+                counts[self._categories[code]] -= count
+        return {operation: count for operation, count in counts.items() if count}
+
+    def _operation_results(self, operation: str) -> list:
+        positions = self._operation_positions(operation)
+        split = bisect.bisect_left(positions, self._base_length)
+        values = self._base_values("result", positions[:split]) if split else []
+        return values + self._columns["result"].take([position - self._base_length for position in positions[split:]])
+
+    def summary(self, operation: str = None) -> dict:
+        """
+        Return the aggregates of the result column by operation. They are maintained
+        incrementally, so this does not scan the history (except once after a load, and
+        for an operation whose minimum or maximum was deleted).
+
+        Args:
+            operation (str): Only summarize this operation.
+
+        Returns:
+            dict: count, sum, mean, variance, stdev, min and max keyed by operation name,
+            for operations that have records.
+        """
+        if self._stats is None:
+            self._stats = {}
+            for name in self._categories:
+                stats = self._stats[self._category_codes[name]] = RunningStats()
+                for value in self._operation_results(name):
+                    stats.add(value)
+        result = {}
+        for code, stats in self._stats.items():
+            name = self._categories[code]
+            if operation is not None and name != operation or not stats.count:
+                continue
+            if stats.extremes_stale:
+                stats.set_extremes(self._operation_results(name))
+            result[name] = stats
+        return {name: stats.as_dict() for name, stats in result.items()}
+
+    def get_record(self, index: int) -> dict:
+        """
+        Return a single record by its index; negative indices count from the end.
+
+        Args:
+            index (int): The index of the record.
+
+        Returns:
+            dict: The record, or None if the index is out of range.
+        """
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            return None
+        return self.row(self._physical(index))
+
+    # Row slots: queries address records by their row position in the buffer, which,
+    # unlike record indices, does not shift when earlier records are deleted. Positions
+    # stay valid until `version` changes (on clear, load or compaction).
+
+    @property
+    def version(self) -> int:
+        """
+        A number that changes whenever row positions are renumbered.
+        """
+        return self._epoch
+
+    @property
+    def row_slots(self) -> int:
+        """
+        The number of row positions, including deleted rows not yet compacted away.
+        """
+        return self._physical_length()
+
+    def row(self, position: int) -> dict:
+        """
+        Return the record stored at a row position.
+
+        Args:
+            position (int): The row position.
+
+        Returns:
+            dict: The record.
+        """
+        code = self._code_at(position)
+        record = {"operation": self._categories[code] if code >= 0 else None}
+        record.update({name: self._value_at(name, position) for name in VALUE_COLUMNS})
+        return record
+
+    def column_values(self, name: str, start: int = 0, stop: int = None) -> list:
+        """
+        Return the values of a column for a range of row positions, deleted rows included.
+
+        Args:
+            name (str): num1, num2 or result.
+            start (int): The first row position.
+            stop (int): The row position to stop before; defaults to row_slots.
+
+        Returns:
+            list: The values.
+        """
+        stop = self._physical_length() if stop is None else stop
+        values = []
+        if start < self._base_length:
+            base_stop = min(stop, self._base_length)
+            if name not in self._base.column_names:
+                values = [None] * (base_stop - start)
+            elif start == 0 and base_stop == self._base_length:
+                values = self._base.values(name)
+            else:
+                values = self._base.values(name, list(range(start, base_stop)))
+        return values + self._columns[name][max(0, start - self._base_length):max(0, stop - self._base_length)]
+
+    def column_floats(self, name: str, start: int = 0) -> "np.ndarray":
+        """
+        Return float64 keys of a column from a row position on, deleted rows included,
+        with NaN for missing or non-numeric values. Rows after the memory-mapped base are
+        converted without decoding their values.
+
+        Args:
+            name (str): num1, num2 or result.
+            start (int): The first row position.
+
+        Returns:
+            np.ndarray: The keys.
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        keys = self._columns[name].floats(max(0, start - self._base_length))
+        if start < self._base_length:
+            keys = np.concatenate([float_keys(self.column_values(name, start, self._base_length)), keys])
+        return keys
+
+    def operation_rows(self, operation: str) -> list:
+        """
+        Return the row positions of the live records of an operation, in order.
+        """
+        return self._operation_positions(operation)
+
+    def live_rows(self, positions) -> list:
+        """
+        Drop deleted rows from ascending row positions.
+        """
+        return self._live(positions)
+
+    def rows_frame(self, positions: list) -> "pd.DataFrame":
+        """
+        Build a DataFrame of the records at ascending live row positions, indexed by
+        their record indices.
+        """
+        if self._frame is not None:
+            return self._frame.iloc[self._logical(positions)]
+        return self._build_frame(positions)
+
+    def head_and_tail(self, count: int) -> "pd.DataFrame":
+        """
+        Build a DataFrame of only the first and last count records, keeping their indices.
+
+        Args:
+            count (int): The number of records to take from each end.
+
+        Returns:
+            pd.DataFrame: The selected records.
+        """
+        if len(self) <= 2 * count:
+            return self._build_frame(self._live_positions())
+        indices = list(range(count)) + list(range(len(self) - count, len(self)))
+        return self._build_frame(self._physical_many(indices))
 
     def save_to_file(self, filepath: str):
         """
-        Save DataFrame to a CSV file.
+        Save DataFrame to a file. The format is chosen by extension: .npz, .arrow and
+        .feather write a binary columnar file that round-trips exact values, anything
+        else writes CSV. Deleted rows are compacted away first.
 
         Args:
             filepath (str): The path where the DataFrame should be saved.
         """
-        self.dataframe.to_csv(filepath, index=False)
+        self.compact()
+        if filepath.lower().endswith(COLUMNAR_EXTENSIONS):
+            import numpy as np  # pylint: disable=import-outside-toplevel
+            from app.columnar_store import write_columnar  # pylint: disable=import-outside-toplevel
+            base_positions = list(range(self._base_length))
+            codes = (np.asarray(self._base.codes).tolist() if self._base is not None else []) + self._codes
+            columns = {name: (self._base_values(name, base_positions) if base_positions else []) + values.tolist()
+                       for name, values in self._columns.items()}
+            write_columnar(filepath, codes, self._categories, columns)
+        else:
+            self.dataframe.to_csv(filepath, index=False)
 
     def load_from_file(self, filepath: str):
         """
-        Load DataFrame from a CSV file.
+        Load DataFrame from a file. Binary columnar files are memory-mapped rather than
+        read; anything else is parsed as CSV.
 
         Args:
             filepath (str): The path from which the DataFrame should be loaded.
         """
-        self.dataframe = pd.read_csv(filepath)
+        if filepath.lower().endswith(COLUMNAR_EXTENSIONS):
+            from app.columnar_store import ColumnarHistory  # pylint: disable=import-outside-toplevel,redefined-outer-name
+            self._reset(ColumnarHistory(filepath))
+        else:
+            import pandas as pd  # pylint: disable=import-outside-toplevel,redefined-outer-name
+            self.dataframe = pd.read_csv(filepath)
+
+    def remove_record(self, index: int) -> bool:
+        """
+        Remove a record by its index without printing anything.
+
+        Args:
+            index (int): The index of the record to remove.
+
+        Returns:
+            bool: Whether the index was in range and the record was removed.
+        """
+        if not 0 <= index < len(self):
+            return False
+        self._tombstone([self._physical(index)])
+        return True
+
+    def remove_records(self, indices) -> int:
+        """
+        Remove many records in one pass. Indices refer to the history before the removal;
+        out-of-range and repeated indices are ignored.
+
+        Args:
+            indices: The indices of the records to remove, e.g. a list or a range.
+
+        Returns:
+            int: The number of records removed.
+        """
+        length = len(self)
+        indices = sorted({index for index in indices if 0 <= index < length})
+        if indices:
+            self._tombstone(self._physical_many(indices))
+        return len(indices)
+
+    def remove_operation(self, operation: str) -> int:
+        """
+        Remove every record of an operation.
+
+        Args:
+            operation (str): The operation name.
+
+        Returns:
+            int: The number of records removed.
+        """
+        positions = self._operation_positions(operation)
+        if positions:
+            self._tombstone(positions)
+        return len(positions)
+
+    def _tombstone(self, positions: list):
+        """
+        Mark ascending live row positions as deleted. Compaction is left to the caller,
+        see compaction_due.
+        """
+        if self._dead is None:
+            self._dead = TombstoneIndex(self._physical_length())
+        for position in positions:
+            self._dead.mark(position)
+            code = self._code_at(position)
+            self._dead_counts[code] = self._dead_counts.get(code, 0) + 1
+            if self._stats is not None and code >= 0:
+                self._stats[code].remove(self._value_at("result", position))
+        self._frame = None
+
+    def compact(self):
+        """
+        Drop tombstoned rows from the buffer. Record indices do not change.
+        """
+        if not self.tombstones:
+            return
+        self._materialize_base()
+        keep = self._dead.mask.translate(_KEEP_TABLE)
+        self._codes = list(compress(self._codes, keep))
+        self._columns = {name: values.compress(keep) for name, values in self._columns.items()}
+        self._positions = {name: array("q") for name in self._categories}
+        for position, code in enumerate(self._codes):
+            if code >= 0:
+                self._positions[self._categories[code]].append(position)
+        self._reset_tombstones()
+        self._epoch += 1
+        self._frame = None
 
     def delete_record(self, index: int):
         """
@@ -67,8 +717,7 @@ class PandasFacade:
         Args:
             index (int): The index of the record to delete.
         """
-        if 0 <= index < len(self.dataframe):
-            self.dataframe = self.dataframe.drop(index).reset_index(drop=True)
+        if self.remove_record(index):
             print(f"Deleted calculation at index {index}.")
         else:
             print(f"Index {index} is out of range. Unable to delete.")
@@ -0,0 +1,138 @@
+# app/plugin_loader.py
+"""
+This module discovers and instantiates the command plugins found in `app/plugins`.
+It is shared by the main process and by worker processes, which preload the plugins
+once when they start.
+
+Discovering plugins requires importing every plugin module once. The result (operation
+name, module and class of each plugin) is cached in a manifest file that is reused as
+long as the plugin files and their modification times are unchanged, so a single-shot
+calculation only imports the one plugin it actually runs.
+"""
+
+import importlib
+import json
+import logging
+import os
+from collections import OrderedDict
+from collections.abc import Mapping
+
+MANIFEST_VERSION = 1
+
+class PluginRegistry(Mapping):
+    """
+    A read-only mapping of operation names to command instances that imports each
+    plugin module the first time its command is looked up.
+    """
+    def __init__(self, entries: dict):
+        """
+        Initialize a PluginRegistry.
+
+        Args:
+            entries (dict): Module and class names keyed by operation name.
+        """
+        self._entries = entries
+        self._commands = {}
+
+    def __getitem__(self, name: str):
+        if name not in self._commands:
+            entry = self._entries[name]
+            module = importlib.import_module(f"app.plugins.{entry['module']}")
+            self._commands[name] = getattr(module, entry["class"])()
+            logging.info("Loaded plugin: %s", entry['module'])
+        return self._commands[name]
+
+    def __contains__(self, name) -> bool:
+        return name in self._entries
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def load_all(self) -> "PluginRegistry":
+        """
+        Import every plugin now instead of on first use.
+
+        Returns:
+            PluginRegistry: This registry.
+        """
+        for name in self._entries:
+            _ = self[name]
+        return self
+
+def _manifest_path(plugins_dir: str) -> str:
+    return os.getenv("PLUGIN_MANIFEST_FILE") or os.path.join(plugins_dir, "__pycache__", "plugin_manifest.json")
+
+def _plugin_files(plugins_dir: str) -> dict:
+    """
+    Map every `*_command.py` file in the plugins directory to its modification time.
+    """
+    return {
+        filename: os.stat(os.path.join(plugins_dir, filename)).st_mtime_ns
+        for filename in sorted(os.listdir(plugins_dir)) if filename.endswith('_command.py')
+    }
+
+def _read_manifest(path: str, files: dict) -> OrderedDict:
+    """
+    Return the cached plugin entries, or None if the manifest is missing or stale.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("files") != files:
+        return None
+    return OrderedDict(manifest["plugins"])
+
+def _write_manifest(path: str, files: dict, entries: OrderedDict):
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "files": files, "plugins": entries}, f)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        logging.warning("Could not write plugin manifest %s: %s", path, e)
+
+def _scan_plugins(plugins_dir: str, files: dict) -> OrderedDict:
+    """
+    Import every plugin module to find the ones that provide a command class.
+    """
+    entries = OrderedDict()
+    for filename in files:
+        module_name = filename[:-3]
+        class_name = module_name[:-8].capitalize() + 'Command'
+        try:
+            module = importlib.import_module(f'app.plugins.{module_name}')
+            getattr(module, class_name)
+            entries[module_name[:-8]] = {"module": module_name, "class": class_name}
+        except (ImportError, AttributeError) as e:
+            logging.error("Failed to load plugin %s: %s", module_name, e)
+    return entries
+
+# Load plugins dynamically
+def load_plugins():
+    """
+    Find the command plugins in the plugins directory, using the manifest cache when it
+    is up to date. Plugin modules are imported when their command is first looked up.
+
+    Returns:
+        PluginRegistry: Command instances keyed by operation name.
+    """
+    plugins_dir = os.path.join('app', 'plugins')
+
+    if not os.path.exists(plugins_dir):
+        logging.warning("Plugins directory not found: %s", plugins_dir)
+        return PluginRegistry(OrderedDict())
+
+    files = _plugin_files(plugins_dir)
+    manifest_path = _manifest_path(plugins_dir)
+    entries = _read_manifest(manifest_path, files)
+    if entries is None:
+        entries = _scan_plugins(plugins_dir, files)
+        _write_manifest(manifest_path, files, entries)
+        logging.debug("Plugin manifest rebuilt: %s", manifest_path)
+
+    return PluginRegistry(entries)
@@ -4,14 +4,20 @@ This module defines the `AddCommand` class for performing addition operations.
 """
 
 from decimal import Decimal
+from typing import TYPE_CHECKING
 from app.command import Command
 
+if TYPE_CHECKING:
+    import numpy as np
+
 class AddCommand(Command):
     """
     Command class for performing addition operations.
-    Implements the `execute` and `execute_multiprocessing` methods.
+    Implements the `execute`, `execute_multiprocessing` and `execute_batch` methods.
     """
     operation_name = "add"
+    pure = True
+    commutative = True
 
     def execute(self, num1: Decimal, num2: Decimal) -> Decimal:
         """
@@ -38,3 +44,17 @@ class AddCommand(Command):
         """
         result = self.execute(num1, num2)
         result_queue.put(result)
+
+    def execute_batch(self, a, b) -> "np.ndarray":
+        """
+        Adds two columns of numbers element-wise.
+
+        Args:
+            a (array-like): The first numbers.
+            b (array-like): The second numbers.
+
+        Returns:
+            np.ndarray: The element-wise results.
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel,redefined-outer-name
+        return np.asarray(a) + np.asarray(b)
@@ -4,14 +4,19 @@ This module defines the `DivideCommand` class for performing division operations
 """
 
 from decimal import Decimal, DivisionByZero
+from typing import TYPE_CHECKING
 from app.command import Command
 
+if TYPE_CHECKING:
+    import numpy as np
+
 class DivideCommand(Command):
     """
     Command class for performing division operations.
-    Implements the `execute` and `execute_multiprocessing` methods.
+    Implements the `execute`, `execute_multiprocessing` and `execute_batch` methods.
     """
     operation_name = "divide"
+    pure = True
 
     def execute(self, num1: Decimal, num2: Decimal) -> Decimal:
         """
@@ -46,3 +51,26 @@ class DivideCommand(Command):
             result_queue.put(result)
         except DivisionByZero as e:
             result_queue.put(e)
+
+    def execute_batch(self, a, b) -> "np.ndarray":
+        """
+        Divides a column of numerators by a column of denominators element-wise.
+
+        Rows with a zero denominator are masked out instead of raising: they come back
+        as None for object (Decimal) arrays and NaN for numeric arrays.
+
+        Args:
+            a (array-like): The numerators.
+            b (array-like): The denominators.
+
+        Returns:
+            np.ndarray: The element-wise quotients.
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel,redefined-outer-name
+        a, b = np.asarray(a), np.asarray(b)
+        nonzero = b != 0
+        if a.dtype == object or b.dtype == object:
+            results = np.full(len(a), None, dtype=object)
+            results[nonzero] = a[nonzero] / b[nonzero]
+            return results
+        return np.divide(a, b, out=np.full(len(a), np.nan), where=nonzero)
@@ -4,14 +4,20 @@ This module defines the `SquareCommand` class for performing square operations.
 """
 
 from decimal import Decimal
+from typing import TYPE_CHECKING
 from app.command import Command
 
+if TYPE_CHECKING:
+    import numpy as np
+
 class SquareCommand(Command):
     """
     Command class for performing square operations.
-    Implements the `execute` and `execute_multiprocessing` methods.
+    Implements the `execute`, `execute_multiprocessing` and `execute_batch` methods.
     """
     operation_name = "square"
+    pure = True
+    arity = 1
 
     def execute(self, num1: Decimal, num2: Decimal) -> Decimal:
         """
@@ -38,3 +44,18 @@ class SquareCommand(Command):
         """
         result = self.execute(num1, num2)
         result_queue.put(result)
+
+    def execute_batch(self, a, b) -> "np.ndarray":
+        """
+        Squares a column of numbers element-wise.
+
+        Args:
+            a (array-like): The numbers to square.
+            b (array-like): Not used in this operation.
+
+        Returns:
+            np.ndarray: The element-wise squares.
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel,redefined-outer-name
+        a = np.asarray(a)
+        return a * a
@@ -4,14 +4,19 @@ This module defines the `SubtractCommand` class for performing subtraction opera
 """
 
 from decimal import Decimal
+from typing import TYPE_CHECKING
 from app.command import Command
 
+if TYPE_CHECKING:
+    import numpy as np
+
 class SubtractCommand(Command):
     """
     Command class for performing subtraction operations.
-    Implements the `execute` and `execute_multiprocessing` methods.
+    Implements the `execute`, `execute_multiprocessing` and `execute_batch` methods.
     """
     operation_name = "subtract"
+    pure = True
 
     def execute(self, num1: Decimal, num2: Decimal) -> Decimal:
         """
@@ -38,3 +43,17 @@ class SubtractCommand(Command):
         """
         result = self.execute(num1, num2)
         result_queue.put(result)
+
+    def execute_batch(self, a, b) -> "np.ndarray":
+        """
+        Subtracts the second column from the first element-wise.
+
+        Args:
+            a (array-like): The first numbers.
+            b (array-like): The second numbers.
+
+        Returns:
+            np.ndarray: The element-wise results.
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel,redefined-outer-name
+        return np.asarray(a) - np.asarray(b)
@@ -0,0 +1,188 @@
+# app/result_cache.py
+"""
+This module provides a memoizing cache for the results of pure commands.
+
+Results are keyed by operation, operands and numeric context and kept in a bounded
+in-memory LRU. An optional SQLite file adds a persistent tier that survives restarts;
+values are stored there as JSON text (never pickles), so reading a cache file cannot
+run code.
+The default cache is configured with the RESULT_CACHE_SIZE (0 disables caching) and
+RESULT_CACHE_FILE environment variables.
+"""
+
+import json
+import logging
+import os
+from collections import OrderedDict
+from app.command import Command
+from app.journal import decode_value, encode_value
+from app.numeric import get_backend
+
+DEFAULT_CACHE_SIZE = 1024
+
+class ResultCache:
+    """
+    A bounded LRU cache of command results with an optional on-disk tier.
+    """
+    def __init__(self, max_size: int = DEFAULT_CACHE_SIZE, path: str = None):
+        """
+        Initialize a ResultCache.
+
+        Args:
+            max_size (int): The maximum number of results kept in memory.
+            path (str): Optional SQLite file for the persistent tier.
+        """
+        self.max_size = max_size
+        self.path = path
+        self._entries = OrderedDict()
+        self._connection = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if path:
+            import sqlite3  # pylint: disable=import-outside-toplevel
+            self._connection = sqlite3.connect(path, check_same_thread=False)
+            self._connection.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT)")
+            self._connection.commit()
+
+    @staticmethod
+    def make_key(command: Command, num1, num2) -> tuple:
+        """
+        Build the cache key for a calculation.
+
+        Operands are keyed by type and exact string form, so Decimal('2') and
+        Decimal('2.0') (which give differently formatted results) stay distinct.
+        Commutative commands share one entry for both operand orders, and commands
+        that ignore their second operand drop it from the key.
+
+        Args:
+            command (Command): The command being executed.
+            num1: The first number.
+            num2: The second number.
+
+        Returns:
+            tuple: The cache key.
+        """
+        operands = [(type(num1).__name__, str(num1))]
+        if getattr(command, "arity", 2) == 2:
+            operands.append((type(num2).__name__, str(num2)))
+            if getattr(command, "commutative", False):
+                operands.sort()
+        return (command.operation_name, tuple(operands), get_backend().context_key())
+
+    def _remember(self, key: tuple, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    @staticmethod
+    def _decode(stored):
+        """
+        Decode a stored value, or return None if it is not one this cache wrote.
+        """
+        try:
+            encoded = json.loads(stored)
+            return decode_value(encoded) if isinstance(encoded, list) else None
+        except (ValueError, TypeError, ArithmeticError):
+            return None
+
+    def get_or_compute(self, command: Command, num1, num2, compute=None):
+        """
+        Return the cached result of a calculation, computing and storing it on a miss.
+
+        Impure commands and a zero-sized cache always compute. Errors are not cached.
+
+        Args:
+            command (Command): The command being executed.
+            num1: The first number.
+            num2: The second number.
+            compute: Optional callable producing the result; defaults to command.execute.
+
+        Returns:
+            The result of the calculation.
+        """
+        compute = compute or (lambda: command.execute(num1, num2))
+        if self.max_size <= 0 or not getattr(command, "pure", False):
+            return compute()
+        key = self.make_key(command, num1, num2)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+        if self._connection is not None:
+            row = self._connection.execute("SELECT value FROM results WHERE key = ?", (repr(key),)).fetchone()
+            value = self._decode(row[0]) if row is not None else None
+            if value is not None:
+                self.disk_hits += 1
+                self._remember(key, value)
+                return value
+        self.misses += 1
+        value = compute()
+        self._remember(key, value)
+        if self._connection is not None:
+            self._connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?)", (repr(key), json.dumps(encode_value(value))))
+            self._connection.commit()
+        return value
+
+    def clear(self):
+        """
+        Drop every cached result, in memory and on disk, and reset the counters.
+        """
+        self._entries.clear()
+        if self._connection is not None:
+            self._connection.execute("DELETE FROM results")
+            self._connection.commit()
+        self.hits = self.disk_hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        """
+        Return the cache counters.
+
+        Returns:
+            dict: Entry count and hit, disk hit, miss and eviction counters.
+        """
+        return {
+            "entries": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        """
+        Close the persistent tier, if there is one.
+        """
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+_default_cache = None
+
+def get_cache() -> ResultCache:
+    """
+    Return the shared result cache, creating it from the environment on first use.
+
+    Returns:
+        ResultCache: The shared cache.
+    """
+    global _default_cache  # pylint: disable=global-statement
+    if _default_cache is None:
+        _default_cache = ResultCache(
+            int(os.getenv("RESULT_CACHE_SIZE", str(DEFAULT_CACHE_SIZE))), os.getenv("RESULT_CACHE_FILE") or None
+        )
+        logging.debug("Result cache created: %s", _default_cache.stats())
+    return _default_cache
+
+def reset_cache():
+    """
+    Close and forget the shared result cache.
+    """
+    global _default_cache  # pylint: disable=global-statement
+    if _default_cache is not None:
+        _default_cache.close()
+        _default_cache = None
@@ -0,0 +1,288 @@
+# app/scaled_column.py
+"""
+This module provides ScaledColumn, the compact storage of one numeric history column.
+
+A Decimal with at most 18 significant digits is stored as its int64 coefficient and
+its exponent (the scale, as in 1.50 = 150 x 10^-2), so the value, including trailing
+zeros, comes back exactly as it was added and prints the same. Floats are stored as
+their int64 bit pattern, ints and fixed-point values as scaled int64 too. Each cell
+costs 10 bytes instead of a pointer to a ~100-byte Python object. Values that do not
+fit go to an overflow side-table keyed by row position: Decimals of up to 40 digits
+(such as division results) as their int coefficient, anything else (NaN Decimals, huge
+ints, strings, None) as is.
+
+The arrays can be read without decoding: `floats` turns a column into float64 keys
+with NumPy.
+"""
+
+import math
+import struct
+from array import array
+from decimal import Context, Decimal
+from typing import TYPE_CHECKING
+from app.history_stats import to_float
+from app.numeric import FixedPoint
+
+if TYPE_CHECKING:
+    import numpy as np
+
+KIND_OVERFLOW, KIND_DECIMAL, KIND_FLOAT, KIND_INT, KIND_FIXED, KIND_WIDE = range(6)
+_INT64_MIN, _INT64_MAX = -2 ** 63, 2 ** 63 - 1
+# Coefficients below 2^53 and powers of ten up to 10^22 are exact floats, so one
+# multiplication or division of them rounds exactly like float(Decimal)
+_EXACT_FLOAT_COEFFICIENT = 2 ** 53
+_EXACT_FLOAT_EXPONENT = 22
+# Decimals with up to this many digits (a division result has 28) keep their exponent in
+# the column and only their coefficient, as an int, in the side-table
+_WIDE_DIGITS = 40
+# Wide enough that rescaling a stored coefficient never rounds, whatever the caller's context
+_EXACT = Context(prec=_WIDE_DIGITS)
+_DOUBLE = struct.Struct("<d")
+_INT64 = struct.Struct("<q")
+
+def float_keys(values) -> "np.ndarray":
+    """
+    Convert history values to float64, with NaN for missing or non-numeric values.
+
+    Args:
+        values: The values.
+
+    Returns:
+        np.ndarray: The float keys.
+    """
+    import numpy as np  # pylint: disable=import-outside-toplevel
+    keys = [to_float(value) for value in values]
+    return np.array([math.nan if key is None else key for key in keys], dtype=np.float64)
+
+def _encode_tuple(value: Decimal) -> tuple:
+    sign, digits, exponent = value.as_tuple()
+    if not isinstance(exponent, int) or not -128 <= exponent <= 127 or len(digits) > _WIDE_DIGITS:
+        return KIND_OVERFLOW, 0, 0
+    coefficient = int("".join(map(str, digits)))
+    if sign and not coefficient:
+        return KIND_OVERFLOW, 0, 0
+    coefficient = -coefficient if sign else coefficient
+    return KIND_DECIMAL if _INT64_MIN <= coefficient <= _INT64_MAX else KIND_WIDE, coefficient, exponent
+
+def encode_cell(value) -> tuple:
+    """
+    Encode a value as one ScaledColumn cell.
+
+    Args:
+        value: A Decimal, float, int, FixedPoint or any other value.
+
+    Returns:
+        tuple: (kind, coefficient, exponent, side-table entry); the entry is the int
+        coefficient for KIND_WIDE, the value itself for KIND_OVERFLOW and None otherwise.
+    """
+    value_type = type(value)
+    if value_type is Decimal:
+        # Plain notation parses straight to the coefficient; exponent notation, NaN,
+        # infinities, -0 and wide values take the slow path
+        text = str(value)
+        point = text.find(".")
+        try:
+            coefficient = int(text) if point < 0 else int(text[:point] + text[point + 1:])
+        except ValueError:
+            coefficient = None
+        if coefficient is not None and _INT64_MIN <= coefficient <= _INT64_MAX and (coefficient or text[0] != "-"):
+            return KIND_DECIMAL, coefficient, point + 1 - len(text) if point >= 0 else 0, None
+        kind, coefficient, exponent = _encode_tuple(value)
+        if kind == KIND_WIDE:
+            return kind, 0, exponent, coefficient
+        if kind == KIND_DECIMAL:
+            return kind, coefficient, exponent, None
+    elif value_type is float:
+        return KIND_FLOAT, _INT64.unpack(_DOUBLE.pack(value))[0], 0, None
+    elif value_type is int:
+        if _INT64_MIN <= value <= _INT64_MAX:
+            return KIND_INT, value, 0, None
+    elif value_type is FixedPoint:
+        if _INT64_MIN <= value.raw <= _INT64_MAX and 0 <= value.digits <= 127:
+            return KIND_FIXED, value.raw, -value.digits, None
+    return KIND_OVERFLOW, 0, 0, value
+
+class ScaledColumn:
+    """
+    An append-only column of history values stored as scaled int64 cells.
+    """
+    __slots__ = ("_kinds", "_coefficients", "_exponents", "_overflow")
+
+    def __init__(self, values=()):
+        """
+        Initialize a ScaledColumn.
+
+        Args:
+            values: Initial values.
+        """
+        self._kinds = array("b")
+        self._coefficients = array("q")
+        self._exponents = array("b")
+        self._overflow = {}
+        self.extend(values)
+
+    @classmethod
+    def from_cells(cls, kinds, coefficients, exponents, overflow: dict) -> "ScaledColumn":
+        """
+        Wrap existing cell buffers, such as memoryviews of shared memory, without copying
+        them. Columns over buffers that cannot grow are read-only.
+
+        Args:
+            kinds: One kind code per row (int8 items).
+            coefficients: One coefficient per row (int64 items).
+            exponents: One exponent per row (int8 items).
+            overflow (dict): The side-table entries, keyed by row position.
+
+        Returns:
+            ScaledColumn: The column.
+        """
+        column = cls()
+        column._kinds, column._coefficients, column._exponents, column._overflow = kinds, coefficients, exponents, overflow
+        return column
+
+    def cells(self) -> tuple:
+        """
+        Return the cell buffers and the side-table.
+
+        Returns:
+            tuple: (kinds, coefficients, exponents, overflow), as taken by from_cells.
+        """
+        return self._kinds, self._coefficients, self._exponents, self._overflow
+
+    def append(self, value):
+        """
+        Add a value at the end of the column.
+
+        Args:
+            value: A Decimal, float, int, FixedPoint or any other value.
+        """
+        kind, coefficient, exponent, overflow = encode_cell(value)
+        if kind == KIND_OVERFLOW or kind == KIND_WIDE:
+            self._overflow[len(self._kinds)] = overflow
+        self._kinds.append(kind)
+        self._coefficients.append(coefficient)
+        self._exponents.append(exponent)
+
+    def extend(self, values):
+        """
+        Add values at the end of the column.
+
+        Args:
+            values: The values, or another ScaledColumn.
+        """
+        if isinstance(values, ScaledColumn):
+            offset = len(self._kinds)
+            self._kinds.extend(values._kinds)
+            self._coefficients.extend(values._coefficients)
+            self._exponents.extend(values._exponents)
+            self._overflow.update({offset + position: value for position, value in values._overflow.items()})
+            return
+        for value in values:
+            self.append(value)
+
+    def _decode(self, position: int, kind: int):
+        if kind == KIND_DECIMAL:
+            return Decimal(self._coefficients[position]).scaleb(self._exponents[position], _EXACT)
+        if kind == KIND_FLOAT:
+            return _DOUBLE.unpack(_INT64.pack(self._coefficients[position]))[0]
+        if kind == KIND_INT:
+            return self._coefficients[position]
+        if kind == KIND_FIXED:
+            return FixedPoint(self._coefficients[position], -self._exponents[position])
+        if kind == KIND_WIDE:
+            return Decimal(self._overflow[position]).scaleb(self._exponents[position], _EXACT)
+        return self._overflow[position]
+
+    def __len__(self) -> int:
+        return len(self._kinds)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return self.take(range(*item.indices(len(self._kinds))))
+        if item < 0:
+            item += len(self._kinds)
+        return self._decode(item, self._kinds[item])
+
+    def take(self, positions) -> list:
+        """
+        Return the values at some row positions.
+
+        Args:
+            positions: The row positions.
+
+        Returns:
+            list: The values.
+        """
+        kinds, decode = self._kinds, self._decode
+        return [decode(position, kinds[position]) for position in positions]
+
+    def tolist(self) -> list:
+        """
+        Return every value.
+
+        Returns:
+            list: The values.
+        """
+        return self.take(range(len(self._kinds)))
+
+    def compress(self, keep: bytes) -> "ScaledColumn":
+        """
+        Return a column of only the rows whose selector is non-zero.
+
+        Args:
+            keep (bytes): One selector per row.
+
+        Returns:
+            ScaledColumn: The kept rows, in order.
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        mask = np.frombuffer(keep, dtype=np.uint8).astype(bool)
+        column = ScaledColumn()
+        for name, dtype in (("_kinds", np.int8), ("_coefficients", np.int64), ("_exponents", np.int8)):
+            getattr(column, name).frombytes(np.frombuffer(getattr(self, name), dtype=dtype)[mask].tobytes())
+        if self._overflow:
+            # The new position of a kept row is the number of kept rows before it
+            new_positions = np.cumsum(mask) - 1
+            column._overflow = {int(new_positions[position]): value
+                                for position, value in self._overflow.items() if mask[position]}
+        return column
+
+    def floats(self, start: int = 0, stop: int = None) -> "np.ndarray":
+        """
+        Return float64 keys of a range of rows, computed with NumPy where the stored
+        cells allow it; each key equals to_float of the value, NaN where that is None.
+
+        Args:
+            start (int): The first row.
+            stop (int): The row to stop before; defaults to the end.
+
+        Returns:
+            np.ndarray: The keys.
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        stop = len(self._kinds) if stop is None else stop
+        if stop <= start:
+            return np.empty(0, dtype=np.float64)
+        # Slicing copies, so the arrays never export a buffer that would block appends
+        kinds = np.frombuffer(self._kinds[start:stop], dtype=np.int8)
+        coefficients = np.frombuffer(self._coefficients[start:stop], dtype=np.int64)
+        exponents = np.frombuffer(self._exponents[start:stop], dtype=np.int8).astype(np.int64)
+        keys = np.full(len(kinds), np.nan)
+        is_float = kinds == KIND_FLOAT
+        keys[is_float] = coefficients[is_float].view(np.float64)
+        scaled = ((kinds == KIND_DECIMAL) | (kinds == KIND_INT) | (kinds == KIND_FIXED))
+        fast = scaled & (np.abs(coefficients) < _EXACT_FLOAT_COEFFICIENT) & (np.abs(exponents) <= _EXACT_FLOAT_EXPONENT)
+        powers = 10.0 ** np.abs(exponents[fast])
+        values = coefficients[fast].astype(np.float64)
+        keys[fast] = np.where(exponents[fast] < 0, values / powers, values * powers)
+        slow = np.flatnonzero((kinds == KIND_OVERFLOW) | (kinds == KIND_WIDE) | (scaled & ~fast))
+        if len(slow):
+            keys[slow] = float_keys(self.take((start + slow).tolist()))
+        return keys
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The bytes held by the cell arrays (not counting overflow values).
+        """
+        return sum(len(cells) * cells.itemsize for cells in (self._kinds, self._coefficients, self._exponents))
@@ -0,0 +1,445 @@
+# app/server.py
+"""
+This module provides a local asyncio calculation server, so other programs can run
+calculations without paying interpreter and plugin startup on every request.
+
+A connection speaks either newline-delimited JSON (one request object per line, one
+response object per line, in order) or a small HTTP/1.1 API; the protocol is detected
+from the first line. Requests look like {"id": 1, "operation": "add", "num1": "2",
+"num2": "3"}; numbers are sent and returned as strings so no precision is lost.
+
+HTTP endpoints:
+- POST /calculate: a request object, or a list of them.
+- GET /history?count=N: the latest N history records.
+- GET /health: a liveness check.
+
+Concurrent requests are micro-batched when the numeric backend packs operands into
+numeric arrays (float mode): every request submitted in the same event loop iteration
+(or within SERVER_BATCH_WINDOW_MS, when set) is evaluated in one flush of up to
+SERVER_BATCH_SIZE requests, and groups of at least VECTORIZE_MIN_ROWS requests for the
+same operation use one vectorized `execute_batch` call. Decimal and fixed-point
+operands are not batched, since NumPy object arrays are slower than executing the
+commands one by one: each is executed as soon as it arrives, and calculations larger
+than SERVER_INLINE_DIGITS digits (default 1000) run on the shared thread pool, so huge
+operands do not hold up the event loop and every other connection. A connection has at most SERVER_MAX_INFLIGHT pipelined requests (default
+256) evaluated or waiting to be written at a time; the server stops reading its lines
+until earlier responses are written. History is either the shared Calculations
+history, a separate history per connection, or not kept at all.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+from decimal import InvalidOperation
+from urllib.parse import parse_qs, urlsplit
+from app.calculation import Calculation
+from app.calculations import Calculations
+from app.execution_planner import calculation_size
+from app.history_session import HistorySession
+from app.numeric import NumericBackend, get_backend
+from app.worker_pool import get_thread_pool
+
+DEFAULT_PORT = 8765
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_BATCH_WINDOW_MS = 0.0
+DEFAULT_MAX_INFLIGHT = 256
+DEFAULT_INLINE_DIGITS = 1000
+VECTORIZE_MIN_ROWS = 64
+HISTORY_MODES = ("shared", "connection", "none")
+HTTP_METHODS = ("GET ", "POST ", "PUT ", "DELETE ", "HEAD ")
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+
+class MicroBatcher:
+    """
+    Collects concurrent calculations for a short window and evaluates them in vectorized
+    batches, one `execute_batch` call per operation.
+    """
+    def __init__(self, max_batch: int = DEFAULT_BATCH_SIZE, window: float = DEFAULT_BATCH_WINDOW_MS / 1000,
+                 backend: NumericBackend = None, pool=None, inline_digits: int = DEFAULT_INLINE_DIGITS):
+        """
+        Initialize a MicroBatcher.
+
+        Args:
+            max_batch (int): Pending calculations that trigger an immediate flush.
+            window (float): Seconds to wait for more calculations before flushing; 0 flushes
+                on the next event loop iteration.
+            backend (NumericBackend): The backend whose columns the batches are built with.
+            pool: The pool that runs larger calculations which are not batched (defaults to
+                the shared thread pool).
+            inline_digits (int): The largest calculation, in digits, that is not batched and
+                still runs on the event loop, where it is cheaper than a thread hand-off.
+        """
+        self.max_batch = max_batch
+        self.window = window
+        self.backend = backend
+        self.pool = pool
+        self.inline_digits = inline_digits
+        self.batches = 0
+        self.batched_calculations = 0
+        self._pending = []
+        self._timer = None
+        self._vectorized_backends = {}
+
+    def _vectorizes(self, backend: NumericBackend) -> bool:
+        key = backend.context_key()
+        if key not in self._vectorized_backends:
+            self._vectorized_backends[key] = backend.column([]).dtype != object
+        return self._vectorized_backends[key]
+
+    async def submit(self, command, num1, num2):
+        """
+        Queue a calculation and wait for its result.
+
+        Args:
+            command (Command): The command to execute.
+            num1: The first parsed operand.
+            num2: The second parsed operand.
+
+        Returns:
+            The result of the calculation.
+
+        Raises:
+            Exception: Whatever command.execute raises for these operands.
+        """
+        backend = self.backend or get_backend()
+        if not self._vectorizes(backend):
+            if calculation_size(command.operation_name, num1, num2) <= self.inline_digits:
+                return command.execute(num1, num2)
+            # Off the event loop: the pool's threads see this thread's Decimal context
+            pool = self.pool or get_thread_pool()
+            return await asyncio.wrap_future(pool.submit(command.execute, num1, num2))
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((command, num1, num2, future))
+        if len(self._pending) >= self.max_batch:
+            self.flush()
+        elif self._timer is None:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(self.window, self.flush) if self.window > 0 else loop.call_soon(self.flush)
+        return await future
+
+    def flush(self):
+        """
+        Evaluate every pending calculation now.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        groups = {}
+        for item in pending:
+            groups.setdefault(id(item[0]), []).append(item)
+        for group in groups.values():
+            self._evaluate(group)
+        self.batches += 1
+        self.batched_calculations += len(pending)
+
+    def _evaluate(self, group: list):
+        command = group[0][0]
+        columns = None
+        if len(group) >= VECTORIZE_MIN_ROWS:
+            backend = self.backend or get_backend()
+            columns = backend.column([item[1] for item in group]), backend.column([item[2] for item in group])
+        if columns is None:
+            for item in group:
+                self._execute_one(*item)
+            return
+        try:
+            results = command.execute_batch(*columns)
+        except Exception:  # pylint: disable=broad-exception-caught
+            results = [None] * len(group)
+        for (_, num1, num2, future), result in zip(group, results):
+            if hasattr(result, "item"):
+                result = result.item()
+            if result is None or (isinstance(result, float) and math.isnan(result)):
+                # Masked rows are re-run one by one to raise the command's own error
+                self._execute_one(command, num1, num2, future)
+            elif not future.done():
+                future.set_result(result)
+
+    @staticmethod
+    def _execute_one(command, num1, num2, future):
+        if future.done():
+            return
+        try:
+            future.set_result(command.execute(num1, num2))
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            future.set_exception(e)
+
+def parse_count(value) -> int:
+    """
+    Parse a non-negative count sent by a client.
+
+    Args:
+        value: The value from the request.
+
+    Returns:
+        int: The count.
+
+    Raises:
+        ValueError: If the value is not a non-negative integer.
+    """
+    try:
+        count = int(value)
+    except (TypeError, ValueError):
+        count = -1
+    if count < 0:
+        raise ValueError(f"Invalid count: {value}")
+    return count
+
+class CalculationServer:
+    """
+    Serves calculations to local clients over TCP or a Unix socket.
+    """
+    def __init__(self, commands: dict, history: str = "shared", batcher: MicroBatcher = None,
+                 max_inflight: int = DEFAULT_MAX_INFLIGHT):
+        """
+        Initialize a CalculationServer.
+
+        Args:
+            commands (dict): The loaded plugin commands, keyed by operation name.
+            history (str): "shared", "connection" or "none".
+            batcher (MicroBatcher): The batcher to evaluate calculations with.
+            max_inflight (int): Pipelined requests per connection evaluated or waiting to be
+                written at a time.
+        """
+        if history not in HISTORY_MODES:
+            raise ValueError(f"Unknown history mode: {history} (expected one of {', '.join(HISTORY_MODES)})")
+        self.commands = commands
+        self.history = history
+        self.batcher = batcher or MicroBatcher()
+        self.max_inflight = max(1, max_inflight)
+        self.requests = 0
+
+    async def calculate(self, request: dict, session: HistorySession = None) -> dict:
+        """
+        Evaluate one request object.
+
+        Args:
+            request (dict): The request, with operation, num1, num2 and an optional id.
+            session (HistorySession): The history to record the calculation in, if any.
+
+        Returns:
+            dict: The response, with either a result or an error.
+        """
+        self.requests += 1
+        response = {"id": request.get("id")} if isinstance(request, dict) and "id" in request else {}
+        if not isinstance(request, dict):
+            response["error"] = "Request must be a JSON object"
+            return response
+        operation = request.get("operation")
+        command = self.commands.get(operation) if isinstance(operation, str) else None
+        if command is None:
+            response["error"] = f"Unknown operation: {operation}"
+            return response
+        backend = get_backend()
+        try:
+            num1, num2 = backend.parse(str(request.get("num1"))), backend.parse(str(request.get("num2", "0")))
+        except InvalidOperation:
+            response["error"] = f"Invalid number input: {request.get('num1')} or {request.get('num2')}"
+            return response
+        try:
+            result = await self.batcher.submit(command, num1, num2)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            response["error"] = str(e) or type(e).__name__
+            return response
+        self._record(command, num1, num2, result, session)
+        response["result"] = str(result)
+        return response
+
+    def _record(self, command, num1, num2, result, session: HistorySession):
+        if session is not None:
+            calculation = Calculation(num1, num2, command)
+            calculation.result = result
+            session.add_calculation(calculation)
+
+    def _history_records(self, session: HistorySession, count: int) -> list:
+        if session is None:
+            return []
+        return [{name: None if value is None else str(value) for name, value in record.items()}
+                for record in session.get_latest_records(count)]
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Serve one client connection, detecting its protocol from the first line.
+        """
+        session = Calculations.session if self.history == "shared" else None
+        if self.history == "connection":
+            session = HistorySession()
+        try:
+            first_line = await reader.readline()
+            if first_line.decode("latin-1").startswith(HTTP_METHODS):
+                await self._serve_http(first_line, reader, writer, session)
+            elif first_line:
+                await self._serve_ndjson(first_line, reader, writer, session)
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            logging.debug("Connection closed: %s", e)
+        except asyncio.CancelledError:
+            logging.debug("Connection cancelled by server shutdown.")
+        finally:
+            writer.close()
+
+    async def _respond_ndjson(self, request, session: HistorySession, earlier: tuple = ()) -> dict:
+        if isinstance(request, dict) and request.get("action") == "history":
+            try:
+                count = parse_count(request.get("count", 10))
+            except ValueError as e:
+                return {"id": request.get("id"), "error": str(e)}
+            # Calculations run off the event loop now, so wait for the ones sent before
+            if earlier:
+                await asyncio.wait(earlier)
+            return {"id": request.get("id"), "history": self._history_records(session, count)}
+        return await self.calculate(request, session)
+
+    async def _serve_ndjson(self, first_line: bytes, reader, writer, session: HistorySession):
+        # Lines are evaluated concurrently (so one connection can fill a batch) and
+        # answered in the order they arrived; a slot is freed once a response is written
+        responses = asyncio.Queue()
+        inflight = asyncio.Semaphore(self.max_inflight)
+
+        async def write_responses():
+            closed = False
+            while (task := await responses.get()) is not None:
+                try:
+                    response = await task
+                except Exception as e:  # pylint: disable=broad-exception-caught
+                    logging.exception("Failed to answer a request")
+                    response = {"error": f"Internal error: {type(e).__name__}"}
+                if not closed:
+                    try:
+                        writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                        await writer.drain()
+                    except ConnectionError as e:
+                        # Keep freeing slots so the reader is not left waiting
+                        logging.debug("Connection closed: %s", e)
+                        closed = True
+                inflight.release()
+
+        writer_task = asyncio.create_task(write_responses())
+        outstanding = set()
+        line = first_line
+        while line:
+            if line.strip():
+                await inflight.acquire()
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError as e:
+                    task = asyncio.get_running_loop().create_future()
+                    task.set_result({"error": f"Invalid JSON: {e}"})
+                else:
+                    earlier = tuple(outstanding) if isinstance(request, dict) and "action" in request else ()
+                    task = asyncio.create_task(self._respond_ndjson(request, session, earlier))
+                    outstanding.add(task)
+                    task.add_done_callback(outstanding.discard)
+                responses.put_nowait(task)
+            line = await reader.readline()
+        responses.put_nowait(None)
+        await writer_task
+
+    async def _serve_http(self, request_line: bytes, reader, writer, session: HistorySession):
+        while request_line:
+            method, target, version = (request_line.decode("latin-1").split() + ["", "", ""])[:3]
+            headers = {}
+            while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            try:
+                length = parse_count(headers.get("content-length", "0") or 0)
+            except ValueError:
+                # Without a usable length the next request cannot be found, so close
+                await self._write_http(writer, version, 400, {"error": "Invalid Content-Length"}, False)
+                return
+            body = await reader.readexactly(length)
+            status, payload = await self._route_http(method, target, body, session)
+            keep_alive = (version == "HTTP/1.1" and headers.get("connection", "").lower() != "close") \
+                or headers.get("connection", "").lower() == "keep-alive"
+            await self._write_http(writer, version, status, payload, keep_alive)
+            if not keep_alive:
+                return
+            request_line = await reader.readline()
+
+    @staticmethod
+    async def _write_http(writer, version: str, status: int, payload, keep_alive: bool):
+        content = json.dumps(payload).encode("utf-8")
+        writer.write(
+            f"{version or 'HTTP/1.1'} {status} {HTTP_REASONS[status]}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(content)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + content
+        )
+        await writer.drain()
+
+    async def _route_http(self, method: str, target: str, body: bytes, session: HistorySession) -> tuple:
+        url = urlsplit(target)
+        if url.path == "/health":
+            return 200, {"status": "ok", "requests": self.requests}
+        if url.path == "/history":
+            if method != "GET":
+                return 405, {"error": "Use GET /history"}
+            try:
+                count = parse_count(parse_qs(url.query).get("count", ["10"])[0])
+            except ValueError as e:
+                return 400, {"error": str(e)}
+            return 200, {"history": self._history_records(session, count)}
+        if url.path == "/calculate":
+            if method != "POST":
+                return 405, {"error": "Use POST /calculate"}
+            try:
+                request = json.loads(body or b"null")
+            except json.JSONDecodeError as e:
+                return 400, {"error": f"Invalid JSON: {e}"}
+            if isinstance(request, list):
+                return 200, list(await asyncio.gather(*(self.calculate(item, session) for item in request)))
+            return 200, await self.calculate(request, session)
+        return 404, {"error": f"Not found: {url.path}"}
+
+    async def start(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT, unix_path: str = None):
+        """
+        Start listening.
+
+        Args:
+            host (str): The TCP host to bind.
+            port (int): The TCP port to bind (0 picks a free port).
+            unix_path (str): A Unix socket path to listen on instead of TCP.
+
+        Returns:
+            asyncio.Server: The listening server.
+        """
+        if unix_path:
+            return await asyncio.start_unix_server(self.handle_connection, path=unix_path)
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+def run_server(commands: dict, args: list):
+    """
+    Run the server from `serve` command-line arguments until interrupted.
+
+    Args:
+        commands (dict): The loaded plugin commands.
+        args (list): The arguments after `serve`.
+    """
+    parser = argparse.ArgumentParser(prog="python main.py serve", description="Run the local calculation server.")
+    parser.add_argument("--host", default=os.getenv("SERVER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SERVER_PORT", str(DEFAULT_PORT))))
+    parser.add_argument("--unix", default=None, help="Listen on a Unix socket instead of TCP")
+    parser.add_argument("--history", choices=HISTORY_MODES, default=os.getenv("SERVER_HISTORY", "shared"))
+    options = parser.parse_args(args)
+    batcher = MicroBatcher(int(os.getenv("SERVER_BATCH_SIZE", str(DEFAULT_BATCH_SIZE))),
+                           float(os.getenv("SERVER_BATCH_WINDOW_MS", str(DEFAULT_BATCH_WINDOW_MS))) / 1000,
+                           inline_digits=int(os.getenv("SERVER_INLINE_DIGITS", str(DEFAULT_INLINE_DIGITS))))
+    server = CalculationServer(commands, options.history, batcher,
+                               int(os.getenv("SERVER_MAX_INFLIGHT", str(DEFAULT_MAX_INFLIGHT))))
+
+    async def serve():
+        listener = await server.start(options.host, options.port, options.unix)
+        address = options.unix or ", ".join(str(sock.getsockname()) for sock in listener.sockets)
+        print(f"Serving calculations on {address} (history: {options.history}). Press Ctrl+C to stop.")
+        async with listener:
+            await listener.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print("Server stopped.")
@@ -0,0 +1,187 @@
+# app/shm_transport.py
+"""
+This module evaluates columns of calculations in the worker pool with the operands and
+results in shared memory, instead of pickling every value through the pool's pipes.
+
+Each column is a multiprocessing.shared_memory block laid out as ScaledColumn cells:
+int64 coefficients, then int8 kinds, then int8 exponents, 10 bytes per row. Decimals
+that fit int64 are fixed-point encoded and floats keep their float64 bits; values that
+do not fit (wide Decimals, None) travel in a small side channel next to the block name.
+Workers attach to the blocks by name, read their slice of the operand columns in place
+and write results into the result block, so a task only ships its descriptor: the
+operation, the block names, the row range and the side-channel entries of its rows.
+"""
+
+from multiprocessing import shared_memory
+from app.scaled_column import KIND_OVERFLOW, KIND_WIDE, ScaledColumn, encode_cell
+from app.worker_pool import WorkerPool, worker_commands
+
+CELL_BYTES = 10
+
+class SharedColumn:
+    """
+    A fixed-length column of ScaledColumn cells in a shared memory block.
+    """
+    def __init__(self, length: int, name: str = None):
+        """
+        Create a block for length rows, or attach to an existing one by name.
+
+        Args:
+            length (int): The number of rows.
+            name (str): The name of the block to attach to; a new block is created if omitted.
+        """
+        self.length = length
+        self.memory = shared_memory.SharedMemory(name=name, create=name is None, size=max(1, CELL_BYTES * length))
+        buffer = self.memory.buf
+        self._coefficients = buffer[:8 * length].cast("q")
+        self._kinds = buffer[8 * length:9 * length].cast("b")
+        self._exponents = buffer[9 * length:10 * length].cast("b")
+
+    @property
+    def name(self) -> str:
+        """
+        The name workers attach to the block with.
+        """
+        return self.memory.name
+
+    @classmethod
+    def from_values(cls, values: list) -> tuple:
+        """
+        Encode values into a new block.
+
+        Args:
+            values (list): The values.
+
+        Returns:
+            tuple: The SharedColumn and its side channel (side-table entries by row).
+        """
+        column = ScaledColumn(values)
+        kinds, coefficients, exponents, overflow = column.cells()
+        shared = cls(len(column))
+        try:
+            shared.memory.buf[:CELL_BYTES * len(column)] = coefficients.tobytes() + kinds.tobytes() + exponents.tobytes()
+        except BaseException:
+            shared.close()
+            shared.memory.unlink()
+            raise
+        return shared, overflow
+
+    def write(self, position: int, value):
+        """
+        Encode a value into a row.
+
+        Args:
+            position (int): The row.
+            value: The value.
+
+        Returns:
+            tuple: (True, side-channel entry) if the value needs the side channel, else (False, None).
+        """
+        kind, coefficient, exponent, overflow = encode_cell(value)
+        self._kinds[position] = kind
+        self._coefficients[position] = coefficient
+        self._exponents[position] = exponent
+        return kind in (KIND_OVERFLOW, KIND_WIDE), overflow
+
+    def column(self, overflow: dict) -> ScaledColumn:
+        """
+        Return a read-only ScaledColumn over the block, without copying it.
+
+        Args:
+            overflow (dict): The side channel of the rows that will be read.
+
+        Returns:
+            ScaledColumn: The column.
+        """
+        return ScaledColumn.from_cells(self._kinds, self._coefficients, self._exponents, overflow)
+
+    def close(self):
+        """
+        Detach from the block. Columns returned by `column` cannot be read afterwards.
+        """
+        for view in (self._coefficients, self._kinds, self._exponents):
+            view.release()
+        self.memory.close()
+
+def evaluate_shared(operation: str, length: int, names: tuple, side_channels: tuple, start: int, stop: int) -> tuple:
+    """
+    Evaluate rows start..stop of two shared operand columns into a shared result column.
+    Runs in a worker process, with its preloaded plugins.
+
+    Args:
+        operation (str): The operation name.
+        length (int): The number of rows of the columns.
+        names (tuple): The block names of the first operands, second operands and results.
+        side_channels (tuple): The side-channel entries of both operand columns in the range.
+        start (int): The first row.
+        stop (int): The row to stop before.
+
+    Returns:
+        tuple: The side-channel entries of the results and the error messages, by row.
+    """
+    command = worker_commands()[operation]
+    first, second, results = (SharedColumn(length, name) for name in names)
+    try:
+        rows = range(start, stop)
+        operands = zip(rows, first.column(side_channels[0]).take(rows), second.column(side_channels[1]).take(rows))
+        side_channel, errors = {}, {}
+        for position, num1, num2 in operands:
+            try:
+                result = command.execute(num1, num2)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                result, errors[position] = None, f"{type(e).__name__}: {e}"
+            needs_side_channel, entry = results.write(position, result)
+            if needs_side_channel:
+                side_channel[position] = entry
+        return side_channel, errors
+    finally:
+        for column in (first, second, results):
+            column.close()
+
+def calculate_columns(pool: WorkerPool, operation: str, first: list, second: list, tasks: int = None) -> tuple:
+    """
+    Evaluate an operation over two operand columns in the worker pool, exchanging the
+    values through shared memory.
+
+    Args:
+        pool (WorkerPool): The pool to evaluate in.
+        operation (str): The operation name.
+        first (list): The first operands.
+        second (list): The second operands, the same length as first.
+        tasks (int): The number of row ranges to split the columns into; defaults to one
+            per worker.
+
+    Returns:
+        tuple: The results (None for rows that failed) and the error messages by row.
+    """
+    if len(first) != len(second):
+        raise ValueError("Operand columns must have the same length.")
+    length = len(first)
+    if not length:
+        return [], {}
+    columns = []
+    try:
+        # Each block is registered as soon as it exists, so a failure unlinks the ones before it
+        first_column, first_side = SharedColumn.from_values(first)
+        columns.append(first_column)
+        second_column, second_side = SharedColumn.from_values(second)
+        columns.append(second_column)
+        columns.append(SharedColumn(length))
+        tasks = max(1, min(tasks or pool.max_workers, length))
+        bounds = [length * task // tasks for task in range(tasks + 1)]
+        names = tuple(column.name for column in columns)
+        futures = []
+        for start, stop in zip(bounds, bounds[1:]):
+            side_channels = tuple({position: entry for position, entry in side.items() if start <= position < stop}
+                                  for side in (first_side, second_side))
+            futures.append(pool.submit(evaluate_shared, operation, length, names, side_channels, start, stop))
+        side_channel, errors = {}, {}
+        for future in futures:
+            task_side_channel, task_errors = future.result()
+            side_channel.update(task_side_channel)
+            errors.update(task_errors)
+        return columns[2].column(side_channel).tolist(), errors
+    finally:
+        for column in columns:
+            column.close()
+            column.memory.unlink()
@@ -0,0 +1,364 @@
+# app/worker_pool.py
+"""
+This module provides a long-lived, lazily started process pool for calculations.
+
+Worker processes preload the command plugins once when they start, so submitting a
+calculation only ships the operation name and operands instead of starting a new
+process per request. The default pool is configured with the WORKER_POOL_SIZE and
+WORKER_START_METHOD (fork, forkserver or spawn) environment variables. ThreadPool offers
+the same interface on threads, for work that does not need its own process.
+
+Calculations can be given a deadline. A worker process that misses it is killed and the
+pool is recycled (the next submission starts fresh workers), so a runaway calculation
+never holds up its caller for longer than the deadline. The default deadline, in
+seconds, comes from the CALCULATION_TIMEOUT environment variable (unset or 0: none).
+"""
+
+import atexit
+import logging
+import os
+from decimal import Decimal
+from app.plugin_loader import load_plugins
+
+_worker_commands = None
+_calculation_timeout = None
+
+class CalculationTimeout(TimeoutError):
+    """
+    Raised when a calculation misses its deadline.
+    """
+    def __init__(self, seconds: float):
+        super().__init__(f"Calculation exceeded its deadline of {seconds:g}s")
+        self.seconds = seconds
+
+def get_calculation_timeout() -> float:
+    """
+    Return the deadline of a calculation in seconds, initialized from CALCULATION_TIMEOUT.
+
+    Returns:
+        float: The deadline, or None for no deadline.
+    """
+    global _calculation_timeout  # pylint: disable=global-statement
+    if _calculation_timeout is None:
+        _calculation_timeout = float(os.getenv("CALCULATION_TIMEOUT") or 0)
+    return _calculation_timeout or None
+
+def set_calculation_timeout(seconds: float):
+    """
+    Set the deadline of a calculation.
+
+    Args:
+        seconds (float): The deadline in seconds; None or 0 removes it.
+
+    Raises:
+        ValueError: If seconds is negative or not a number.
+    """
+    global _calculation_timeout  # pylint: disable=global-statement
+    try:
+        value = float(seconds or 0)
+    except ValueError:
+        value = -1.0
+    if not 0 <= value < float("inf"):
+        raise ValueError(f"Invalid timeout: {seconds}. Use a number of seconds, or 0 for none.")
+    _calculation_timeout = value
+
+def _init_worker():
+    """
+    Preload the command plugins in a freshly started worker process.
+    """
+    global _worker_commands  # pylint: disable=global-statement
+    _worker_commands = load_plugins().load_all()
+
+def worker_commands() -> dict:
+    """
+    Return the plugin commands loaded in the current process, loading them if needed.
+
+    Returns:
+        dict: Command instances keyed by operation name.
+    """
+    if _worker_commands is None:
+        _init_worker()
+    return _worker_commands
+
+def execute_in_worker(operation_name: str, num1: Decimal, num2: Decimal) -> Decimal:
+    """
+    Execute a single calculation with the worker's preloaded commands.
+
+    Args:
+        operation_name (str): The name of the operation to run.
+        num1 (Decimal): The first number.
+        num2 (Decimal): The second number.
+
+    Returns:
+        Decimal: The result of the operation.
+    """
+    return worker_commands()[operation_name].execute(num1, num2)
+
+class WorkerPool:
+    """
+    A process pool that is started on first use and reused for every submission.
+    """
+    def __init__(self, max_workers: int = None, start_method: str = None):
+        """
+        Initialize a WorkerPool without starting any processes.
+
+        Args:
+            max_workers (int): The number of worker processes (defaults to the CPU count).
+            start_method (str): The multiprocessing start method: fork, forkserver or spawn.
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.start_method = start_method
+        self._executor = None
+
+    @property
+    def started(self) -> bool:
+        """
+        Whether the worker processes have been started.
+        """
+        return self._executor is not None
+
+    def _get_executor(self):
+        if self._executor is None:
+            # Imported here so that code paths that never use the pool do not pay for it
+            import multiprocessing  # pylint: disable=import-outside-toplevel
+            from concurrent.futures import ProcessPoolExecutor  # pylint: disable=import-outside-toplevel
+            context = multiprocessing.get_context(self.start_method)
+            if os.name == "posix":
+                # Workers inherit the running resource tracker; one started lazily after the
+                # fork would be their own, and would flag shared memory they attached to as leaked
+                from multiprocessing import resource_tracker  # pylint: disable=import-outside-toplevel
+                resource_tracker.ensure_running()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=context, initializer=_init_worker
+            )
+            logging.info("Started worker pool with %d workers (%s).", self.max_workers, context.get_start_method())
+        return self._executor
+
+    def submit(self, function, *args):
+        """
+        Run a picklable function in a worker process.
+
+        Args:
+            function: A module-level function to call in the worker.
+            *args: The arguments to pass to the function.
+
+        Returns:
+            concurrent.futures.Future: The pending result.
+        """
+        return self._get_executor().submit(function, *args)
+
+    def wait(self, future, timeout: float = None):
+        """
+        Wait for a submitted task. If it misses the deadline, the pool is recycled.
+
+        Args:
+            future (concurrent.futures.Future): The task, from submit.
+            timeout (float): Seconds to wait; None waits forever.
+
+        Returns:
+            The task's result.
+
+        Raises:
+            CalculationTimeout: If the task did not finish in time.
+        """
+        from concurrent.futures import TimeoutError as FutureTimeout  # pylint: disable=import-outside-toplevel
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            self.recycle()
+            raise CalculationTimeout(timeout) from None
+
+    def recycle(self):
+        """
+        Kill the worker processes, failing the tasks they were running, and let the next
+        submission start fresh ones.
+        """
+        executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        # ProcessPoolExecutor has no way to stop a running task other than killing its process
+        processes = list((executor._processes or {}).values())  # pylint: disable=protected-access
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join(1)
+        executor.shutdown(wait=False, cancel_futures=True)
+        logging.warning("Worker pool recycled: %d workers killed.", len(processes))
+
+    def calculate(self, operation_name: str, num1: Decimal, num2: Decimal, timeout: float = None) -> Decimal:
+        """
+        Run a calculation in a worker process and wait for the result.
+
+        Args:
+            operation_name (str): The name of the operation to run.
+            num1 (Decimal): The first number.
+            num2 (Decimal): The second number.
+            timeout (float): The deadline in seconds; None waits forever.
+
+        Returns:
+            Decimal: The result of the operation.
+
+        Raises:
+            CalculationTimeout: If the calculation missed the deadline.
+        """
+        return self.wait(self.submit(execute_in_worker, operation_name, num1, num2), timeout)
+
+    def calculate_columns(self, operation_name: str, first: list, second: list) -> tuple:
+        """
+        Run an operation over two columns of operands in the worker processes. Operands
+        and results are exchanged through shared memory rather than pickled one by one.
+
+        Args:
+            operation_name (str): The name of the operation to run.
+            first (list): The first numbers.
+            second (list): The second numbers, the same length as first.
+
+        Returns:
+            tuple: The results (None for rows that failed) and the error messages by row.
+        """
+        from app.shm_transport import calculate_columns  # pylint: disable=import-outside-toplevel
+        return calculate_columns(self, operation_name, first, second)
+
+    def shutdown(self):
+        """
+        Stop the worker processes, if they were started.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+            logging.info("Worker pool shut down.")
+
+class ThreadPool:
+    """
+    A thread pool with the WorkerPool interface, started on first use. Tasks run in a
+    copy of the submitting thread's context, so they see its Decimal precision.
+    """
+    def __init__(self, max_workers: int = None):
+        """
+        Initialize a ThreadPool without starting any threads.
+
+        Args:
+            max_workers (int): The number of threads (defaults to the CPU count).
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor = None
+
+    @property
+    def started(self) -> bool:
+        """
+        Whether the threads have been started.
+        """
+        return self._executor is not None
+
+    def submit(self, function, *args):
+        """
+        Run a function in a thread of the pool.
+
+        Args:
+            function: The function to call.
+            *args: The arguments to pass to the function.
+
+        Returns:
+            concurrent.futures.Future: The pending result.
+        """
+        # Imported here so that code paths that never use the pool do not pay for it
+        import contextvars  # pylint: disable=import-outside-toplevel
+        if self._executor is None:
+            from concurrent.futures import ThreadPoolExecutor  # pylint: disable=import-outside-toplevel
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="calculation")
+        return self._executor.submit(contextvars.copy_context().run, function, *args)
+
+    def calculate(self, operation_name: str, num1: Decimal, num2: Decimal) -> Decimal:
+        """
+        Run a calculation in a thread of the pool and wait for the result.
+
+        Args:
+            operation_name (str): The name of the operation to run.
+            num1 (Decimal): The first number.
+            num2 (Decimal): The second number.
+
+        Returns:
+            Decimal: The result of the operation.
+        """
+        return self.submit(execute_in_worker, operation_name, num1, num2).result()
+
+    def wait(self, future, timeout: float = None):
+        """
+        Wait for a submitted task. If it misses the deadline, the pool is recycled.
+
+        Args:
+            future (concurrent.futures.Future): The task, from submit.
+            timeout (float): Seconds to wait; None waits forever.
+
+        Returns:
+            The task's result.
+
+        Raises:
+            CalculationTimeout: If the task did not finish in time.
+        """
+        from concurrent.futures import TimeoutError as FutureTimeout  # pylint: disable=import-outside-toplevel
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            self.recycle()
+            raise CalculationTimeout(timeout) from None
+
+    def recycle(self):
+        """
+        Abandon the threads and let the next submission start fresh ones. Threads cannot be
+        killed: a running task finishes in the background and its result is dropped.
+        """
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        """
+        Stop the threads, if they were started.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+_default_pool = None
+_thread_pool = None
+
+def get_pool() -> WorkerPool:
+    """
+    Return the shared worker pool, creating it from the environment on first use.
+
+    Returns:
+        WorkerPool: The shared pool.
+    """
+    global _default_pool  # pylint: disable=global-statement
+    if _default_pool is None:
+        size = os.getenv("WORKER_POOL_SIZE")
+        _default_pool = WorkerPool(int(size) if size else None, os.getenv("WORKER_START_METHOD") or None)
+    return _default_pool
+
+def get_thread_pool() -> ThreadPool:
+    """
+    Return the shared thread pool, creating it on first use with WORKER_POOL_SIZE threads.
+
+    Returns:
+        ThreadPool: The shared thread pool.
+    """
+    global _thread_pool  # pylint: disable=global-statement
+    if _thread_pool is None:
+        size = os.getenv("WORKER_POOL_SIZE")
+        _thread_pool = ThreadPool(int(size) if size else None)
+    return _thread_pool
+
+def shutdown_pool():
+    """
+    Shut down the shared worker pool and thread pool, if they were created.
+    """
+    global _default_pool, _thread_pool  # pylint: disable=global-statement
+    if _default_pool is not None:
+        _default_pool.shutdown()
+        _default_pool = None
+    if _thread_pool is not None:
+        _thread_pool.shutdown()
+        _thread_pool = None
+
+atexit.register(shutdown_pool)
@@ -0,0 +1,71 @@
+# benchmarks/bench_batch_shards.py
+"""
+Benchmark for sharded parallel batch evaluation.
+
+Generates an input file of --rows calculations, evaluates it once in a single process
+with run_batch as the reference, then with run_sharded_batch on pools of 1, 2, 4, ...
+--max-workers processes. Reports rows/sec and the speedup over one worker, and checks
+every sharded output is byte-identical to the reference. Speedup is bounded by the
+number of cores (printed first).
+
+Usage:
+    python -m benchmarks.bench_batch_shards [--rows 200000] [--max-workers 8] [--digits 50]
+"""
+
+import argparse
+import filecmp
+import os
+import random
+import tempfile
+import time
+from app.batch import run_batch, run_sharded_batch
+from app.plugin_loader import load_plugins
+from app.worker_pool import WorkerPool
+
+OPERATIONS = ["add", "subtract", "multiply", "divide", "square"]
+
+def write_input(path: str, rows: int, digits: int, seed: int = 0):
+    """
+    Write rows random calculations with operands of about digits digits.
+    """
+    generator = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as outfile:
+        outfile.write("operation,num1,num2\n")
+        for _ in range(rows):
+            num1 = generator.randrange(10 ** (digits - 1), 10 ** digits)
+            num2 = generator.randrange(1, 10 ** digits)
+            outfile.write(f"{generator.choice(OPERATIONS)},{num1}.{num2 % 1000},{num2}\n")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000, help="Rows in the input file")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1, help="Largest worker count")
+    parser.add_argument("--digits", type=int, default=50, help="Digits per operand")
+    args = parser.parse_args()
+
+    commands = load_plugins().load_all()
+    with tempfile.TemporaryDirectory() as directory:
+        input_path = os.path.join(directory, "input.csv")
+        reference_path = os.path.join(directory, "reference.csv")
+        write_input(input_path, args.rows, args.digits)
+        start = time.perf_counter()
+        run_batch(input_path, reference_path, commands)
+        single = time.perf_counter() - start
+        print(f"cores: {os.cpu_count()}; single process: {args.rows / single:.0f} rows/sec")
+        print(f"{'workers':>8} {'shards':>8} {'rows/sec':>10} {'speedup':>8} {'identical':>10}")
+        baseline = None
+        workers = 1
+        while workers <= args.max_workers:
+            pool = WorkerPool(workers)
+            pool.calculate("add", 1, 1)  # Start the processes outside the measurement
+            output_path = os.path.join(directory, f"sharded{workers}.csv")
+            summary = run_sharded_batch(input_path, output_path, commands, pool)
+            pool.shutdown()
+            baseline = baseline or summary.throughput
+            identical = filecmp.cmp(reference_path, output_path, shallow=False)
+            print(f"{workers:>8} {summary.chunks:>8} {summary.throughput:>10.0f} "
+                  f"{summary.throughput / baseline:>7.2f}x {str(identical):>10}")
+            workers *= 2
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# benchmarks/bench_execution_planner.py
+"""
+Benchmark for the execution planner.
+
+Runs a few workloads (single calculations and batches, on small and large operands)
+inline, on the thread pool and on the worker pool (best of three runs), and prints the
+planner's estimate next to the measured time of every strategy, with the strategy it
+picked and how much slower that was than the fastest one. The calibration time is
+printed first.
+
+Usage:
+    python -m benchmarks.bench_execution_planner [--workers 2]
+"""
+
+import argparse
+import time
+from decimal import Decimal
+from app.execution_planner import ExecutionPlanner, calculation_size
+from app.plugin_loader import load_plugins
+from app.worker_pool import ThreadPool, WorkerPool, worker_commands
+
+# (label, operation, operand digits, rows)
+WORKLOADS = [
+    ("single small", "multiply", 10, 1),
+    ("single large", "multiply", 50000, 1),
+    ("batch small", "add", 10, 20000),
+    ("batch large", "multiply", 3000, 2000),
+]
+TASKS = 8
+
+def evaluate_rows(operation: str, rows: list) -> list:
+    """
+    Evaluate (num1, num2) rows with the current process's plugins.
+    """
+    command = worker_commands()[operation]
+    return [command.execute(num1, num2) for num1, num2 in rows]
+
+def run(pool, operation: str, rows: list, repeats: int = 3) -> float:
+    """
+    Return the best seconds to evaluate rows inline (pool None) or in TASKS tasks on a pool.
+    """
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        if pool is None:
+            evaluate_rows(operation, rows)
+        else:
+            tasks = min(TASKS, len(rows))
+            bounds = [len(rows) * task // tasks for task in range(tasks + 1)]
+            futures = [pool.submit(evaluate_rows, operation, rows[begin:end])
+                       for begin, end in zip(bounds, bounds[1:])]
+            for future in futures:
+                future.result()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=2, help="Threads and worker processes")
+    args = parser.parse_args()
+
+    pools = {"inline": None, "thread": ThreadPool(args.workers), "process": WorkerPool(args.workers)}
+    pools["process"].calculate("add", 1, 1)  # Start the processes outside the measurement
+    start = time.perf_counter()
+    planner = ExecutionPlanner(load_plugins(), pool=pools["process"], thread_pool=pools["thread"])
+    planner.calibrate()
+    print(f"calibration: {time.perf_counter() - start:.3f}s")
+    print(f"{'workload':<14} {'pick':>8} {'inline':>19} {'thread':>19} {'process':>19} {'vs best':>8}")
+    for label, operation, digits, rows in WORKLOADS:
+        num1, num2 = Decimal("7" * digits), Decimal("3" * digits)
+        size = calculation_size(operation, num1, num2)
+        decision = planner.decide(label, planner.work_seconds(operation, size), size, rows, min(TASKS, rows))
+        measured = {strategy: run(pool, operation, [(num1, num2)] * rows) for strategy, pool in pools.items()}
+        cells = " ".join(f"{decision.estimates[strategy] * 1e3:>8.2f}/{seconds * 1e3:>8.2f}ms"
+                         for strategy, seconds in measured.items())
+        # How much slower the picked strategy was than the fastest one
+        ratio = measured[decision.strategy] / min(measured.values())
+        print(f"{label:<14} {decision.strategy:>8} {cells} {ratio:>7.2f}x")
+    print("(estimated/measured)")
+    for pool in pools.values():
+        if pool is not None:
+            pool.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# benchmarks/bench_expression.py
+"""
+Benchmark for the expression mode.
+
+Evaluates --count expressions of the shape `(a + b) * c / d - square(e)` four ways:
+as one calculation per operation, each stored in the history (what the REPL needed
+before expressions); with a cold evaluator that parses every expression; with the
+template cache and a different set of numbers each time; and repeating one expression,
+whose literal sub-expressions are folded once. Reports expressions/sec for each.
+
+Usage:
+    python -m benchmarks.bench_expression [--count 20000]
+"""
+
+import argparse
+import random
+import time
+from decimal import Decimal
+from app.calculation import Calculation
+from app.calculations import Calculations
+from app.expression import ExpressionEvaluator
+from app.plugin_loader import load_plugins
+
+def stepwise(commands, numbers: list):
+    """
+    Run an expression as separate calculations, storing each in the history.
+    """
+    a, b, c, d, e = map(Decimal, numbers)
+    result = None
+    for operation, num1, num2 in (("add", a, b), ("multiply", None, c), ("divide", None, d)):
+        calculation = Calculation(result if num1 is None else num1, num2, commands[operation])
+        result = calculation.operate()
+        Calculations.add_calculation(calculation)
+    square = Calculation(e, Decimal(0), commands["square"])
+    square.operate()
+    Calculations.add_calculation(square)
+    calculation = Calculation(result, square.result, commands["subtract"])
+    calculation.operate()
+    Calculations.add_calculation(calculation)
+
+def measure(label: str, count: int, run):
+    start = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - start
+    print(f"{label:>24} {count / seconds:>14.0f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=20000, help="Expressions per run")
+    args = parser.parse_args()
+
+    commands = load_plugins().load_all()
+    generator = random.Random(0)
+    numbers = [[str(generator.randint(1, 10 ** 6)) for _ in range(5)] for _ in range(args.count)]
+    texts = ["({} + {}) * {} / {} - square({})".format(*row) for row in numbers]
+
+    def cold():
+        for text in texts:
+            ExpressionEvaluator(commands).evaluate(text)
+
+    def cached():
+        evaluator = ExpressionEvaluator(commands)
+        for text in texts:
+            evaluator.evaluate(text)
+
+    def repeated():
+        evaluator = ExpressionEvaluator(commands)
+        for _ in texts:
+            evaluator.evaluate(texts[0])
+
+    print(f"{'path':>24} {'expressions/sec':>14}")
+    Calculations.clear_history()
+    measure("stepwise with history", args.count, lambda: [stepwise(commands, row) for row in numbers])
+    Calculations.clear_history()
+    measure("eval, parsed every time", args.count, cold)
+    measure("eval, cached templates", args.count, cached)
+    measure("eval, folded constants", args.count, repeated)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# benchmarks/bench_history_append.py
+"""
+Benchmark for appending records to the calculation history.
+
+Times PandasFacade.add_record for increasing history sizes and reports the cost per
+appended row, which stays flat when appends scale linearly with the number of rows.
+
+Usage:
+    python -m benchmarks.bench_history_append [--max-rows 10000000]
+"""
+
+import argparse
+import time
+from decimal import Decimal
+from app.pandas_facade import PandasFacade
+
+OPERATIONS = ["add", "subtract", "multiply", "divide"]
+
+def time_appends(num_rows: int) -> float:
+    """
+    Append num_rows records to an empty facade and materialize the DataFrame once.
+
+    Args:
+        num_rows (int): The number of records to append.
+
+    Returns:
+        float: The elapsed time in seconds.
+    """
+    facade = PandasFacade()
+    operands = [Decimal(value) for value in range(100)]
+    start = time.perf_counter()
+    for index in range(num_rows):
+        facade.add_record({
+            "operation": OPERATIONS[index % 4],
+            "num1": operands[index % 100],
+            "num2": operands[(index * 7) % 100],
+            "result": operands[(index * 13) % 100]
+        })
+    _ = facade.dataframe
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-rows", type=int, default=1_000_000, help="Largest history size to time")
+    args = parser.parse_args()
+
+    sizes = []
+    size = 1_000
+    while size <= args.max_rows:
+        sizes.append(size)
+        size *= 10
+
+    print(f"{'rows':>12} {'seconds':>10} {'ns/row':>10}")
+    per_row = []
+    for size in sizes:
+        elapsed = time_appends(size)
+        per_row.append(elapsed / size)
+        print(f"{size:>12} {elapsed:>10.3f} {elapsed / size * 1e9:>10.1f}")
+
+    # Linear scaling means the cost per row does not grow with the history size
+    growth = per_row[-1] / per_row[0] if per_row else 1.0
+    print(f"Per-row cost growth from {sizes[0]} to {sizes[-1]} rows: {growth:.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# benchmarks/bench_history_formats.py
+"""
+Benchmark for history file formats.
+
+Times saving and loading the same history as CSV and as the binary columnar formats
+(.npz, plus .arrow when pyarrow is installed), and the first `latest` and
+`filter_with_operation` reads after loading.
+
+Usage:
+    python -m benchmarks.bench_history_formats [--rows 200000]
+"""
+
+import argparse
+import importlib.util
+import os
+import tempfile
+import time
+from decimal import Decimal
+from app.pandas_facade import PandasFacade
+
+OPERATIONS = ["add", "subtract", "multiply", "divide"]
+
+def build_history(rows: int) -> PandasFacade:
+    """
+    Build a history of rows records with exact Decimal results.
+    """
+    facade = PandasFacade()
+    for index in range(rows):
+        num1, num2 = Decimal(index % 997), Decimal(index % 89 + 1)
+        facade.add_record({"operation": OPERATIONS[index % 4], "num1": num1, "num2": num2, "result": num1 / num2})
+    return facade
+
+def timed(function) -> float:
+    """
+    Return the seconds taken by a call to function.
+    """
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000, help="History size")
+    args = parser.parse_args()
+
+    extensions = [".csv", ".npz"]
+    if importlib.util.find_spec("pyarrow") is not None:
+        extensions.append(".arrow")
+
+    facade = build_history(args.rows)
+    print(f"{'format':>8} {'size MB':>9} {'save s':>8} {'load s':>8} {'latest s':>9} {'filter s':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for extension in extensions:
+            path = os.path.join(directory, f"history{extension}")
+            save = timed(lambda: facade.save_to_file(path))
+            loaded = PandasFacade()
+            load = timed(lambda: loaded.load_from_file(path))
+            latest = timed(lambda: loaded.get_record(-1))
+            filtering = timed(lambda: loaded.filter_by_operation("divide"))
+            size = os.path.getsize(path) / 1e6
+            print(f"{extension[1:]:>8} {size:>9.1f} {save:>8.3f} {load:>8.3f} {latest:>9.5f} {filtering:>9.3f}")
+
+if __name__ == '__main__':
+    main()
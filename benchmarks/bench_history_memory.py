@@ -0,0 +1,91 @@
+# benchmarks/bench_history_memory.py
+"""
+Benchmark for the memory taken by the calculation history.
+
+Appends --rows calculations with distinct Decimal operands and results (as a session
+of real calculations would produce) and reports the bytes per row held by the history,
+measured with tracemalloc, for the scaled int64 columns of PandasFacade and for plain
+lists of the Decimal objects, the way the columns used to be stored. It also times the
+appends and building the DataFrame, and checks the CSV output of both is identical.
+
+Usage:
+    python -m benchmarks.bench_history_memory [--rows 200000]
+"""
+
+import argparse
+import gc
+import io
+import random
+import time
+import tracemalloc
+from decimal import Decimal
+import pandas as pd
+from app.pandas_facade import COLUMNS, PandasFacade
+
+OPERATIONS = ["add", "subtract", "multiply", "divide"]
+
+def make_records(rows: int, seed: int = 0):
+    """
+    Yield rows records with freshly created Decimal values.
+    """
+    generator = random.Random(seed)
+    for index in range(rows):
+        num1 = Decimal(generator.randint(-10 ** 6, 10 ** 6)).scaleb(-2)
+        num2 = Decimal(generator.randint(1, 10 ** 4)).scaleb(-1)
+        operation = OPERATIONS[index % 4]
+        result = {"add": num1 + num2, "subtract": num1 - num2, "multiply": num1 * num2,
+                  "divide": num1 / num2}[operation]
+        yield {"operation": operation, "num1": num1, "num2": num2, "result": result}
+
+def measure(build, rows: int) -> tuple:
+    """
+    Return (the built history, bytes it holds per row, seconds to build it).
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    history = build(make_records(rows))
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return history, current / rows, elapsed
+
+def build_facade(records) -> PandasFacade:
+    facade = PandasFacade()
+    for record in records:
+        facade.add_record(record)
+    return facade
+
+def build_lists(records) -> dict:
+    columns = {name: [] for name in COLUMNS}
+    for record in records:
+        for name, values in columns.items():
+            values.append(record[name])
+    return columns
+
+def to_csv(frame: pd.DataFrame) -> str:
+    output = io.StringIO()
+    frame.to_csv(output, index=False)
+    return output.getvalue()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000, help="History size")
+    args = parser.parse_args()
+
+    facade, facade_bytes, facade_seconds = measure(build_facade, args.rows)
+    lists, list_bytes, list_seconds = measure(build_lists, args.rows)
+    start = time.perf_counter()
+    frame = facade.dataframe
+    frame_seconds = time.perf_counter() - start
+    object_frame = pd.DataFrame({name: pd.Series(values, dtype=object) for name, values in lists.items()})
+    assert to_csv(frame) == to_csv(object_frame), "CSV output differs"
+
+    print(f"{'storage':<22} {'bytes/row':>10} {'append s':>10}")
+    print(f"{'scaled int64 columns':<22} {facade_bytes:>10.1f} {facade_seconds:>10.3f}")
+    print(f"{'Decimal object lists':<22} {list_bytes:>10.1f} {list_seconds:>10.3f}")
+    print(f"Memory reduction: {list_bytes / facade_bytes:.1f}x; DataFrame built in {frame_seconds:.3f}s; CSV identical")
+
+if __name__ == '__main__':
+    main()
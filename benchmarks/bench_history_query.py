@@ -0,0 +1,74 @@
+# benchmarks/bench_history_query.py
+"""
+Benchmark for history range queries.
+
+Builds a history of --rows random calculations and times a set of queries with the
+query engine (after its indexes are built) against boolean masking of the history
+DataFrame, the way a caller would filter it with pandas. Reports the plan the engine
+chose for each query and checks both return the same rows.
+
+Usage:
+    python -m benchmarks.bench_history_query [--rows 200000] [--repeat 5]
+"""
+
+import argparse
+import random
+import time
+from decimal import Decimal
+from app.history_query import HistoryQuery, QueryEngine
+from app.pandas_facade import PandasFacade
+
+QUERIES = [
+    ("result between 500 501", lambda frame: (frame["result"] >= Decimal(500)) & (frame["result"] <= Decimal(501))),
+    ("num1 == 7 and num2 < 10", lambda frame: (frame["num1"] == Decimal(7)) & (frame["num2"] < Decimal(10))),
+    ("operation divide result > 900",
+     lambda frame: (frame["operation"] == "divide") & (frame["result"] > Decimal(900))),
+    ("result > 10", lambda frame: frame["result"] > Decimal(10)),
+]
+
+def build_history(rows: int, seed: int = 0) -> PandasFacade:
+    """
+    Return a facade holding rows random calculations.
+    """
+    generator = random.Random(seed)
+    facade = PandasFacade()
+    for _ in range(rows):
+        num1, num2 = Decimal(generator.randint(0, 1000)), Decimal(generator.randint(1, 1000))
+        operation = generator.choice(["add", "subtract", "multiply", "divide"])
+        result = {"add": num1 + num2, "subtract": num1 - num2, "multiply": num1 * num2,
+                  "divide": num1 / num2}[operation]
+        facade.add_record({"operation": operation, "num1": num1, "num2": num2, "result": result})
+    return facade
+
+def best_of(function, repeat: int) -> float:
+    """
+    Return the fastest of repeat calls, in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000, help="History size")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per query; the best is reported")
+    args = parser.parse_args()
+
+    facade = build_history(args.rows)
+    engine = QueryEngine(facade)
+    frame = facade.dataframe
+    print(f"{'query':<32} {'engine ms':>10} {'pandas ms':>10} {'speedup':>8}  plan")
+    for text, mask in QUERIES:
+        query = HistoryQuery.parse(text)
+        engine.run(query)
+        assert engine.run(query).index.tolist() == frame[mask(frame)].index.tolist()
+        indexed = best_of(lambda: engine.run(query), args.repeat)
+        masked = best_of(lambda: frame[mask(frame)], args.repeat)
+        print(f"{text:<32} {indexed * 1000:>10.2f} {masked * 1000:>10.2f} {masked / indexed:>7.1f}x  "
+              f"{engine.last_plan.describe()}")
+
+if __name__ == '__main__':
+    main()
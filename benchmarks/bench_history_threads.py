@@ -0,0 +1,82 @@
+# benchmarks/bench_history_threads.py
+"""
+Benchmark for concurrent appends to a HistorySession.
+
+Starts 1, 2, 4, ... --max-threads threads that each append --appends calculations to one
+shared session while a reader thread filters and counts it, and reports total appends
+per second, once with the default lock striping and once with a single stripe (one lock
+shared by every appender). With the GIL, throughput does not grow with the thread
+count; what striping buys is that it does not collapse under contention either.
+
+Usage:
+    python -m benchmarks.bench_history_threads [--appends 20000] [--max-threads 8]
+"""
+
+import argparse
+import threading
+import time
+from decimal import Decimal
+from app.calculation import Calculation
+from app.history_session import DEFAULT_APPEND_STRIPES, HistorySession
+from app.plugin_loader import load_plugins
+
+OPERATIONS = ["add", "subtract", "multiply", "divide"]
+
+def time_appends(stripes: int, threads: int, appends: int, commands: dict) -> float:
+    """
+    Return appends per second for the given number of appending threads.
+    """
+    session = HistorySession(stripes=stripes)
+    calculations = []
+    for index in range(appends):
+        calculation = Calculation(Decimal(index % 100), Decimal(index % 7 + 1), commands[OPERATIONS[index % 4]])
+        calculation.operate()
+        calculations.append(calculation)
+    barrier = threading.Barrier(threads + 1)
+    done = threading.Event()
+
+    def append():
+        barrier.wait()
+        for calculation in calculations:
+            session.add_calculation(calculation)
+
+    def read():
+        while not done.is_set():
+            session.filter_with_operation("add")
+            session.count()
+            time.sleep(0.001)
+
+    workers = [threading.Thread(target=append) for _ in range(threads)]
+    reader = threading.Thread(target=read)
+    for worker in workers:
+        worker.start()
+    reader.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    assert session.count() == threads * appends
+    elapsed = time.perf_counter() - start
+    done.set()
+    reader.join()
+    return threads * appends / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--appends", type=int, default=20000, help="Appends per thread")
+    parser.add_argument("--max-threads", type=int, default=8, help="Largest thread count")
+    args = parser.parse_args()
+
+    commands = load_plugins()
+    # Warm up (pandas import, first filter) outside the measured runs
+    time_appends(DEFAULT_APPEND_STRIPES, 1, 1000, commands)
+    print(f"{'threads':>8} {'striped/sec':>12} {'1 lock/sec':>12}")
+    threads = 1
+    while threads <= args.max_threads:
+        striped = time_appends(DEFAULT_APPEND_STRIPES, threads, args.appends, commands)
+        single = time_appends(1, threads, args.appends, commands)
+        print(f"{threads:>8} {striped:>12.0f} {single:>12.0f}")
+        threads *= 2
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# benchmarks/bench_logging.py
+"""
+Benchmark for the cost of logging on the calculation path.
+
+Times perform_calculation_and_display with logging disabled, with handlers writing
+synchronously from the calling thread, through the queue and background listener
+thread set up by configure_logging, and through the queue with only 1 in --sample
+successful calculations logged. Console output is sent to os.devnull.
+
+Usage:
+    python -m benchmarks.bench_logging [--calls 5000] [--level INFO] [--sample 100]
+"""
+
+import argparse
+import contextlib
+import logging
+import os
+import tempfile
+import time
+from app.calculations import Calculations
+from app.log_sampling import get_sampler, reset_sampler
+from app.plugin_loader import load_plugins
+from logger_config import configure_logging, dropped_records, stop_logging
+from main import perform_calculation_and_display
+
+def time_calls(commands: dict, calls: int) -> tuple:
+    """
+    Return the mean and 99th percentile seconds per calculation over the given number of calls.
+    """
+    latencies = []
+    for index in range(calls):
+        start = time.perf_counter()
+        perform_calculation_and_display(str(index), "3", "add", commands)
+        latencies.append(time.perf_counter() - start)
+    Calculations.clear_history()
+    latencies.sort()
+    return sum(latencies) / calls, latencies[int(calls * 0.99)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=5000, help="Calculations per mode")
+    parser.add_argument("--level", default="INFO", help="Log level for the enabled modes")
+    parser.add_argument("--sample", type=int, default=100, help="Log 1 in N calculations in the sampled mode")
+    args = parser.parse_args()
+
+    commands = load_plugins()
+    results = {}
+    dropped = 0
+    with tempfile.TemporaryDirectory() as directory, open(os.devnull, "w", encoding="utf-8") as devnull:
+        os.environ["LOG_FILE"] = os.path.join(directory, "bench.log")
+        with contextlib.redirect_stdout(devnull):
+            logging.disable(logging.CRITICAL)
+            results["off"] = time_calls(commands, args.calls)
+            logging.disable(logging.NOTSET)
+            for mode, asynchronous, every in (("sync", "0", 1), ("queue", "1", 1), ("sampled", "1", args.sample)):
+                os.environ["LOG_ASYNC"] = asynchronous
+                configure_logging(args.level)
+                reset_sampler()
+                get_sampler().every = every
+                results[mode] = time_calls(commands, args.calls)
+                dropped += dropped_records()
+                stop_logging()
+        logging.getLogger().handlers.clear()
+
+    print(f"{'logging':>8} {'mean us':>10} {'p99 us':>10} {'calls/sec':>10}")
+    for mode, (mean, p99) in results.items():
+        print(f"{mode:>8} {mean * 1e6:>10.1f} {p99 * 1e6:>10.1f} {1 / mean:>10.0f}")
+    print(f"Records dropped by the queue: {dropped}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# benchmarks/bench_mp_calculation.py
+"""
+Benchmark for the `mp` calculation path.
+
+Compares running a calculation inline, on the persistent worker pool, and in a new
+multiprocessing.Process per call (the previous behaviour).
+
+Usage:
+    python -m benchmarks.bench_mp_calculation [--calls 200] [--start-method spawn]
+"""
+
+import argparse
+import multiprocessing
+import time
+from decimal import Decimal
+from app.plugins.add_command import AddCommand
+from app.worker_pool import WorkerPool
+
+def per_call_process(command, num1: Decimal, num2: Decimal, context) -> Decimal:
+    """
+    Run a calculation the way the `mp` path used to: one Process and Queue per call.
+    """
+    result_queue = context.Queue()
+    process = context.Process(target=command.execute_multiprocessing, args=(num1, num2, result_queue))
+    process.start()
+    result = result_queue.get()
+    process.join()
+    return result
+
+def time_calls(function, calls: int) -> float:
+    """
+    Return the mean seconds per call of function over the given number of calls.
+    """
+    start = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter() - start) / calls
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200, help="Calculations per mode")
+    parser.add_argument("--start-method", default=None, help="fork, forkserver or spawn")
+    args = parser.parse_args()
+
+    command = AddCommand()
+    num1, num2 = Decimal("2.5"), Decimal("3.25")
+    context = multiprocessing.get_context(args.start_method)
+    pool = WorkerPool(max_workers=1, start_method=args.start_method)
+    pool.calculate("add", num1, num2)  # start the worker outside the timed region
+
+    results = {
+        "inline": time_calls(lambda: command.execute(num1, num2), args.calls),
+        "pool": time_calls(lambda: pool.calculate("add", num1, num2), args.calls),
+        "process per call": time_calls(lambda: per_call_process(command, num1, num2, context),
+                                       max(1, args.calls // 10)),
+    }
+    pool.shutdown()
+
+    print(f"{'mode':>18} {'us/call':>12} {'calls/sec':>12}")
+    for mode, seconds in results.items():
+        print(f"{mode:>18} {seconds * 1e6:>12.1f} {1 / seconds:>12.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+# benchmarks/bench_numeric_modes.py
+"""
+Benchmark for the numeric backends.
+
+Prints a table of operations per second for every backend and plugin operation, both
+through the scalar `execute` path and the vectorized `execute_batch` path.
+
+Usage:
+    python -m benchmarks.bench_numeric_modes [--rows 100000]
+"""
+
+import argparse
+import random
+import time
+from app.numeric import BACKENDS, create_backend
+from app.plugin_loader import load_plugins
+
+def operand_strings(rows: int) -> tuple:
+    """
+    Generate two columns of decimal strings with up to four fractional digits.
+    """
+    generator = random.Random(42)
+    first = [f"{generator.uniform(-1000, 1000):.4f}" for _ in range(rows)]
+    second = [f"{generator.uniform(1, 1000):.4f}" for _ in range(rows)]
+    return first, second
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000, help="Operand pairs per measurement")
+    args = parser.parse_args()
+
+    commands = load_plugins()
+    first, second = operand_strings(args.rows)
+    print(f"{'mode':>8} {'operation':>10} {'execute ops/s':>15} {'batch ops/s':>15}")
+    for mode in BACKENDS:
+        backend = create_backend(mode)
+        values1 = [backend.parse(text) for text in first]
+        values2 = [backend.parse(text) for text in second]
+        column1, column2 = backend.column(values1), backend.column(values2)
+        for name, command in commands.items():
+            start = time.perf_counter()
+            for num1, num2 in zip(values1, values2):
+                command.execute(num1, num2)
+            scalar = time.perf_counter() - start
+            start = time.perf_counter()
+            command.execute_batch(column1, column2)
+            batch = time.perf_counter() - start
+            print(f"{mode:>8} {name:>10} {args.rows / scalar:>15,.0f} {args.rows / batch:>15,.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+# benchmarks/bench_server.py
+"""
+Load generator for the calculation server.
+
+Opens --connections NDJSON connections that each keep --depth requests in flight and
+reports requests/sec and latency percentiles. Without --port or --unix it starts a
+server in-process, once with micro-batching and once with every request evaluated on
+its own, so the two can be compared, and times --cli-calls runs of
+`python main.py a b op` for reference.
+
+Usage:
+    python -m benchmarks.bench_server [--requests 20000] [--connections 8] [--depth 16]
+                                      [--port 8765 | --unix /tmp/calc.sock]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from app.plugin_loader import load_plugins
+from app.server import CalculationServer, MicroBatcher
+
+OPERATIONS = ["add", "subtract", "multiply", "divide"]
+
+async def client(open_connection, requests: int, depth: int, latencies: list):
+    """
+    Send requests over one connection, keeping depth of them in flight.
+    """
+    reader, writer = await open_connection()
+    rng = random.Random(len(latencies))
+    sent_at = {}
+    in_flight = asyncio.Semaphore(depth)
+
+    async def send():
+        for index in range(requests):
+            await in_flight.acquire()
+            request = {"id": index, "operation": rng.choice(OPERATIONS),
+                       "num1": str(rng.randint(1, 999)), "num2": str(rng.randint(1, 99))}
+            sent_at[index] = time.perf_counter()
+            writer.write(json.dumps(request).encode("utf-8") + b"\n")
+            await writer.drain()
+
+    sender = asyncio.create_task(send())
+    for _ in range(requests):
+        response = json.loads(await reader.readline())
+        latencies.append(time.perf_counter() - sent_at.pop(response["id"]))
+        in_flight.release()
+    await sender
+    writer.close()
+
+async def generate_load(open_connection, requests: int, connections: int, depth: int) -> dict:
+    """
+    Run the load and return throughput and latency percentiles.
+    """
+    latencies = []
+    per_connection = requests // connections
+    start = time.perf_counter()
+    await asyncio.gather(*(client(open_connection, per_connection, depth, latencies) for _ in range(connections)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "requests_per_sec": len(latencies) / elapsed,
+        **{label: latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1e3
+           for label, fraction in (("p50_ms", 0.5), ("p99_ms", 0.99), ("max_ms", 1.0))},
+    }
+
+async def run_in_process(args) -> dict:
+    results = {}
+    commands = load_plugins()
+    for label, max_batch in (("batched", 256), ("unbatched", 1)):
+        server = CalculationServer(commands, history="none", batcher=MicroBatcher(max_batch=max_batch))
+        listener = await server.start(port=0)
+        port = listener.sockets[0].getsockname()[1]
+        # Warm up (imports, first vectorized batch) outside the measured run
+        await generate_load(lambda port=port: asyncio.open_connection("127.0.0.1", port),
+                            args.connections * args.depth, args.connections, args.depth)
+        server.batcher.batches = server.batcher.batched_calculations = 0
+        results[label] = await generate_load(lambda port=port: asyncio.open_connection("127.0.0.1", port),
+                                             args.requests, args.connections, args.depth)
+        if server.batcher.batches and max_batch > 1:
+            results[label]["mean_batch"] = server.batcher.batched_calculations / server.batcher.batches
+        listener.close()
+        await listener.wait_closed()
+    return results
+
+def time_cli(calls: int) -> dict:
+    """
+    Time single-shot `python main.py` calculations, the way callers did without the server.
+    """
+    latencies = []
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, LOG_FILE=os.path.join(directory, "cli.log"))
+        for index in range(calls):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "main.py", str(index), "3", "add"], env=env,
+                           capture_output=True, check=True)
+            latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {"requests_per_sec": calls / sum(latencies), "p50_ms": latencies[calls // 2] * 1e3,
+            "p99_ms": latencies[-1] * 1e3, "max_ms": latencies[-1] * 1e3}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000, help="Total requests")
+    parser.add_argument("--connections", type=int, default=8, help="Concurrent connections")
+    parser.add_argument("--depth", type=int, default=16, help="Requests in flight per connection")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=None, help="Load an already running server")
+    parser.add_argument("--unix", default=None, help="Load an already running server on a Unix socket")
+    parser.add_argument("--cli-calls", type=int, default=5, help="Single-shot CLI runs to time (0 skips them)")
+    args = parser.parse_args()
+
+    if args.unix:
+        results = {"server": asyncio.run(generate_load(lambda: asyncio.open_unix_connection(args.unix),
+                                                       args.requests, args.connections, args.depth))}
+    elif args.port:
+        results = {"server": asyncio.run(generate_load(lambda: asyncio.open_connection(args.host, args.port),
+                                                       args.requests, args.connections, args.depth))}
+    else:
+        results = asyncio.run(run_in_process(args))
+    if args.cli_calls:
+        results["cli"] = time_cli(args.cli_calls)
+
+    print(f"{'server':>10} {'req/sec':>10} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'batch':>6}")
+    for label, result in results.items():
+        batch = f"{result['mean_batch']:.1f}" if "mean_batch" in result else "-"
+        print(f"{label:>10} {result['requests_per_sec']:>10.0f} {result['p50_ms']:>8.2f} "
+              f"{result['p99_ms']:>8.2f} {result['max_ms']:>8.2f} {batch:>6}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# benchmarks/bench_shm_transport.py
+"""
+Benchmark for the shared-memory column transport of the worker pool.
+
+Evaluates --rows calculations on the worker pool twice: with the operand and result
+columns in shared memory (calculate_columns) and with the same row ranges pickled to
+the workers and back as lists of Decimals. Reports rows/sec, the bytes each path sends
+through the pool's pipes, and checks both return the same results.
+
+Usage:
+    python -m benchmarks.bench_shm_transport [--rows 200000] [--workers 2] [--operation multiply]
+"""
+
+import argparse
+import pickle
+import random
+import time
+from decimal import Decimal
+from app.shm_transport import calculate_columns, evaluate_shared
+from app.worker_pool import WorkerPool, worker_commands
+
+def evaluate_rows(operation: str, first: list, second: list) -> list:
+    """
+    Evaluate pickled operand lists in a worker, the way chunks were sent before.
+    """
+    command = worker_commands()[operation]
+    results = []
+    for num1, num2 in zip(first, second):
+        try:
+            results.append(command.execute(num1, num2))
+        except Exception:  # pylint: disable=broad-exception-caught
+            results.append(None)
+    return results
+
+def pickled(pool: WorkerPool, operation: str, first: list, second: list, tasks: int) -> list:
+    bounds = [len(first) * task // tasks for task in range(tasks + 1)]
+    futures = [pool.submit(evaluate_rows, operation, first[start:stop], second[start:stop])
+               for start, stop in zip(bounds, bounds[1:])]
+    return [result for future in futures for result in future.result()]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000, help="Calculations per run")
+    parser.add_argument("--workers", type=int, default=2, help="Worker processes")
+    parser.add_argument("--operation", default="multiply", help="Operation to evaluate")
+    args = parser.parse_args()
+
+    generator = random.Random(0)
+    first = [Decimal(generator.randint(-10 ** 8, 10 ** 8)).scaleb(-3) for _ in range(args.rows)]
+    second = [Decimal(generator.randint(1, 10 ** 5)).scaleb(-2) for _ in range(args.rows)]
+    pool = WorkerPool(args.workers)
+    pool.calculate("add", 1, 1)  # Start the processes outside the measurement
+
+    start = time.perf_counter()
+    shared_results, _ = calculate_columns(pool, args.operation, first, second)
+    shared_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    pickled_results = pickled(pool, args.operation, first, second, args.workers)
+    pickled_seconds = time.perf_counter() - start
+    pool.shutdown()
+    assert shared_results == pickled_results, "Results differ"
+
+    # What crosses the pipes: descriptors and side channels against whole columns
+    shared_bytes = len(pickle.dumps((evaluate_shared, args.operation, args.rows, ("psm_0000",) * 3,
+                                     ({}, {}), 0, args.rows))) * args.workers
+    pickled_bytes = len(pickle.dumps((first, second))) + len(pickle.dumps(pickled_results))
+    print(f"{'transport':>14} {'rows/sec':>10} {'pipe bytes':>12}")
+    print(f"{'shared memory':>14} {args.rows / shared_seconds:>10.0f} {shared_bytes:>12}")
+    print(f"{'pickled lists':>14} {args.rows / pickled_seconds:>10.0f} {pickled_bytes:>12}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,338 @@
+# benchmarks/suite.py
+"""
+Benchmark suite covering the hot paths of the calculator.
+
+`run` times every case for each history size and writes ops/sec, latency percentiles
+and peak traced memory to a JSON results file. Operands and operations come from the
+Faker-based generate_test_data in tests/conftest.py; --mix reweights the operations.
+
+`compare` reads two results files and flags every case whose throughput dropped or
+whose p99 latency grew by more than --threshold, exiting with status 1 if any did.
+
+Usage:
+    python -m benchmarks.suite run [--sizes 1000,10000,100000] [--mix add=3,divide=1]
+                                   [--cases history.add_record,...] [--output results.json]
+    python -m benchmarks.suite compare baseline.json results.json [--threshold 0.1]
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from decimal import Decimal
+from app.history_query import HistoryQuery, QueryEngine
+from app.pandas_facade import PandasFacade
+from app.plugin_loader import load_plugins
+from app.worker_pool import WorkerPool
+from tests.conftest import generate_test_data
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+# Faker is slow, so generated records are reused cyclically beyond this many rows
+RECORD_POOL_SIZE = 10_000
+# Rows used to warm each case up (imports, caches) before it is timed
+WARMUP_ROWS = 100
+# Per-call cases do not depend on the history size; cap their number of calls
+MAX_CALLS = 100_000
+
+def parse_mix(text: str) -> dict:
+    """
+    Parse an operation mix such as "add=3,divide=1" into weights keyed by operation.
+    """
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+def make_records(size: int, mix: dict = None, seed: int = 0) -> list:
+    """
+    Build size history records from generate_test_data, optionally reweighting the operations.
+
+    Args:
+        size (int): The number of records.
+        mix (dict): Optional operation weights.
+        seed (int): Seed for the reweighted operation choice.
+
+    Returns:
+        list: Records with operation, num1, num2 and result keys.
+    """
+    pool = list(generate_test_data(min(size, RECORD_POOL_SIZE)))
+    operations = None
+    if mix:
+        operations = random.Random(seed).choices(list(mix), weights=list(mix.values()), k=len(pool))
+    records = []
+    for index, (num1, num2, name, _, expected) in enumerate(pool):
+        records.append({
+            "operation": operations[index] if operations else name,
+            "num1": num1,
+            "num2": num2,
+            "result": None if expected == "ZeroDivisionError" else expected,
+        })
+    return list(itertools.islice(itertools.cycle(records), size))
+
+def build_facade(records: list) -> PandasFacade:
+    """
+    Return a facade holding the given records.
+    """
+    facade = PandasFacade()
+    for record in records:
+        facade.add_record(record)
+    return facade
+
+def time_each(function, arguments) -> list:
+    """
+    Call function once per argument and return the latency of every call in seconds.
+    """
+    latencies = []
+    for argument in arguments:
+        start = time.perf_counter()
+        function(argument)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+# Every case takes (records, context) and returns (operations performed, per-call latencies).
+
+def case_add_record(records: list, context: dict) -> tuple:
+    facade = PandasFacade()
+    return len(records), time_each(facade.add_record, records)
+
+def case_filter_by_operation(records: list, context: dict) -> tuple:
+    facade = build_facade(records)
+    operations = sorted({record["operation"] for record in records}) * context["repeat"]
+    return len(operations), time_each(facade.filter_by_operation, operations)
+
+def case_delete_record(records: list, context: dict) -> tuple:
+    facade = build_facade(records)
+    # Delete half the rows one at a time, from the front, where shifting costs most
+    indices = [0] * (len(records) // 2)
+    return len(indices), time_each(facade.remove_record, indices)
+
+def case_query(records: list, context: dict) -> tuple:
+    engine = QueryEngine(build_facade(records))
+    queries = [HistoryQuery.parse(f"num1 == {record['num1']}") for record in records[:context["repeat"] * 10]]
+    return len(queries), time_each(engine.run, queries)
+
+def _file_cases(extension: str) -> tuple:
+    def save(records: list, context: dict) -> tuple:
+        facade = build_facade(records)
+        path = os.path.join(context["directory"], f"save{extension}")
+        latencies = time_each(lambda _: facade.save_to_file(path), range(context["repeat"]))
+        return len(records) * context["repeat"], latencies
+
+    def load(records: list, context: dict) -> tuple:
+        path = os.path.join(context["directory"], f"load{extension}")
+        build_facade(records).save_to_file(path)
+        latencies = time_each(lambda _: PandasFacade().load_from_file(path), range(context["repeat"]))
+        return len(records) * context["repeat"], latencies
+    return save, load
+
+def case_plugin_execute(records: list, context: dict) -> tuple:
+    commands = context["commands"]
+    calls = [(commands[record["operation"]], record["num1"], record["num2"] or Decimal(1))
+             for record in records[:MAX_CALLS]]
+    return len(calls), time_each(lambda call: call[0].execute(call[1], call[2]), calls)
+
+def case_load_plugins(records: list, context: dict) -> tuple:
+    return context["repeat"], time_each(lambda _: load_plugins().load_all(), range(context["repeat"]))
+
+def case_mp_calculation(records: list, context: dict) -> tuple:
+    pool = context["pool"]
+    if not pool.started:
+        pool.calculate("add", Decimal(1), Decimal(1))  # start the worker outside the timed region
+    calls = [(record["operation"], record["num1"], record["num2"] or Decimal(1))
+             for record in records[:context["mp_calls"]]]
+    return len(calls), time_each(lambda call: pool.calculate(*call), calls)
+
+save_csv, load_csv = _file_cases(".csv")
+save_npz, load_npz = _file_cases(".npz")
+
+# Case name -> (function, whether it depends on the history size)
+CASES = {
+    "history.add_record": (case_add_record, True),
+    "history.filter_by_operation": (case_filter_by_operation, True),
+    "history.delete_record": (case_delete_record, True),
+    "history.query": (case_query, True),
+    "history.save_csv": (save_csv, True),
+    "history.load_csv": (load_csv, True),
+    "history.save_npz": (save_npz, True),
+    "history.load_npz": (load_npz, True),
+    "plugin.execute": (case_plugin_execute, False),
+    "plugins.load": (case_load_plugins, False),
+    "calculation.mp": (case_mp_calculation, False),
+}
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """
+    Return the value at a fraction (0-1) of a sorted list, by nearest rank.
+    """
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+def run_case(name: str, records: list, context: dict, measure_memory: bool) -> dict:
+    """
+    Time one case after a small warm-up run and, optionally, measure its peak traced
+    memory in a second run.
+
+    Returns:
+        dict: The case result.
+    """
+    function, _ = CASES[name]
+    function(records[:WARMUP_ROWS], context)
+    start = time.perf_counter()
+    operations, latencies = function(records, context)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    result = {
+        "case": name,
+        "ops": operations,
+        "seconds": elapsed,
+        "ops_per_sec": operations / sum(latencies) if sum(latencies) else None,
+        "latency_us": {label: percentile(latencies, fraction) * 1e6
+                       for label, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))},
+        "peak_memory_bytes": None,
+    }
+    if measure_memory:
+        tracemalloc.start()
+        function(records, context)
+        result["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+def run_suite(sizes: list, case_names: list, mix: dict = None, repeat: int = 5, mp_calls: int = 200,
+              measure_memory: bool = True) -> dict:
+    """
+    Run the selected cases for every size.
+
+    Args:
+        sizes (list): The history sizes to run the size-dependent cases with.
+        case_names (list): The cases to run.
+        mix (dict): Optional operation weights.
+        repeat (int): Calls per measurement for the bulk cases.
+        mp_calls (int): Calculations sent to the worker pool.
+        measure_memory (bool): Whether to measure peak memory in an extra traced run.
+
+    Returns:
+        dict: The results document.
+    """
+    results = []
+    pool = WorkerPool(max_workers=1)
+    with tempfile.TemporaryDirectory() as directory:
+        context = {"directory": directory, "repeat": repeat, "mp_calls": mp_calls,
+                   "commands": load_plugins(), "pool": pool}
+        for size in sizes:
+            records = make_records(size, mix)
+            for name in case_names:
+                size_dependent = CASES[name][1]
+                if not size_dependent and size != sizes[0]:
+                    continue
+                result = run_case(name, records, context, measure_memory)
+                result["size"] = size if size_dependent else None
+                results.append(result)
+                print(format_result(result), flush=True)
+    pool.shutdown()
+    return {
+        "meta": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "sizes": sizes,
+            "mix": mix,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+def format_result(result: dict) -> str:
+    """
+    Format a case result as one table row.
+    """
+    size = result.get("size")
+    memory = result["peak_memory_bytes"]
+    return (f"{result['case']:<28} {size if size is not None else '-':>9} {result['ops_per_sec'] or 0:>12.0f} "
+            f"{result['latency_us']['p50']:>10.1f} {result['latency_us']['p99']:>10.1f} "
+            f"{memory / 1e6 if memory is not None else float('nan'):>9.1f}")
+
+def compare_results(baseline: dict, current: dict, threshold: float = 0.1) -> list:
+    """
+    Compare two results documents case by case.
+
+    Args:
+        baseline (dict): The reference results.
+        current (dict): The results to check.
+        threshold (float): The relative slowdown that counts as a regression.
+
+    Returns:
+        list: One dict per case present in both, with the throughput and p99 ratios and
+        whether the case regressed.
+    """
+    reference = {(result["case"], result.get("size")): result for result in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        old = reference.get((result["case"], result.get("size")))
+        if old is None or not old["ops_per_sec"] or not result["ops_per_sec"]:
+            continue
+        throughput = result["ops_per_sec"] / old["ops_per_sec"]
+        p99 = result["latency_us"]["p99"] / old["latency_us"]["p99"] if old["latency_us"]["p99"] else 1.0
+        rows.append({
+            "case": result["case"],
+            "size": result.get("size"),
+            "throughput_ratio": throughput,
+            "p99_ratio": p99,
+            "regressed": throughput < 1 - threshold or p99 > 1 + threshold,
+        })
+    return rows
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="Run the suite and write a results file")
+    run.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                     help="Comma-separated history sizes, e.g. 1000,1e5,1e7")
+    run.add_argument("--cases", default=",".join(CASES), help="Comma-separated case names")
+    run.add_argument("--mix", default=None, help="Operation weights, e.g. add=3,divide=1 (default: Faker's mix)")
+    run.add_argument("--repeat", type=int, default=5, help="Calls per measurement for the bulk cases")
+    run.add_argument("--mp-calls", type=int, default=200, help="Calculations sent to the worker pool")
+    run.add_argument("--no-memory", action="store_true", help="Skip the traced run that measures peak memory")
+    run.add_argument("--output", default="benchmark_results.json", help="Results file to write")
+    compare = commands.add_parser("compare", help="Compare two results files")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=0.1, help="Relative change that counts as a regression")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        case_names = [name.strip() for name in args.cases.split(",")]
+        unknown = [name for name in case_names if name not in CASES]
+        if unknown:
+            parser.error(f"unknown cases: {', '.join(unknown)} (available: {', '.join(CASES)})")
+        sizes = [int(float(size)) for size in args.sizes.split(",")]
+        print(f"{'case':<28} {'size':>9} {'ops/sec':>12} {'p50 us':>10} {'p99 us':>10} {'peak MB':>9}")
+        document = run_suite(sizes, case_names, parse_mix(args.mix) if args.mix else None,
+                             args.repeat, args.mp_calls, not args.no_memory)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+        print(f"Results written to {args.output}")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+    rows = compare_results(baseline, current, args.threshold)
+    print(f"{'case':<28} {'size':>9} {'ops/sec x':>10} {'p99 x':>8}")
+    for row in rows:
+        size = row["size"] if row["size"] is not None else "-"
+        flag = "  REGRESSION" if row["regressed"] else ""
+        print(f"{row['case']:<28} {size:>9} {row['throughput_ratio']:>10.2f} {row['p99_ratio']:>8.2f}{flag}")
+    regressions = sum(row["regressed"] for row in rows)
+    print(f"{regressions} regression(s) beyond {args.threshold:.0%}.")
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
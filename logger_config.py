@@ -1,45 +1,127 @@
+import atexit
 import logging
-import logging.config
+import logging.handlers
 import os
+import queue
+import sys
+
+DEFAULT_QUEUE_SIZE = 10000
+QUEUE_POLICIES = ("drop", "block")
+
+_listener = None
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    A QueueHandler for a bounded queue that either drops records or blocks the caller
+    when the queue is full, counting the records it dropped.
+    """
+    def __init__(self, log_queue: queue.Queue, policy: str = "drop"):
+        """
+        Initialize a BoundedQueueHandler.
+
+        Args:
+            log_queue (queue.Queue): The bounded queue drained by a QueueListener.
+            policy (str): "drop" to discard records on overflow, "block" to wait for space.
+        """
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"Unknown log queue policy: {policy} (expected one of {', '.join(QUEUE_POLICIES)})")
+        super().__init__(log_queue)
+        self.policy = policy
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        if self.policy == "block":
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class _DrainingQueueListener(logging.handlers.QueueListener):
+    """
+    A QueueListener whose stop waits for room in a full queue instead of failing.
+    """
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+def _build_handlers(log_level: str, log_file: str) -> list:
+    formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    console = logging.StreamHandler(sys.stdout)
+    rotating_file = logging.handlers.RotatingFileHandler(
+        log_file, mode="a",
+        maxBytes=int(os.getenv("LOG_MAX_BYTES", str(1 << 20))),
+        backupCount=int(os.getenv("LOG_BACKUP_COUNT", "5")),
+        encoding="utf-8",
+    )
+    for handler in (console, rotating_file):
+        handler.setLevel(log_level)
+        handler.setFormatter(formatter)
+    return [console, rotating_file]
+
+def stop_logging():
+    """
+    Stop the background logging thread after it has written every queued record.
+    """
+    global _listener  # pylint: disable=global-statement
+    if _listener is not None:
+        _listener.stop()
+        dropped = dropped_records()
+        for handler in _listener.handlers:
+            if dropped:
+                handler.handle(logging.makeLogRecord({
+                    "name": "root", "levelno": logging.WARNING, "levelname": "WARNING",
+                    "msg": f"Dropped {dropped} log records because the log queue was full.",
+                }))
+            handler.close()
+        _listener = None
 
 # Configure logging with dynamic settings
 def configure_logging(log_level=None):
+    """
+    Route log records through a bounded queue to a background thread that writes them to
+    stdout and a size-rotated log file, so callers never wait on console or disk I/O.
+
+    Settings come from the environment: LOG_LEVEL, LOG_FILE, LOG_MAX_BYTES and
+    LOG_BACKUP_COUNT for the output, LOG_QUEUE_SIZE and LOG_QUEUE_POLICY (drop or block)
+    for the queue, and LOG_ASYNC=0 to write synchronously from the calling thread.
+
+    Args:
+        log_level (str): Optional level overriding LOG_LEVEL.
+    """
+    global _listener  # pylint: disable=global-statement
     os.makedirs("logs", exist_ok=True)  # Ensure the logs directory exists
 
     # Load environment variables for logging configuration if not explicitly passed
     log_level = log_level or os.getenv("LOG_LEVEL", "INFO").upper()  # Default to INFO if not set
     log_file = os.getenv("LOG_FILE", "logs/application.log")  # Default log file location
-    log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-
-    # Configure logging settings
-    logging_config = {
-        "version": 1,
-        "disable_existing_loggers": False,
-        "formatters": {
-            "standard": {
-                "format": log_format
-            }
-        },
-        "handlers": {
-            "console": {
-                "level": log_level,
-                "class": "logging.StreamHandler",
-                "formatter": "standard",
-                "stream": "ext://sys.stdout"
-            },
-            "file": {
-                "level": log_level,
-                "class": "logging.FileHandler",
-                "formatter": "standard",
-                "filename": log_file,
-                "mode": "a"
-            }
-        },
-        "root": {
-            "level": log_level,
-            "handlers": ["console", "file"]
-        }
-    }
-
-    # Apply logging configuration
-    logging.config.dictConfig(logging_config)
\ No newline at end of file
+
+    stop_logging()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.setLevel(log_level)
+
+    handlers = _build_handlers(log_level, log_file)
+    if os.getenv("LOG_ASYNC", "1") == "0":
+        for handler in handlers:
+            root.addHandler(handler)
+        return
+
+    log_queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", str(DEFAULT_QUEUE_SIZE))))
+    root.addHandler(BoundedQueueHandler(log_queue, os.getenv("LOG_QUEUE_POLICY", "drop")))
+    _listener = _DrainingQueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+def dropped_records() -> int:
+    """
+    Return how many log records the queue handler has dropped because the queue was full.
+
+    Returns:
+        int: The number of dropped records.
+    """
+    return sum(handler.dropped for handler in logging.getLogger().handlers
+               if isinstance(handler, BoundedQueueHandler))
+
+atexit.register(stop_logging)
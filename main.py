@@ -1,17 +1,31 @@
-import multiprocessing
 import sys
-import importlib
 import os
-from decimal import Decimal, InvalidOperation
-from collections import OrderedDict
+import time
+from decimal import InvalidOperation
 import logging
 import logging.config
-import pandas as pd
 from dotenv import load_dotenv
 from app.calculations import Calculations
 from app.calculation import Calculation
+from app.history_query import HistoryQuery, QUERY_USAGE
+from app.history_stats import format_summary
+from app.batch import plan_batch, run_batch, run_sharded_batch, DEFAULT_CHUNK_SIZE
+from app.execution_planner import get_planner
+from app.expression import EXPRESSION_USAGE, get_evaluator
+from app.instrumentation import get_metrics
+from app.log_sampling import get_sampler
+from app.numeric import get_backend, set_backend
+from app.plugin_loader import load_plugins
+from app.result_cache import get_cache
+from app.worker_pool import (CalculationTimeout, get_calculation_timeout, get_pool, get_thread_pool,
+                             set_calculation_timeout, shutdown_pool)
 from logger_config import configure_logging
 
+USAGE = ("Usage: python main.py <number1> <number2> <operation> [mp] or python main.py repl "
+         "or python main.py batch <input.csv> <output.csv> [history] [mp|sharded|auto] "
+         "or python main.py serve [--port N] [--unix PATH] [--history shared|connection|none] "
+         "(options: --mode decimal|float|fixed)")
+
 # Load environment variables
 def load_environment_variables():
     load_dotenv()
@@ -20,89 +34,164 @@ def load_environment_variables():
     return settings
 
 
-# Load plugins dynamically
-def load_plugins():
-    commands = OrderedDict()
-    plugins_dir = os.path.join('app', 'plugins')
-    
-    if not os.path.exists(plugins_dir):
-        logging.warning(f"Plugins directory not found: {plugins_dir}")
-        return commands
-    
-    for filename in os.listdir(plugins_dir):
-        if filename.endswith('_command.py'):
-            try:
-                module_name = filename[:-3]  
-                module = importlib.import_module(f'app.plugins.{module_name}')
-                command_class = getattr(module, module_name[:-8].capitalize() + 'Command')
-                commands[module_name[:-8]] = command_class()
-                logging.info(f"Loaded plugin: {module_name}")
-            except (ImportError, AttributeError) as e:
-                logging.error(f"Failed to load plugin {module_name}: {e}")
-
-    return commands
+def _display_max_rows() -> int:
+    """
+    Return pandas' display.max_rows option. pandas is imported here rather than at module
+    level so that single-shot calculations never load it.
+    """
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+    return pd.get_option("display.max_rows")
 
 # Decorator for logging execution
 def log_execution(func):
     def wrapper(*args, **kwargs):
-        logging.info(f"Executing {func.__name__}")
+        get_sampler().log(func.__name__, logging.INFO, "Executing %s", func.__name__)
         try:
             return func(*args, **kwargs)
         except Exception as e:
-            logging.error(f"Error in {func.__name__}: {e}")
+            logging.error("Error in %s: %s", func.__name__, e)
             raise
     return wrapper
 
+def _calculate(commands, operation_type, command, num1, num2, use_multiprocessing=False, timeout=None):
+    """
+    Run one calculation through the result cache. A lone calculation always runs inline
+    unless it goes to the pool for mp, or might have to be stopped at a deadline; only then
+    is the planner (and its calibration) worth consulting.
+
+    Args:
+        commands: The plugin commands, for the planner.
+        operation_type (str): The operation name.
+        command (Command): Its command.
+        num1: The first number.
+        num2: The second number.
+        use_multiprocessing (bool): Whether to run it on the worker pool.
+        timeout (float): The deadline in seconds; defaults to the calculation timeout.
+
+    Returns:
+        tuple: The result and the strategy it ran with.
+
+    Raises:
+        CalculationTimeout: If the calculation missed the deadline.
+    """
+    timeout = timeout or get_calculation_timeout()
+    strategy = "inline"
+    compute = lambda: command.execute(num1, num2)
+    if use_multiprocessing or timeout:
+        planner = get_planner(commands)
+        decision = planner.plan_calculation(operation_type, num1, num2,
+                                            "process" if use_multiprocessing else None, timeout)
+        strategy = decision.strategy
+        if strategy == "process":
+            run = lambda: get_pool().calculate(operation_type, num1, num2, timeout)
+        elif strategy == "thread":
+            run = lambda: get_thread_pool().calculate(operation_type, num1, num2)
+        else:
+            run = compute
+        compute = lambda: planner.measure(decision, run)
+    return get_cache().get_or_compute(command, num1, num2, compute), strategy
+
 @log_execution
 def perform_calculation_and_display(num1, num2, operation_type, commands, use_multiprocessing=False):
-    logging.debug(f"Starting calculation: {num1} {operation_type} {num2}")
+    logging.debug("Starting calculation: %s %s %s", num1, operation_type, num2)
+    metrics = get_metrics()
+    metrics.count_call(operation_type)
+    started = metrics.clock()
     try:
-        decimal_num1, decimal_num2 = map(Decimal, [num1, num2])
+        decimal_num1, decimal_num2 = map(get_backend().parse, [num1, num2])
+        started = metrics.record(operation_type, "parse", started)
         operation_function = commands.get(operation_type)
+        started = metrics.record(operation_type, "dispatch", started)
         if not operation_function:
-            logging.warning(f"Unknown operation: {operation_type}")
+            metrics.count_error(operation_type)
+            logging.warning("Unknown operation: %s", operation_type)
             print(f"Unknown operation: {operation_type}")
             return
         
-        # Perform the calculation
-        if use_multiprocessing:
-            logging.debug("Using multiprocessing for calculation.")
-            # Multiprocessing code here
-            result_queue = multiprocessing.Queue()
-            process = multiprocessing.Process(
-                target=operation_function.execute_multiprocessing,
-                args=(decimal_num1, decimal_num2, result_queue)
-            )
-            process.start()
-            process.join()
-            
-            # Retrieve the result from the queue
-            if not result_queue.empty():
-                result = result_queue.get()
-                logging.info(f"Calculated {operation_type} result using multiprocessing: {result}")
-                print(f"The result of {num1} {operation_type} {num2} using multiprocessing is {result}")
-            else:
-                logging.error("Failed to retrieve the result from the multiprocessing queue.")
-                print("Error: Multiprocessing calculation failed.")
+        result, strategy = _calculate(commands, operation_type, operation_function, decimal_num1, decimal_num2, use_multiprocessing)
+        started = metrics.record(operation_type, "execute", started)
+        if strategy == "process":
+            logging.debug("Used the worker pool for calculation.")
+            get_sampler().log("calculation", logging.INFO,
+                              "Calculated %s result using multiprocessing: %s", operation_type, result)
+            print(f"The result of {num1} {operation_type} {num2} using multiprocessing is {result}")
         else:
-            result = operation_function.execute(decimal_num1, decimal_num2)
-            logging.info(f"Calculated {operation_type} result: {result}")
+            get_sampler().log("calculation", logging.INFO, "Calculated %s result: %s", operation_type, result)
             print(f"The result of {num1} {operation_type} {num2} is {result}")
+        started = metrics.record(operation_type, "display", started)
 
         # Save result in history
         calculation = Calculation(decimal_num1, decimal_num2, operation_function)
-        calculation_result = calculation.operate()
+        calculation.result = result
         Calculations.add_calculation(calculation)
+        metrics.record(operation_type, "history", started)
         logging.debug("Calculation stored in history.")
 
+    except CalculationTimeout as e:
+        metrics.count_error(operation_type)
+        logging.warning("Calculation timed out: %s %s %s", num1, operation_type, num2)
+        print(f"Timed out: {num1} {operation_type} {num2} did not finish within {e.seconds:g}s.")
     except InvalidOperation:
-        logging.error(f"Invalid input: {num1}, {num2}")
+        metrics.count_error(operation_type)
+        logging.error("Invalid input: %s, %s", num1, num2)
         print(f"Invalid number input: {num1} or {num2} is not a valid number.")
     except Exception as e:
-        logging.error(f"Unexpected error during calculation: {e}")
+        metrics.count_error(operation_type)
+        logging.error("Unexpected error during calculation: %s", e)
         print(f"An error occurred: {e}")
 
 
+@log_execution
+def evaluate_expression_and_display(text, commands):
+    """
+    Evaluate an expression and display its result. Only the outermost call of the
+    expression is stored in the history, not every intermediate step.
+    """
+    logging.debug("Evaluating expression: %s", text)
+    metrics = get_metrics()
+    metrics.count_call("eval")
+    started = metrics.clock()
+    timeout = get_calculation_timeout()
+    deadline = time.monotonic() + timeout if timeout else None
+
+    def execute(command, num1, num2):
+        # Every call goes where a single calculation would, within what is left of the deadline
+        remaining = None
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise CalculationTimeout(timeout)
+        try:
+            return _calculate(commands, command.operation_name, command, num1, num2, timeout=remaining)[0]
+        except CalculationTimeout:
+            raise CalculationTimeout(timeout) from None
+
+    try:
+        latest = Calculations.get_latest()
+        result, last_call = get_evaluator(commands).evaluate(text, latest["result"] if latest else None, execute)
+        started = metrics.record("eval", "execute", started)
+        get_sampler().log("calculation", logging.INFO, "Evaluated expression %s: %s", text, result)
+        print(f"The result of {text} is {result}")
+        if last_call:
+            command, num1, num2 = last_call
+            calculation = Calculation(num1, num2, command)
+            calculation.result = result
+            Calculations.add_calculation(calculation)
+            metrics.record("eval", "history", started)
+    except CalculationTimeout as e:
+        metrics.count_error("eval")
+        logging.warning("Expression timed out: %s", text)
+        print(f"Timed out: {text} did not finish within {e.seconds:g}s.")
+    except ValueError as e:
+        metrics.count_error("eval")
+        logging.warning("Invalid expression %s: %s", text, e)
+        print(e)
+        print(EXPRESSION_USAGE)
+    except Exception as e:
+        metrics.count_error("eval")
+        logging.error("Unexpected error during evaluation: %s", e)
+        print(f"An error occurred: {e}")
+
 # Run the REPL interface
 @log_execution
 def run_repl(commands):
@@ -115,6 +204,8 @@ def run_repl(commands):
     while True:
         user_input = input("Enter command: ")
         if user_input == 'exit':
+            Calculations.close_journal()
+            shutdown_pool()
             print("Exiting REPL mode...")
             break
         elif user_input == 'menu':
@@ -123,11 +214,14 @@ def run_repl(commands):
                 print(f"- {cmd_name}")
             continue
         elif user_input == 'history':
-            history_df = Calculations.get_all_calculations()
-            if history_df.empty:
+            count = Calculations.count()
+            if count == 0:
                 print("No calculations in history.")
+            elif count > _display_max_rows():
+                print(Calculations.preview_history())
+                print(f"[{count} rows x 4 columns]")
             else:
-                print(history_df)
+                print(Calculations.get_all_calculations())
             continue
         elif user_input == 'clear_history':
             Calculations.clear_history()
@@ -140,12 +234,27 @@ def run_repl(commands):
             continue
         elif user_input.startswith('load_history'):
             _, filepath = user_input.split(maxsplit=1)
-            if os.path.exists(filepath):
+            if os.path.exists(filepath) or os.path.exists(filepath + ".journal"):
                 Calculations.load_history(filepath)
                 print(f"History loaded from {filepath}.")
             else:
                 print(f"File not found: {filepath}")
             continue
+        elif user_input.startswith('journal_history'):
+            try:
+                _, filepath = user_input.split(maxsplit=1)
+                Calculations.open_journal(filepath)
+                print(f"Journaling history changes to {filepath}.journal.")
+            except ValueError:
+                print("Usage: journal_history <filepath>")
+            continue
+        elif user_input == 'compact_history':
+            try:
+                Calculations.compact_history()
+                print("History journal compacted.")
+            except RuntimeError as e:
+                print(e)
+            continue
         elif user_input == 'latest':
             # Display the latest calculation
             latest_calculation = Calculations.get_latest()
@@ -156,11 +265,104 @@ def run_repl(commands):
             continue
         elif user_input.startswith('delete_history'):
             try:
-                _, index_str = user_input.split(maxsplit=1)
-                index = int(index_str)
-                Calculations.delete_history(index)
+                args = user_input.split()[1:]
+                if len(args) == 2 and args[0] == 'operation':
+                    print(f"Deleted {Calculations.delete_operation(args[1])} calculations.")
+                elif len(args) == 1 and ':' in args[0]:
+                    start, end = args[0].split(':')
+                    print(f"Deleted {Calculations.delete_records(range(int(start), int(end)))} calculations.")
+                elif len(args) > 1:
+                    print(f"Deleted {Calculations.delete_records([int(arg) for arg in args])} calculations.")
+                else:
+                    Calculations.delete_history(int(args[0]))
             except (ValueError, IndexError):
-                print("Usage: delete_history <index>")
+                print("Usage: delete_history <index> [<index> ...] | <start>:<end> | operation <name>")
+            continue
+        elif user_input == 'summary' or user_input.startswith('summary '):
+            operation = user_input[len('summary'):].strip() or None
+            summary = Calculations.summary(operation)
+            if summary:
+                print(format_summary(summary))
+            elif operation:
+                print(f"No calculations for operation: {operation}")
+            else:
+                print("No calculations in history.")
+            continue
+        elif user_input == 'query' or user_input.startswith('query '):
+            text = user_input[len('query'):].strip()
+            explain = text == 'explain' or text.startswith('explain ')
+            try:
+                query = HistoryQuery.parse(text[len('explain'):] if explain else text)
+            except ValueError as e:
+                print(e)
+                print(QUERY_USAGE)
+                continue
+            if explain:
+                print(Calculations.explain_query(query))
+                continue
+            matches = Calculations.query(query)
+            print(matches if len(matches) else "No matching calculations.")
+            continue
+        elif user_input == 'cache' or user_input == 'cache clear':
+            if user_input == 'cache clear':
+                get_cache().clear()
+                print("Result cache cleared.")
+            for name, value in get_cache().stats().items():
+                print(f"{name}: {value}")
+            continue
+        elif user_input == 'timeout' or user_input.startswith('timeout '):
+            parts = user_input.split()
+            if len(parts) == 2:
+                try:
+                    set_calculation_timeout(0 if parts[1] == 'off' else parts[1])
+                except ValueError as e:
+                    print(e)
+                    continue
+            timeout = get_calculation_timeout()
+            print(f"Calculation timeout: {timeout:g}s" if timeout else "Calculation timeout: off")
+            continue
+        elif user_input == 'eval' or user_input.startswith('eval '):
+            text = user_input[len('eval'):].strip()
+            if text:
+                evaluate_expression_and_display(text, commands)
+            else:
+                print(EXPRESSION_USAGE)
+            continue
+        elif user_input == 'plan' or user_input == 'plan calibrate':
+            planner = get_planner(commands)
+            if user_input == 'plan calibrate':
+                planner.calibrate()
+            print(planner.report())
+            continue
+        elif user_input == 'stats' or user_input.startswith('stats '):
+            metrics = get_metrics()
+            option = user_input[len('stats'):].strip()
+            if option in ('on', 'off'):
+                metrics.enabled = option == 'on'
+            elif option == 'reset':
+                metrics.reset()
+                get_sampler().reset()
+            elif option:
+                print("Usage: stats [on|off|reset]")
+                continue
+            if not metrics.enabled:
+                print("Instrumentation is off. Use 'stats on' or set METRICS_ENABLED=1 to enable it.")
+            elif not metrics.calls:
+                print("No calculations recorded yet.")
+            else:
+                print(metrics.report())
+            if get_sampler().seen:
+                print(get_sampler().report())
+            continue
+        elif user_input == 'mode' or user_input.startswith('mode '):
+            parts = user_input.split()
+            if len(parts) == 2:
+                try:
+                    set_backend(parts[1])
+                except ValueError as e:
+                    print(e)
+                    continue
+            print(f"Numeric mode: {get_backend().name}")
             continue
         elif user_input.startswith('filter_with_operation'):
             try:
@@ -191,6 +393,28 @@ def run_repl(commands):
 
 
 
+# Strip the --mode flag from the command-line arguments
+def apply_mode_flag(argv):
+    """
+    Select the numeric backend from a `--mode <name>` or `--mode=<name>` argument.
+
+    Returns:
+        list: The arguments without the flag.
+
+    Raises:
+        ValueError: If the mode is not a known backend.
+    """
+    remaining = []
+    args = iter(argv)
+    for arg in args:
+        if arg == '--mode':
+            set_backend(next(args, 'decimal'))
+        elif arg.startswith('--mode='):
+            set_backend(arg.split('=', 1)[1])
+        else:
+            remaining.append(arg)
+    return remaining
+
 # Main function
 @log_execution
 def main():
@@ -198,27 +422,58 @@ def main():
     Main function to handle command-line arguments and initiate the calculation.
     """
     commands = load_plugins()  
+    try:
+        argv = apply_mode_flag(sys.argv)
+    except ValueError as e:
+        print(e)
+        print(USAGE)
+        sys.exit(1)
+
+    if len(argv) >= 4 and argv[1] == 'batch':
+        input_path, output_path = argv[2:4]
+        flags = argv[4:]
+        chunk_size = int(os.getenv("BATCH_CHUNK_SIZE", str(DEFAULT_CHUNK_SIZE)))
+        deadline = float(os.getenv("BATCH_TIMEOUT") or 0) or None
+        if 'auto' in flags:
+            planner = get_planner(commands)
+            decision = plan_batch(input_path, planner, chunk_size, deadline=deadline)
+            pool = {"thread": get_thread_pool(), "process": get_pool()}.get(decision.strategy)
+            summary = planner.measure(decision, lambda: run_batch(input_path, output_path, commands, chunk_size,
+                                                                  'history' in flags, pool, deadline))
+            print(decision)
+        elif 'sharded' in flags:
+            summary = run_sharded_batch(input_path, output_path, commands, get_pool(), chunk_size=chunk_size,
+                                        record_history='history' in flags, deadline=deadline)
+        else:
+            # Only work running in worker processes can be stopped at the deadline
+            pool = get_pool() if 'mp' in flags or deadline else None
+            summary = run_batch(input_path, output_path, commands, chunk_size, 'history' in flags, pool, deadline)
+        print(summary)
+
+    elif len(argv) >= 2 and argv[1] == 'serve':
+        from app.server import run_server  # pylint: disable=import-outside-toplevel
+        run_server(commands, argv[2:])
 
-    if len(sys.argv) == 4:  
-        _, num1, num2, operation_type = sys.argv
+    elif len(argv) == 4:  
+        _, num1, num2, operation_type = argv
         perform_calculation_and_display(num1, num2, operation_type, commands)
         
-    elif len(sys.argv) == 5:  
-        _, num1, num2, operation_type, mp_flag = sys.argv
+    elif len(argv) == 5:  
+        _, num1, num2, operation_type, mp_flag = argv
         use_multiprocessing = mp_flag == "mp"
         perform_calculation_and_display(num1, num2, operation_type, commands, use_multiprocessing)
     
-    elif len(sys.argv) == 2 and sys.argv[1] == 'repl':  
+    elif len(argv) == 2 and argv[1] == 'repl':  
         run_repl(commands)
         
     else:
-        print("Usage: python main.py <number1> <number2> <operation> [mp] or python main.py repl")
+        print(USAGE)
 
 # Entry point
 if __name__ == '__main__':
     settings = load_environment_variables()
     log_level = settings.get("LOG_LEVEL", "INFO").upper()
     configure_logging(log_level=log_level)
-    logging.info(f"Environment: {settings.get('ENVIRONMENT')}")
+    logging.info("Environment: %s", settings.get('ENVIRONMENT'))
     logging.info("Application started.")
     main()
@@ -0,0 +1,177 @@
+# tests/test_batch.py
+import csv
+from multiprocessing import shared_memory
+import time
+from decimal import Decimal
+import pytest
+from app import batch
+from app.batch import evaluate_chunk, evaluate_shard, read_chunks, run_batch, run_sharded_batch, shard_ranges
+from app.calculations import Calculations
+from app.plugins.add_command import AddCommand
+from app.plugins.divide_command import DivideCommand
+from app.plugins.square_command import SquareCommand
+from app.shm_transport import SharedColumn
+from app.worker_pool import WorkerPool
+
+@pytest.fixture
+def commands():
+    return {"add": AddCommand(), "divide": DivideCommand(), "square": SquareCommand()}
+
+@pytest.fixture(autouse=True)
+def setup_calculations():
+    Calculations.clear_history()
+    yield
+    Calculations.clear_history()
+
+def write_input(path, lines):
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+def read_output(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+def test_run_batch_writes_results(tmp_path, commands):
+    input_path, output_path = tmp_path / "in.csv", tmp_path / "out.csv"
+    write_input(input_path, ["operation,num1,num2", "add,2,3", "divide,6,3", "square,4,0"])
+    summary = run_batch(str(input_path), str(output_path), commands, chunk_size=2)
+    rows = read_output(output_path)
+    assert rows[0] == ["operation", "num1", "num2", "result", "error"]
+    assert rows[1:] == [["add", "2", "3", "5", ""], ["divide", "6", "3", "2", ""], ["square", "4", "0", "16", ""]]
+    assert summary.rows == 3
+    assert summary.errors == 0
+    assert summary.chunks == 2
+    assert "3 rows" in str(summary)
+
+def test_run_batch_captures_row_errors(tmp_path, commands):
+    input_path, output_path = tmp_path / "in.csv", tmp_path / "out.csv"
+    write_input(input_path, ["divide,1,0", "power,2,3", "add,x,3", "add,1", "add,1,1"])
+    summary = run_batch(str(input_path), str(output_path), commands)
+    rows = read_output(output_path)[1:]
+    assert summary.rows == 5
+    assert summary.errors == 4
+    assert rows[0][4].startswith("DivisionByZero")
+    assert rows[1][4] == "Unknown operation: power"
+    assert rows[2][4].startswith("Invalid number input")
+    assert rows[3] == ["add", "1", "", "", "Expected 3 fields, got 2"]
+    assert rows[4] == ["add", "1", "1", "2", ""]
+
+def test_run_batch_records_history(tmp_path, commands):
+    input_path, output_path = tmp_path / "in.csv", tmp_path / "out.csv"
+    write_input(input_path, ["add,2,3", "divide,1,0"])
+    run_batch(str(input_path), str(output_path), commands, record_history=True)
+    history = Calculations.get_all_calculations()
+    assert len(history) == 1
+    assert history.iloc[0]["result"] == Decimal(5)
+
+def test_read_chunks_bounds_chunk_size():
+    rows = [["operation", "num1", "num2"]] + [["add", "1", "1"]] * 5
+    chunks = list(read_chunks(iter(rows), 2))
+    assert [len(chunk) for chunk in chunks] == [1, 2, 2]
+
+@pytest.mark.parametrize("content", [b"operation,num1,num2\nadd,1,2\nadd,3,4\n", b"add,1,2\r\nadd,3,4", b"add,1,2\n", b""])
+@pytest.mark.parametrize("shards", [1, 2, 3, 10])
+def test_shard_ranges_cover_whole_lines(tmp_path, content, shards):
+    path = tmp_path / "in.csv"
+    path.write_bytes(content)
+    ranges = shard_ranges(str(path), shards)
+    assert b"".join(content[start:end] for start, end in ranges) == content
+    assert len(ranges) <= shards
+    for start, _ in ranges:
+        assert start == 0 or content[start - 1:start] == b"\n"
+
+@pytest.fixture
+def pool():
+    pool = WorkerPool(max_workers=2)
+    yield pool
+    pool.shutdown()
+
+def test_sharded_batch_matches_single_process(tmp_path, commands, pool):
+    lines = ["operation,num1,num2"] + [f"{['add', 'divide', 'square'][index % 3]},{index}.5,{index % 4}"
+                                       for index in range(200)] + ["power,1,2", "add,1", "", "add,x,1"]
+    input_path = tmp_path / "in.csv"
+    write_input(input_path, lines)
+    run_batch(str(input_path), str(tmp_path / "single.csv"), commands)
+    summary = run_sharded_batch(str(input_path), str(tmp_path / "sharded.csv"), commands, pool, shards=7, chunk_size=9)
+    assert (tmp_path / "sharded.csv").read_bytes() == (tmp_path / "single.csv").read_bytes()
+    assert summary.rows == 204 and summary.chunks == 7
+    assert summary.errors == 4 + sum(1 for index in range(200) if index % 3 == 1 and index % 4 == 0)
+    # The shard outputs are removed after the merge
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["in.csv", "sharded.csv", "single.csv"]
+
+def test_pool_batch_reads_results_from_shared_memory(tmp_path, commands, pool, monkeypatch):
+    names = []
+    created = SharedColumn.__init__
+    def recording_init(self, length, name=None):
+        created(self, length, name)
+        if name is None:
+            names.append(self.name)
+    monkeypatch.setattr(SharedColumn, "__init__", recording_init)
+    lines = [f"{['add', 'divide', 'square'][index % 3]},{index}.50,{index % 4}" for index in range(50)]
+    input_path = tmp_path / "in.csv"
+    write_input(input_path, lines + ["add,1e30,1", "power,1,2", "add,x,1", "divide,1,3"])
+    run_batch(str(input_path), str(tmp_path / "single.csv"), commands, chunk_size=8)
+    summary = run_batch(str(input_path), str(tmp_path / "pool.csv"), commands, chunk_size=8, pool=pool,
+                        record_history=True)
+    assert (tmp_path / "pool.csv").read_bytes() == (tmp_path / "single.csv").read_bytes()
+    assert summary.rows == 54 and summary.chunks == 7 and Calculations.count() == 54 - summary.errors
+    # Three blocks per chunk, all unlinked once the chunk is written
+    assert len(names) == 3 * 7
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+def test_sharded_batch_records_history(tmp_path, commands, pool):
+    input_path = tmp_path / "in.csv"
+    write_input(input_path, ["add,2,3", "divide,1,0", "square,1.50,0"])
+    run_sharded_batch(str(input_path), str(tmp_path / "out.csv"), commands, pool, shards=2, record_history=True)
+    history = Calculations.get_all_calculations()
+    assert history["result"].tolist() == [Decimal(5), Decimal("2.2500")]
+
+def slow_evaluate_chunk(chunk, mode):
+    """
+    evaluate_chunk, except that chunks with a `sleep` row never finish in time.
+    """
+    if any(row[0] == "sleep" for row in chunk):
+        time.sleep(30)
+    return evaluate_chunk(chunk, mode)
+
+def slow_evaluate_shard(input_path, start, end, output_path, mode, chunk_size):
+    """
+    evaluate_shard, except that every shard after the first never finishes in time.
+    """
+    if start:
+        time.sleep(30)
+    return evaluate_shard(input_path, start, end, output_path, mode, chunk_size)
+
+def test_run_batch_deadline_times_out_the_rest(tmp_path, commands, monkeypatch):
+    monkeypatch.setattr(batch, "evaluate_chunk", slow_evaluate_chunk)
+    input_path, output_path = tmp_path / "in.csv", tmp_path / "out.csv"
+    write_input(input_path, ["add,1,1", "add,2,2", "sleep,0,0", "add,3,3", "add,4,4", "add,5,5"])
+    pool = WorkerPool(max_workers=1)
+    summary = run_batch(str(input_path), str(output_path), commands, chunk_size=2, pool=pool, deadline=0.5)
+    pool.shutdown()
+    rows = read_output(output_path)[1:]
+    assert rows[:2] == [["add", "1", "1", "2", ""], ["add", "2", "2", "4", ""]]
+    assert [row[:3] for row in rows[2:]] == [["sleep", "0", "0"], ["add", "3", "3"], ["add", "4", "4"], ["add", "5", "5"]]
+    assert all(row[4].startswith("CalculationTimeout: the batch deadline of 0.5s") for row in rows[2:])
+    assert (summary.rows, summary.errors, summary.timed_out, summary.chunks) == (6, 4, 4, 3)
+    assert summary.elapsed < 10 and "4 timed out" in str(summary)
+
+def test_inline_batch_stops_between_chunks(tmp_path, commands):
+    input_path, output_path = tmp_path / "in.csv", tmp_path / "out.csv"
+    write_input(input_path, ["add,1,1", "add,2,2"])
+    summary = run_batch(str(input_path), str(output_path), commands, chunk_size=1, deadline=0)
+    assert summary.timed_out == 2 and summary.chunks == 2
+
+def test_sharded_batch_deadline_keeps_row_order(tmp_path, commands, monkeypatch):
+    monkeypatch.setattr(batch, "evaluate_shard", slow_evaluate_shard)
+    input_path, output_path = tmp_path / "in.csv", tmp_path / "out.csv"
+    write_input(input_path, ["operation,num1,num2"] + [f"add,{index},1" for index in range(20)])
+    pool = WorkerPool(max_workers=2)
+    summary = run_sharded_batch(str(input_path), str(output_path), commands, pool, shards=2, deadline=0.5)
+    pool.shutdown()
+    rows = read_output(output_path)[1:]
+    assert [row[:3] for row in rows] == [["add", str(index), "1"] for index in range(20)]
+    finished = [row for row in rows if not row[4]]
+    assert finished and all(row[3] == str(int(row[1]) + 1) for row in finished)
+    assert summary.timed_out == 20 - len(finished) > 0 and summary.chunks == 2
@@ -0,0 +1,38 @@
+# tests/test_benchmark_suite.py
+import json
+from benchmarks import suite
+
+def test_make_records_cycles_and_reweights():
+    records = suite.make_records(30, {"add": 1, "square": 0})
+    assert len(records) == 30
+    assert {record["operation"] for record in records} == {"add"}
+    assert set(records[0]) == {"operation", "num1", "num2", "result"}
+
+def test_parse_mix():
+    assert suite.parse_mix("add=3, divide") == {"add": 3.0, "divide": 1.0}
+
+def test_run_suite_records_metrics():
+    document = suite.run_suite([50], ["history.add_record", "history.load_npz", "plugins.load"], repeat=2)
+    results = {result["case"]: result for result in document["results"]}
+    assert results["history.add_record"]["ops"] == 50 and results["history.add_record"]["size"] == 50
+    assert results["history.load_npz"]["ops"] == 100
+    assert results["plugins.load"]["size"] is None
+    for result in results.values():
+        assert result["ops_per_sec"] > 0
+        assert result["latency_us"]["p50"] <= result["latency_us"]["p99"]
+        assert result["peak_memory_bytes"] > 0
+    json.dumps(document)
+
+def test_compare_flags_regressions(tmp_path, capsys):
+    def document(ops_per_sec, p99):
+        return {"results": [{"case": "history.add_record", "size": 10, "ops_per_sec": ops_per_sec,
+                             "latency_us": {"p50": 1.0, "p95": 1.0, "p99": p99}}]}
+    baseline, current = tmp_path / "baseline.json", tmp_path / "current.json"
+    baseline.write_text(json.dumps(document(1000, 10.0)))
+    current.write_text(json.dumps(document(950, 10.5)))
+    assert suite.main(["compare", str(baseline), str(current)]) == 0
+    current.write_text(json.dumps(document(800, 10.0)))
+    assert suite.main(["compare", str(baseline), str(current)]) == 1
+    assert "REGRESSION" in capsys.readouterr().out
+    rows = suite.compare_results(document(1000, 10.0), document(1000, 20.0), threshold=0.5)
+    assert rows[0]["regressed"] and rows[0]["p99_ratio"] == 2.0
@@ -98,3 +98,30 @@ def test_get_all_calculations_empty(setup_calculations):
     # Verify history is empty
     history = Calculations.get_all_calculations()
     assert history.empty
+
+def test_count_by_operation(setup_calculations):
+    for command, a, b in [(AddCommand(), 1, 2), (AddCommand(), 3, 4), (DivideCommand(), 6, 3)]:
+        calculation = Calculation(Decimal(a), Decimal(b), command)
+        calculation.operate()
+        Calculations.add_calculation(calculation)
+    assert Calculations.count_by_operation() == {"add": 2, "divide": 1}
+
+def test_get_latest_and_preview(setup_calculations):
+    assert Calculations.get_latest() is None
+    for value in range(20):
+        calculation = Calculation(Decimal(value), Decimal(1), AddCommand())
+        calculation.operate()
+        Calculations.add_calculation(calculation)
+    assert Calculations.get_latest() == {"operation": "add", "num1": Decimal(19), "num2": Decimal(1), "result": Decimal(20)}
+    assert Calculations.count() == 20
+    assert Calculations.preview_history(2).index.tolist() == [0, 1, 18, 19]
+
+def test_save_and_load_binary_history(setup_calculations, tmp_path):
+    calculation = Calculation(Decimal(1), Decimal(3), DivideCommand())
+    calculation.operate()
+    Calculations.add_calculation(calculation)
+    file_path = str(tmp_path / "history.npz")
+    Calculations.save_history(file_path)
+    Calculations.clear_history()
+    Calculations.load_history(file_path)
+    assert Calculations.get_all_calculations().iloc[0]["result"] == Decimal(1) / Decimal(3)
@@ -0,0 +1,85 @@
+# tests/test_columnar_store.py
+from decimal import Decimal
+import numpy as np
+import pytest
+from app.columnar_store import ColumnarHistory, is_columnar_path, write_columnar
+from app.numeric import FixedPoint
+from app.pandas_facade import PandasFacade
+
+VALUES = [Decimal("0.1000000000000000000000000001"), 0.1, 7, FixedPoint.from_decimal(Decimal("2.5")), None]
+
+def make_facade(rows=None):
+    facade = PandasFacade()
+    for index, operation in enumerate(rows or ["add", "divide", "add", "multiply"]):
+        facade.add_record({"operation": operation, "num1": Decimal(index), "num2": Decimal("0.5"),
+                           "result": Decimal(index) / Decimal(3)})
+    return facade
+
+def test_is_columnar_path():
+    assert is_columnar_path("history.npz")
+    assert is_columnar_path("history.ARROW")
+    assert not is_columnar_path("history.csv")
+
+def test_write_and_open_exact_values(tmp_path):
+    path = str(tmp_path / "values.npz")
+    write_columnar(path, [0, -1, 1, 0, 1], ["add", "divide"], {"num1": VALUES})
+    history = ColumnarHistory(path)
+    assert len(history) == 5
+    assert history.categories == ["add", "divide"]
+    assert isinstance(history.codes, np.memmap)
+    decoded = history.values("num1")
+    assert decoded == VALUES
+    assert [type(value) for value in decoded] == [type(value) for value in VALUES]
+
+@pytest.mark.parametrize("extension", [".npz", ".arrow"])
+def test_facade_round_trip_is_exact(tmp_path, extension):
+    if extension == ".arrow":
+        pytest.importorskip("pyarrow")
+    facade = make_facade()
+    path = str(tmp_path / f"history{extension}")
+    facade.save_to_file(path)
+    loaded = PandasFacade()
+    loaded.load_from_file(path)
+    assert len(loaded) == 4
+    assert loaded.dataframe["result"].tolist() == facade.dataframe["result"].tolist()
+    assert isinstance(loaded.dataframe.iloc[1]["result"], Decimal)
+    assert list(loaded.dataframe["operation"]) == ["add", "divide", "add", "multiply"]
+
+def test_lazy_base_supports_reads_without_decoding(tmp_path):
+    path = str(tmp_path / "history.npz")
+    make_facade(["add", "divide"] * 50).save_to_file(path)
+    loaded = PandasFacade()
+    loaded.load_from_file(path)
+    assert loaded._frame is None
+    assert loaded.get_record(-1) == {"operation": "divide", "num1": Decimal(99), "num2": Decimal("0.5"),
+                                     "result": Decimal(99) / Decimal(3)}
+    assert loaded.count_by_operation() == {"add": 50, "divide": 50}
+    assert loaded.filter_by_operation("divide").index.tolist()[:3] == [1, 3, 5]
+    preview = loaded.head_and_tail(2)
+    assert preview.index.tolist() == [0, 1, 98, 99]
+
+def test_appends_and_deletes_on_top_of_lazy_base(tmp_path):
+    path = str(tmp_path / "history.npz")
+    make_facade().save_to_file(path)
+    loaded = PandasFacade()
+    loaded.load_from_file(path)
+    loaded.add_record({"operation": "square", "num1": Decimal(3), "num2": Decimal(0), "result": Decimal(9)})
+    loaded.add_record({"operation": "add", "num1": Decimal(1), "num2": Decimal(1), "result": Decimal(2)})
+    assert loaded.count_by_operation() == {"add": 3, "divide": 1, "multiply": 1, "square": 1}
+    assert loaded.filter_by_operation("add").index.tolist() == [0, 2, 5]
+    assert loaded.remove_record(1)
+    assert loaded.filter_by_operation("add").index.tolist() == [0, 1, 4]
+    assert loaded.filter_by_operation("square").index.tolist() == [3]
+    # Saving over the file that is currently loaded must be safe
+    loaded.save_to_file(path)
+    reloaded = PandasFacade()
+    reloaded.load_from_file(path)
+    assert reloaded.dataframe["operation"].tolist() == ["add", "add", "multiply", "square", "add"]
+
+def test_empty_history_round_trip(tmp_path):
+    path = str(tmp_path / "empty.npz")
+    PandasFacade().save_to_file(path)
+    loaded = PandasFacade()
+    loaded.load_from_file(path)
+    assert loaded.dataframe.empty
+    assert loaded.get_record(-1) is None
@@ -1,5 +1,6 @@
 # tests/test_command.py
 import pytest
+import numpy as np
 from decimal import Decimal
 from app.command import Command
 from multiprocessing import Queue
@@ -38,3 +39,18 @@ def test_mock_command_execute_multiprocessing():
     mock_command.execute_multiprocessing(Decimal(2), Decimal(3), result_queue)
     result = result_queue.get()  # Get the result from the queue
     assert result == Decimal(5)
+
+def test_execute_batch_default_loops_over_execute():
+
+    class MockDivideCommand(MockCommand):
+        def execute(self, num1, num2):
+            return num1 / num2
+
+    decimals = MockDivideCommand().execute_batch(
+        np.array([Decimal(6), Decimal(1)], dtype=object), np.array([Decimal(3), Decimal(0)], dtype=object)
+    )
+    assert decimals.tolist() == [Decimal(2), None]
+
+    floats = MockCommand().execute_batch(np.array([1.5, 2.0]), np.array([1.0, 3.0]))
+    assert floats.dtype == np.float64
+    assert floats.tolist() == [2.5, 5.0]
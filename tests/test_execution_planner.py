@@ -0,0 +1,104 @@
+# tests/test_execution_planner.py
+from decimal import Decimal, localcontext
+import pytest
+from app import execution_planner
+from app.batch import plan_batch
+from app.execution_planner import (ExecutionPlanner, OperationCost, calculation_size, calibrate_operation,
+                                   operand_digits)
+from app.numeric import FixedPoint
+from app.plugins.add_command import AddCommand
+from app.worker_pool import ThreadPool, WorkerPool
+
+@pytest.fixture
+def planner(monkeypatch):
+    """
+    An uncalibrated planner on four cores, with pools of four workers that are not started.
+    """
+    monkeypatch.setattr(execution_planner.os, "cpu_count", lambda: 4)
+    planner = ExecutionPlanner({"add": AddCommand()}, calibrate=False, pool=WorkerPool(4), thread_pool=ThreadPool(4))
+    planner.costs["add"] = OperationCost([(8, 1e-6), (1024, 1e-4)])
+    planner.process_startup = 0.1
+    planner.process_overhead = 300e-6
+    planner.thread_overhead = 50e-6
+    return planner
+
+def test_operand_digits():
+    assert operand_digits(Decimal("-123.45")) == 5
+    assert operand_digits(Decimal("1E+100000")) == 1
+    assert operand_digits(Decimal("1.000E-5")) == 4
+    assert operand_digits(10 ** 40) == 41
+    assert operand_digits(2.5) == 17
+    assert operand_digits(FixedPoint.from_decimal(Decimal("1.5"))) == 7
+    with localcontext() as context:
+        context.prec = 500
+        assert calculation_size("divide", Decimal(1), Decimal(3)) == 500
+    assert calculation_size("multiply", Decimal("12"), Decimal("123")) == 3
+
+def test_cost_curve_interpolates_and_learns_beyond_calibration():
+    cost = OperationCost([(10, 1e-6), (100, 1e-4)])
+    assert cost.seconds(1) == 1e-6
+    assert cost.seconds(10 ** 1.5) == pytest.approx(1e-5)
+    # Extrapolation keeps the last slope, clamped to quadratic growth
+    assert cost.seconds(1000) == pytest.approx(1e-2)
+    cost.observe(50, 1.0)
+    assert len(cost.points) == 2
+    cost.observe(1000, 1e-3)
+    assert cost.seconds(1000) == pytest.approx(1e-3)
+    cost.observe(1100, 1e-3)
+    assert len(cost.points) == 3 and cost.seconds(1000) < 1e-3
+
+def test_calibrate_operation_measures_growing_sizes():
+    cost = calibrate_operation("add", AddCommand())
+    sizes = [size for size, _ in cost.points]
+    assert sizes[0] == 8 and len(sizes) >= 3 and sizes == sorted(sizes)
+    assert all(seconds > 0 for _, seconds in cost.points)
+
+def test_single_calculations_run_inline(planner):
+    decision = planner.plan_calculation("add", Decimal("1" * 5000), Decimal(2))
+    assert decision.strategy == "inline" and not decision.forced
+    assert decision.size == 5000 and decision.estimates["thread"] > decision.estimates["inline"]
+    forced = planner.plan_calculation("add", Decimal(1), Decimal(2), "process")
+    assert forced.strategy == "process" and forced.forced
+    with pytest.raises(ValueError):
+        planner.plan_calculation("add", Decimal(1), Decimal(2), "gpu")
+    assert list(planner.decisions) == [decision, forced]
+
+def test_batches_pick_processes_when_the_work_outweighs_dispatch(planner):
+    assert planner.decide("small.csv", 1e-6, 8, rows=1000, tasks=1).strategy == "inline"
+    heavy = planner.decide("heavy.csv", 1e-3, 1000, rows=100000, tasks=10)
+    assert heavy.strategy == "process"
+    assert heavy.estimates["process"] < heavy.estimates["inline"] / 3
+    # Threads only win if they are measured to run in parallel
+    planner.thread_parallelism = 2.0
+    planner.process_startup = 1000.0
+    assert planner.decide("heavy.csv", 1e-3, 1000, rows=100000, tasks=10).strategy == "thread"
+
+def test_measured_times_refine_the_model(planner):
+    decision = planner.plan_calculation("add", Decimal(1), Decimal(2), "thread")
+    assert planner.measure(decision, lambda: 42) == 42
+    assert decision.measured is not None and planner.thread_overhead < 50e-6
+    cold = planner.plan_calculation("add", Decimal(1), Decimal(2), "process")
+    assert cold.cold_start
+    planner.record(cold, 0.05)
+    assert planner.process_startup == pytest.approx(0.05, rel=0.01)
+    inline = planner.plan_calculation("add", Decimal("1" * 4096), Decimal(1))
+    planner.record(inline, 2e-5)
+    assert planner.work_seconds("add", 4096) == pytest.approx(2e-5)
+    report = planner.report()
+    assert "add: 8: 1.0us, 1024: 100.0us, 4096: 20.0us" in report
+    assert "add 1 digits x 1: thread (requested)" in report
+
+def test_plan_batch_estimates_rows_from_a_sample(planner, tmp_path):
+    path = tmp_path / "in.csv"
+    path.write_text("operation,num1,num2\n" + "add,123456,7\n" * 2000 + "bogus,1,2\n", encoding="utf-8")
+    decision = plan_batch(str(path), planner, chunk_size=500)
+    assert 1900 <= decision.rows <= 2100
+    assert decision.tasks == 4 and decision.size == 6
+    assert decision.label == "in.csv" and decision.strategy == "inline"
+
+def test_deadlines_send_slow_calculations_to_processes(planner):
+    quick = planner.plan_calculation("add", Decimal(1), Decimal(2), deadline=1.0)
+    assert quick.strategy == "inline" and quick.deadline == 1.0
+    slow = planner.plan_calculation("add", Decimal("1" * 4096), Decimal(1), deadline=0.01)
+    assert slow.strategy == "process" and not slow.forced
+    assert "process within 0.01s;" in str(slow)
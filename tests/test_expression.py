@@ -0,0 +1,105 @@
+# tests/test_expression.py
+import re
+from decimal import Decimal, DivisionByZero
+from unittest import mock
+import pytest
+from app import expression
+from app.expression import ExpressionEvaluator, expression_shape, get_evaluator, reset_evaluator
+from app.numeric import FixedPoint, set_backend
+from app.plugins.add_command import AddCommand
+from app.plugins.divide_command import DivideCommand
+from app.plugins.multiply_command import MultiplyCommand
+from app.plugins.square_command import SquareCommand
+from app.plugins.subtract_command import SubtractCommand
+
+COMMANDS = {
+    "add": AddCommand(),
+    "subtract": SubtractCommand(),
+    "multiply": MultiplyCommand(),
+    "divide": DivideCommand(),
+    "square": SquareCommand(),
+}
+
+def test_expression_shape():
+    assert expression_shape("(2 + 3) * 4 / 7") == ("(#+#)*#/#", ("2", "3", "4", "7"))
+    assert expression_shape("square(1.5e3)- .25") == ("square(#)-#", ("1.5e3", ".25"))
+    assert expression_shape("( 20+3 )*4/7")[0] == expression_shape("(2 + 3) * 4 / 7")[0]
+    # Digits inside names and malformed numbers are not literals
+    assert expression_shape("log2(1.2.3)") == ("log2(1.2.3)", ())
+
+def test_precedence_and_plugin_calls():
+    evaluator = ExpressionEvaluator(COMMANDS)
+    value, (command, num1, num2) = evaluator.evaluate("(2 + 3) * 4 / 7")
+    assert value == Decimal(20) / Decimal(7)
+    assert (command.operation_name, num1, num2) == ("divide", Decimal(20), Decimal(7))
+    assert evaluator.evaluate("square(5) - 1")[0] == Decimal(24)
+    assert evaluator.evaluate("2 + 3 * 4 - 6 / 2")[0] == Decimal(11)
+    assert evaluator.evaluate("-3 * -(2) + add(1, 2)")[0] == Decimal(9)
+    assert evaluator.evaluate("7") == (Decimal(7), None)
+
+def test_templates_are_cached_by_shape():
+    evaluator = ExpressionEvaluator(COMMANDS)
+    with mock.patch.object(expression, "ExpressionTemplate", wraps=expression.ExpressionTemplate) as template:
+        assert evaluator.evaluate("(2 + 3) * 4")[0] == Decimal(20)
+        assert evaluator.evaluate("(10+1)*2")[0] == Decimal(22)
+        assert evaluator.evaluate("(2 + 3) * 4")[0] == Decimal(20)
+    assert template.call_count == 1
+    assert evaluator.stats() == {"templates": 1, "folded": 2, "template_hits": 2, "template_misses": 1,
+                                 "fold_hits": 1}
+
+def test_literal_sub_expressions_are_folded_once():
+    multiply = mock.Mock(wraps=MultiplyCommand())
+    multiply.pure, multiply.arity = True, 2
+    evaluator = ExpressionEvaluator(dict(COMMANDS, multiply=multiply))
+    assert evaluator.evaluate("ans + 6 * 7", Decimal(1))[0] == Decimal(43)
+    assert evaluator.evaluate("ans + 6 * 7", Decimal(2))[0] == Decimal(44)
+    assert multiply.execute.call_count == 1
+    # Impure commands run every time
+    multiply.pure = False
+    evaluator = ExpressionEvaluator(dict(COMMANDS, multiply=multiply))
+    evaluator.evaluate("6 * 7")
+    evaluator.evaluate("6 * 7")
+    assert multiply.execute.call_count == 3
+
+def test_numeric_backends_are_folded_separately():
+    evaluator = ExpressionEvaluator(COMMANDS)
+    assert evaluator.evaluate("1 / 4")[0] == Decimal("0.25")
+    set_backend("float")
+    try:
+        assert evaluator.evaluate("1 / 4")[0] == 0.25
+    finally:
+        set_backend("decimal")
+    set_backend("fixed")
+    try:
+        assert isinstance(evaluator.evaluate("1 / 4")[0], FixedPoint)
+    finally:
+        set_backend("decimal")
+
+@pytest.mark.parametrize("text, message", [
+    ("2 +", "expected a value, found the end"),
+    ("2 3", "did not expect a number"),
+    ("(1", "expected ')', found the end"),
+    ("1.2.3", "did not expect '1'"),
+    ("square(1, 2)", "square takes 1 argument, got 2"),
+    ("cube(2)", "Unknown command in expression: cube"),
+    ("ans * 2", "No previous result for ans"),
+])
+def test_invalid_expressions(text, message):
+    evaluator = ExpressionEvaluator(COMMANDS)
+    with pytest.raises(ValueError, match=re.escape(message)):
+        evaluator.evaluate(text)
+    assert not evaluator.stats()["folded"]
+
+def test_errors_are_not_folded():
+    evaluator = ExpressionEvaluator(COMMANDS)
+    for _ in range(2):
+        with pytest.raises(DivisionByZero):
+            evaluator.evaluate("1 / (2 - 2)")
+    assert evaluator.stats()["folded"] == 0
+
+def test_shared_evaluator_follows_the_commands():
+    reset_evaluator()
+    evaluator = get_evaluator(COMMANDS)
+    assert get_evaluator() is evaluator and get_evaluator(COMMANDS) is evaluator
+    assert get_evaluator(dict(COMMANDS)) is not evaluator
+    reset_evaluator()
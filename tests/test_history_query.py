@@ -0,0 +1,115 @@
+# tests/test_history_query.py
+import random
+from decimal import Decimal
+import pytest
+from app.history_query import HistoryQuery, QueryEngine
+from app.history_session import HistorySession
+from app.numeric import FixedPoint
+from app.pandas_facade import PandasFacade
+
+OPERATIONS = ["add", "subtract", "multiply"]
+
+TEXTS = [
+    "result between 10 20",
+    "num1 >= 50 and num2 < 3",
+    "operation add result > 150",
+    "operation multiply",
+    "num1 == 7",
+    "num2 != 4 result <= 0",
+    "top 5 result",
+    "bottom 3 num1 operation subtract",
+    "num1 < 20 top 4 num2",
+    "",
+]
+
+def make_facade(rows: int, seed: int = 0) -> PandasFacade:
+    generator = random.Random(seed)
+    facade = PandasFacade()
+    for _ in range(rows):
+        num1, num2 = Decimal(generator.randint(0, 100)), Decimal(generator.randint(0, 9))
+        operation = generator.choice(OPERATIONS)
+        result = {"add": num1 + num2, "subtract": num1 - num2, "multiply": num1 * num2}[operation]
+        facade.add_record({"operation": operation, "num1": num1, "num2": num2, "result": result})
+    return facade
+
+def expected(facade: PandasFacade, query: HistoryQuery) -> list:
+    """Answer the query by checking every record."""
+    records = [(index, facade.get_record(index)) for index in range(len(facade))]
+    matches = [(index, record) for index, record in records if query.matches(record)]
+    if query.top:
+        count, column, descending = query.top
+        matches = sorted(matches, key=lambda item: item[1][column], reverse=descending)[:count]
+    return [index for index, _ in matches]
+
+def engine_for(facade: PandasFacade, indexed: bool) -> QueryEngine:
+    engine = QueryEngine(facade)
+    engine.index_min_rows = 0 if indexed else 10 ** 9
+    return engine
+
+def test_parse():
+    query = HistoryQuery.parse("operation add and result>=1.5 num2 between -2 3 top 4 num1")
+    assert query.operation == "add"
+    assert [str(condition) for condition in query.conditions] == ["result >= 1.5", "num2 >= -2", "num2 <= 3"]
+    assert query.top == (4, "num1", True)
+    assert query.bounds() == {"result": (1.5, float("inf")), "num2": (-2.0, 3.0)}
+    assert HistoryQuery.parse("").conditions == []
+
+@pytest.mark.parametrize("text", ["result", "result > abc", "result ~ 3", "colour > 1", "top x result",
+                                  "top 3 colour", "result > NaN"])
+def test_parse_rejects_invalid_queries(text):
+    with pytest.raises(ValueError):
+        HistoryQuery.parse(text)
+
+@pytest.mark.parametrize("indexed", [True, False])
+@pytest.mark.parametrize("text", TEXTS)
+def test_results_match_a_full_check(text, indexed):
+    facade = make_facade(600)
+    query = HistoryQuery.parse(text)
+    assert engine_for(facade, indexed).run(query).index.tolist() == expected(facade, query)
+
+def test_planner_prefers_the_most_selective_access_path():
+    facade = make_facade(2000)
+    engine = engine_for(facade, indexed=True)
+    assert engine.plan(HistoryQuery.parse("num1 == 3")).strategy == "index"
+    assert engine.plan(HistoryQuery.parse("num1 >= 1")).strategy == "scan"
+    assert engine.plan(HistoryQuery.parse("top 3 result")).strategy == "walk"
+    facade.add_record({"operation": "power", "num1": Decimal(2), "num2": Decimal(3), "result": Decimal(8)})
+    plan = engine.plan(HistoryQuery.parse("operation power num1 >= 1"))
+    assert plan.strategy == "operation" and plan.estimate == 1
+    assert engine_for(facade, indexed=False).plan(HistoryQuery.parse("num1 == 3")).strategy == "scan"
+
+def test_indexes_follow_appends_deletes_and_compaction():
+    facade = make_facade(500)
+    facade.compact_ratio = 0
+    engine = engine_for(facade, indexed=True)
+    query = HistoryQuery.parse("result between 20 40")
+    engine.run(query)
+    for index in range(0, 400, 3):
+        facade.remove_record(index)
+    facade.add_record({"operation": "add", "num1": Decimal(10), "num2": Decimal(20), "result": Decimal(30)})
+    assert engine.run(query).index.tolist() == expected(facade, query)
+    facade.compact()
+    assert engine.run(query).index.tolist() == expected(facade, query)
+    facade.clear()
+    assert engine.run(query).empty
+
+def test_values_beyond_float_precision_compare_exactly():
+    facade = PandasFacade()
+    values = [Decimal("0.1"), Decimal("0.10000000000000000001"), Decimal("0.09999999999999999999"),
+              FixedPoint.from_decimal(Decimal("0.1")), "text", None]
+    for value in values:
+        facade.add_record({"operation": "add", "num1": value, "num2": Decimal(0), "result": value})
+    engine = engine_for(facade, indexed=True)
+    assert engine.run(HistoryQuery.parse("result > 0.1")).index.tolist() == [1]
+    assert engine.run(HistoryQuery.parse("result == 0.1")).index.tolist() == [0, 3]
+    assert engine.run(HistoryQuery.parse("result != 0.1")).index.tolist() == [1, 2]
+    assert engine.run(HistoryQuery.parse("top 2 num1")).index.tolist() == [1, 0]
+
+def test_session_query_and_explain():
+    session = HistorySession()
+    for record in [{"operation": "add", "num1": Decimal(1), "num2": Decimal(2), "result": Decimal(3)},
+                   {"operation": "add", "num1": Decimal(5), "num2": Decimal(5), "result": Decimal(10)}]:
+        session.facade.add_record(record)
+    query = HistoryQuery.parse("result > 4")
+    assert session.query(query)["num1"].tolist() == [Decimal(5)]
+    assert "matched 1" in session.explain_query(query)
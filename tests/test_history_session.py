@@ -0,0 +1,121 @@
+# tests/test_history_session.py
+import threading
+from unittest import mock
+from decimal import Decimal
+from app.calculation import Calculation
+from app.calculations import Calculations
+from app.history_session import HistorySession
+from app.plugins.add_command import AddCommand
+from app.plugins.multiply_command import MultiplyCommand
+
+THREADS = 8
+PER_THREAD = 500
+
+def make_calculation(command, a, b):
+    calculation = Calculation(Decimal(a), Decimal(b), command)
+    calculation.operate()
+    return calculation
+
+def test_concurrent_appends_lose_nothing_and_keep_order():
+    session = HistorySession(stripes=4)
+    commands = [AddCommand(), MultiplyCommand()]
+    counts = []
+    errors = []
+    done = threading.Event()
+    start = threading.Barrier(THREADS + 1)
+
+    def append(worker):
+        start.wait()
+        for index in range(PER_THREAD):
+            session.add_calculation(make_calculation(commands[worker % 2], worker, index))
+
+    def read():
+        start.wait()
+        try:
+            while not done.is_set():
+                counts.append(session.count())
+                filtered = session.filter_with_operation("add")
+                assert set(filtered["operation"]) <= {"add"}
+                session.count_by_operation()
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            errors.append(e)
+
+    appenders = [threading.Thread(target=append, args=(worker,)) for worker in range(THREADS)]
+    reader = threading.Thread(target=read)
+    for thread in appenders + [reader]:
+        thread.start()
+    for thread in appenders:
+        thread.join()
+    done.set()
+    reader.join()
+
+    assert not errors
+    assert counts == sorted(counts)
+    history = session.get_all_calculations()
+    assert len(history) == THREADS * PER_THREAD
+    for worker in range(THREADS):
+        rows = history[history["num1"] == Decimal(worker)]
+        assert rows["num2"].tolist() == [Decimal(index) for index in range(PER_THREAD)]
+    assert session.count_by_operation() == {"add": THREADS // 2 * PER_THREAD, "multiply": THREADS // 2 * PER_THREAD}
+
+def test_sessions_are_independent():
+    first, second = HistorySession(), HistorySession()
+    first.add_calculation(make_calculation(AddCommand(), 1, 2))
+    assert first.count() == 1 and second.count() == 0
+    assert first.get_latest_records(5) == [first.get_latest()]
+
+def test_concurrent_appends_with_journal(tmp_path):
+    session = HistorySession()
+    path = str(tmp_path / "history.csv")
+    session.open_journal(path)
+    threads = [threading.Thread(target=lambda worker=worker: [
+        session.add_calculation(make_calculation(AddCommand(), worker, index)) for index in range(50)])
+        for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    session.close_journal()
+
+    reloaded = HistorySession()
+    reloaded.load_history(path)
+    assert reloaded.count() == 200
+
+def test_calculations_delegates_to_default_session():
+    Calculations.clear_history()
+    Calculations.add_calculation(make_calculation(AddCommand(), 2, 3))
+    assert Calculations.session.count() == 1
+    assert Calculations.get_latest()["result"] == Decimal(5)
+    Calculations.clear_history()
+
+def test_append_survives_journal_closed_concurrently(tmp_path):
+    session = HistorySession()
+    session.open_journal(str(tmp_path / "history.csv"))
+    drain = session._drain
+
+    def close_then_drain():
+        # Simulates close_journal() running between the journal check and the session lock
+        session._drain = drain
+        session.close_journal()
+        drain()
+
+    session._drain = close_then_drain
+    session.add_calculation(make_calculation(AddCommand(), 1, 2))
+    assert session.journal is None and session.count() == 1
+
+def test_deletes_past_the_ratio_compact_in_the_background():
+    session = HistorySession()
+    session.facade.compact_ratio = 0.5
+    for index in range(4):
+        session.add_calculation(make_calculation(AddCommand(), index, 1))
+    with mock.patch.object(session.facade, "compact", wraps=session.facade.compact) as compact:
+        session.delete_records([0])
+        assert session._compactor is None
+        with session._lock:
+            session.delete_records([0])
+            # The delete returned before anything was compacted
+            assert session.facade.tombstones == 2 and compact.call_count == 0
+        session._compactor.join(5)
+    compact.assert_called_once()
+    assert session.facade.tombstones == 0
+    assert [record["num1"] for record in session.get_latest_records(5)] == [Decimal(2), Decimal(3)]
@@ -0,0 +1,78 @@
+# tests/test_history_stats.py
+import math
+import random
+import statistics
+from decimal import Decimal
+import pytest
+from app.history_stats import RunningStats, format_summary, to_float
+from app.numeric import FixedPoint
+from app.pandas_facade import PandasFacade
+
+def make_record(operation, result):
+    return {"operation": operation, "num1": Decimal(1), "num2": Decimal(1), "result": result}
+
+def test_to_float():
+    assert to_float(Decimal("1.5")) == 1.5
+    assert to_float(FixedPoint.from_decimal(Decimal("2.25"))) == 2.25
+    assert to_float(None) is None and to_float("x") is None and to_float(float("nan")) is None
+
+def test_running_stats_match_statistics_after_adds_and_removes():
+    rng = random.Random(3)
+    values = [rng.uniform(-1000, 1000) for _ in range(500)]
+    stats = RunningStats()
+    for value in values:
+        stats.add(value)
+    for value in values[:200]:
+        stats.remove(value)
+    remaining = values[200:]
+    assert stats.count == len(remaining)
+    assert stats.mean == pytest.approx(statistics.fmean(remaining))
+    assert stats.variance == pytest.approx(statistics.variance(remaining))
+    assert stats.total == pytest.approx(math.fsum(remaining))
+
+def test_removing_an_extreme_marks_it_stale():
+    stats = RunningStats()
+    for value in (1, 5, 3):
+        stats.add(value)
+    stats.remove(3)
+    assert not stats.extremes_stale
+    stats.remove(5)
+    assert stats.extremes_stale
+    stats.set_extremes([1])
+    assert (stats.minimum, stats.maximum) == (1, 1)
+
+def test_facade_summary_follows_changes(tmp_path):
+    facade = PandasFacade()
+    for value in (2, 4, 6):
+        facade.add_record(make_record("add", Decimal(value)))
+    facade.add_record(make_record("divide", Decimal("0.5")))
+    assert facade.summary()["add"] == {"count": 3, "sum": 12.0, "mean": 4.0, "variance": 4.0, "stdev": 2.0,
+                                       "min": 2.0, "max": 6.0}
+    facade.remove_record(2)
+    assert facade.summary("add")["add"]["max"] == 4.0 and facade.summary("add")["add"]["count"] == 2
+    assert facade.remove_operation("divide") == 1
+    assert list(facade.summary()) == ["add"]
+    facade.save_to_file(str(tmp_path / "history.csv"))
+    loaded = PandasFacade()
+    loaded.load_from_file(str(tmp_path / "history.csv"))
+    assert loaded.summary() == facade.summary()
+    loaded.clear()
+    assert loaded.summary() == {}
+
+def test_summary_of_columnar_base(tmp_path):
+    facade = PandasFacade()
+    for value in range(10):
+        facade.add_record(make_record("multiply", Decimal(value)))
+    facade.save_to_file(str(tmp_path / "history.npz"))
+    loaded = PandasFacade()
+    loaded.load_from_file(str(tmp_path / "history.npz"))
+    loaded.add_record(make_record("multiply", Decimal(10)))
+    loaded.remove_record(0)
+    assert loaded.summary("multiply")["multiply"]["count"] == 10
+    assert loaded.summary("multiply")["multiply"]["min"] == 1.0
+    assert loaded.summary("multiply")["multiply"]["mean"] == 5.5
+
+def test_format_summary():
+    table = format_summary({"add": {"count": 2, "sum": 3.0, "mean": 1.5, "variance": 0.5, "stdev": 0.707107,
+                                    "min": 1.0, "max": 2.0}})
+    assert table.splitlines()[1].split() == ["add", "2", "3", "1.5", "0.707107", "1", "2"]
@@ -0,0 +1,87 @@
+# tests/test_instrumentation.py
+import json
+import random
+from unittest import mock
+import pytest
+from app.calculations import Calculations
+from app.instrumentation import (
+    Instrumentation, LatencyHistogram, bucket_index, bucket_upper_bound, get_metrics, reset_metrics,
+)
+from app.plugin_loader import load_plugins
+from main import perform_calculation_and_display, run_repl
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    reset_metrics()
+    yield
+    reset_metrics()
+    Calculations.clear_history()
+
+def test_buckets_cover_values_with_bounded_error():
+    previous = -1
+    for value in list(range(200)) + [10 ** exponent + offset for exponent in range(3, 10) for offset in (-1, 0, 1)]:
+        index = bucket_index(value)
+        upper = bucket_upper_bound(index)
+        assert value <= upper <= value * 1.07 + 1
+        assert index >= bucket_index(previous) if previous >= 0 else True
+        previous = value
+
+def test_histogram_percentiles():
+    histogram = LatencyHistogram()
+    values = list(range(1, 10001))
+    random.Random(1).shuffle(values)
+    for value in values:
+        histogram.record(value * 1000)
+    for fraction, expected in ((0.5, 5_000_000), (0.95, 9_500_000), (0.99, 9_900_000)):
+        assert expected <= histogram.percentile(fraction) <= expected * 1.07
+    summary = histogram.summary()
+    assert summary["count"] == 10000
+    assert summary["max_us"] == 10000.0
+    assert LatencyHistogram().percentile(0.5) == 0
+
+def test_disabled_instrumentation_records_nothing():
+    metrics = Instrumentation(enabled=False)
+    start = metrics.clock()
+    assert metrics.record("add", "parse", start) == 0
+    metrics.count_call("add")
+    metrics.count_error("add")
+    assert metrics.snapshot() == {}
+
+def test_calculation_phases_recorded(monkeypatch):
+    monkeypatch.setenv("METRICS_ENABLED", "1")
+    commands = load_plugins()
+    with mock.patch("builtins.print"):
+        perform_calculation_and_display("6", "3", "divide", commands)
+        perform_calculation_and_display("6", "0", "divide", commands)
+        perform_calculation_and_display("x", "3", "add", commands)
+    snapshot = get_metrics().snapshot()
+    assert snapshot["divide"]["calls"] == 2 and snapshot["divide"]["errors"] == 1
+    assert list(snapshot["divide"]["phases"]) == ["parse", "dispatch", "execute", "display", "history"]
+    assert snapshot["divide"]["phases"]["history"]["count"] == 1
+    assert snapshot["add"] == {"calls": 1, "errors": 1, "phases": {}}
+
+def test_export_json_and_prometheus(tmp_path):
+    metrics = Instrumentation(enabled=True)
+    metrics.count_call("add")
+    metrics.record("add", "execute", metrics.clock() - 1500)
+    metrics.export(str(tmp_path / "metrics.json"))
+    data = json.loads((tmp_path / "metrics.json").read_text())
+    assert data["add"]["phases"]["execute"]["count"] == 1
+    metrics.export(str(tmp_path / "metrics.prom"))
+    text = (tmp_path / "metrics.prom").read_text()
+    assert 'calculator_calls_total{operation="add"} 1' in text
+    assert 'calculator_phase_seconds_bucket{operation="add",phase="execute",le="+Inf"} 1' in text
+    assert 'calculator_phase_seconds_count{operation="add",phase="execute"} 1' in text
+
+def test_repl_stats_command():
+    commands = load_plugins()
+    inputs = ["stats", "stats on", "add 1 2", "stats", "stats reset", "stats bogus", "exit"]
+    with mock.patch("builtins.input", side_effect=inputs), \
+         mock.patch("builtins.print") as mock_print, \
+         mock.patch("main.shutdown_pool"):
+        run_repl(commands)
+    printed = [str(call.args[0]) for call in mock_print.call_args_list if call.args]
+    assert printed.count("Instrumentation is off. Use 'stats on' or set METRICS_ENABLED=1 to enable it.") == 1
+    assert "No calculations recorded yet." in printed
+    assert any(line.startswith("operation") and "add" in line and "execute" in line for line in printed)
+    assert "Usage: stats [on|off|reset]" in printed
@@ -0,0 +1,180 @@
+# tests/test_journal.py
+import json
+from decimal import Decimal
+import pytest
+from app.calculation import Calculation
+from app.calculations import Calculations
+from app.journal import HistoryJournal, decode_value, encode_value
+from app.numeric import FixedPoint
+from app.pandas_facade import PandasFacade
+from app.plugins.add_command import AddCommand
+from app.plugins.multiply_command import MultiplyCommand
+
+@pytest.fixture(autouse=True)
+def setup_calculations():
+    Calculations.close_journal()
+    Calculations.clear_history()
+    yield
+    Calculations.close_journal()
+    Calculations.clear_history()
+
+def add(a, b, command=None):
+    calculation = Calculation(Decimal(a), Decimal(b), command or AddCommand())
+    calculation.operate()
+    Calculations.add_calculation(calculation)
+
+def journal_lines(path):
+    with open(str(path) + ".journal", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+@pytest.mark.parametrize("value", [None, "add", Decimal("1.10"), 0.1, 7, FixedPoint.from_decimal(Decimal("2.5"))])
+def test_value_round_trip(value):
+    decoded = decode_value(json.loads(json.dumps(encode_value(value))))
+    assert decoded == value
+    assert type(decoded) is type(value)
+    assert str(decoded) == str(value)
+
+def test_changes_are_appended_not_rewritten(tmp_path):
+    path = tmp_path / "history.csv"
+    Calculations.open_journal(str(path), fsync_every=1, compact_every=0)
+    add(2, 3)
+    add(4, 5, MultiplyCommand())
+    Calculations.delete_history(0)
+    Calculations.delete_history(10)
+    # Changes go to the journal; the snapshot written when it was opened is left alone
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 1
+    ops = [entry["op"] for entry in journal_lines(path)]
+    assert ops == ["base", "add", "add", "delete"]
+    Calculations.close_journal()
+
+    Calculations.clear_history()
+    Calculations.load_history(str(path))
+    history = Calculations.get_all_calculations()
+    assert len(history) == 1
+    assert history.iloc[0]["result"] == Decimal(20)
+    assert isinstance(history.iloc[0]["result"], Decimal)
+
+def test_opening_a_new_file_keeps_the_current_history(tmp_path):
+    path = tmp_path / "new_history.csv"
+    for index in range(3):
+        add(index, 1)
+    Calculations.open_journal(str(path), compact_every=0)
+    assert Calculations.count() == 3 and path.exists()
+    add(3, 1)
+    Calculations.close_journal()
+
+    Calculations.clear_history()
+    Calculations.load_history(str(path))
+    assert Calculations.get_all_calculations()["num1"].tolist() == [Decimal(0), Decimal(1), Decimal(2), Decimal(3)]
+
+def test_bulk_deletes_are_journaled(tmp_path):
+    path = tmp_path / "history.csv"
+    Calculations.open_journal(str(path), compact_every=0)
+    for index in range(6):
+        add(index, 1, MultiplyCommand() if index % 2 else AddCommand())
+    assert Calculations.delete_records([0, 1, 9]) == 2
+    assert Calculations.delete_operation("multiply") == 2
+    entries = journal_lines(path)[-2:]
+    assert entries == [{"op": "delete", "indices": [0, 1]}, {"op": "delete_operation", "operation": "multiply"}]
+    Calculations.close_journal()
+
+    Calculations.clear_history()
+    Calculations.load_history(str(path))
+    assert Calculations.get_all_calculations()["num1"].tolist() == [Decimal(2), Decimal(4)]
+
+def test_loading_another_file_stops_journaling(tmp_path):
+    main_path, other_path = str(tmp_path / "main.csv"), str(tmp_path / "other.csv")
+    Calculations.open_journal(main_path, compact_every=0)
+    add(1, 0)
+    add(2, 0)
+    Calculations.save_history(other_path)
+    Calculations.load_history(other_path)
+    assert Calculations.session.journal is None
+    add(3, 0)
+    Calculations.delete_history(0)
+
+    Calculations.load_history(main_path)
+    assert Calculations.get_all_calculations()["num1"].tolist() == [Decimal(1), Decimal(2)]
+
+def test_reloading_the_journaled_file_keeps_journaling(tmp_path):
+    path = str(tmp_path / "history.csv")
+    Calculations.open_journal(path, compact_every=0)
+    add(1, 0)
+    Calculations.load_history(path)
+    assert Calculations.session.journal is not None and Calculations.count() == 1
+    add(2, 0)
+    Calculations.close_journal()
+    Calculations.load_history(path)
+    assert Calculations.get_all_calculations()["num1"].tolist() == [Decimal(1), Decimal(2)]
+
+def test_compaction_rewrites_snapshot(tmp_path):
+    path = tmp_path / "history.csv"
+    Calculations.open_journal(str(path), compact_every=0)
+    add(1, 1)
+    add(2, 2)
+    Calculations.compact_history()
+    assert path.exists()
+    assert [entry["op"] for entry in journal_lines(path)] == ["base"]
+    add(3, 3)
+    Calculations.clear_history()
+    add(4, 4)
+    Calculations.close_journal()
+
+    Calculations.open_journal(str(path), compact_every=0)
+    assert Calculations.get_all_calculations()["result"].tolist() == [Decimal(8)]
+    Calculations.save_history(str(path))
+    assert [entry["op"] for entry in journal_lines(path)] == ["base"]
+
+def test_automatic_compaction(tmp_path):
+    path = tmp_path / "history.csv"
+    Calculations.open_journal(str(path), compact_every=3)
+    for value in range(7):
+        add(value, 0)
+    assert len(journal_lines(path)) == 2
+    Calculations.close_journal()
+    Calculations.load_history(str(path))
+    assert len(Calculations.get_all_calculations()) == 7
+
+def test_stale_journal_is_not_replayed(tmp_path):
+    path = tmp_path / "history.csv"
+    Calculations.open_journal(str(path), compact_every=0)
+    add(1, 1)
+    Calculations.compact_history()
+    stale_journal = (tmp_path / "history.csv.journal").read_text(encoding="utf-8")
+    add(2, 2)
+    Calculations.compact_history()
+    # Simulate a crash between writing the snapshot and resetting the journal
+    (tmp_path / "history.csv.journal").write_text(
+        stale_journal + json.dumps({"op": "add", "record": {"operation": "add"}}) + "\n", encoding="utf-8"
+    )
+    Calculations.close_journal()
+    facade = PandasFacade()
+    facade.load_from_file(str(path))
+    assert HistoryJournal(str(path)).replay(facade) == -1
+    assert len(facade) == 2
+
+def test_torn_last_line_is_ignored(tmp_path):
+    path = tmp_path / "history.csv"
+    Calculations.open_journal(str(path))
+    add(1, 2)
+    Calculations.close_journal()
+    with open(str(path) + ".journal", "a", encoding="utf-8") as f:
+        f.write('{"op": "add", "rec')
+    facade = PandasFacade()
+    assert HistoryJournal(str(path)).replay(facade) == 1
+    assert len(facade) == 1
+
+def test_compact_without_journal():
+    with pytest.raises(RuntimeError, match="No history journal is open."):
+        Calculations.compact_history()
+
+def test_journal_over_binary_snapshot(tmp_path):
+    path = tmp_path / "history.npz"
+    Calculations.open_journal(str(path), compact_every=0)
+    add(1, 2)
+    Calculations.compact_history()
+    add(3, 4)
+    Calculations.close_journal()
+    assert not (tmp_path / "history.tmp.npz").exists()
+    Calculations.load_history(str(path))
+    assert Calculations.get_all_calculations()["result"].tolist() == [Decimal(3), Decimal(7)]
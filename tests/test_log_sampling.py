@@ -0,0 +1,99 @@
+# tests/test_log_sampling.py
+import json
+import logging
+from unittest import mock
+import pytest
+from app import log_sampling
+from app.instrumentation import Instrumentation
+from app.log_sampling import LogSampler, get_sampler, reset_sampler
+from app.calculations import Calculations
+from app.plugin_loader import load_plugins
+from main import perform_calculation_and_display, run_repl
+
+class Rendered:
+    """An argument that records whether it was ever formatted."""
+    def __init__(self):
+        self.count = 0
+
+    def __str__(self):
+        self.count += 1
+        return "rendered"
+
+@pytest.fixture(autouse=True)
+def fresh_sampler():
+    reset_sampler()
+    yield
+    reset_sampler()
+
+def test_sampler_logs_first_of_every_n(caplog):
+    sampler = LogSampler(every=3)
+    with caplog.at_level(logging.INFO):
+        for index in range(7):
+            sampler.log("calc", logging.INFO, "event %d", index)
+    assert [record.getMessage() for record in caplog.records] == [
+        "event 0 [sampled 1/3, 1 seen]", "event 3 [sampled 1/3, 4 seen]", "event 6 [sampled 1/3, 7 seen]",
+    ]
+    assert sampler.stats() == {"calc": {"seen": 7, "logged": 3}}
+
+def test_sampler_without_sampling_keeps_message(caplog):
+    with caplog.at_level(logging.INFO):
+        LogSampler().log("calc", logging.INFO, "plain %s", "message")
+    assert caplog.records[0].getMessage() == "plain message"
+
+def test_disabled_level_is_never_rendered(caplog):
+    argument = Rendered()
+    sampler = LogSampler()
+    with caplog.at_level(logging.WARNING):
+        sampler.log("calc", logging.INFO, "value %s", argument)
+    assert argument.count == 0
+    assert sampler.stats() == {"calc": {"seen": 1, "logged": 0}}
+
+def test_default_sampler_from_environment(monkeypatch):
+    monkeypatch.setenv("LOG_SAMPLE_EVERY", "50")
+    assert get_sampler().every == 50
+    assert get_sampler() is log_sampling._default_sampler
+
+def test_calculations_sampled_but_errors_always_logged(caplog, monkeypatch):
+    monkeypatch.setenv("LOG_SAMPLE_EVERY", "10")
+    commands = load_plugins()
+    with caplog.at_level(logging.INFO):
+        for index in range(20):
+            perform_calculation_and_display(str(index), "1", "add", commands)
+        perform_calculation_and_display("1", "0", "divide", commands)
+        perform_calculation_and_display("x", "1", "add", commands)
+    messages = [record.getMessage() for record in caplog.records]
+    assert sum(message.startswith("Calculated add result") for message in messages) == 2
+    assert any(message.startswith("Unexpected error during calculation") for message in messages)
+    assert "Invalid input: x, 1" in messages
+    assert get_sampler().stats()["calculation"] == {"seen": 20, "logged": 2}
+    Calculations.clear_history()
+
+def test_counters_in_report_and_prometheus():
+    sampler = LogSampler(every=2)
+    for _ in range(3):
+        sampler.log("calculation", logging.DEBUG, "event")
+    assert sampler.report().splitlines()[1].split() == ["calculation", "3", "0"]
+    assert 'calculator_log_events_total{event="calculation"} 3' in sampler.to_prometheus()
+    assert 'calculator_log_records_total{event="calculation"} 0' in sampler.to_prometheus()
+    sampler.reset()
+    assert not sampler.stats()
+
+def test_counters_in_metrics_export(tmp_path):
+    get_sampler().log("calculation", logging.DEBUG, "event")
+    Instrumentation().export(str(tmp_path / "metrics.json"))
+    data = json.loads((tmp_path / "metrics.json").read_text())
+    assert data["log_sampling"] == {"calculation": {"seen": 1, "logged": 0}}
+    Instrumentation().export(str(tmp_path / "metrics.prom"))
+    assert 'calculator_log_events_total{event="calculation"} 1' in (tmp_path / "metrics.prom").read_text()
+
+def test_repl_stats_shows_counters():
+    commands = load_plugins()
+    with mock.patch("builtins.input", side_effect=["add 1 2", "stats", "stats reset", "stats", "exit"]), \
+         mock.patch("builtins.print") as mock_print, \
+         mock.patch("main.shutdown_pool"):
+        run_repl(commands)
+    printed = [str(call.args[0]) for call in mock_print.call_args_list if call.args]
+    reports = [line for line in printed if line.startswith("log event")]
+    assert len(reports) == 1
+    assert "calculation" in reports[0] and "sampling 1 in 1" in reports[0]
+    Calculations.clear_history()
@@ -0,0 +1,68 @@
+# tests/test_logger_config.py
+import logging
+import queue
+import pytest
+import logger_config
+from logger_config import BoundedQueueHandler, configure_logging, dropped_records, stop_logging
+
+@pytest.fixture
+def log_file(tmp_path, monkeypatch):
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    path = tmp_path / "app.log"
+    monkeypatch.setenv("LOG_FILE", str(path))
+    monkeypatch.chdir(tmp_path)
+    yield path
+    stop_logging()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+def test_records_reach_file_through_queue(log_file):
+    configure_logging("INFO")
+    assert any(isinstance(handler, BoundedQueueHandler) for handler in logging.getLogger().handlers)
+    assert logger_config._listener is not None
+    logging.info("queued message")
+    logging.debug("filtered message")
+    stop_logging()
+    contents = log_file.read_text()
+    assert "INFO - queued message" in contents
+    assert "filtered message" not in contents
+
+def test_synchronous_mode_and_rotation(log_file, monkeypatch):
+    monkeypatch.setenv("LOG_ASYNC", "0")
+    monkeypatch.setenv("LOG_MAX_BYTES", "200")
+    monkeypatch.setenv("LOG_BACKUP_COUNT", "2")
+    configure_logging("INFO")
+    assert logger_config._listener is None
+    assert not any(isinstance(handler, BoundedQueueHandler) for handler in logging.getLogger().handlers)
+    for index in range(20):
+        logging.info(f"message {index}")
+    assert (log_file.parent / "app.log.1").exists()
+    assert not (log_file.parent / "app.log.3").exists()
+
+def test_drop_policy_counts_dropped_records():
+    handler = BoundedQueueHandler(queue.Queue(maxsize=1), "drop")
+    for index in range(3):
+        handler.handle(logging.makeLogRecord({"msg": f"record {index}", "levelno": logging.INFO}))
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == 2
+
+def test_dropped_records_reported_on_stop(log_file, monkeypatch):
+    monkeypatch.setenv("LOG_QUEUE_SIZE", "1")
+    configure_logging("INFO")
+    listener = logger_config._listener
+    listener.stop()  # stop draining so the bounded queue fills up
+    monkeypatch.setattr(listener, "stop", lambda: None)
+    for index in range(5):
+        logging.info(f"message {index}")
+    assert dropped_records() == 4
+    stop_logging()
+    assert "Dropped 4 log records because the log queue was full." in log_file.read_text()
+
+def test_unknown_policy_rejected():
+    with pytest.raises(ValueError, match="Unknown log queue policy"):
+        BoundedQueueHandler(queue.Queue(), "spill")
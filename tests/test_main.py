@@ -4,6 +4,7 @@ from decimal import Decimal
 from unittest import mock
 from app.calculation import Calculation
 from app.calculations import Calculations
+from app.numeric import get_backend, set_backend
 from main import (
     load_environment_variables,
     load_plugins,
@@ -25,7 +26,8 @@ def test_load_environment_variables():
         assert settings["LOG_LEVEL"] == "DEBUG"
 
 # Test loading plugins
-def test_load_plugins():
+def test_load_plugins(tmp_path, monkeypatch):
+    monkeypatch.setenv("PLUGIN_MANIFEST_FILE", str(tmp_path / "manifest.json"))
     with mock.patch('os.path.exists', return_value=True), \
          mock.patch('os.listdir', return_value=['add_command.py']), \
          mock.patch('importlib.import_module', return_value=mock.Mock()):
@@ -50,12 +52,11 @@ def test_perform_calculation_and_display_multiprocessing():
     commands = {
         "add": mock.Mock()
     }
-    commands["add"].execute_multiprocessing = mock.Mock()
 
-    with mock.patch("builtins.print"), mock.patch("multiprocessing.Queue"), \
-         mock.patch("multiprocessing.Process") as mock_process:
+    with mock.patch("builtins.print"), mock.patch("main.get_pool") as mock_get_pool:
+        mock_get_pool.return_value.calculate.return_value = Decimal(5)
         perform_calculation_and_display("2", "3", "add", commands, use_multiprocessing=True)
-        mock_process.assert_called_once()
+        mock_get_pool.return_value.calculate.assert_called_once_with("add", Decimal(2), Decimal(3), None)
 
 # Test REPL run
 def test_run_repl():
@@ -63,8 +64,10 @@ def test_run_repl():
         "add": mock.Mock()
     }
     with mock.patch("builtins.input", side_effect=["menu", "exit"]), \
-         mock.patch("builtins.print"):
+         mock.patch("builtins.print"), \
+         mock.patch("main.shutdown_pool") as mock_shutdown:
         run_repl(commands)
+        mock_shutdown.assert_called_once()
 
 # Test main function with arguments
 def test_main_with_arguments():
@@ -85,4 +88,288 @@ def test_main_no_arguments():
     with mock.patch("sys.argv", ["main.py"]), \
          mock.patch("builtins.print") as mock_print:
         main()
-        mock_print.assert_called_once_with("Usage: python main.py <number1> <number2> <operation> [mp] or python main.py repl")
+        mock_print.assert_called_once_with("Usage: python main.py <number1> <number2> <operation> [mp] or python main.py repl "
+                                           "or python main.py batch <input.csv> <output.csv> [history] [mp|sharded|auto] "
+                                           "or python main.py serve [--port N] [--unix PATH] [--history shared|connection|none] "
+                                           "(options: --mode decimal|float|fixed)")
+
+# Test main function with batch arguments
+def test_main_with_batch():
+    with mock.patch("sys.argv", ["main.py", "batch", "in.csv", "out.csv", "history"]), \
+         mock.patch("main.run_batch") as mock_batch, \
+         mock.patch("builtins.print"):
+        main()
+        args = mock_batch.call_args[0]
+        assert args[:2] == ("in.csv", "out.csv")
+        assert args[4] is True
+        assert args[5] is None
+
+# Test main function with sharded batch arguments
+def test_main_with_sharded_batch():
+    with mock.patch("sys.argv", ["main.py", "batch", "in.csv", "out.csv", "sharded"]), \
+         mock.patch("main.run_sharded_batch") as mock_batch, \
+         mock.patch("main.get_pool") as mock_pool, \
+         mock.patch("builtins.print"):
+        main()
+        assert mock_batch.call_args[0][:2] == ("in.csv", "out.csv")
+        assert mock_batch.call_args[0][3] is mock_pool.return_value
+        assert mock_batch.call_args[1]["record_history"] is False
+
+# Test the --mode flag selects the numeric backend
+def test_main_with_mode_flag():
+    with mock.patch("sys.argv", ["main.py", "--mode", "float", "2", "3", "add"]), \
+         mock.patch("main.perform_calculation_and_display") as mock_perform:
+        main()
+        mock_perform.assert_called_once()
+        assert mock_perform.call_args[0][:3] == ("2", "3", "add")
+        assert get_backend().name == "float"
+    set_backend("decimal")
+
+def test_main_with_unknown_mode():
+    with mock.patch("sys.argv", ["main.py", "--mode", "bogus", "2", "3", "add"]), \
+         mock.patch("main.perform_calculation_and_display") as mock_perform, \
+         mock.patch("builtins.print") as mock_print, \
+         pytest.raises(SystemExit) as exit_info:
+        main()
+    assert exit_info.value.code == 1
+    mock_perform.assert_not_called()
+    printed = [str(call.args[0]) for call in mock_print.call_args_list]
+    assert printed[0].startswith("Unknown numeric mode: bogus") and printed[1].startswith("Usage: python main.py")
+    assert get_backend().name == "decimal"
+
+# Test the REPL mode command
+def test_run_repl_mode_command():
+    with mock.patch("builtins.input", side_effect=["mode fixed", "mode", "mode bogus", "exit"]), \
+         mock.patch("builtins.print") as mock_print, \
+         mock.patch("main.shutdown_pool"):
+        run_repl({})
+    printed = [call.args[0] for call in mock_print.call_args_list if call.args]
+    assert printed.count("Numeric mode: fixed") == 2
+    assert any("Unknown numeric mode: bogus" in str(line) for line in printed)
+    set_backend("decimal")
+
+# Test a calculation in float mode stores floats in history
+def test_perform_calculation_float_mode():
+    from app.plugins.divide_command import DivideCommand
+    Calculations.clear_history()
+    set_backend("float")
+    try:
+        with mock.patch("builtins.print") as mock_print:
+            perform_calculation_and_display("1", "4", "divide", {"divide": DivideCommand()})
+        mock_print.assert_called_once_with("The result of 1 divide 4 is 0.25")
+        assert Calculations.get_all_calculations().iloc[0]["result"] == 0.25
+        assert isinstance(Calculations.get_all_calculations().iloc[0]["result"], float)
+    finally:
+        set_backend("decimal")
+        Calculations.clear_history()
+
+# Test each calculation is computed once and repeated calculations hit the cache
+def test_perform_calculation_uses_cache():
+    from app.result_cache import reset_cache
+    reset_cache()
+    command = mock.Mock(operation_name="add", pure=True, commutative=True, arity=2)
+    command.execute.return_value = Decimal(8)
+    with mock.patch("builtins.print"):
+        perform_calculation_and_display("3", "5", "add", {"add": command})
+        perform_calculation_and_display("5", "3", "add", {"add": command})
+    command.execute.assert_called_once_with(Decimal(3), Decimal(5))
+    with mock.patch("builtins.input", side_effect=["cache", "cache clear", "exit"]), \
+         mock.patch("builtins.print") as mock_print, \
+         mock.patch("main.shutdown_pool"):
+        run_repl({})
+    printed = [call.args[0] for call in mock_print.call_args_list if call.args]
+    assert "hits: 1" in printed
+    assert "Result cache cleared." in printed
+    reset_cache()
+
+# Test the REPL journal commands
+def test_run_repl_journal_commands(tmp_path):
+    filepath = str(tmp_path / "history.csv")
+    with mock.patch("builtins.input", side_effect=["compact_history", f"journal_history {filepath}", "compact_history", "exit"]), \
+         mock.patch("builtins.print") as mock_print, \
+         mock.patch("main.shutdown_pool"):
+        run_repl({})
+    printed = [call.args[0] for call in mock_print.call_args_list if call.args]
+    assert "No history journal is open." in [str(line) for line in printed]
+    assert f"Journaling history changes to {filepath}.journal." in printed
+    assert "History journal compacted." in printed
+    assert Calculations.session.journal is None
+
+# Test the REPL history and latest commands on a large history
+def test_run_repl_history_preview_and_latest():
+    from app.plugins.add_command import AddCommand
+    Calculations.clear_history()
+    for value in range(100):
+        calculation = Calculation(Decimal(value), Decimal(1), AddCommand())
+        calculation.result = Decimal(value + 1)
+        Calculations.add_calculation(calculation)
+    with mock.patch("builtins.input", side_effect=["history", "latest", "exit"]), \
+         mock.patch("builtins.print") as mock_print, \
+         mock.patch("main.shutdown_pool"):
+        run_repl({})
+    printed = [str(call.args[0]) for call in mock_print.call_args_list if call.args]
+    assert "[100 rows x 4 columns]" in printed
+    assert any(line.startswith("Latest calculation: {'operation': 'add', 'num1': Decimal('99')") for line in printed)
+    Calculations.clear_history()
+
+# Test the REPL bulk delete forms
+def test_run_repl_bulk_delete():
+    from app.plugins.add_command import AddCommand
+    from app.plugins.multiply_command import MultiplyCommand
+    Calculations.clear_history()
+    for value in range(10):
+        calculation = Calculation(Decimal(value), Decimal(1), MultiplyCommand() if value % 2 else AddCommand())
+        calculation.operate()
+        Calculations.add_calculation(calculation)
+    with mock.patch("builtins.input", side_effect=["delete_history 0 1", "delete_history 0:2", "delete_history operation multiply",
+                                                   "delete_history 0", "delete_history x", "exit"]), \
+         mock.patch("builtins.print") as mock_print, \
+         mock.patch("main.shutdown_pool"):
+        run_repl({})
+    printed = [str(call.args[0]) for call in mock_print.call_args_list if call.args]
+    assert printed.count("Deleted 2 calculations.") == 2
+    assert "Deleted 3 calculations." in printed
+    assert "Deleted calculation at index 0." in printed
+    assert "Usage: delete_history <index> [<index> ...] | <start>:<end> | operation <name>" in printed
+    assert Calculations.get_all_calculations()["num1"].tolist() == [Decimal(6), Decimal(8)]
+    Calculations.clear_history()
+
+# Test the REPL summary command
+def test_run_repl_summary():
+    from app.plugins.add_command import AddCommand
+    Calculations.clear_history()
+    with mock.patch("builtins.input", side_effect=["summary", "exit"]), \
+         mock.patch("builtins.print") as mock_print, \
+         mock.patch("main.shutdown_pool"):
+        run_repl({})
+    assert "No calculations in history." in [str(call.args[0]) for call in mock_print.call_args_list if call.args]
+    for value in range(3):
+        calculation = Calculation(Decimal(value), Decimal(1), AddCommand())
+        calculation.operate()
+        Calculations.add_calculation(calculation)
+    with mock.patch("builtins.input", side_effect=["summary add", "summary divide", "exit"]), \
+         mock.patch("builtins.print") as mock_print, \
+         mock.patch("main.shutdown_pool"):
+        run_repl({})
+    printed = [str(call.args[0]) for call in mock_print.call_args_list if call.args]
+    assert any(line.splitlines()[-1].split()[:3] == ["add", "3", "6"] for line in printed)
+    assert "No calculations for operation: divide" in printed
+    Calculations.clear_history()
+
+# Test the REPL query command
+def test_run_repl_query():
+    from app.plugins.add_command import AddCommand
+    Calculations.clear_history()
+    for value in range(3):
+        calculation = Calculation(Decimal(value), Decimal(1), AddCommand())
+        calculation.operate()
+        Calculations.add_calculation(calculation)
+    with mock.patch("builtins.input", side_effect=["query result >= 2", "query explain num1 == 1",
+                                                   "query result > 10", "query result >", "exit"]), \
+         mock.patch("builtins.print") as mock_print, \
+         mock.patch("main.shutdown_pool"):
+        run_repl({})
+    printed = [str(call.args[0]) for call in mock_print.call_args_list if call.args]
+    assert any(line.split()[:2] == ["operation", "num1"] and len(line.splitlines()) == 3 for line in printed)
+    assert any("matched 1" in line for line in printed)
+    assert "No matching calculations." in printed
+    assert any(line.startswith("Usage: query") for line in printed)
+    Calculations.clear_history()
+
+# Test main function with a planned batch
+def test_main_with_auto_batch(tmp_path):
+    input_path, output_path = tmp_path / "in.csv", tmp_path / "out.csv"
+    input_path.write_text("add,1,2\nmultiply,3,4\n", encoding="utf-8")
+    with mock.patch("sys.argv", ["main.py", "batch", str(input_path), str(output_path), "auto"]), \
+         mock.patch("builtins.print") as mock_print:
+        main()
+    printed = [str(call.args[0]) for call in mock_print.call_args_list if call.args]
+    assert any(line.startswith("in.csv 1 digits x 2: inline") for line in printed)
+    assert output_path.read_text(encoding="utf-8").splitlines()[1:] == ["add,1,2,3,", "multiply,3,4,12,"]
+
+# Test the REPL plan command
+def test_run_repl_plan_command():
+    from app.plugins.add_command import AddCommand
+    # Only calculations under a deadline (or mp) are planned
+    with mock.patch("builtins.input", side_effect=["timeout 5", "add 1 2", "plan", "timeout off", "exit"]), \
+         mock.patch("builtins.print") as mock_print, \
+         mock.patch("main.shutdown_pool"):
+        run_repl({"add": AddCommand()})
+    report = [str(call.args[0]) for call in mock_print.call_args_list if call.args][-3]
+    assert report.startswith("Cost model")
+    assert "add 1 digits x 1: inline within 5s" in report
+
+def test_plain_calculation_skips_the_planner():
+    with mock.patch("sys.argv", ["main.py", "2", "3", "add"]), \
+         mock.patch("main.get_planner") as mock_planner, \
+         mock.patch("app.execution_planner.calibrate_operation") as mock_calibrate, \
+         mock.patch("builtins.print") as mock_print:
+        main()
+    mock_print.assert_called_once_with("The result of 2 add 3 is 5")
+    mock_planner.assert_not_called()
+    mock_calibrate.assert_not_called()
+
+def test_run_repl_timeout_command():
+    from app.plugins.add_command import AddCommand
+    with mock.patch("builtins.input", side_effect=["timeout 2.5", "timeout -1", "timeout off", "exit"]), \
+         mock.patch("builtins.print") as mock_print, \
+         mock.patch("main.shutdown_pool"):
+        run_repl({"add": AddCommand()})
+    printed = [call.args[0] for call in mock_print.call_args_list if call.args]
+    assert "Calculation timeout: 2.5s" in printed
+    assert any(str(line).startswith("Invalid timeout: -1") for line in printed)
+    assert printed[printed.index("Calculation timeout: 2.5s") + 2] == "Calculation timeout: off"
+
+def test_perform_calculation_reports_timeouts():
+    from app.plugins.add_command import AddCommand
+    from app.worker_pool import CalculationTimeout
+    with mock.patch("main.get_pool") as mock_pool, mock.patch("builtins.print") as mock_print:
+        mock_pool.return_value.calculate.side_effect = CalculationTimeout(0.5)
+        perform_calculation_and_display("7", "8", "add", {"add": AddCommand()}, use_multiprocessing=True)
+    mock_print.assert_called_once_with("Timed out: 7 add 8 did not finish within 0.5s.")
+
+def test_run_repl_eval_command():
+    from app.plugins.add_command import AddCommand
+    from app.plugins.multiply_command import MultiplyCommand
+    from app.plugins.square_command import SquareCommand
+    from app.plugins.subtract_command import SubtractCommand
+    commands = {"add": AddCommand(), "multiply": MultiplyCommand(), "square": SquareCommand(),
+                "subtract": SubtractCommand()}
+    Calculations.clear_history()
+    with mock.patch("builtins.input", side_effect=["eval (2 + 3) * 4", "eval square(5) - ans", "eval 2 +", "eval",
+                                                   "exit"]), \
+         mock.patch("builtins.print") as mock_print, \
+         mock.patch("main.shutdown_pool"):
+        run_repl(commands)
+    printed = [str(call.args[0]) for call in mock_print.call_args_list if call.args]
+    assert "The result of (2 + 3) * 4 is 20" in printed
+    assert "The result of square(5) - ans is 5" in printed
+    assert "Invalid expression: expected a value, found the end." in printed
+    assert sum(line.startswith("Usage: eval") for line in printed) == 2
+    # One history record per expression: its outermost call
+    assert Calculations.count() == 2
+    assert Calculations.get_latest() == {"operation": "subtract", "num1": Decimal(25), "num2": Decimal(20),
+                                         "result": Decimal(5)}
+    Calculations.clear_history()
+
+def test_eval_runs_calls_like_single_calculations():
+    from app.plugins.add_command import AddCommand
+    from app.plugins.square_command import SquareCommand
+    from app.worker_pool import CalculationTimeout, set_calculation_timeout
+    from main import evaluate_expression_and_display
+    commands = {"add": AddCommand(), "square": SquareCommand()}
+    with mock.patch("main._calculate", side_effect=lambda *args, **kwargs: (args[2].execute(*args[3:5]), "inline")) \
+            as mock_calculate, mock.patch("builtins.print") as mock_print:
+        evaluate_expression_and_display("square(97) + 1", commands)
+    mock_print.assert_called_once_with("The result of square(97) + 1 is 9410")
+    assert [call.args[1] for call in mock_calculate.call_args_list] == ["square", "add"]
+    # Under a deadline, every call gets what is left of it, and a miss is reported for the whole expression
+    set_calculation_timeout(0.5)
+    try:
+        with mock.patch("main._calculate", side_effect=CalculationTimeout(0.2)) as mock_calculate, \
+             mock.patch("builtins.print") as mock_print:
+            evaluate_expression_and_display("square(98) + 1", commands)
+    finally:
+        set_calculation_timeout(0)
+    assert 0 < mock_calculate.call_args.kwargs["timeout"] <= 0.5
+    mock_print.assert_called_once_with("Timed out: square(98) + 1 did not finish within 0.5s.")
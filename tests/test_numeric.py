@@ -0,0 +1,79 @@
+# tests/test_numeric.py
+from decimal import Decimal, InvalidOperation
+import numpy as np
+import pytest
+from app.numeric import FixedPoint, create_backend, get_backend, set_backend
+from app.plugins.add_command import AddCommand
+from app.plugins.divide_command import DivideCommand
+from app.plugins.multiply_command import MultiplyCommand
+from app.plugins.square_command import SquareCommand
+from app.plugins.subtract_command import SubtractCommand
+
+@pytest.fixture(autouse=True)
+def reset_backend():
+    yield
+    set_backend("decimal")
+
+def test_default_backend_is_decimal(monkeypatch):
+    monkeypatch.delenv("NUMERIC_MODE", raising=False)
+    set_backend("decimal")
+    assert get_backend().name == "decimal"
+    assert get_backend().parse("2.5") == Decimal("2.5")
+
+def test_unknown_backend():
+    with pytest.raises(ValueError, match="Unknown numeric mode"):
+        create_backend("complex")
+
+def test_float_backend():
+    backend = set_backend("FLOAT")
+    assert backend.name == "float"
+    assert backend.parse("0.1") == 0.1
+    assert backend.to_decimal(0.1) == Decimal("0.1")
+    with pytest.raises(InvalidOperation):
+        backend.parse("abc")
+    column = backend.column([1.0, 2.0])
+    assert column.dtype == np.float64
+
+def test_fixed_point_parse_and_round_trip(monkeypatch):
+    monkeypatch.setenv("FIXED_POINT_DIGITS", "2")
+    backend = create_backend("fixed")
+    value = backend.parse("1.005")
+    assert value.raw == 100  # half-even rounding
+    assert str(backend.parse("3.14159")) == "3.14"
+    assert backend.to_decimal(backend.parse("2.5")) == Decimal("2.50")
+    with pytest.raises(InvalidOperation):
+        backend.parse("inf")
+
+def test_fixed_point_arithmetic():
+    a, b = FixedPoint.from_decimal(Decimal("7.5")), FixedPoint.from_decimal(Decimal("2"))
+    assert str(a + b) == "9.500000"
+    assert str(a - b) == "5.500000"
+    assert str(a * b) == "15.000000"
+    assert str(a / b) == "3.750000"
+    assert str(FixedPoint.from_decimal(Decimal(1)) / FixedPoint.from_decimal(Decimal(3))) == "0.333333"
+    assert str(FixedPoint.from_decimal(Decimal(2)) / FixedPoint.from_decimal(Decimal(3))) == "0.666667"
+    assert a == Decimal("7.5") and b == 2 and a > b and b <= a
+    assert -a == FixedPoint.from_decimal(Decimal("-7.5"))
+    assert float(a) == 7.5
+    with pytest.raises(ZeroDivisionError):
+        _ = a / FixedPoint(0)
+
+def test_wide_fixed_point_values_are_exact():
+    value = Decimal("123456789012345678901234567890.123456")
+    fixed = FixedPoint.from_decimal(value)
+    assert fixed.raw == 123456789012345678901234567890123456
+    assert fixed.to_decimal() == value and str(fixed.to_decimal()) == str(value)
+
+@pytest.mark.parametrize("mode", ["decimal", "float", "fixed"])
+def test_plugins_honor_every_backend(mode):
+    backend = create_backend(mode)
+    six, four = backend.parse("6"), backend.parse("4")
+    expected = {"add": "10", "subtract": "2", "multiply": "24", "divide": "1.5", "square": "36"}
+    commands = {"add": AddCommand(), "subtract": SubtractCommand(), "multiply": MultiplyCommand(),
+                "divide": DivideCommand(), "square": SquareCommand()}
+    for name, command in commands.items():
+        assert backend.to_decimal(command.execute(six, four)) == Decimal(expected[name])
+        batch = command.execute_batch(backend.column([six]), backend.column([four]))
+        assert backend.to_decimal(batch[0]) == Decimal(expected[name])
+    with pytest.raises(ZeroDivisionError):
+        DivideCommand().execute(six, backend.parse("0"))
@@ -0,0 +1,201 @@
+# tests/test_pandas_facade.py
+import bisect
+import random
+from decimal import Decimal
+from unittest import mock
+import pandas as pd
+from app.pandas_facade import PandasFacade, TombstoneIndex
+
+def make_record(operation="add", num1=2, num2=3, result=5):
+    return {"operation": operation, "num1": Decimal(num1), "num2": Decimal(num2), "result": Decimal(result)}
+
+def test_add_record_does_not_concat():
+    facade = PandasFacade()
+    with mock.patch("pandas.concat") as mock_concat:
+        for _ in range(100):
+            facade.add_record(make_record())
+        mock_concat.assert_not_called()
+    assert len(facade) == 100
+    assert len(facade.dataframe) == 100
+
+def test_dataframe_is_materialized_lazily_and_cached():
+    facade = PandasFacade()
+    facade.add_record(make_record())
+    first = facade.dataframe
+    assert facade.dataframe is first
+    facade.add_record(make_record("subtract", 5, 3, 2))
+    second = facade.dataframe
+    assert second is not first
+    assert list(second["operation"]) == ["add", "subtract"]
+    assert second.iloc[1]["result"] == Decimal(2)
+
+def test_empty_dataframe_has_columns():
+    facade = PandasFacade()
+    assert facade.dataframe.empty
+    assert list(facade.dataframe.columns) == ["operation", "num1", "num2", "result"]
+
+def test_dataframe_setter_replaces_buffer():
+    facade = PandasFacade()
+    facade.add_record(make_record())
+    facade.dataframe = pd.DataFrame([make_record("multiply", 2, 3, 6), make_record("divide", 6, 3, 2)])
+    assert len(facade) == 2
+    assert list(facade.filter_by_operation("divide")["result"]) == [Decimal(2)]
+
+def test_delete_record_keeps_columns_aligned(capsys):
+    facade = PandasFacade()
+    facade.add_record(make_record("add", 1, 1, 2))
+    facade.add_record(make_record("subtract", 5, 3, 2))
+    facade.delete_record(0)
+    assert "Deleted calculation at index 0." in capsys.readouterr().out
+    assert facade.dataframe.iloc[0]["operation"] == "subtract"
+    assert facade.dataframe.index.tolist() == [0]
+
+def test_save_and_load_round_trip(tmp_path):
+    facade = PandasFacade()
+    facade.add_record(make_record())
+    file_path = tmp_path / "history.csv"
+    facade.save_to_file(str(file_path))
+    facade.clear()
+    assert facade.dataframe.empty
+    facade.load_from_file(str(file_path))
+    assert len(facade) == 1
+    assert facade.dataframe.iloc[0]["result"] == 5
+
+def test_operation_column_is_categorical():
+    facade = PandasFacade()
+    facade.add_record(make_record("add"))
+    facade.add_record(make_record("divide", 6, 3, 2))
+    assert isinstance(facade.dataframe["operation"].dtype, pd.CategoricalDtype)
+    assert list(facade.dataframe["operation"]) == ["add", "divide"]
+
+def test_filter_by_operation_uses_position_index():
+    facade = PandasFacade()
+    for index in range(6):
+        facade.add_record(make_record("add" if index % 2 == 0 else "subtract", index, 1, index + 1))
+    _ = facade.dataframe
+    with mock.patch.object(PandasFacade, "dataframe", new_callable=mock.PropertyMock) as mock_frame:
+        filtered = facade.filter_by_operation("subtract")
+        mock_frame.assert_not_called()
+    assert filtered.index.tolist() == [1, 3, 5]
+    assert list(filtered["num1"]) == [Decimal(1), Decimal(3), Decimal(5)]
+    assert facade.filter_by_operation("multiply").empty
+    assert facade.count_by_operation() == {"add": 3, "subtract": 3}
+
+def test_position_index_follows_deletes():
+    facade = PandasFacade()
+    for operation in ["add", "subtract", "add", "subtract", "add"]:
+        facade.add_record(make_record(operation))
+    facade.delete_record(1)
+    facade.delete_record(0)
+    assert facade.filter_by_operation("add").index.tolist() == [0, 2]
+    assert facade.filter_by_operation("subtract").index.tolist() == [1]
+    assert facade.count_by_operation() == {"add": 2, "subtract": 1}
+    facade.delete_record(1)
+    assert facade.count_by_operation() == {"add": 2}
+
+def test_position_index_rebuilt_on_load(tmp_path):
+    facade = PandasFacade()
+    for operation in ["add", "multiply", "add"]:
+        facade.add_record(make_record(operation))
+    file_path = tmp_path / "history.csv"
+    facade.save_to_file(str(file_path))
+    loaded = PandasFacade()
+    loaded.load_from_file(str(file_path))
+    assert loaded.count_by_operation() == {"add": 2, "multiply": 1}
+    assert loaded.filter_by_operation("add").index.tolist() == [0, 2]
+    loaded.add_record(make_record("multiply"))
+    assert loaded.filter_by_operation("multiply").index.tolist() == [1, 3]
+
+def test_deletes_are_tombstoned_until_compaction():
+    facade = PandasFacade()
+    facade.compact_ratio = 0
+    for index in range(6):
+        facade.add_record(make_record("add" if index % 2 == 0 else "subtract", index, 1, index + 1))
+    assert facade.remove_record(1) and facade.remove_record(1)
+    assert facade.tombstones == 2 and len(facade) == 4
+    assert [facade.get_record(index)["num1"] for index in range(4)] == [Decimal(0), Decimal(3), Decimal(4), Decimal(5)]
+    assert facade.filter_by_operation("subtract").index.tolist() == [1, 3]
+    assert facade.dataframe.index.tolist() == [0, 1, 2, 3]
+    assert facade.count_by_operation() == {"add": 2, "subtract": 2}
+    assert facade.head_and_tail(1)["num1"].tolist() == [Decimal(0), Decimal(5)]
+    facade.compact()
+    assert facade.tombstones == 0
+    assert facade.dataframe["num1"].tolist() == [Decimal(0), Decimal(3), Decimal(4), Decimal(5)]
+    assert facade.filter_by_operation("subtract").index.tolist() == [1, 3]
+
+def test_compaction_due_past_ratio_and_on_save(tmp_path):
+    facade = PandasFacade()
+    facade.compact_ratio = 0.5
+    for index in range(4):
+        facade.add_record(make_record(num1=index))
+    facade.remove_record(0)
+    assert facade.tombstones == 1 and not facade.compaction_due
+    facade.remove_record(0)
+    # The delete itself never compacts; the owner of the facade does
+    assert facade.tombstones == 2 and facade.compaction_due
+    facade.compact()
+    assert facade.tombstones == 0 and len(facade) == 2 and not facade.compaction_due
+    facade.remove_record(0)
+    facade.save_to_file(str(tmp_path / "history.csv"))
+    assert facade.tombstones == 0
+    assert pd.read_csv(tmp_path / "history.csv")["num1"].tolist() == [3]
+
+def test_bulk_removal():
+    facade = PandasFacade()
+    facade.compact_ratio = 0
+    for index in range(10):
+        facade.add_record(make_record(["add", "subtract", "multiply"][index % 3], index))
+    assert facade.remove_records([8, 2, 2, 50, -1]) == 2
+    assert facade.remove_records(range(0, 2)) == 2
+    assert facade.remove_operation("subtract") == 2
+    assert facade.dataframe["num1"].tolist() == [Decimal(3), Decimal(5), Decimal(6), Decimal(9)]
+    assert facade.count_by_operation() == {"add": 3, "multiply": 1}
+    assert facade.remove_operation("divide") == 0
+
+def test_adds_after_uncompacted_deletes_are_indexed_at_their_rows(tmp_path):
+    facade = PandasFacade()
+    facade.compact_ratio = 0
+    for index in range(10):
+        facade.add_record(make_record("add" if index % 2 == 0 else "subtract", index, 1, index))
+    facade.remove_record(0)
+    facade.add_record(make_record("add", 10, 1, 100))
+    facade.add_record(make_record("subtract", 11, 1, -100))
+    adds = facade.filter_by_operation("add")
+    assert adds.index.tolist() == [1, 3, 5, 7, 9]
+    assert adds["num1"].tolist()[-1] == Decimal(10)
+    assert set(facade.filter_by_operation("subtract")["operation"]) == {"subtract"}
+    assert facade.summary("add")["add"]["max"] == 100.0
+    assert facade.summary("subtract")["subtract"]["min"] == -100.0
+    assert facade.remove_operation("add") == 5
+    assert facade.dataframe["num1"].tolist() == [Decimal(value) for value in (1, 3, 5, 7, 9, 11)]
+
+def test_adds_after_deletes_on_columnar_base(tmp_path):
+    path = str(tmp_path / "history.npz")
+    facade = PandasFacade()
+    for index in range(6):
+        facade.add_record(make_record("divide", index, 3, Decimal(index) / 3))
+    facade.save_to_file(path)
+    loaded = PandasFacade()
+    loaded.compact_ratio = 0
+    loaded.load_from_file(path)
+    loaded.remove_record(5)
+    loaded.add_record(make_record("divide", 9, 3, 3))
+    assert loaded.summary("divide")["divide"]["max"] == 3.0
+    assert loaded.filter_by_operation("divide")["result"].tolist()[-1] == Decimal(3)
+
+def test_tombstone_index_matches_a_sorted_list():
+    generator = random.Random(0)
+    index = TombstoneIndex(0)
+    dead = []
+    for _ in range(300):
+        index.append()
+        if generator.random() < 0.5:
+            position = generator.choice([position for position in range(len(index.mask)) if not index.mask[position]])
+            index.mark(position)
+            bisect.insort(dead, position)
+        live = [position for position in range(len(index.mask)) if not index.mask[position]]
+        assert len(index) == len(dead)
+        assert [index.select(record) for record in range(len(live))] == live
+        assert index.select_many(list(range(len(live)))) == live
+        assert index.logical_many(live) == list(range(len(live)))
+        assert [index.before(position) for position in live] == [bisect.bisect_left(dead, p) for p in live]
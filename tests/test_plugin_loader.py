@@ -0,0 +1,76 @@
+# tests/test_plugin_loader.py
+import json
+import os
+import subprocess
+import sys
+import pytest
+from app import plugin_loader
+from app.plugin_loader import PluginRegistry, load_plugins
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Cumulative import time budget for `main.py 2 3 add`, in microseconds
+STARTUP_IMPORT_BUDGET_US = int(os.getenv("STARTUP_IMPORT_BUDGET_US", "400000"))
+
+@pytest.fixture
+def manifest(tmp_path, monkeypatch):
+    path = tmp_path / "manifest.json"
+    monkeypatch.setenv("PLUGIN_MANIFEST_FILE", str(path))
+    return path
+
+def test_manifest_written_and_reused(manifest, monkeypatch):
+    commands = load_plugins()
+    assert set(commands) == {"add", "subtract", "multiply", "divide", "square"}
+    data = json.loads(manifest.read_text())
+    assert data["plugins"]["add"] == {"module": "add_command", "class": "AddCommand"}
+
+    def fail_scan(*args):
+        raise AssertionError("manifest should have been reused")
+    monkeypatch.setattr(plugin_loader, "_scan_plugins", fail_scan)
+    assert set(load_plugins()) == set(commands)
+
+def test_manifest_invalidated_by_changed_plugin_files(manifest):
+    load_plugins()
+    data = json.loads(manifest.read_text())
+    data["files"]["add_command.py"] -= 1
+    manifest.write_text(json.dumps(data))
+    assert plugin_loader._read_manifest(str(manifest), plugin_loader._plugin_files(os.path.join("app", "plugins"))) is None
+    load_plugins()
+    assert json.loads(manifest.read_text())["files"] != data["files"]
+
+def test_corrupt_manifest_is_rebuilt(manifest):
+    manifest.write_text("{not json")
+    assert "divide" in load_plugins()
+    assert json.loads(manifest.read_text())["version"] == plugin_loader.MANIFEST_VERSION
+
+def test_registry_imports_on_first_lookup(monkeypatch):
+    imported = []
+    real_import = plugin_loader.importlib.import_module
+    monkeypatch.setattr(plugin_loader.importlib, "import_module", lambda name: imported.append(name) or real_import(name))
+    registry = PluginRegistry({"add": {"module": "add_command", "class": "AddCommand"},
+                               "square": {"module": "square_command", "class": "SquareCommand"}})
+    assert "add" in registry and len(registry) == 2
+    assert not imported
+    assert registry["add"] is registry["add"]
+    assert imported == ["app.plugins.add_command"]
+    registry.load_all()
+    assert imported == ["app.plugins.add_command", "app.plugins.square_command"]
+    with pytest.raises(KeyError):
+        _ = registry["unknown"]
+
+def test_single_shot_startup_skips_heavy_imports(tmp_path):
+    env = dict(os.environ, LOG_FILE=str(tmp_path / "app.log"), PLUGIN_MANIFEST_FILE=str(tmp_path / "manifest.json"))
+    for _ in range(2):  # the first run builds the manifest, the second reuses it
+        completed = subprocess.run([sys.executable, "-X", "importtime", "main.py", "2", "3", "add"],
+                                   cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True)
+    assert "The result of 2 add 3 is 5" in completed.stdout
+    imports = {}
+    for line in completed.stderr.splitlines():
+        if line.startswith("import time:") and line.split("|")[0].split()[-1].isdigit():
+            _, cumulative_us, name = line.split("|")
+            imports[name.rstrip()] = int(cumulative_us)
+    names = {name.strip() for name in imports}
+    assert "pandas" not in names and "numpy" not in names
+    assert "app.plugins.divide_command" not in names
+    # Top-level imports are indented by a single space; their cumulative times add up to the total
+    total_us = sum(cumulative for name, cumulative in imports.items() if not name.startswith("  "))
+    assert total_us < STARTUP_IMPORT_BUDGET_US
@@ -1,5 +1,6 @@
 import pytest
 import multiprocessing
+import numpy as np
 from decimal import Decimal, DivisionByZero
 from app.plugins.add_command import AddCommand
 from app.plugins.square_command import SquareCommand
@@ -116,4 +117,26 @@ def test_execute_multiprocessing_with_zero():
     
     # Retrieve the result from the queue
     result = result_queue.get()
-    assert result == Decimal(0)
\ No newline at end of file
+    assert result == Decimal(0)
+def test_execute_batch_float_columns():
+    a, b = np.array([6.0, 5.0, -2.0]), np.array([3.0, 0.0, 4.0])
+    assert AddCommand().execute_batch(a, b).tolist() == [9.0, 5.0, 2.0]
+    assert SubtractCommand().execute_batch(a, b).tolist() == [3.0, 5.0, -6.0]
+    assert MultiplyCommand().execute_batch(a, b).tolist() == [18.0, 0.0, -8.0]
+    assert SquareCommand().execute_batch(a, b).tolist() == [36.0, 25.0, 4.0]
+    quotients = DivideCommand().execute_batch(a, b)
+    assert quotients[0] == 2.0 and np.isnan(quotients[1]) and quotients[2] == -0.5
+
+def test_execute_batch_int_columns():
+    a, b = np.array([6, 5], dtype=np.int64), np.array([3, 0], dtype=np.int64)
+    sums = AddCommand().execute_batch(a, b)
+    assert sums.dtype == np.int64 and sums.tolist() == [9, 5]
+    quotients = DivideCommand().execute_batch(a, b)
+    assert quotients[0] == 2.0 and np.isnan(quotients[1])
+
+def test_execute_batch_decimal_columns():
+    a = np.array([Decimal("1.1"), Decimal(6)], dtype=object)
+    b = np.array([Decimal("2.2"), Decimal(0)], dtype=object)
+    assert AddCommand().execute_batch(a, b).tolist() == [Decimal("3.3"), Decimal(6)]
+    assert MultiplyCommand().execute_batch(a, b).tolist() == [Decimal("2.42"), Decimal(0)]
+    assert DivideCommand().execute_batch(a, b).tolist() == [Decimal("0.5"), None]
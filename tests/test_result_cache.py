@@ -0,0 +1,115 @@
+# tests/test_result_cache.py
+from decimal import Decimal
+from unittest import mock
+import pytest
+from app.command import Command
+from app.numeric import set_backend
+from app.plugins.add_command import AddCommand
+from app.plugins.divide_command import DivideCommand
+from app.plugins.square_command import SquareCommand
+from app.plugins.subtract_command import SubtractCommand
+from app.result_cache import ResultCache, get_cache, reset_cache
+
+def test_hit_and_miss_counters():
+    cache = ResultCache(max_size=4)
+    command = SubtractCommand()
+    assert cache.get_or_compute(command, Decimal(5), Decimal(3)) == Decimal(2)
+    assert cache.get_or_compute(command, Decimal(5), Decimal(3)) == Decimal(2)
+    assert cache.get_or_compute(command, Decimal(3), Decimal(5)) == Decimal(-2)
+    assert cache.stats() == {"entries": 2, "max_size": 4, "hits": 1, "disk_hits": 0, "misses": 2, "evictions": 0}
+
+def test_commutative_and_unary_keys():
+    cache = ResultCache()
+    assert cache.make_key(AddCommand(), Decimal(3), Decimal(5)) == cache.make_key(AddCommand(), Decimal(5), Decimal(3))
+    assert cache.make_key(SubtractCommand(), Decimal(3), Decimal(5)) != cache.make_key(SubtractCommand(), Decimal(5), Decimal(3))
+    assert cache.make_key(SquareCommand(), Decimal(4), Decimal(1)) == cache.make_key(SquareCommand(), Decimal(4), Decimal(9))
+    assert cache.make_key(AddCommand(), Decimal("2"), Decimal(1)) != cache.make_key(AddCommand(), Decimal("2.0"), Decimal(1))
+
+def test_key_includes_numeric_context():
+    cache = ResultCache()
+    decimal_key = cache.make_key(AddCommand(), Decimal(1), Decimal(2))
+    set_backend("float")
+    try:
+        assert cache.make_key(AddCommand(), Decimal(1), Decimal(2)) != decimal_key
+    finally:
+        set_backend("decimal")
+
+def test_lru_eviction():
+    cache = ResultCache(max_size=2)
+    command = SubtractCommand()
+    cache.get_or_compute(command, Decimal(1), Decimal(0))
+    cache.get_or_compute(command, Decimal(2), Decimal(0))
+    cache.get_or_compute(command, Decimal(1), Decimal(0))  # refresh 1
+    cache.get_or_compute(command, Decimal(3), Decimal(0))  # evicts 2
+    assert cache.evictions == 1
+    compute = mock.Mock(return_value=Decimal(2))
+    cache.get_or_compute(command, Decimal(2), Decimal(0), compute)
+    compute.assert_called_once()
+    cache.get_or_compute(command, Decimal(3), Decimal(0), compute)
+    compute.assert_called_once()
+
+def test_impure_and_disabled_commands_are_not_cached():
+    impure = SubtractCommand()
+    impure.pure = False
+    cache = ResultCache()
+    cache.get_or_compute(impure, Decimal(1), Decimal(1))
+    cache.get_or_compute(impure, Decimal(1), Decimal(1))
+    assert cache.stats()["entries"] == 0
+    disabled = ResultCache(max_size=0)
+    disabled.get_or_compute(AddCommand(), Decimal(1), Decimal(1))
+    assert disabled.stats()["misses"] == 0
+
+def test_plugins_are_impure_unless_declared():
+    class UndeclaredCommand(SubtractCommand):
+        pure = Command.pure
+    cache = ResultCache()
+    cache.get_or_compute(UndeclaredCommand(), Decimal(1), Decimal(1))
+    assert cache.stats()["entries"] == 0
+    assert all(command.pure for command in (AddCommand, DivideCommand, SquareCommand, SubtractCommand))
+
+def test_errors_are_not_cached():
+    cache = ResultCache()
+    with pytest.raises(ZeroDivisionError):
+        cache.get_or_compute(DivideCommand(), Decimal(1), Decimal(0))
+    assert cache.stats()["entries"] == 0
+
+def test_persistent_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResultCache(path=path)
+    cache.get_or_compute(DivideCommand(), Decimal(1), Decimal(3))
+    cache.close()
+    reopened = ResultCache(path=path)
+    compute = mock.Mock()
+    assert reopened.get_or_compute(DivideCommand(), Decimal(1), Decimal(3), compute) == Decimal(1) / Decimal(3)
+    compute.assert_not_called()
+    assert reopened.disk_hits == 1
+    reopened.clear()
+    assert reopened.stats()["disk_hits"] == 0
+    reopened.get_or_compute(DivideCommand(), Decimal(1), Decimal(3))
+    assert reopened.misses == 1
+    reopened.close()
+
+def test_get_cache_reads_environment(monkeypatch):
+    reset_cache()
+    monkeypatch.setenv("RESULT_CACHE_SIZE", "7")
+    monkeypatch.delenv("RESULT_CACHE_FILE", raising=False)
+    cache = get_cache()
+    assert get_cache() is cache
+    assert cache.max_size == 7
+    reset_cache()
+
+def test_persistent_tier_never_unpickles(tmp_path):
+    import pickle
+    import sqlite3
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResultCache(path=path)
+    key = repr(cache.make_key(AddCommand(), Decimal(1), Decimal(2)))
+    cache.close()
+    with sqlite3.connect(path) as connection:
+        connection.execute("INSERT INTO results VALUES (?, ?)", (key, pickle.dumps(Decimal(99))))
+    reopened = ResultCache(path=path)
+    assert reopened.get_or_compute(AddCommand(), Decimal(1), Decimal(2)) == Decimal(3)
+    assert reopened.disk_hits == 0 and reopened.misses == 1
+    row = reopened._connection.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+    assert row[0] == '["decimal", "3"]'
+    reopened.close()
@@ -0,0 +1,61 @@
+# tests/test_scaled_column.py
+import math
+from decimal import Decimal
+import numpy as np
+import pandas as pd
+from app.history_stats import to_float
+from app.numeric import FixedPoint
+from app.pandas_facade import PandasFacade
+from app.scaled_column import KIND_DECIMAL, KIND_OVERFLOW, KIND_WIDE, ScaledColumn, float_keys
+
+VALUES = [
+    Decimal("1.50"), Decimal("-3"), Decimal("0E-7"), Decimal("1E+5"), Decimal("-0.00"),
+    Decimal(1) / Decimal(3), Decimal("9223372036854775808"), Decimal("1" * 50), Decimal("1E-200"),
+    Decimal("NaN"), Decimal("-Infinity"), 1.5, float("nan"), -0.0, 7, 2 ** 70, True, None, "text",
+    FixedPoint.from_decimal(Decimal("2.5")),
+]
+
+def test_values_round_trip_with_their_type_and_text():
+    column = ScaledColumn(VALUES)
+    assert len(column) == len(VALUES)
+    for original, stored in zip(VALUES, column.tolist()):
+        assert type(stored) is type(original)
+        assert str(stored) == str(original)
+    assert str(column[0]) == "1.50" and str(column[-1]) == "2.500000"
+    assert [str(value) for value in column[3:5]] == ["1E+5", "-0.00"]
+
+def test_cells_use_int64_storage_when_values_fit():
+    column = ScaledColumn([Decimal("1.50"), Decimal(1) / Decimal(3), Decimal("NaN")])
+    assert list(column._kinds) == [KIND_DECIMAL, KIND_WIDE, KIND_OVERFLOW]
+    assert list(column._coefficients)[0] == 150 and list(column._exponents)[0] == -2
+    assert column.nbytes == 30
+
+def test_floats_match_to_float():
+    column = ScaledColumn(VALUES + [Decimal("0.1"), Decimal("123456789.987654321"), Decimal("-2.5E-30")])
+    expected = [math.nan if to_float(value) is None else to_float(value) for value in column.tolist()]
+    np.testing.assert_array_equal(column.floats(), np.array(expected))
+    np.testing.assert_array_equal(column.floats(5, 9), np.array(expected[5:9]))
+    np.testing.assert_array_equal(float_keys(["x", Decimal("2")]), np.array([math.nan, 2.0]))
+
+def test_appends_still_work_after_floats_and_compress_keeps_overflow():
+    column = ScaledColumn([Decimal(1), None, Decimal(3), "x"])
+    column.floats()
+    column.append(Decimal(4))
+    kept = column.compress(bytes([1, 0, 1, 1, 1]))
+    assert kept.tolist() == [Decimal(1), Decimal(3), "x", Decimal(4)]
+    kept.extend(ScaledColumn([None, Decimal(5)]))
+    assert kept.tolist()[-2:] == [None, Decimal(5)]
+
+def test_facade_csv_is_identical_to_object_columns(tmp_path):
+    records = [{"operation": "divide", "num1": Decimal("1.10"), "num2": Decimal(3), "result": Decimal("1.10") / 3},
+               {"operation": "add", "num1": Decimal("2.000"), "num2": Decimal("-0.5"), "result": Decimal("1.500")},
+               {"operation": "divide", "num1": Decimal(1), "num2": Decimal(0), "result": None}]
+    facade = PandasFacade()
+    for record in records:
+        facade.add_record(record)
+    path = tmp_path / "history.csv"
+    facade.save_to_file(str(path))
+    expected = pd.DataFrame({name: pd.Series([record[name] for record in records], dtype=object)
+                             for name in ["operation", "num1", "num2", "result"]})
+    assert path.read_text() == expected.to_csv(index=False)
+    assert facade.dataframe["result"].tolist() == [record["result"] for record in records]
@@ -0,0 +1,213 @@
+# tests/test_server.py
+import asyncio
+import json
+import threading
+import time
+from decimal import Decimal, DivisionByZero
+from unittest import mock
+import pytest
+from app.calculations import Calculations
+from app.numeric import create_backend, set_backend
+from app.plugin_loader import load_plugins
+from app.server import CalculationServer, MicroBatcher, VECTORIZE_MIN_ROWS
+from app.worker_pool import ThreadPool
+from main import main
+
+@pytest.fixture(autouse=True)
+def clean_history():
+    Calculations.clear_history()
+    yield
+    Calculations.clear_history()
+    set_backend("decimal")
+
+def run_with_server(history, scenario, unix_path=None, server=None):
+    async def run():
+        server_ = server or CalculationServer(load_plugins(), history)
+        listener = await server_.start(port=0, unix_path=unix_path)
+        try:
+            if unix_path:
+                streams = await asyncio.open_unix_connection(unix_path)
+            else:
+                streams = await asyncio.open_connection("127.0.0.1", listener.sockets[0].getsockname()[1])
+            return await scenario(*streams)
+        finally:
+            listener.close()
+            await listener.wait_closed()
+    return asyncio.run(run())
+
+async def ndjson_exchange(reader, writer, requests):
+    for request in requests:
+        writer.write((request if isinstance(request, str) else json.dumps(request)).encode() + b"\n")
+    await writer.drain()
+    responses = [json.loads(await reader.readline()) for _ in requests]
+    writer.close()
+    return responses
+
+def test_ndjson_pipelined_requests_answered_in_order():
+    requests = [
+        {"id": 1, "operation": "add", "num1": "2", "num2": "3"},
+        {"id": 2, "operation": "divide", "num1": "1", "num2": "0"},
+        {"id": 3, "operation": "power", "num1": "1", "num2": "2"},
+        {"id": 4, "operation": "multiply", "num1": "x", "num2": "2"},
+        "{not json",
+        {"id": 5, "operation": "square", "num1": "1.5"},
+        {"id": 6, "action": "history", "count": 5},
+    ]
+    responses = run_with_server("connection", lambda r, w: ndjson_exchange(r, w, requests))
+    assert responses[0] == {"id": 1, "result": "5"}
+    assert responses[1] == {"id": 2, "error": "Division by zero is not allowed."}
+    assert responses[2] == {"id": 3, "error": "Unknown operation: power"}
+    assert responses[3] == {"id": 4, "error": "Invalid number input: x or 2"}
+    assert responses[4]["error"].startswith("Invalid JSON")
+    assert responses[5] == {"id": 5, "result": "2.25"}
+    assert [record["result"] for record in responses[6]["history"]] == ["5", "2.25"]
+    assert Calculations.count() == 0
+
+async def http_exchange(reader, writer, requests):
+    responses = []
+    for request in requests:
+        writer.write(request.encode())
+        await writer.drain()
+        status = (await reader.readline()).decode()
+        headers = {}
+        while (line := await reader.readline()) != b"\r\n":
+            name, _, value = line.decode().partition(":")
+            headers[name.lower()] = value.strip()
+        body = json.loads(await reader.readexactly(int(headers["content-length"])))
+        responses.append((int(status.split()[1]), headers["connection"], body))
+    writer.close()
+    return responses
+
+def http_request(method, path, body=None, connection=None):
+    content = json.dumps(body) if body is not None else ""
+    extra = f"Connection: {connection}\r\n" if connection else ""
+    return f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n{extra}Content-Length: {len(content)}\r\n\r\n{content}"
+
+def test_http_api_with_shared_history():
+    requests = [
+        http_request("POST", "/calculate", {"operation": "add", "num1": "1", "num2": "2"}),
+        http_request("POST", "/calculate", [{"id": "a", "operation": "multiply", "num1": "2", "num2": "4"},
+                                            {"id": "b", "operation": "divide", "num1": "2", "num2": "0"}]),
+        http_request("GET", "/history?count=1"),
+        http_request("GET", "/calculate"),
+        http_request("GET", "/missing"),
+        http_request("GET", "/health", connection="close"),
+    ]
+    responses = run_with_server("shared", lambda r, w: http_exchange(r, w, requests))
+    assert responses[0] == (200, "keep-alive", {"result": "3"})
+    assert responses[1][2] == [{"id": "a", "result": "8"}, {"id": "b", "error": "Division by zero is not allowed."}]
+    assert responses[2][2]["history"] == [{"operation": "multiply", "num1": "2", "num2": "4", "result": "8"}]
+    assert responses[3][0] == 405 and responses[4][0] == 404
+    assert responses[5][:2] == (200, "close") and responses[5][2]["status"] == "ok"
+    assert Calculations.count() == 2
+
+def test_malformed_counts_are_answered_with_errors():
+    requests = [
+        {"id": 1, "action": "history", "count": "many"},
+        {"id": 2, "action": "history", "count": -1},
+        {"id": 3, "operation": "add", "num1": "1", "num2": "1"},
+    ]
+    responses = run_with_server("connection", lambda r, w: ndjson_exchange(r, w, requests))
+    assert responses == [{"id": 1, "error": "Invalid count: many"}, {"id": 2, "error": "Invalid count: -1"},
+                         {"id": 3, "result": "2"}]
+    responses = run_with_server("connection", lambda r, w: http_exchange(r, w, [
+        http_request("GET", "/history?count=x"),
+        "POST /calculate HTTP/1.1\r\nContent-Length: ten\r\n\r\n",
+    ]))
+    assert responses[0] == (400, "keep-alive", {"error": "Invalid count: x"})
+    assert responses[1] == (400, "close", {"error": "Invalid Content-Length"})
+
+def test_unix_socket(tmp_path):
+    responses = run_with_server("none", lambda r, w: ndjson_exchange(
+        r, w, [{"operation": "subtract", "num1": "5", "num2": "7"}]), unix_path=str(tmp_path / "calc.sock"))
+    assert responses == [{"result": "-2"}]
+    assert Calculations.count() == 0
+
+def test_batcher_vectorizes_float_groups():
+    commands = load_plugins()
+    backend = create_backend("float")
+    batcher = MicroBatcher(backend=backend)
+    count = VECTORIZE_MIN_ROWS + 6
+
+    async def run():
+        calls = [batcher.submit(commands["divide"], float(index), float(index % 3)) for index in range(count)]
+        calls.append(batcher.submit(commands["add"], 1.0, 2.0))
+        return await asyncio.gather(*calls, return_exceptions=True)
+
+    with mock.patch.object(commands["divide"], "execute_batch", wraps=commands["divide"].execute_batch) as batch:
+        results = asyncio.run(run())
+    batch.assert_called_once()
+    assert batcher.batches == 1 and batcher.batched_calculations == count + 1
+    for index, result in enumerate(results[:count]):
+        if index % 3 == 0:
+            assert isinstance(result, DivisionByZero)
+        else:
+            assert result == index / (index % 3) and isinstance(result, float)
+    assert results[-1] == 3.0
+
+def test_batcher_executes_decimal_immediately():
+    batcher = MicroBatcher()
+    result = asyncio.run(batcher.submit(load_plugins()["add"], Decimal("0.1"), Decimal("0.2")))
+    assert result == Decimal("0.3")
+    assert batcher.batches == 0
+
+class SlowCommand:
+    """A command that blocks its thread for a while on large operands."""
+    operation_name = "add"
+
+    def __init__(self):
+        self.threads = []
+
+    def execute(self, num1, num2):
+        self.threads.append(threading.current_thread().name)
+        if num1 > 10 ** 10:
+            time.sleep(0.3)
+        return num1 + num2
+
+def test_batcher_runs_decimal_off_the_event_loop():
+    pool = ThreadPool(2)
+    batcher = MicroBatcher(pool=pool, inline_digits=10)
+    slow = SlowCommand()
+
+    async def run():
+        pending = asyncio.ensure_future(batcher.submit(slow, Decimal(10 ** 20), Decimal(2)))
+        await asyncio.sleep(0.01)
+        fast = await batcher.submit(slow, Decimal(2), Decimal(2))
+        assert not pending.done()
+        return await pending, fast
+
+    try:
+        assert asyncio.run(run()) == (Decimal(10 ** 20 + 2), Decimal(4))
+    finally:
+        pool.shutdown()
+    assert slow.threads[0].startswith("calculation")
+    assert slow.threads[1] == threading.current_thread().name
+
+def test_ndjson_inflight_requests_are_capped():
+    server = CalculationServer(load_plugins(), "none", max_inflight=2)
+    active = []
+    peak = []
+    calculate = server.calculate
+
+    async def tracked(request, session=None):
+        active.append(request)
+        peak.append(len(active))
+        await asyncio.sleep(0.01)
+        active.remove(request)
+        return await calculate(request, session)
+
+    requests = [{"id": index, "operation": "add", "num1": str(index), "num2": "1"} for index in range(10)]
+    with mock.patch.object(server, "calculate", tracked):
+        responses = run_with_server("none", lambda r, w: ndjson_exchange(r, w, requests), server=server)
+    assert responses == [{"id": index, "result": str(index + 1)} for index in range(10)]
+    assert max(peak) == 2
+
+def test_unknown_history_mode():
+    with pytest.raises(ValueError, match="Unknown history mode"):
+        CalculationServer({}, "global")
+
+def test_main_serve_dispatch():
+    with mock.patch("sys.argv", ["main.py", "serve", "--port", "9000"]), \
+         mock.patch("app.server.run_server") as mock_run:
+        main()
+    assert mock_run.call_args.args[1] == ["--port", "9000"]
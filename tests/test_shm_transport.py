@@ -0,0 +1,83 @@
+# tests/test_shm_transport.py
+from decimal import Decimal
+from multiprocessing import shared_memory
+import pytest
+from app.plugin_loader import load_plugins
+from app.shm_transport import SharedColumn, calculate_columns
+from app.worker_pool import WorkerPool
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = WorkerPool(max_workers=2)
+    yield pool
+    pool.shutdown()
+
+def inline(operation: str, first: list, second: list) -> list:
+    command = load_plugins().load_all()[operation]
+    results = []
+    for num1, num2 in zip(first, second):
+        try:
+            results.append(command.execute(num1, num2))
+        except Exception:  # pylint: disable=broad-exception-caught
+            results.append(None)
+    return results
+
+def test_shared_column_round_trips_values():
+    values = [Decimal("1.50"), Decimal("-0.00"), Decimal(1) / Decimal(3), Decimal("1" * 50), 2.5, None]
+    shared, side_channel = SharedColumn.from_values(values)
+    try:
+        assert sorted(side_channel) == [1, 2, 3, 5]
+        assert [str(value) for value in shared.column(side_channel).tolist()] == [str(value) for value in values]
+        attached = SharedColumn(len(values), shared.name)
+        assert attached.write(0, Decimal("7.25")) == (False, None)
+        assert attached.write(5, Decimal("NaN"))[0]
+        attached.close()
+        assert shared.column(side_channel)[0] == Decimal("7.25")
+    finally:
+        shared.close()
+        shared.memory.unlink()
+
+@pytest.mark.parametrize("operation", ["add", "multiply", "divide", "square"])
+def test_calculate_columns_matches_inline(pool, operation):
+    first = [Decimal(i).scaleb(-2) for i in range(-50, 50)] + [Decimal("9" * 30), 1.5]
+    second = [Decimal(i % 4) for i in range(100)] + [Decimal("0.5"), 2.0]
+    results, errors = calculate_columns(pool, operation, first, second, tasks=3)
+    assert results == inline(operation, first, second)
+    assert [str(value) for value in results] == [str(value) for value in inline(operation, first, second)]
+    if operation == "divide":
+        assert sorted(errors) == [i for i in range(100) if i % 4 == 0]
+        assert errors[0].startswith("DivisionByZero")
+    else:
+        assert not errors
+
+def test_calculate_columns_frees_the_blocks(pool, monkeypatch):
+    names = []
+    created = SharedColumn.__init__
+    def recording_init(self, length, name=None):
+        created(self, length, name)
+        names.append(self.name)
+    monkeypatch.setattr(SharedColumn, "__init__", recording_init)
+    assert pool.calculate_columns("add", [Decimal(1), Decimal(2)], [Decimal(3), Decimal(4)]) == ([Decimal(4), Decimal(6)], {})
+    assert len(names) == 3
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+def test_calculate_columns_frees_the_blocks_when_setup_fails(pool, monkeypatch):
+    created = []
+    from_values = SharedColumn.from_values.__func__
+    def failing_from_values(cls, values):
+        if created:
+            raise MemoryError("no space left for the second column")
+        created.append(from_values(cls, values))
+        return created[0]
+    monkeypatch.setattr(SharedColumn, "from_values", classmethod(failing_from_values))
+    with pytest.raises(MemoryError):
+        calculate_columns(pool, "add", [Decimal(1)], [Decimal(2)])
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=created[0][0].name)
+
+def test_calculate_columns_edge_cases(pool):
+    assert calculate_columns(pool, "add", [], []) == ([], {})
+    with pytest.raises(ValueError):
+        calculate_columns(pool, "add", [Decimal(1)], [])
@@ -0,0 +1,85 @@
+# tests/test_worker_pool.py
+import time
+from decimal import Decimal, DivisionByZero
+import pytest
+from app import worker_pool
+from app.batch import run_batch
+from app.worker_pool import (CalculationTimeout, ThreadPool, WorkerPool, execute_in_worker, get_calculation_timeout,
+                             get_pool, set_calculation_timeout, shutdown_pool)
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = WorkerPool(max_workers=1)
+    yield pool
+    pool.shutdown()
+
+def test_pool_starts_lazily():
+    pool = WorkerPool(max_workers=1)
+    assert not pool.started
+    pool.shutdown()
+    assert not pool.started
+
+def test_pool_calculate(pool):
+    assert pool.calculate("add", Decimal(2), Decimal(3)) == Decimal(5)
+    assert pool.calculate("square", Decimal(4), Decimal(0)) == Decimal(16)
+    assert pool.started
+
+def test_pool_calculate_reraises_errors(pool):
+    with pytest.raises(DivisionByZero):
+        pool.calculate("divide", Decimal(1), Decimal(0))
+
+def test_execute_in_worker_inline():
+    assert execute_in_worker("multiply", Decimal(2), Decimal(3)) == Decimal(6)
+
+def test_run_batch_with_pool(pool, tmp_path):
+    input_path, output_path = tmp_path / "in.csv", tmp_path / "out.csv"
+    input_path.write_text("\n".join(f"add,{i},1" for i in range(50)) + "\n", encoding="utf-8")
+    summary = run_batch(str(input_path), str(output_path), {}, chunk_size=7, pool=pool)
+    lines = output_path.read_text(encoding="utf-8").splitlines()[1:]
+    assert summary.rows == 50
+    assert summary.chunks == 8
+    assert lines == [f"add,{i},1,{i + 1}," for i in range(50)]
+
+def test_get_pool_reads_environment(monkeypatch):
+    shutdown_pool()
+    monkeypatch.setenv("WORKER_POOL_SIZE", "3")
+    monkeypatch.setenv("WORKER_START_METHOD", "spawn")
+    pool = get_pool()
+    assert get_pool() is pool
+    assert pool.max_workers == 3
+    assert pool.start_method == "spawn"
+    shutdown_pool()
+    assert worker_pool._default_pool is None
+
+def test_missed_deadline_recycles_the_pool():
+    pool = WorkerPool(max_workers=1)
+    running, queued = pool.submit(time.sleep, 30), pool.submit(time.sleep, 30)
+    start = time.perf_counter()
+    with pytest.raises(CalculationTimeout, match="deadline of 0.2s"):
+        pool.wait(running, 0.2)
+    assert time.perf_counter() - start < 5
+    assert not pool.started
+    assert queued.cancelled() or queued.exception() is not None
+    assert pool.calculate("add", Decimal(2), Decimal(3), timeout=30) == Decimal(5)
+    pool.shutdown()
+
+def test_thread_pool_keeps_the_decimal_context():
+    from decimal import localcontext  # pylint: disable=import-outside-toplevel
+    pool = ThreadPool(max_workers=1)
+    with localcontext() as context:
+        context.prec = 5
+        assert pool.calculate("divide", Decimal(1), Decimal(3)) == Decimal("0.33333")
+    with pytest.raises(CalculationTimeout):
+        pool.wait(pool.submit(time.sleep, 0.5), 0.01)
+    assert not pool.started
+    pool.shutdown()
+
+def test_calculation_timeout_setting(monkeypatch):
+    monkeypatch.setattr(worker_pool, "_calculation_timeout", None)
+    monkeypatch.setenv("CALCULATION_TIMEOUT", "2.5")
+    assert get_calculation_timeout() == 2.5
+    set_calculation_timeout(0)
+    assert get_calculation_timeout() is None
+    for invalid in ("-1", "soon", "inf", "nan"):
+        with pytest.raises(ValueError):
+            set_calculation_timeout(invalid)